@@ -418,138 +418,32 @@ def bulk_export():
 
     Supports multi-timeframe export where computed intervals (5m, 15m, 30m, 1h)
     are aggregated from 1m data and exported as separate files.
+    Runs in the request; large exports should use /api/export/jobs.
     """
     try:
-        from datetime import datetime
+        from services.historify_export_service import prepare_export_request, run_export
 
-        from database.historify_db import (
-            export_bulk_csv,
-            export_to_parquet,
-            export_to_txt,
-            export_to_zip,
-        )
+        success, params, status_code = prepare_export_request(request.get_json())
+        if not success:
+            return jsonify(params), status_code
 
-        data = request.get_json()
-        format_type = data.get("format", "csv").lower()
-        symbols = data.get("symbols")  # Optional list of {symbol, exchange}
-        interval = data.get("interval")  # Single interval (legacy)
-        intervals = data.get("intervals")  # Multiple intervals (new)
-        start_date = data.get("start_date")
-        end_date = data.get("end_date")
-        split_by = data.get("split_by", "symbol")  # For ZIP: 'symbol' or 'none'
-        compression = data.get("compression", "zstd")  # For Parquet
-        # Validate compression against allowlist to prevent SQL injection
-        VALID_COMPRESSIONS = ["zstd", "snappy", "gzip", "none"]
-        if compression not in VALID_COMPRESSIONS:
-            compression = "zstd"
-
-        # Validate intervals parameter using parse_interval for dynamic validation
-        from database.historify_db import parse_interval
-
-        if intervals is not None:
-            if not isinstance(intervals, list):
-                return jsonify({"status": "error", "message": "intervals must be an array"}), 400
-            if len(intervals) == 0:
-                return jsonify(
-                    {"status": "error", "message": "At least one interval must be specified"}
-                ), 400
-            intervals = list(set(intervals))  # Remove duplicates
-            invalid = [i for i in intervals if parse_interval(i) is None]
-            if invalid:
-                return jsonify({"status": "error", "message": f"Invalid intervals: {invalid}"}), 400
-
-        # Convert dates to timestamps if provided
-        start_timestamp = None
-        end_timestamp = None
-        if start_date:
-            start_timestamp = int(datetime.strptime(start_date, "%Y-%m-%d").timestamp())
-        if end_date:
-            # End of day
-            end_timestamp = int(datetime.strptime(end_date, "%Y-%m-%d").timestamp()) + 86400
-
-        # Generate filename
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        if symbols and len(symbols) == 1:
-            base_name = f"historify_{symbols[0]['symbol']}_{timestamp_str}"
-        else:
-            base_name = f"historify_export_{timestamp_str}"
-
-        # Check if any interval requires aggregation from 1m data (custom intervals)
-        from database.historify_db import is_custom_interval
-
-        # Force ZIP format if:
-        # 1. Multiple intervals selected, OR
-        # 2. Any computed/custom interval is selected (since only ZIP supports aggregation)
-        has_computed = intervals and any(is_custom_interval(i) for i in intervals)
-        if (intervals and len(intervals) > 1) or has_computed:
-            format_type = "zip"
-
-        # Create temp file path
-        if format_type == "parquet":
-            file_ext = ".parquet"
-        elif format_type == "zip":
-            file_ext = ".zip"
-        elif format_type == "txt":
-            file_ext = ".txt"
-        else:
-            file_ext = ".csv"
-
-        output_path = os.path.join(tempfile.gettempdir(), f"{base_name}{file_ext}")
-
-        # Execute export based on format
-        if format_type == "parquet":
-            success, message, record_count = export_to_parquet(
-                output_path=output_path,
-                symbols=symbols,
-                interval=intervals[0] if intervals else interval,
-                start_timestamp=start_timestamp,
-                end_timestamp=end_timestamp,
-                compression=compression,
-            )
-            mime_type = "application/octet-stream"
-        elif format_type == "zip":
-            success, message, record_count = export_to_zip(
-                output_path=output_path,
-                symbols=symbols,
-                intervals=intervals if intervals else ([interval] if interval else None),
-                start_timestamp=start_timestamp,
-                end_timestamp=end_timestamp,
-                split_by=split_by,
-            )
-            mime_type = "application/zip"
-        elif format_type == "txt":
-            success, message, record_count = export_to_txt(
-                output_path=output_path,
-                symbols=symbols,
-                interval=intervals[0] if intervals else interval,
-                start_timestamp=start_timestamp,
-                end_timestamp=end_timestamp,
-            )
-            mime_type = "text/plain"
-        else:  # csv
-            success, message, record_count = export_bulk_csv(
-                output_path=output_path,
-                symbols=symbols if symbols else [],
-                interval=intervals[0] if intervals else interval,
-                start_timestamp=start_timestamp,
-                end_timestamp=end_timestamp,
-            )
-            mime_type = "text/csv"
+        output_path = os.path.join(tempfile.gettempdir(), params["filename"])
+        success, message, record_count = run_export(params, output_path)
 
         if not success:
             return jsonify({"status": "error", "message": message}), 400
 
         # Store file path in session for download
         session["bulk_export_file"] = output_path
-        session["bulk_export_mime"] = mime_type
-        session["bulk_export_name"] = f"{base_name}{file_ext}"
+        session["bulk_export_mime"] = params["mime_type"]
+        session["bulk_export_name"] = params["filename"]
 
         return jsonify(
             {
                 "status": "success",
                 "message": message,
                 "record_count": record_count,
-                "filename": f"{base_name}{file_ext}",
+                "filename": params["filename"],
             }
         ), 200
 
@@ -616,6 +510,61 @@ def download_bulk_export():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@historify_bp.route("/api/export/jobs", methods=["POST"])
+@check_session_validity
+def start_export_job():
+    """Start a background export job (same request body as /api/export/bulk)."""
+    try:
+        from services.historify_export_service import start_export_job as service_start_export
+
+        success, response, status_code = service_start_export(request.get_json())
+        return jsonify(response), status_code
+    except Exception as e:
+        logger.error(f"Error starting export job: {e}")
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@historify_bp.route("/api/export/jobs/<job_id>", methods=["GET"])
+@check_session_validity
+def get_export_job(job_id):
+    """Get status and progress of an export job."""
+    try:
+        from services.historify_export_service import get_export_job as service_get_export_job
+
+        success, response, status_code = service_get_export_job(job_id)
+        return jsonify(response), status_code
+    except Exception as e:
+        logger.error(f"Error getting export job: {e}")
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@historify_bp.route("/api/export/jobs/<job_id>/download", methods=["GET"])
+@check_session_validity
+def download_export_job(job_id):
+    """Stream a completed export; ZIP archives are assembled while streaming."""
+    try:
+        from services.historify_export_service import open_export_download
+
+        success, response, status_code = open_export_download(job_id)
+        if not success:
+            return jsonify(response), status_code
+
+        result = Response(
+            response["stream"],
+            mimetype=response["mime_type"],
+            headers={"Content-Disposition": f"attachment; filename={response['filename']}"},
+        )
+        # Export files are deleted once the response is closed
+        result.call_on_close(response["cleanup"])
+        return result
+    except Exception as e:
+        logger.error(f"Error downloading export job: {e}")
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 # =============================================================================
 # Utility Endpoints
 # =============================================================================
@@ -694,6 +643,45 @@ def get_stats():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@historify_bp.route("/api/catalog/rebuild", methods=["POST"])
+@check_session_validity
+def rebuild_catalog():
+    """Recompute catalog statistics and rollups from stored data (repair)."""
+    try:
+        from services.historify_service import rebuild_catalog as service_rebuild_catalog
+
+        data = request.get_json(silent=True) or {}
+        success, response, status_code = service_rebuild_catalog(
+            data.get("symbol"), data.get("exchange"), data.get("interval")
+        )
+        return jsonify(response), status_code
+    except Exception as e:
+        logger.error(f"Error rebuilding catalog: {e}")
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@historify_bp.route("/api/gaps", methods=["POST"])
+@check_session_validity
+def verify_gaps():
+    """Report missing trading sessions per symbol without downloading (verify mode)."""
+    try:
+        from services.historify_planner_service import verify_gaps as service_verify_gaps
+
+        data = request.get_json(silent=True) or {}
+        success, response, status_code = service_verify_gaps(
+            symbols=data.get("symbols"),
+            interval=data.get("interval", "D"),
+            start_date=data.get("start_date"),
+            end_date=data.get("end_date"),
+        )
+        return jsonify(response), status_code
+    except Exception as e:
+        logger.error(f"Error verifying data gaps: {e}")
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @historify_bp.route("/api/delete", methods=["DELETE"])
 @check_session_validity
 def delete_data():
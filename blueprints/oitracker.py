@@ -5,6 +5,7 @@ Serves Open Interest and Max Pain data for option chains.
 Endpoints:
     POST /oitracker/api/oi-data   - Get OI data for all strikes
     POST /oitracker/api/maxpain   - Calculate Max Pain
+    POST /oitracker/api/maxpain-multi - Max Pain per expiry and aggregated across expiries
 """
 
 import re
@@ -13,7 +14,11 @@ from flask import Blueprint, jsonify, request, session
 from flask_cors import cross_origin
 
 from database.auth_db import get_api_key_for_tradingview
-from services.oi_tracker_service import calculate_max_pain, get_oi_data
+from services.oi_tracker_service import (
+    calculate_max_pain,
+    calculate_max_pain_multi,
+    get_oi_data,
+)
 from utils.logging import get_logger
 from utils.session import check_session_validity
 
@@ -21,6 +26,9 @@ logger = get_logger(__name__)
 
 oitracker_bp = Blueprint("oitracker_bp", __name__, url_prefix="/")
 
+# Upper bound on expiries per multi-expiry max pain request
+MAX_EXPIRIES = 12
+
 
 @oitracker_bp.route("/oitracker/api/oi-data", methods=["POST"])
 @cross_origin()
@@ -124,3 +132,61 @@ def maxpain():
     except Exception as e:
         logger.exception(f"Error in Max Pain API: {e}")
         return jsonify({"status": "error", "message": "An error occurred processing your request"}), 500
+
+
+@oitracker_bp.route("/oitracker/api/maxpain-multi", methods=["POST"])
+@cross_origin()
+@check_session_validity
+def maxpain_multi():
+    """Calculate Max Pain for several expiries and aggregated across them."""
+    try:
+        login_username = session.get("user")
+        if not login_username:
+            return jsonify({"status": "error", "message": "Authentication required"}), 401
+
+        api_key = get_api_key_for_tradingview(login_username)
+        if not api_key:
+            return jsonify(
+                {
+                    "status": "error",
+                    "message": "API key not configured. Please generate an API key in /apikey",
+                }
+            ), 401
+
+        data = request.get_json(silent=True) or {}
+        underlying = data.get("underlying", "").strip()[:20]
+        exchange = data.get("exchange", "").strip()[:20]
+        expiry_dates = data.get("expiry_dates") or []
+
+        if not underlying or not exchange or not isinstance(expiry_dates, list) or not expiry_dates:
+            return jsonify(
+                {
+                    "status": "error",
+                    "message": "underlying, exchange, and expiry_dates are required",
+                }
+            ), 400
+
+        if not re.match(r"^[A-Z0-9]+$", underlying) or not re.match(r"^[A-Z0-9_]+$", exchange):
+            return jsonify({"status": "error", "message": "Invalid input format"}), 400
+
+        if len(expiry_dates) > MAX_EXPIRIES:
+            return jsonify(
+                {"status": "error", "message": f"At most {MAX_EXPIRIES} expiries per request"}
+            ), 400
+
+        expiry_dates = [str(expiry).strip()[:10] for expiry in expiry_dates]
+        if not all(re.match(r"^\d{2}[A-Z]{3}\d{2}$", expiry) for expiry in expiry_dates):
+            return jsonify({"status": "error", "message": "Invalid expiry_dates format. Expected DDMMMYY"}), 400
+
+        success, response, status_code = calculate_max_pain_multi(
+            underlying=underlying,
+            exchange=exchange,
+            expiry_dates=list(dict.fromkeys(expiry_dates)),
+            api_key=api_key,
+        )
+
+        return jsonify(response), status_code
+
+    except Exception as e:
+        logger.exception(f"Error in multi-expiry Max Pain API: {e}")
+        return jsonify({"status": "error", "message": "An error occurred processing your request"}), 500
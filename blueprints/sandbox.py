@@ -227,16 +227,19 @@ def update_config():
 
                     new_capital = Decimal(str(config_value))
 
+                    from sandbox.margin_ledger import external_fund_write
+
                     # Update all user funds with new starting capital
                     # This resets their balance to the new capital value
-                    funds = SandboxFunds.query.all()
-                    for fund in funds:
-                        # Calculate what the new available balance should be
-                        # New available = new_capital - used_margin + total_pnl
-                        fund.total_capital = new_capital
-                        fund.available_balance = new_capital - fund.used_margin + fund.total_pnl
-
-                    db_session.commit()
+                    with external_fund_write():
+                        funds = SandboxFunds.query.all()
+                        for fund in funds:
+                            # Calculate what the new available balance should be
+                            # New available = new_capital - used_margin + total_pnl
+                            fund.total_capital = new_capital
+                            fund.available_balance = new_capital - fund.used_margin + fund.total_pnl
+
+                        db_session.commit()
                     logger.info(
                         f"Updated {len(funds)} user funds with new starting capital: ₹{new_capital}"
                     )
@@ -351,39 +354,43 @@ def reset_config():
 
             import pytz
 
-            fund = SandboxFunds.query.filter_by(user_id=user_id).first()
-            starting_capital = Decimal(default_configs["starting_capital"])
-
-            if fund:
-                # Reset existing fund
-                fund.total_capital = starting_capital
-                fund.available_balance = starting_capital
-                fund.used_margin = Decimal("0.00")
-                fund.unrealized_pnl = Decimal("0.00")
-                fund.realized_pnl = Decimal("0.00")
-                fund.today_realized_pnl = Decimal("0.00")
-                fund.total_pnl = Decimal("0.00")
-                fund.last_reset_date = datetime.now(pytz.timezone("Asia/Kolkata"))
-                fund.reset_count = (fund.reset_count or 0) + 1
-                logger.info(f"Reset sandbox funds for user {user_id}")
-            else:
-                # Create new fund record
-                fund = SandboxFunds(
-                    user_id=user_id,
-                    total_capital=starting_capital,
-                    available_balance=starting_capital,
-                    used_margin=Decimal("0.00"),
-                    unrealized_pnl=Decimal("0.00"),
-                    realized_pnl=Decimal("0.00"),
-                    today_realized_pnl=Decimal("0.00"),
-                    total_pnl=Decimal("0.00"),
-                    last_reset_date=datetime.now(pytz.timezone("Asia/Kolkata")),
-                    reset_count=1,
-                )
-                db_session.add(fund)
-                logger.info(f"Created new sandbox funds for user {user_id}")
+            from sandbox.margin_ledger import external_fund_write
+
+            # Fund row is rewritten directly - keep the margin ledger in sync
+            with external_fund_write(user_id):
+                fund = SandboxFunds.query.filter_by(user_id=user_id).first()
+                starting_capital = Decimal(default_configs["starting_capital"])
+
+                if fund:
+                    # Reset existing fund
+                    fund.total_capital = starting_capital
+                    fund.available_balance = starting_capital
+                    fund.used_margin = Decimal("0.00")
+                    fund.unrealized_pnl = Decimal("0.00")
+                    fund.realized_pnl = Decimal("0.00")
+                    fund.today_realized_pnl = Decimal("0.00")
+                    fund.total_pnl = Decimal("0.00")
+                    fund.last_reset_date = datetime.now(pytz.timezone("Asia/Kolkata"))
+                    fund.reset_count = (fund.reset_count or 0) + 1
+                    logger.info(f"Reset sandbox funds for user {user_id}")
+                else:
+                    # Create new fund record
+                    fund = SandboxFunds(
+                        user_id=user_id,
+                        total_capital=starting_capital,
+                        available_balance=starting_capital,
+                        used_margin=Decimal("0.00"),
+                        unrealized_pnl=Decimal("0.00"),
+                        realized_pnl=Decimal("0.00"),
+                        today_realized_pnl=Decimal("0.00"),
+                        total_pnl=Decimal("0.00"),
+                        last_reset_date=datetime.now(pytz.timezone("Asia/Kolkata")),
+                        reset_count=1,
+                    )
+                    db_session.add(fund)
+                    logger.info(f"Created new sandbox funds for user {user_id}")
 
-            db_session.commit()
+                db_session.commit()
             logger.info(f"Successfully reset all sandbox data for user {user_id}")
 
         except Exception as e:
@@ -450,6 +457,61 @@ def squareoff_status():
         ), 500
 
 
+@sandbox_bp.route("/replay/start", methods=["POST"])
+@check_session_validity
+@limiter.limit(API_RATE_LIMIT)
+def replay_start():
+    """Start a historical replay driven by Historify data"""
+    try:
+        from services.sandbox_service import sandbox_start_replay
+
+        user_id = session.get("user")
+        success, response, status_code = sandbox_start_replay(
+            user_id, request.get_json(silent=True) or {}
+        )
+        return jsonify(response), status_code
+
+    except Exception as e:
+        logger.exception(f"Error starting replay: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": f"Error starting replay: {str(e)}"}), 500
+
+
+@sandbox_bp.route("/replay/stop", methods=["POST"])
+@check_session_validity
+@limiter.limit(API_RATE_LIMIT)
+def replay_stop():
+    """Stop the running historical replay"""
+    try:
+        from services.sandbox_service import sandbox_stop_replay
+
+        user_id = session.get("user")
+        success, response, status_code = sandbox_stop_replay(user_id)
+        return jsonify(response), status_code
+
+    except Exception as e:
+        logger.exception(f"Error stopping replay: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": f"Error stopping replay: {str(e)}"}), 500
+
+
+@sandbox_bp.route("/replay/status")
+@check_session_validity
+@limiter.limit(API_RATE_LIMIT)
+def replay_status():
+    """Get historical replay progress"""
+    try:
+        from services.sandbox_service import sandbox_get_replay_status
+
+        user_id = session.get("user")
+        success, response, status_code = sandbox_get_replay_status(user_id)
+        return jsonify(response), status_code
+
+    except Exception as e:
+        logger.exception(f"Error getting replay status: {str(e)}\n{traceback.format_exc()}")
+        return jsonify(
+            {"status": "error", "message": f"Error getting replay status: {str(e)}"}
+        ), 500
+
+
 @sandbox_bp.route("/mypnl/api/data")
 @check_session_validity
 @limiter.limit(API_RATE_LIMIT)
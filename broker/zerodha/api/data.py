@@ -3,6 +3,7 @@ import os
 import threading
 import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 
 import pandas as pd
@@ -10,6 +11,7 @@ import pandas as pd
 from broker.zerodha.database.master_contract_db import SymToken, db_session
 from broker.zerodha.utils import validate_enctoken
 from database.token_db import get_br_symbol, get_oa_symbol
+from utils.history_rate_governor import get_history_rate_governor
 from utils.httpx_client import get_httpx_client
 from utils.logging import get_logger
 
@@ -47,6 +49,42 @@ def _enforce_oms_rate_limit():
         _last_oms_call = time.monotonic()
 
 
+# ---------------------------------------------------------------------------
+# Historical data is fetched in 60-day windows. Windows of one request run
+# concurrently; every HTTP request takes a slot from the shared per-broker
+# history rate governor (utils/history_rate_governor.py), so concurrent
+# Historify downloads and chunk fetches together stay within Kite's limit.
+# ---------------------------------------------------------------------------
+HISTORY_CHUNK_WORKERS = int(os.getenv("HISTORY_CHUNK_WORKERS", "3"))
+
+
+def _history_windows(start_date, end_date, days=60):
+    """Split [start_date, end_date] into consecutive windows of at most `days` days."""
+    windows = []
+    current_start = start_date
+    while current_start <= end_date:
+        current_end = min(current_start + timedelta(days=days - 1), end_date)
+        windows.append((current_start, current_end))
+        current_start = current_end + timedelta(days=1)
+    return windows
+
+
+def _fetch_history_chunks(windows, fetch_chunk):
+    """Run fetch_chunk(start, end) for every window, in window order; the first error is raised."""
+    governor = get_history_rate_governor()
+
+    def run(window):
+        governor.acquire("zerodha")
+        return fetch_chunk(*window)
+
+    if len(windows) <= 1:
+        results = [run(window) for window in windows]
+    else:
+        with ThreadPoolExecutor(max_workers=min(HISTORY_CHUNK_WORKERS, len(windows))) as pool:
+            results = list(pool.map(run, windows))
+    return [df for df in results if df is not None]
+
+
 class ZerodhaPermissionError(Exception):
     """Custom exception for Zerodha API permission errors"""
 
@@ -793,16 +831,7 @@ class BrokerData:
             "Sec-Fetch-Site": "same-origin",
         }
 
-        start_date = pd.to_datetime(from_date)
-        end_date = pd.to_datetime(to_date)
-
-        dfs = []
-        current_start = start_date
-
-        while current_start <= end_date:
-            # Chunk in 60-day windows (same limit applies to OMS API)
-            current_end = min(current_start + timedelta(days=59), end_date)
-
+        def fetch_chunk(current_start, current_end):
             from_str = current_start.strftime("%Y-%m-%d")
             to_str = current_end.strftime("%Y-%m-%d")
 
@@ -829,17 +858,20 @@ class BrokerData:
 
                 candles = response_data.get("data", {}).get("candles", [])
                 if candles:
-                    df = pd.DataFrame(
+                    return pd.DataFrame(
                         candles,
                         columns=["timestamp", "open", "high", "low", "close", "volume", "oi"],
                     )
-                    dfs.append(df)
+                return None
 
             except Exception as e:
                 logger.error(f"[enctoken] Error fetching chunk {from_str} to {to_str}: {e}")
                 raise
 
-            current_start = current_end + timedelta(days=1)
+        # Chunk in 60-day windows (same limit applies to OMS API)
+        dfs = _fetch_history_chunks(
+            _history_windows(pd.to_datetime(from_date), pd.to_datetime(to_date)), fetch_chunk
+        )
 
         if not dfs:
             return pd.DataFrame(
@@ -945,19 +977,7 @@ class BrokerData:
             elif exchange == "BSE_INDEX":
                 exchange = "BSE"
 
-            # Convert dates to datetime objects
-            start_date = pd.to_datetime(from_date)
-            end_date = pd.to_datetime(to_date)
-
-            # Initialize empty list to store DataFrames
-            dfs = []
-
-            # Process data in 60-day chunks
-            current_start = start_date
-            while current_start <= end_date:
-                # Calculate chunk end date (60 days or remaining period)
-                current_end = min(current_start + timedelta(days=59), end_date)
-
+            def fetch_chunk(current_start, current_end):
                 # Format dates for API call
                 from_str = current_start.strftime("%Y-%m-%d+00:00:00")
                 to_str = current_end.strftime("%Y-%m-%d+23:59:59")
@@ -983,14 +1003,16 @@ class BrokerData:
                 # Convert to DataFrame
                 candles = response.get("data", {}).get("candles", [])
                 if candles:
-                    df = pd.DataFrame(
+                    return pd.DataFrame(
                         candles,
                         columns=["timestamp", "open", "high", "low", "close", "volume", "oi"],
                     )
-                    dfs.append(df)
+                return None
 
-                # Move to next chunk
-                current_start = current_end + timedelta(days=1)
+            # Process data in 60-day chunks, fetched concurrently
+            dfs = _fetch_history_chunks(
+                _history_windows(pd.to_datetime(from_date), pd.to_datetime(to_date)), fetch_chunk
+            )
 
             # If no data was found, return empty DataFrame
             if not dfs:
@@ -0,0 +1,242 @@
+# database/historify_cache.py
+"""
+Historify Query Result Cache
+
+In-process LRU cache of get_ohlcv() results. Chart pans and strategy restarts
+repeat the same (symbol, exchange, interval, range) queries, so the aggregated
+candles are kept instead of being recomputed:
+
+- Entries are keyed by the normalized request and evicted least recently used
+  once their total size exceeds the byte budget
+- Each entry records the stored interval it was computed from (1m or D) and the
+  source time range it depends on, so an upsert or delete drops exactly the
+  entries whose candles it can change
+- A per-symbol version guards against a query that read the old data while a
+  write committed: its result is not stored
+
+Configuration (.env):
+- HISTORIFY_QUERY_CACHE_MB: Memory budget of cached results in MB (default: 128, 0 disables)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+QUERY_CACHE_MB = float(os.getenv("HISTORIFY_QUERY_CACHE_MB", "128"))
+
+
+@dataclass
+class _Entry:
+    value: pd.DataFrame | pa.Table
+    size: int
+    source_interval: str
+    first_source: int | None
+    last_source: int | None
+
+
+def _result_size(value: pd.DataFrame | pa.Table) -> int:
+    """Approximate memory held by a cached result in bytes"""
+    if isinstance(value, pa.Table):
+        return value.nbytes
+    return int(value.memory_usage(index=True, deep=True).sum())
+
+
+class HistorifyQueryCache:
+    """Byte-bounded LRU cache of OHLCV query results with range-based invalidation"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._by_symbol: dict[tuple[str, str], set[tuple]] = {}
+        self._versions: dict[tuple[str, str], int] = {}
+        self._epoch = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def version(self, symbol: str, exchange: str) -> tuple[int, int]:
+        """Version token to take before running a query whose result will be put()"""
+        with self._lock:
+            return self._epoch, self._versions.get((symbol, exchange), 0)
+
+    def get(self, key: tuple) -> pd.DataFrame | pa.Table | None:
+        """
+        Look up a cached result and mark it most recently used.
+
+        DataFrames are returned as copies, so callers may modify them freely.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry.value
+        return value.copy() if isinstance(value, pd.DataFrame) else value
+
+    def put(
+        self,
+        key: tuple,
+        value: pd.DataFrame | pa.Table,
+        version: tuple[int, int],
+        source_interval: str,
+        first_source: int | None = None,
+        last_source: int | None = None,
+    ) -> bool:
+        """
+        Store a query result.
+
+        Args:
+            key: Normalized request key, starting with (symbol, exchange)
+            value: Query result (DataFrames are copied on the way in)
+            version: Token from version() taken before the query ran
+            source_interval: Stored interval the result was computed from
+            first_source: Earliest source timestamp the result depends on (None: unbounded)
+            last_source: Latest source timestamp the result depends on (None: unbounded)
+
+        Returns:
+            True if the result was cached
+        """
+        if not self.enabled:
+            return False
+        size = _result_size(value)
+        # A single result may not flush more than a quarter of the cache
+        if size > self.max_bytes // 4:
+            return False
+        if isinstance(value, pd.DataFrame):
+            value = value.copy()
+
+        symbol_key = key[:2]
+        with self._lock:
+            # A write committed while the query ran - the result may be stale
+            if (self._epoch, self._versions.get(symbol_key, 0)) != version:
+                return False
+
+            self._drop(key)
+            self._entries[key] = _Entry(value, size, source_interval, first_source, last_source)
+            self._by_symbol.setdefault(symbol_key, set()).add(key)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate(
+        self,
+        symbol: str | None = None,
+        exchange: str | None = None,
+        source_interval: str | None = None,
+        first_timestamp: int | None = None,
+        last_timestamp: int | None = None,
+    ) -> int:
+        """
+        Drop the cached results that a write to stored data can change.
+
+        Args:
+            symbol: Written symbol (None: every symbol)
+            exchange: Written exchange
+            source_interval: Written stored interval (None: every interval)
+            first_timestamp: First written timestamp (None: unbounded)
+            last_timestamp: Last written timestamp (None: unbounded)
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            if symbol is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._by_symbol.clear()
+                self._size = 0
+                # In-flight queries of every symbol are not stored
+                self._epoch += 1
+                self.invalidations += dropped
+                return dropped
+
+            symbol_key = (symbol, exchange)
+            self._versions[symbol_key] = self._versions.get(symbol_key, 0) + 1
+
+            dropped = 0
+            for key in list(self._by_symbol.get(symbol_key, ())):
+                entry = self._entries[key]
+                if source_interval and entry.source_interval != source_interval:
+                    continue
+                if (
+                    first_timestamp is not None
+                    and entry.last_source is not None
+                    and entry.last_source < first_timestamp
+                ):
+                    continue
+                if (
+                    last_timestamp is not None
+                    and entry.first_source is not None
+                    and entry.first_source > last_timestamp
+                ):
+                    continue
+                self._drop(key)
+                dropped += 1
+
+            self.invalidations += dropped
+            return dropped
+
+    def _drop(self, key: tuple):
+        """Remove an entry (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        keys = self._by_symbol.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_symbol[key[:2]]
+
+    def stats(self) -> dict:
+        """Hit/miss counters and memory use"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "size_mb": round(self._size / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache: HistorifyQueryCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> HistorifyQueryCache:
+    """Get the process-wide Historify query cache"""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HistorifyQueryCache(int(QUERY_CACHE_MB * 1024 * 1024))
+                logger.debug(f"Historify query cache: {QUERY_CACHE_MB:g} MB")
+    return _cache
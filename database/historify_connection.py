@@ -0,0 +1,272 @@
+# database/historify_connection.py
+"""
+Historify DuckDB Connection Manager
+
+Keeps one DuckDB database open per process instead of connecting on every call:
+- Reads use cursors from a small pool (conn.cursor() shares the open database,
+  so the catalog and WAL are not re-read per query)
+- Writes run on a single writer connection owned by a dedicated writer thread.
+  A write block submits its statements through the writer queue and holds the
+  writer until the block ends, so multi-statement transactions stay atomic and
+  concurrent download workers never contend for the file lock
+- Opening retries on lock conflicts (another process holding the file)
+
+Configuration (.env):
+- HISTORIFY_READ_POOL_SIZE: Idle read cursors kept open for reuse (default: 8)
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class _WriteSession:
+    """
+    Connection proxy handed to a write block.
+
+    Every method call is executed on the writer thread. Calls that return the
+    connection itself (execute, begin, ...) return the proxy, so chained calls
+    like conn.execute(...).fetchone() work as on a plain DuckDB connection.
+    """
+
+    def __init__(self):
+        self._calls: queue.SimpleQueue = queue.SimpleQueue()
+        self._conn_type = None
+
+    def _serve(self, conn):
+        """Run submitted calls on the writer thread until the session is closed"""
+        self._conn_type = type(conn)
+        while True:
+            item = self._calls.get()
+            if item is None:
+                return
+            fn, future = item
+            try:
+                future.set_result(fn(conn))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _call(self, fn):
+        future = Future()
+        self._calls.put((fn, future))
+        result = future.result()
+        if self._conn_type is not None and isinstance(result, self._conn_type):
+            return self
+        return result
+
+    def _close(self):
+        self._calls.put(None)
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            return self._call(lambda conn: getattr(conn, name)(*args, **kwargs))
+
+        return method
+
+
+class HistorifyConnectionManager:
+    """Process-wide owner of the Historify DuckDB database"""
+
+    def __init__(self, db_path, pool_size=None, max_retries=3, retry_delay=0.5):
+        self.db_path = db_path
+        self.pool_size = int(pool_size or os.getenv("HISTORIFY_READ_POOL_SIZE", "8"))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._conn = None
+        self._open_lock = threading.Lock()
+
+        # Idle read cursors, reused most-recently-returned first
+        self._idle = []
+        self._pool_lock = threading.Lock()
+
+        # Writer thread and its submission queue of (fn, future)
+        self._writer_conn = None
+        self._writer_queue: queue.Queue = queue.Queue()
+        self._writer_thread: threading.Thread | None = None
+        self._local = threading.local()
+
+        self.stats = {"reads": 0, "cursors_opened": 0, "write_blocks": 0}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        """Open the database file, retrying while another process holds the lock"""
+        import duckdb
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        for attempt in range(self.max_retries):
+            try:
+                return duckdb.connect(self.db_path)
+            except Exception as e:
+                if attempt < self.max_retries - 1:
+                    logger.debug(f"DuckDB connection attempt {attempt + 1} failed, retrying: {e}")
+                    time.sleep(self.retry_delay * (attempt + 1))
+                else:
+                    logger.exception(
+                        f"Failed to connect to DuckDB after {self.max_retries} attempts: {e}"
+                    )
+                    raise
+
+    def _ensure_open(self):
+        if self._conn is not None:
+            return
+        with self._open_lock:
+            if self._conn is not None:
+                return
+            conn = self._connect()
+            self._writer_conn = conn.cursor()
+            self._writer_thread = threading.Thread(
+                target=self._writer_loop, daemon=True, name="HistorifyWriter"
+            )
+            self._writer_thread.start()
+            self._conn = conn
+            logger.debug(f"Historify database opened: {self.db_path}")
+
+    def close(self):
+        """Stop the writer thread and close all connections"""
+        with self._open_lock:
+            if self._conn is None:
+                return
+            self._writer_queue.put(None)
+            if self._writer_thread is not None:
+                self._writer_thread.join(timeout=10)
+            with self._pool_lock:
+                idle, self._idle = self._idle, []
+            for cursor in idle + [self._writer_conn]:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self._conn.close()
+            self._conn = None
+            self._writer_conn = None
+            self._writer_thread = None
+            logger.debug(f"Historify database closed: {self.db_path}")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def read_cursor(self):
+        """Check out a pooled read cursor"""
+        self._ensure_open()
+        with self._pool_lock:
+            cursor = self._idle.pop() if self._idle else None
+            self.stats["reads"] += 1
+        if cursor is None:
+            cursor = self._conn.cursor()
+            self.stats["cursors_opened"] += 1
+
+        reusable = False
+        try:
+            yield cursor
+            reusable = True
+        finally:
+            # Cursors that saw an error may hold an aborted transaction - drop them
+            with self._pool_lock:
+                if reusable and self._conn is not None and len(self._idle) < self.pool_size:
+                    self._idle.append(cursor)
+                    cursor = None
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _writer_loop(self):
+        while True:
+            job = self._writer_queue.get()
+            if job is None:
+                return
+            fn, future = job
+            try:
+                future.set_result(fn(self._writer_conn))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, fn) -> Future:
+        """Queue fn(writer_connection) on the writer thread"""
+        self._ensure_open()
+        future = Future()
+        self._writer_queue.put((fn, future))
+        return future
+
+    @contextmanager
+    def write_connection(self):
+        """
+        Hold the writer for a block of statements.
+
+        Nested write blocks in the same thread share the outer session.
+        """
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            yield session
+            return
+
+        session = _WriteSession()
+        served = self.submit(session._serve)
+        self._local.session = session
+        self.stats["write_blocks"] += 1
+        try:
+            yield session
+        except BaseException:
+            # Do not leave the shared writer inside a failed transaction
+            try:
+                session.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        finally:
+            self._local.session = None
+            session._close()
+            served.result()
+
+
+# Global instance for singleton access
+_manager: HistorifyConnectionManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str) -> HistorifyConnectionManager:
+    """Get the connection manager for db_path, reopening if the path changed"""
+    global _manager
+
+    manager = _manager
+    if manager is not None and manager.db_path == db_path:
+        return manager
+
+    with _manager_lock:
+        if _manager is None or _manager.db_path != db_path:
+            if _manager is not None:
+                _manager.close()
+            _manager = HistorifyConnectionManager(db_path)
+        return _manager
+
+
+def close_historify_connections():
+    """Close the Historify database (lets other processes open the file)"""
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+
+
+atexit.register(close_historify_connections)
@@ -8,13 +8,27 @@ Optimized for backtesting and analytical queries.
 
 import os
 from contextlib import contextmanager
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
 
+from database.historify_cache import get_query_cache
+from database.historify_connection import get_connection_manager
+from database.historify_parquet import (
+    delete_partitions,
+    ensure_parquet_root,
+    get_parquet_root,
+    get_parquet_size,
+    has_data_files,
+    is_parquet_backend,
+    market_data_view_sql,
+    parquet_glob,
+    write_partitions,
+)
 from utils.logging import get_logger
 
 # Initialize logger
@@ -48,47 +62,127 @@ def ensure_db_directory():
 @contextmanager
 def get_connection(max_retries: int = 3, retry_delay: float = 0.5):
     """
-    Get a DuckDB connection with proper resource management and retry logic.
+    Get a pooled read cursor on the process-wide Historify database.
 
-    DuckDB uses exclusive file locking on Windows. This function includes retry
-    logic to handle temporary file access conflicts in concurrent scenarios.
-
-    Args:
-        max_retries: Maximum number of connection attempts (default: 3)
-        retry_delay: Delay in seconds between retries (default: 0.5)
+    The database is opened once per process (see database/historify_connection.py);
+    opening retries on file lock conflicts using max_retries / retry_delay.
+    Use get_write_connection() for statements that modify data.
 
     Usage:
         with get_connection() as conn:
             result = conn.execute("SELECT * FROM market_data").fetchdf()
     """
-    import time
+    manager = get_connection_manager(get_db_path())
+    manager.max_retries = max_retries
+    manager.retry_delay = retry_delay
+    with manager.read_cursor() as conn:
+        yield conn
 
-    ensure_db_directory()
-    db_path = get_db_path()
-    conn = None
-    last_error = None
 
-    for attempt in range(max_retries):
-        try:
-            import duckdb
-
-            conn = duckdb.connect(db_path)
-            break
-        except Exception as e:
-            last_error = e
-            if attempt < max_retries - 1:
-                logger.debug(f"DuckDB connection attempt {attempt + 1} failed, retrying: {e}")
-                time.sleep(retry_delay * (attempt + 1))  # Exponential backoff
-            else:
-                logger.exception(f"Failed to connect to DuckDB after {max_retries} attempts: {e}")
+@contextmanager
+def get_write_connection():
+    """
+    Get the Historify writer connection for a block of statements.
 
-    if conn is None:
-        raise last_error or Exception("Failed to connect to DuckDB")
+    Statements run on the dedicated writer thread, one write block at a time,
+    so transactions (BEGIN ... COMMIT) inside the block stay atomic.
+    DataFrames must be passed with conn.register(), since the statements do not
+    run in the caller's frame.
 
-    try:
+    Usage:
+        with get_write_connection() as conn:
+            conn.execute("DELETE FROM watchlist")
+    """
+    with get_connection_manager(get_db_path()).write_connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def _market_data_type(conn) -> str | None:
+    """'BASE TABLE', 'VIEW' or None for the market_data relation."""
+    row = conn.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = 'market_data'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _init_table_market_data(conn):
+    """Create the market_data table, importing the Parquet store when switching back from it."""
+    switching_back = _market_data_type(conn) == "VIEW"
+    if switching_back:
+        conn.execute("DROP VIEW market_data")
+
+    # Main OHLCV data table - unified table approach
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS market_data (
+            symbol VARCHAR NOT NULL,
+            exchange VARCHAR NOT NULL,
+            interval VARCHAR NOT NULL,
+            timestamp BIGINT NOT NULL,
+            open DOUBLE NOT NULL,
+            high DOUBLE NOT NULL,
+            low DOUBLE NOT NULL,
+            close DOUBLE NOT NULL,
+            volume BIGINT NOT NULL,
+            oi BIGINT DEFAULT 0,
+            created_at TIMESTAMP DEFAULT current_timestamp,
+            PRIMARY KEY (symbol, exchange, interval, timestamp)
+        )
+    """)
+
+    if switching_back and has_data_files():
+        conn.execute(f"""
+            INSERT INTO market_data
+            (symbol, exchange, interval, timestamp, open, high, low, close, volume, oi)
+            SELECT symbol, exchange, interval, timestamp, open, high, low, close, volume, oi
+            FROM read_parquet('{parquet_glob()}', hive_partitioning = true,
+                hive_types = {{'exchange': VARCHAR, 'symbol': VARCHAR, 'interval': VARCHAR}})
+            WHERE exchange <> '_'
+        """)
+        logger.info(f"Imported Historify Parquet store {get_parquet_root()} into market_data")
+
+    # Create indexes for common query patterns
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_data_timestamp
+        ON market_data (timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_data_exchange_time
+        ON market_data (exchange, timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_data_interval_time
+        ON market_data (interval, timestamp)
+    """)
+
+
+def _init_parquet_market_data(conn):
+    """
+    Point market_data at the Parquet store.
+
+    Candles still held in a market_data table (the DuckDB backend) are moved
+    into Parquet partitions first; the table is dropped once every key has
+    been written.
+    """
+    ensure_parquet_root()
+
+    if _market_data_type(conn) == "BASE TABLE":
+        keys = conn.execute("SELECT DISTINCT symbol, exchange, interval FROM market_data").fetchall()
+        for symbol, exchange, interval in keys:
+            df = conn.execute(
+                """
+                SELECT timestamp, open, high, low, close, volume, COALESCE(oi, 0) AS oi
+                FROM market_data
+                WHERE symbol = ? AND exchange = ? AND interval = ?
+                ORDER BY timestamp
+            """,
+                [symbol, exchange, interval],
+            ).fetchdf()
+            write_partitions(df, symbol, exchange, interval)
+        conn.execute("DROP TABLE market_data")
+        conn.execute("CHECKPOINT")
+        logger.info(f"Moved {len(keys)} Historify symbol intervals to {get_parquet_root()}")
+
+    conn.execute(market_data_view_sql())
 
 
 def init_database():
@@ -98,24 +192,12 @@ def init_database():
     """
     ensure_db_directory()
 
-    with get_connection() as conn:
-        # Main OHLCV data table - unified table approach
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS market_data (
-                symbol VARCHAR NOT NULL,
-                exchange VARCHAR NOT NULL,
-                interval VARCHAR NOT NULL,
-                timestamp BIGINT NOT NULL,
-                open DOUBLE NOT NULL,
-                high DOUBLE NOT NULL,
-                low DOUBLE NOT NULL,
-                close DOUBLE NOT NULL,
-                volume BIGINT NOT NULL,
-                oi BIGINT DEFAULT 0,
-                created_at TIMESTAMP DEFAULT current_timestamp,
-                PRIMARY KEY (symbol, exchange, interval, timestamp)
-            )
-        """)
+    with get_write_connection() as conn:
+        # Main OHLCV data - a table in this file, or a view over the Parquet store
+        if is_parquet_backend():
+            _init_parquet_market_data(conn)
+        else:
+            _init_table_market_data(conn)
 
         # Watchlist table
         conn.execute("""
@@ -144,6 +226,58 @@ def init_database():
             )
         """)
 
+        # Catalog ids come from a sequence; existing databases start it past the current ids
+        sequence_exists = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_sequences() WHERE sequence_name = 'data_catalog_id_seq'"
+        ).fetchone()[0]
+        if not sequence_exists:
+            next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM data_catalog").fetchone()[0]
+            conn.execute(f"CREATE SEQUENCE data_catalog_id_seq START {int(next_id)}")
+
+        # Materialized rollups for HISTORIFY_ROLLUP_INTERVALS, keyed like market_data.
+        # first/last_source_timestamp bound the 1m/D rows each candle was built from.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS market_data_rollup (
+                symbol VARCHAR NOT NULL,
+                exchange VARCHAR NOT NULL,
+                interval VARCHAR NOT NULL,
+                timestamp BIGINT NOT NULL,
+                open DOUBLE NOT NULL,
+                high DOUBLE NOT NULL,
+                low DOUBLE NOT NULL,
+                close DOUBLE NOT NULL,
+                volume BIGINT NOT NULL,
+                oi BIGINT DEFAULT 0,
+                first_source_timestamp BIGINT NOT NULL,
+                last_source_timestamp BIGINT NOT NULL,
+                PRIMARY KEY (symbol, exchange, interval, timestamp)
+            )
+        """)
+
+        # Rollups of intervals no longer configured stopped being refreshed - drop them
+        # so re-enabling an interval rebuilds it from scratch
+        if ROLLUP_INTERVALS:
+            placeholders = ", ".join("?" for _ in ROLLUP_INTERVALS)
+            conn.execute(
+                f"DELETE FROM market_data_rollup WHERE interval NOT IN ({placeholders})",
+                list(ROLLUP_INTERVALS),
+            )
+        else:
+            conn.execute("DELETE FROM market_data_rollup")
+
+        # Trading sessions the broker returned no data for (not listed yet, no trades);
+        # the download planner does not request them again
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS empty_sessions (
+                symbol VARCHAR NOT NULL,
+                exchange VARCHAR NOT NULL,
+                interval VARCHAR NOT NULL,
+                session_date DATE NOT NULL,
+                checked_at TIMESTAMP DEFAULT current_timestamp,
+                PRIMARY KEY (symbol, exchange, interval, session_date)
+            )
+        """)
+
         # Download Jobs Table - for tracking bulk operations
         conn.execute("""
             CREATE TABLE IF NOT EXISTS download_jobs (
@@ -241,18 +375,6 @@ def init_database():
         """)
 
         # Create indexes for common query patterns
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_market_data_timestamp
-            ON market_data (timestamp)
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_market_data_exchange_time
-            ON market_data (exchange, timestamp)
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_market_data_interval_time
-            ON market_data (interval, timestamp)
-        """)
         conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_job_items_job_id
             ON job_items (job_id)
@@ -272,6 +394,9 @@ def init_database():
 
         logger.debug("Historify database initialized successfully")
 
+    # Results cached from a previously opened database (or before a migration)
+    get_query_cache().invalidate()
+
 
 # =============================================================================
 # Watchlist Operations
@@ -301,7 +426,7 @@ def add_to_watchlist(symbol: str, exchange: str, display_name: str = None) -> tu
         Tuple of (success, message)
     """
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Check if symbol already exists
             existing = conn.execute(
                 """
@@ -347,7 +472,7 @@ def bulk_add_to_watchlist(symbols: list[dict[str, str]]) -> tuple[int, int, list
     failed = []
 
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Get existing symbols in one query
             existing_result = conn.execute("""
                 SELECT symbol, exchange FROM watchlist
@@ -411,7 +536,7 @@ def remove_from_watchlist(symbol: str, exchange: str) -> tuple[bool, str]:
         Tuple of (success, message)
     """
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute(
                 """
                 DELETE FROM watchlist
@@ -444,7 +569,7 @@ def bulk_remove_from_watchlist(
     failed = []
 
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Get existing symbols in one query
             existing_result = conn.execute("""
                 SELECT symbol, exchange FROM watchlist
@@ -496,7 +621,7 @@ def bulk_remove_from_watchlist(
 def clear_watchlist() -> tuple[bool, str]:
     """Clear all symbols from watchlist."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute("DELETE FROM watchlist")
         logger.info("Cleared watchlist")
         return True, "Watchlist cleared"
@@ -510,6 +635,42 @@ def clear_watchlist() -> tuple[bool, str]:
 # =============================================================================
 
 
+def _insert_market_data(conn, key: list[str], batch_first: int, batch_last: int) -> int:
+    """
+    Upsert the registered df into the market_data table.
+
+    Returns:
+        Number of rows of the batch that already existed
+    """
+    # Rows of this batch that already exist - the time range filter lets
+    # DuckDB skip row groups outside the batch instead of scanning the symbol
+    existing_rows = conn.execute(
+        """
+        SELECT COUNT(*) FROM market_data m
+        JOIN df ON m.timestamp = df.timestamp
+        WHERE m.symbol = ? AND m.exchange = ? AND m.interval = ?
+          AND m.timestamp BETWEEN ? AND ?
+    """,
+        key + [batch_first, batch_last],
+    ).fetchone()[0]
+
+    # Use INSERT with ON CONFLICT for upsert (DuckDB requires explicit conflict target)
+    conn.execute("""
+        INSERT INTO market_data
+        (symbol, exchange, interval, timestamp, open, high, low, close, volume, oi)
+        SELECT symbol, exchange, interval, timestamp, open, high, low, close, volume, oi
+        FROM df
+        ON CONFLICT (symbol, exchange, interval, timestamp) DO UPDATE SET
+            open = EXCLUDED.open,
+            high = EXCLUDED.high,
+            low = EXCLUDED.low,
+            close = EXCLUDED.close,
+            volume = EXCLUDED.volume,
+            oi = EXCLUDED.oi
+    """)
+    return existing_rows
+
+
 def upsert_market_data(df: pd.DataFrame, symbol: str, exchange: str, interval: str) -> int:
     """
     Insert or update OHLCV data from a pandas DataFrame.
@@ -541,6 +702,9 @@ def upsert_market_data(df: pd.DataFrame, symbol: str, exchange: str, interval: s
         if df["timestamp"].dtype != "int64":
             df["timestamp"] = pd.to_datetime(df["timestamp"]).astype("int64") // 10**9
 
+        # One row per timestamp (the last one wins), so the catalog count delta is exact
+        df = df.drop_duplicates(subset="timestamp", keep="last")
+
         # Select only required columns in correct order
         df = df[
             [
@@ -557,98 +721,112 @@ def upsert_market_data(df: pd.DataFrame, symbol: str, exchange: str, interval: s
             ]
         ]
 
-        with get_connection() as conn:
-            # Use INSERT with ON CONFLICT for upsert (DuckDB requires explicit conflict target)
-            conn.execute("""
-                INSERT INTO market_data
-                (symbol, exchange, interval, timestamp, open, high, low, close, volume, oi)
-                SELECT symbol, exchange, interval, timestamp, open, high, low, close, volume, oi
-                FROM df
-                ON CONFLICT (symbol, exchange, interval, timestamp) DO UPDATE SET
-                    open = EXCLUDED.open,
-                    high = EXCLUDED.high,
-                    low = EXCLUDED.low,
-                    close = EXCLUDED.close,
-                    volume = EXCLUDED.volume,
-                    oi = EXCLUDED.oi
-            """)
+        symbol = symbol.upper()
+        exchange = exchange.upper()
+        key = [symbol, exchange, interval]
+        batch_first = int(df["timestamp"].min())
+        batch_last = int(df["timestamp"].max())
 
-            # Update catalog - check if exists first due to multiple constraints
-            existing = conn.execute(
-                """
-                SELECT id FROM data_catalog
-                WHERE symbol = ? AND exchange = ? AND interval = ?
-            """,
-                [symbol.upper(), exchange.upper(), interval],
-            ).fetchone()
+        if is_parquet_backend():
+            # Files are written outside the writer (partitions of different
+            # symbols in parallel); the catalog and rollups follow below
+            existing_rows = write_partitions(df, symbol, exchange, interval)
 
-            if existing:
-                # Update existing record
-                conn.execute(
+        with get_write_connection() as conn:
+            conn.execute("BEGIN TRANSACTION")
+            conn.register("df", df)
+            try:
+                if not is_parquet_backend():
+                    existing_rows = _insert_market_data(conn, key, batch_first, batch_last)
+
+                # Update catalog - check if exists first due to multiple constraints
+                existing = conn.execute(
                     """
-                    UPDATE data_catalog SET
-                        first_timestamp = (SELECT MIN(timestamp) FROM market_data
-                                          WHERE symbol = ? AND exchange = ? AND interval = ?),
-                        last_timestamp = (SELECT MAX(timestamp) FROM market_data
-                                         WHERE symbol = ? AND exchange = ? AND interval = ?),
-                        record_count = (SELECT COUNT(*) FROM market_data
-                                       WHERE symbol = ? AND exchange = ? AND interval = ?),
-                        last_download_at = current_timestamp
+                    SELECT id FROM data_catalog
                     WHERE symbol = ? AND exchange = ? AND interval = ?
                 """,
-                    [
-                        symbol.upper(),
-                        exchange.upper(),
-                        interval,
-                        symbol.upper(),
-                        exchange.upper(),
-                        interval,
-                        symbol.upper(),
-                        exchange.upper(),
-                        interval,
-                        symbol.upper(),
-                        exchange.upper(),
-                        interval,
-                    ],
-                )
-            else:
-                # Insert new record
-                next_id_result = conn.execute(
-                    "SELECT COALESCE(MAX(id), 0) + 1 FROM data_catalog"
+                    key,
                 ).fetchone()
-                next_id = next_id_result[0] if next_id_result else 1
 
-                conn.execute(
-                    """
-                    INSERT INTO data_catalog
-                    (id, symbol, exchange, interval, first_timestamp, last_timestamp,
-                     record_count, last_download_at)
-                    SELECT
-                        ?, ?, ?, ?,
-                        MIN(timestamp), MAX(timestamp), COUNT(*),
-                        current_timestamp
-                    FROM market_data
-                    WHERE symbol = ? AND exchange = ? AND interval = ?
-                """,
-                    [
-                        next_id,
-                        symbol.upper(),
-                        exchange.upper(),
-                        interval,
-                        symbol.upper(),
-                        exchange.upper(),
-                        interval,
-                    ],
-                )
+                if existing:
+                    # Merge the batch into the stored range and count only new rows
+                    conn.execute(
+                        """
+                        UPDATE data_catalog SET
+                            first_timestamp = LEAST(COALESCE(first_timestamp, ?), ?),
+                            last_timestamp = GREATEST(COALESCE(last_timestamp, ?), ?),
+                            record_count = COALESCE(record_count, 0) + ?,
+                            last_download_at = current_timestamp
+                        WHERE id = ?
+                    """,
+                        [
+                            batch_first,
+                            batch_first,
+                            batch_last,
+                            batch_last,
+                            len(df) - existing_rows,
+                            existing[0],
+                        ],
+                    )
+                else:
+                    # First batch for this key - take full stats once (covers data
+                    # stored before the catalog entry existed)
+                    conn.execute(
+                        """
+                        INSERT INTO data_catalog
+                        (id, symbol, exchange, interval, first_timestamp, last_timestamp,
+                         record_count, last_download_at)
+                        SELECT
+                            nextval('data_catalog_id_seq'), ?, ?, ?,
+                            MIN(timestamp), MAX(timestamp), COUNT(*),
+                            current_timestamp
+                        FROM market_data
+                        WHERE symbol = ? AND exchange = ? AND interval = ?
+                    """,
+                        key + key,
+                    )
+
+                _refresh_rollups(conn, symbol, exchange, interval, batch_first, batch_last)
+
+                conn.execute("COMMIT")
+
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
 
+            finally:
+                conn.unregister("df")
+
+        get_query_cache().invalidate(symbol, exchange, interval, batch_first, batch_last)
         logger.info(f"Upserted {len(df)} records for {symbol}:{exchange}:{interval}")
         return len(df)
 
     except Exception as e:
+        # Parquet files may have been replaced before the transaction failed
+        get_query_cache().invalidate(symbol.upper(), exchange.upper(), interval)
         logger.exception(f"Error upserting market data: {e}")
+        if is_parquet_backend():
+            _repair_parquet_upsert(symbol, exchange, interval)
         raise
 
 
+def _repair_parquet_upsert(symbol: str, exchange: str, interval: str):
+    """
+    Bring the catalog and rollups of a key back in line with its Parquet files.
+
+    Partition files are replaced before the catalog transaction, so when that
+    transaction fails the stored candles are already new while the catalog
+    still counts the old ones; a retried batch would then count its replaced
+    rows as existing and record_count would drift.
+    """
+    try:
+        rebuild_data_catalog(symbol, exchange, interval)
+        if ROLLUP_INTERVALS:
+            rebuild_rollups(symbol, exchange)
+    except Exception as e:
+        logger.exception(f"Error repairing catalog for {symbol}:{exchange}:{interval}: {e}")
+
+
 # Storage intervals - only these are physically stored
 STORAGE_INTERVALS = {"1m", "D"}
 
@@ -792,33 +970,147 @@ def is_daily_aggregated_interval(interval: str) -> bool:
     return parsed["type"] in ("weekly", "monthly", "quarterly", "yearly")
 
 
+# Column types of OHLCV results fetched as Arrow tables
+OHLCV_ARROW_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.int64()),
+        ("open", pa.float64()),
+        ("high", pa.float64()),
+        ("low", pa.float64()),
+        ("close", pa.float64()),
+        ("volume", pa.int64()),
+        ("oi", pa.int64()),
+    ]
+)
+
+
+# Long-format batch results: one row per candle, keyed by symbol and exchange
+OHLCV_BATCH_ARROW_SCHEMA = pa.schema(
+    [("symbol", pa.string()), ("exchange", pa.string())] + list(OHLCV_ARROW_SCHEMA)
+)
+
+
+def _empty_ohlcv(as_arrow: bool = False, schema: pa.Schema = OHLCV_ARROW_SCHEMA) -> pd.DataFrame | pa.Table:
+    """Empty OHLCV result in the requested representation."""
+    return schema.empty_table() if as_arrow else pd.DataFrame()
+
+
+def _fetch_ohlcv(
+    conn, query: str, params: list, as_arrow: bool = False, schema: pa.Schema = OHLCV_ARROW_SCHEMA
+) -> pd.DataFrame | pa.Table:
+    """
+    Run an OHLCV query and fetch the result.
+
+    With as_arrow the columns are fetched as an Arrow table straight from DuckDB
+    (no pandas conversion) and cast to the schema (OHLCV_ARROW_SCHEMA by default),
+    so aggregated sums and epoch doubles come back as plain int64 columns.
+    """
+    result = conn.execute(query, params)
+    if not as_arrow:
+        return result.fetchdf()
+    table = result.fetch_arrow_table()
+    if "oi" in table.column_names and table.column("oi").null_count:
+        table = table.set_column(
+            table.column_names.index("oi"), "oi", table.column("oi").fill_null(0)
+        )
+    return table.cast(schema)
+
+
 def get_ohlcv(
     symbol: str,
     exchange: str,
     interval: str,
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
-) -> pd.DataFrame:
+    as_arrow: bool = False,
+) -> pd.DataFrame | pa.Table:
     """
     Retrieve OHLCV data for a symbol.
     For computed intervals, aggregates from base data on-the-fly.
 
     Supports:
     - Storage intervals: 1m, D (retrieved directly)
+    - Intervals in HISTORIFY_ROLLUP_INTERVALS (read from materialized rollups)
     - Intraday computed: 5m, 15m, 30m, 1h, 25m, 2h, etc. (aggregated from 1m)
     - Daily-based: W, M, Q, Y (aggregated from D)
 
+    Non-empty results are served from the query cache (database/historify_cache.py)
+    until an upsert or delete touches the data they were computed from.
+
     Args:
         symbol: Trading symbol
         exchange: Exchange code
         interval: Time interval (e.g., '1m', '25m', '2h', 'D', 'W', 'M', 'Q', 'Y')
         start_timestamp: Start epoch timestamp (optional)
         end_timestamp: End epoch timestamp (optional)
+        as_arrow: Return a pyarrow Table (OHLCV_ARROW_SCHEMA) instead of a DataFrame
 
     Returns:
-        DataFrame with columns: timestamp, open, high, low, close, volume, oi
+        DataFrame (or Arrow table) with columns: timestamp, open, high, low, close, volume, oi
     """
+    symbol, exchange = symbol.upper(), exchange.upper()
+    start_timestamp = int(start_timestamp) if start_timestamp else None
+    end_timestamp = int(end_timestamp) if end_timestamp else None
+
+    cache = get_query_cache()
+    dependency = _cache_dependency(interval, start_timestamp, end_timestamp) if cache.enabled else None
+    if dependency is None:
+        return _query_ohlcv(symbol, exchange, interval, start_timestamp, end_timestamp, as_arrow)
+
+    key = (symbol, exchange, interval, start_timestamp, end_timestamp, as_arrow)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    version = cache.version(symbol, exchange)
+    result = _query_ohlcv(symbol, exchange, interval, start_timestamp, end_timestamp, as_arrow)
+    # Empty results are not cached - query errors also come back empty
+    if len(result):
+        cache.put(key, result, version, *dependency)
+    return result
+
+
+def _cache_dependency(
+    interval: str, start_timestamp: int | None, end_timestamp: int | None
+) -> tuple[str, int | None, int | None] | None:
+    """
+    Stored data a get_ohlcv() result is computed from, for cache invalidation.
+
+    Returns:
+        Tuple of (source interval, first source timestamp, last source timestamp),
+        or None if the interval is not cacheable. Rollup candles at the range edges
+        are returned whole, so their dependency extends by one candle span.
+    """
+    source_interval = interval if interval in STORAGE_INTERVALS else _rollup_source(interval)
+    if source_interval is None:
+        return None
+
+    margin = _rollup_span_seconds(interval) + 86400 if interval in ROLLUP_INTERVALS else 0
+    return (
+        source_interval,
+        start_timestamp - margin if start_timestamp else None,
+        end_timestamp + margin if end_timestamp else None,
+    )
+
+
+def _query_ohlcv(
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start_timestamp: int | None,
+    end_timestamp: int | None,
+    as_arrow: bool,
+) -> pd.DataFrame | pa.Table:
+    """Run the get_ohlcv() query for the interval (uncached)."""
     try:
+        # Materialized rollups; fall through to on-the-fly aggregation until built
+        if interval in ROLLUP_INTERVALS:
+            result = _get_rollup_ohlcv(
+                symbol, exchange, interval, start_timestamp, end_timestamp, as_arrow
+            )
+            if len(result):
+                return result
+
         # Check if this is a daily-aggregated interval (W, MO, Q, Y)
         if is_daily_aggregated_interval(interval):
             return _get_daily_aggregated_ohlcv(
@@ -827,6 +1119,7 @@ def get_ohlcv(
                 target_interval=interval,
                 start_timestamp=start_timestamp,
                 end_timestamp=end_timestamp,
+                as_arrow=as_arrow,
             )
 
         # Check if this is an intraday computed interval (standard or custom)
@@ -837,6 +1130,7 @@ def get_ohlcv(
                 target_interval=interval,
                 start_timestamp=start_timestamp,
                 end_timestamp=end_timestamp,
+                as_arrow=as_arrow,
             )
 
         # Standard query for stored intervals (1m, D)
@@ -858,13 +1152,13 @@ def get_ohlcv(
         query += " ORDER BY timestamp ASC"
 
         with get_connection() as conn:
-            result = conn.execute(query, params).fetchdf()
+            result = _fetch_ohlcv(conn, query, params, as_arrow)
 
         return result
 
     except Exception as e:
         logger.exception(f"Error fetching OHLCV data: {e}")
-        return pd.DataFrame()
+        return _empty_ohlcv(as_arrow)
 
 
 # Market open times in seconds from midnight IST for each exchange
@@ -911,13 +1205,58 @@ def _get_market_open_seconds(exchange: str) -> int:
     return EXCHANGE_MARKET_OPEN_SECONDS.get(exchange.upper(), 33300)
 
 
+def _intraday_bucket_expr(exchange: str | None, minutes: int, market_open_sql: str | None = None) -> str:
+    """
+    SQL expression for the start of the intraday candle containing market_data.timestamp.
+    Aligns candle boundaries to exchange market open time.
+
+    Args:
+        exchange: Exchange code (determines candle alignment)
+        minutes: Candle size in minutes
+        market_open_sql: SQL expression for the market open seconds, used instead of
+            the exchange's open time when rows of several exchanges share one query
+
+    Returns:
+        SQL expression evaluating to the candle start epoch
+    """
+    interval_seconds = minutes * 60
+
+    # Get market open time for this exchange (in seconds from midnight)
+    market_open_seconds = market_open_sql or _get_market_open_seconds(exchange)
+
+    # IST timezone offset from UTC (5 hours 30 minutes = 19800 seconds)
+    # We need this because timestamps are in UTC epoch
+    ist_offset = 19800
+
+    # Candle alignment algorithm:
+    # 1. Convert UTC timestamp to IST by adding ist_offset
+    # 2. Get seconds from midnight: (timestamp + ist_offset) % 86400
+    # 3. Get trading seconds: seconds_from_midnight - market_open_seconds
+    # 4. Calculate bucket: (trading_seconds / interval_seconds) * interval_seconds
+    # 5. Candle start = day_start + market_open_seconds + bucket
+    #
+    # In SQL:
+    # day_start_utc = ((timestamp + ist_offset) / 86400) * 86400 - ist_offset
+    # seconds_from_midnight_ist = (timestamp + ist_offset) % 86400
+    # trading_seconds = seconds_from_midnight_ist - market_open_seconds
+    # bucket_offset = (trading_seconds / interval_seconds) * interval_seconds
+    # candle_timestamp = day_start_utc + market_open_seconds + bucket_offset
+
+    # Use FLOOR() to ensure proper integer division for candle alignment
+    # Without FLOOR(), floating-point division can cause incorrect bucketing
+    return f"""(FLOOR((timestamp + {ist_offset}) / 86400) * 86400 - {ist_offset}) +
+                {market_open_seconds} +
+                FLOOR((((timestamp + {ist_offset}) % 86400) - {market_open_seconds}) / {interval_seconds}) * {interval_seconds}"""
+
+
 def _get_aggregated_ohlcv(
     symbol: str,
     exchange: str,
     target_interval: str,
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
-) -> pd.DataFrame:
+    as_arrow: bool = False,
+) -> pd.DataFrame | pa.Table:
     """
     Aggregate 1m data to higher timeframes using DuckDB SQL.
     Aligns candle boundaries to exchange market open time.
@@ -946,39 +1285,13 @@ def _get_aggregated_ohlcv(
                 minutes = parsed["minutes"]
             else:
                 logger.error(f"Cannot aggregate to interval: {target_interval}")
-                return pd.DataFrame()
-
-        interval_seconds = minutes * 60
-
-        # Get market open time for this exchange (in seconds from midnight)
-        market_open_seconds = _get_market_open_seconds(exchange)
-
-        # IST timezone offset from UTC (5 hours 30 minutes = 19800 seconds)
-        # We need this because timestamps are in UTC epoch
-        ist_offset = 19800
-
-        # Candle alignment algorithm:
-        # 1. Convert UTC timestamp to IST by adding ist_offset
-        # 2. Get seconds from midnight: (timestamp + ist_offset) % 86400
-        # 3. Get trading seconds: seconds_from_midnight - market_open_seconds
-        # 4. Calculate bucket: (trading_seconds / interval_seconds) * interval_seconds
-        # 5. Candle start = day_start + market_open_seconds + bucket
-        #
-        # In SQL:
-        # day_start_utc = ((timestamp + ist_offset) / 86400) * 86400 - ist_offset
-        # seconds_from_midnight_ist = (timestamp + ist_offset) % 86400
-        # trading_seconds = seconds_from_midnight_ist - market_open_seconds
-        # bucket_offset = (trading_seconds / interval_seconds) * interval_seconds
-        # candle_timestamp = day_start_utc + market_open_seconds + bucket_offset
-
-        # Use FLOOR() to ensure proper integer division for candle alignment
-        # Without FLOOR(), floating-point division can cause incorrect bucketing
+                return _empty_ohlcv(as_arrow)
+
+        bucket_expr = _intraday_bucket_expr(exchange, minutes)
+
         query = f"""
             SELECT
-                (FLOOR((timestamp + {ist_offset}) / 86400) * 86400 - {ist_offset}) +
-                {market_open_seconds} +
-                FLOOR((((timestamp + {ist_offset}) % 86400) - {market_open_seconds}) / {interval_seconds}) * {interval_seconds}
-                as timestamp,
+                {bucket_expr} as timestamp,
                 FIRST(open ORDER BY timestamp) as open,
                 MAX(high) as high,
                 MIN(low) as low,
@@ -999,20 +1312,84 @@ def _get_aggregated_ohlcv(
             params.append(end_timestamp)
 
         query += f"""
-            GROUP BY (FLOOR((timestamp + {ist_offset}) / 86400) * 86400 - {ist_offset}) +
-                     {market_open_seconds} +
-                     FLOOR((((timestamp + {ist_offset}) % 86400) - {market_open_seconds}) / {interval_seconds}) * {interval_seconds}
+            GROUP BY {bucket_expr}
             ORDER BY timestamp ASC
         """
 
         with get_connection() as conn:
-            result = conn.execute(query, params).fetchdf()
+            result = _fetch_ohlcv(conn, query, params, as_arrow)
 
         return result
 
     except Exception as e:
         logger.exception(f"Error aggregating OHLCV data to {target_interval}: {e}")
-        return pd.DataFrame()
+        return _empty_ohlcv(as_arrow)
+
+
+def _daily_bucket_expr(parsed: dict[str, Any]) -> str | None:
+    """
+    SQL expression for the IST period (week, month, quarter, year) containing
+    market_data.timestamp, as a timestamp truncated to the period start.
+
+    Args:
+        parsed: Parsed interval from parse_interval()
+
+    Returns:
+        SQL expression, or None for unsupported interval types
+    """
+    interval_type = parsed["type"]
+    interval_value = parsed.get("value", 1)
+
+    # IST timezone offset from UTC (5 hours 30 minutes = 19800 seconds)
+    ist_offset = 19800
+
+    # Build the GROUP BY expression based on interval type
+    if interval_type == "weekly":
+        # Group by ISO week number, adjusting for multi-week intervals
+        # ISO week starts on Monday
+        if interval_value == 1:
+            group_expr = f"DATE_TRUNC('week', to_timestamp(timestamp + {ist_offset}))"
+        else:
+            # For multi-week intervals, group weeks together
+            group_expr = f"""
+                DATE_TRUNC('week', to_timestamp(timestamp + {ist_offset})) -
+                INTERVAL ((EXTRACT(WEEK FROM to_timestamp(timestamp + {ist_offset})) - 1) % {interval_value}) WEEK
+            """
+    elif interval_type == "monthly":
+        # Group by calendar month
+        if interval_value == 1:
+            group_expr = f"DATE_TRUNC('month', to_timestamp(timestamp + {ist_offset}))"
+        else:
+            # For multi-month intervals, group months together
+            group_expr = f"""
+                DATE_TRUNC('month', to_timestamp(timestamp + {ist_offset})) -
+                INTERVAL ((EXTRACT(MONTH FROM to_timestamp(timestamp + {ist_offset})) - 1) % {interval_value}) MONTH
+            """
+    elif interval_type == "quarterly":
+        # Group by calendar quarter (3 months)
+        months = parsed.get("months", 3)
+        if months == 3:
+            group_expr = f"DATE_TRUNC('quarter', to_timestamp(timestamp + {ist_offset}))"
+        else:
+            # For multi-quarter intervals
+            group_expr = f"""
+                DATE_TRUNC('quarter', to_timestamp(timestamp + {ist_offset})) -
+                INTERVAL ((EXTRACT(QUARTER FROM to_timestamp(timestamp + {ist_offset})) - 1) % {interval_value}) QUARTER
+            """
+    elif interval_type == "yearly":
+        # Group by calendar year
+        if interval_value == 1:
+            group_expr = f"DATE_TRUNC('year', to_timestamp(timestamp + {ist_offset}))"
+        else:
+            # For multi-year intervals
+            group_expr = f"""
+                DATE_TRUNC('year', to_timestamp(timestamp + {ist_offset})) -
+                INTERVAL ((EXTRACT(YEAR FROM to_timestamp(timestamp + {ist_offset})) % {interval_value})) YEAR
+            """
+    else:
+        return None
+
+    return group_expr
 
 
 def _get_daily_aggregated_ohlcv(
@@ -1021,7 +1398,8 @@ def _get_daily_aggregated_ohlcv(
     target_interval: str,
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
-) -> pd.DataFrame:
+    as_arrow: bool = False,
+) -> pd.DataFrame | pa.Table:
     """
     Aggregate Daily (D) data to higher timeframes (W, M, Q, Y) using DuckDB SQL.
 
@@ -1045,60 +1423,12 @@ def _get_daily_aggregated_ohlcv(
         parsed = parse_interval(target_interval)
         if not parsed:
             logger.error(f"Cannot parse interval: {target_interval}")
-            return pd.DataFrame()
-
-        interval_type = parsed["type"]
-        interval_value = parsed.get("value", 1)
-
-        # IST timezone offset from UTC (5 hours 30 minutes = 19800 seconds)
-        ist_offset = 19800
+            return _empty_ohlcv(as_arrow)
 
-        # Build the GROUP BY expression based on interval type
-        if interval_type == "weekly":
-            # Group by ISO week number, adjusting for multi-week intervals
-            # ISO week starts on Monday
-            if interval_value == 1:
-                group_expr = f"DATE_TRUNC('week', to_timestamp(timestamp + {ist_offset}))"
-            else:
-                # For multi-week intervals, group weeks together
-                group_expr = f"""
-                    DATE_TRUNC('week', to_timestamp(timestamp + {ist_offset})) -
-                    INTERVAL ((EXTRACT(WEEK FROM to_timestamp(timestamp + {ist_offset})) - 1) % {interval_value}) WEEK
-                """
-        elif interval_type == "monthly":
-            # Group by calendar month
-            if interval_value == 1:
-                group_expr = f"DATE_TRUNC('month', to_timestamp(timestamp + {ist_offset}))"
-            else:
-                # For multi-month intervals, group months together
-                group_expr = f"""
-                    DATE_TRUNC('month', to_timestamp(timestamp + {ist_offset})) -
-                    INTERVAL ((EXTRACT(MONTH FROM to_timestamp(timestamp + {ist_offset})) - 1) % {interval_value}) MONTH
-                """
-        elif interval_type == "quarterly":
-            # Group by calendar quarter (3 months)
-            months = parsed.get("months", 3)
-            if months == 3:
-                group_expr = f"DATE_TRUNC('quarter', to_timestamp(timestamp + {ist_offset}))"
-            else:
-                # For multi-quarter intervals
-                group_expr = f"""
-                    DATE_TRUNC('quarter', to_timestamp(timestamp + {ist_offset})) -
-                    INTERVAL ((EXTRACT(QUARTER FROM to_timestamp(timestamp + {ist_offset})) - 1) % {interval_value}) QUARTER
-                """
-        elif interval_type == "yearly":
-            # Group by calendar year
-            if interval_value == 1:
-                group_expr = f"DATE_TRUNC('year', to_timestamp(timestamp + {ist_offset}))"
-            else:
-                # For multi-year intervals
-                group_expr = f"""
-                    DATE_TRUNC('year', to_timestamp(timestamp + {ist_offset})) -
-                    INTERVAL ((EXTRACT(YEAR FROM to_timestamp(timestamp + {ist_offset})) % {interval_value})) YEAR
-                """
-        else:
-            logger.error(f"Unsupported interval type for daily aggregation: {interval_type}")
-            return pd.DataFrame()
+        group_expr = _daily_bucket_expr(parsed)
+        if group_expr is None:
+            logger.error(f"Unsupported interval type for daily aggregation: {parsed['type']}")
+            return _empty_ohlcv(as_arrow)
 
         # Build the query - aggregate from D (daily) data
         # Return timestamp as UTC epoch representing the IST date
@@ -1131,13 +1461,451 @@ def _get_daily_aggregated_ohlcv(
         """
 
         with get_connection() as conn:
-            result = conn.execute(query, params).fetchdf()
+            result = _fetch_ohlcv(conn, query, params, as_arrow)
 
         return result
 
     except Exception as e:
         logger.exception(f"Error aggregating daily OHLCV data to {target_interval}: {e}")
-        return pd.DataFrame()
+        return _empty_ohlcv(as_arrow)
+
+
+# =============================================================================
+# Materialized Rollups
+# =============================================================================
+
+
+def _rollup_source(interval: str) -> str | None:
+    """
+    Storage interval a rollup interval is aggregated from.
+
+    Args:
+        interval: Interval string
+
+    Returns:
+        '1m' for intraday intervals, 'D' for W/M/Q/Y intervals, None if the
+        interval cannot be materialized
+    """
+    if interval in STORAGE_INTERVALS:
+        return None
+    if is_custom_interval(interval):
+        return "1m"
+    if is_daily_aggregated_interval(interval):
+        return "D"
+    return None
+
+
+def _parse_rollup_intervals(value: str) -> tuple[str, ...]:
+    """Parse the comma-separated HISTORIFY_ROLLUP_INTERVALS setting."""
+    intervals = []
+    for interval in (item.strip() for item in value.split(",")):
+        if not interval:
+            continue
+        if _rollup_source(interval) is None:
+            logger.warning(f"Ignoring rollup interval {interval}: not an aggregated interval")
+            continue
+        if interval not in intervals:
+            intervals.append(interval)
+    return tuple(intervals)
+
+
+# Computed intervals served from materialized rollups (e.g. "5m,15m,1h,W").
+# Rollups are refreshed for the affected candles whenever upsert_market_data()
+# writes 1m/D rows; other computed intervals are aggregated on-the-fly.
+ROLLUP_INTERVALS = _parse_rollup_intervals(os.getenv("HISTORIFY_ROLLUP_INTERVALS", ""))
+
+
+def _rollup_bucket_sql(interval: str, exchange: str) -> str:
+    """SQL expression for the candle start epoch, identical to on-the-fly aggregation."""
+    parsed = parse_interval(interval)
+    if parsed["type"] == "intraday":
+        return f"CAST({_intraday_bucket_expr(exchange, parsed['minutes'])} AS BIGINT)"
+    return f"CAST(EPOCH({_daily_bucket_expr(parsed)}) AS BIGINT)"
+
+
+def _rollup_span_seconds(interval: str) -> int:
+    """Upper bound of one candle's length, used to bound source range scans."""
+    parsed = parse_interval(interval)
+    if parsed["type"] == "intraday":
+        return parsed["minutes"] * 60
+    if "months" in parsed:
+        return parsed["months"] * 31 * 86400
+    return parsed["days"] * 86400
+
+
+def _refresh_rollups(
+    conn,
+    symbol: str,
+    exchange: str,
+    source_interval: str,
+    batch_first: int | None = None,
+    batch_last: int | None = None,
+):
+    """
+    Re-aggregate the rollup candles touched by a batch of source rows.
+
+    Runs inside the caller's write transaction. Rollups that have not been built
+    for this symbol yet (or when no batch range is given) are built in full, so
+    data stored before the interval was configured is covered.
+
+    Args:
+        conn: Writer connection
+        symbol: Trading symbol (upper case)
+        exchange: Exchange code (upper case)
+        source_interval: Storage interval that was written ('1m' or 'D')
+        batch_first: First timestamp of the written batch
+        batch_last: Last timestamp of the written batch
+    """
+    for interval in ROLLUP_INTERVALS:
+        if _rollup_source(interval) != source_interval:
+            continue
+
+        key = [symbol, exchange, interval]
+        bucket = _rollup_bucket_sql(interval, exchange)
+        source_filter = ""
+        source_params = [symbol, exchange, source_interval]
+
+        built = conn.execute(
+            """
+            SELECT 1 FROM market_data_rollup
+            WHERE symbol = ? AND exchange = ? AND interval = ?
+            LIMIT 1
+        """,
+            key,
+        ).fetchone()
+
+        if built and batch_first is not None and batch_last is not None:
+            # Candles containing the batch edges; everything between is re-aggregated
+            first_bucket, last_bucket = (
+                row[0]
+                for row in conn.execute(
+                    f"""
+                    SELECT {bucket} FROM (VALUES (?::BIGINT), (?::BIGINT)) t(timestamp)
+                    ORDER BY 1
+                """,
+                    [batch_first, batch_last],
+                ).fetchall()
+            )
+            conn.execute(
+                """
+                DELETE FROM market_data_rollup
+                WHERE symbol = ? AND exchange = ? AND interval = ?
+                  AND timestamp BETWEEN ? AND ?
+            """,
+                key + [first_bucket, last_bucket],
+            )
+            # The plain timestamp range lets DuckDB skip row groups outside the candles
+            source_filter = f" AND timestamp BETWEEN ? AND ? AND {bucket} BETWEEN ? AND ?"
+            source_params += [
+                first_bucket - 86400,
+                last_bucket + _rollup_span_seconds(interval) + 86400,
+                first_bucket,
+                last_bucket,
+            ]
+
+        conn.execute(
+            f"""
+            INSERT INTO market_data_rollup
+            (symbol, exchange, interval, timestamp, open, high, low, close, volume, oi,
+             first_source_timestamp, last_source_timestamp)
+            SELECT
+                ?, ?, ?,
+                {bucket} AS bucket,
+                FIRST(open ORDER BY timestamp),
+                MAX(high),
+                MIN(low),
+                LAST(close ORDER BY timestamp),
+                SUM(volume),
+                LAST(oi ORDER BY timestamp),
+                MIN(timestamp),
+                MAX(timestamp)
+            FROM market_data
+            WHERE symbol = ? AND exchange = ? AND interval = ?{source_filter}
+            GROUP BY bucket
+        """,
+            key + source_params,
+        )
+
+
+def _get_rollup_ohlcv(
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start_timestamp: int | None = None,
+    end_timestamp: int | None = None,
+    as_arrow: bool = False,
+) -> pd.DataFrame | pa.Table:
+    """
+    Read candles from the materialized rollup table.
+
+    Returns every candle that has source data inside the requested range - the
+    same candles on-the-fly aggregation returns. Candles at the range edges are
+    returned whole rather than re-aggregated from the partial source range.
+
+    Args:
+        symbol: Trading symbol
+        exchange: Exchange code
+        interval: Rollup interval
+        start_timestamp: Start epoch timestamp (optional)
+        end_timestamp: End epoch timestamp (optional)
+        as_arrow: Return a pyarrow Table instead of a DataFrame
+
+    Returns:
+        DataFrame (or Arrow table) with columns: timestamp, open, high, low, close, volume, oi
+        (empty if the rollup has not been built yet)
+    """
+    query = """
+        SELECT timestamp, open, high, low, close, volume, oi
+        FROM market_data_rollup
+        WHERE symbol = ? AND exchange = ? AND interval = ?
+    """
+    params = [symbol.upper(), exchange.upper(), interval]
+
+    if start_timestamp:
+        query += " AND last_source_timestamp >= ? AND timestamp >= ?"
+        params += [start_timestamp, start_timestamp - _rollup_span_seconds(interval) - 86400]
+
+    if end_timestamp:
+        query += " AND first_source_timestamp <= ? AND timestamp <= ?"
+        params += [end_timestamp, end_timestamp + 86400]
+
+    query += " ORDER BY timestamp ASC"
+
+    with get_connection() as conn:
+        return _fetch_ohlcv(conn, query, params, as_arrow)
+
+
+def rebuild_rollups(symbol: str | None = None, exchange: str | None = None) -> int:
+    """
+    Rebuild materialized rollups from market_data.
+
+    Needed only after changes that upserts do not see, such as a new market
+    open time for an exchange (candle alignment).
+
+    Args:
+        symbol: Only rebuild this symbol (optional)
+        exchange: Only rebuild this exchange (optional)
+
+    Returns:
+        Number of rollup candles written
+    """
+    filters = []
+    params = []
+    for column, value in (("symbol", symbol), ("exchange", exchange)):
+        if value:
+            filters.append(f" AND {column} = ?")
+            params.append(value.upper())
+    where = "".join(filters)
+
+    with get_write_connection() as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(f"DELETE FROM market_data_rollup WHERE 1 = 1{where}", params)
+            if ROLLUP_INTERVALS:
+                keys = conn.execute(
+                    f"""
+                    SELECT DISTINCT symbol, exchange, interval FROM market_data
+                    WHERE interval IN ('1m', 'D'){where}
+                """,
+                    params,
+                ).fetchall()
+                for key_symbol, key_exchange, source_interval in keys:
+                    _refresh_rollups(conn, key_symbol, key_exchange, source_interval)
+
+            rows = conn.execute(
+                f"SELECT COUNT(*) FROM market_data_rollup WHERE 1 = 1{where}", params
+            ).fetchone()[0]
+            conn.execute("COMMIT")
+
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    if symbol and exchange:
+        get_query_cache().invalidate(symbol.upper(), exchange.upper())
+    else:
+        get_query_cache().invalidate()
+    logger.info(f"Rebuilt {rows} rollup candles for intervals {', '.join(ROLLUP_INTERVALS) or '-'}")
+    return rows
+
+
+# =============================================================================
+# Batch Queries
+# =============================================================================
+
+
+def _batch_ohlcv_query(
+    interval: str,
+    keys: list[tuple[str, str]],
+    start_timestamp: int | None,
+    end_timestamp: int | None,
+    rollup: bool,
+    from_market_open: bool = False,
+) -> tuple[str, list] | None:
+    """
+    Build the single-scan query for get_ohlcv_batch().
+
+    The requested (symbol, exchange) pairs are joined in as a VALUES list that also
+    carries each exchange's market open, so intraday candles stay aligned per
+    exchange while every symbol is aggregated by the same GROUP BY.
+
+    from_market_open drops 1m rows before the market open from intraday
+    aggregation (exports never produce candles that start before the open).
+
+    Returns:
+        Tuple of (query, params), or None if the interval cannot be served
+    """
+    market_open = {exchange: _get_market_open_seconds(exchange) for exchange in {e for _, e in keys}}
+    values = ", ".join(["(?, ?, ?::BIGINT)"] * len(keys))
+    params = [value for symbol, exchange in keys for value in (symbol, exchange, market_open[exchange])]
+
+    columns = "open, high, low, close, volume, oi"
+    aggregates = """
+                FIRST(open ORDER BY timestamp) AS open,
+                MAX(high) AS high,
+                MIN(low) AS low,
+                LAST(close ORDER BY timestamp) AS close,
+                SUM(volume) AS volume,
+                LAST(oi ORDER BY timestamp) AS oi"""
+    bucket = None
+
+    if rollup:
+        source_table, source_interval = "market_data_rollup", interval
+    elif interval in STORAGE_INTERVALS:
+        source_table, source_interval = "market_data", interval
+    elif is_daily_aggregated_interval(interval):
+        bucket = _daily_bucket_expr(parse_interval(interval))
+        if bucket is None:
+            return None
+        source_table, source_interval = "market_data", "D"
+        bucket = f"EPOCH({bucket})"
+    else:
+        minutes = INTERVAL_MINUTES.get(interval)
+        if minutes is None:
+            parsed = parse_interval(interval)
+            if not parsed or parsed["type"] != "intraday":
+                return None
+            minutes = parsed["minutes"]
+        source_table, source_interval = "market_data", "1m"
+        bucket = _intraday_bucket_expr(None, minutes, market_open_sql="k.market_open")
+
+    if bucket:
+        select = f"symbol, exchange, {bucket} AS timestamp,{aggregates}"
+    else:
+        select = f"symbol, exchange, timestamp, {columns}"
+
+    query = f"""
+        SELECT {select}
+        FROM {source_table}
+        JOIN (VALUES {values}) k(symbol, exchange, market_open) USING (symbol, exchange)
+        WHERE interval = ?
+    """
+    params.append(source_interval)
+
+    # Rollup candles are matched on their source range, as in _get_rollup_ohlcv()
+    if from_market_open and source_interval == "1m" and bucket:
+        query += " AND ((timestamp + 19800) % 86400) >= k.market_open"
+
+    if start_timestamp:
+        if rollup:
+            query += " AND last_source_timestamp >= ? AND timestamp >= ?"
+            params += [start_timestamp, start_timestamp - _rollup_span_seconds(interval) - 86400]
+        else:
+            query += " AND timestamp >= ?"
+            params.append(start_timestamp)
+
+    if end_timestamp:
+        if rollup:
+            query += " AND first_source_timestamp <= ? AND timestamp <= ?"
+            params += [end_timestamp, end_timestamp + 86400]
+        else:
+            query += " AND timestamp <= ?"
+            params.append(end_timestamp)
+
+    if bucket:
+        query += " GROUP BY ALL"
+    query += " ORDER BY symbol, exchange, timestamp"
+    return query, params
+
+
+def get_ohlcv_batch(
+    symbols: list[dict[str, str]],
+    interval: str,
+    start_timestamp: int | None = None,
+    end_timestamp: int | None = None,
+    as_arrow: bool = False,
+) -> pd.DataFrame | pa.Table:
+    """
+    Retrieve OHLCV data for many symbols with one scan of market_data.
+
+    Supports the same intervals as get_ohlcv(). Computed intervals are aggregated
+    in the same query, with intraday candles aligned to each symbol's exchange
+    market open. For rollup intervals, symbols whose rollup has not been built
+    yet are aggregated on-the-fly in one more query.
+
+    Args:
+        symbols: List of dicts with 'symbol' and 'exchange' keys
+        interval: Time interval (e.g., '1m', '5m', '25m', 'D', 'W')
+        start_timestamp: Start epoch timestamp (optional)
+        end_timestamp: End epoch timestamp (optional)
+        as_arrow: Return a pyarrow Table (OHLCV_BATCH_ARROW_SCHEMA) instead of a DataFrame
+
+    Returns:
+        Long-format DataFrame (or Arrow table) with columns: symbol, exchange,
+        timestamp, open, high, low, close, volume, oi, ordered by symbol,
+        exchange and timestamp. Symbols without data have no rows.
+    """
+    keys = list(dict.fromkeys((s["symbol"].upper(), s["exchange"].upper()) for s in symbols))
+    if not keys:
+        return _empty_ohlcv(as_arrow, OHLCV_BATCH_ARROW_SCHEMA)
+
+    try:
+        parts = []
+        remaining = keys
+
+        with get_connection() as conn:
+            if interval in ROLLUP_INTERVALS:
+                query, params = _batch_ohlcv_query(
+                    interval, keys, start_timestamp, end_timestamp, rollup=True
+                )
+                result = _fetch_ohlcv(conn, query, params, as_arrow, OHLCV_BATCH_ARROW_SCHEMA)
+                if len(result):
+                    parts.append(result)
+                    built = set(
+                        conn.execute(
+                            f"""
+                            SELECT DISTINCT symbol, exchange FROM market_data_rollup
+                            JOIN (VALUES {", ".join(["(?, ?)"] * len(keys))}) k(symbol, exchange)
+                            USING (symbol, exchange)
+                            WHERE interval = ?
+                        """,
+                            [value for key in keys for value in key] + [interval],
+                        ).fetchall()
+                    )
+                    remaining = [key for key in keys if key not in built]
+
+            if remaining:
+                built_query = _batch_ohlcv_query(
+                    interval, remaining, start_timestamp, end_timestamp, rollup=False
+                )
+                if built_query is None:
+                    logger.error(f"Cannot query batch OHLCV for interval: {interval}")
+                    return _empty_ohlcv(as_arrow, OHLCV_BATCH_ARROW_SCHEMA)
+                parts.append(
+                    _fetch_ohlcv(conn, *built_query, as_arrow, OHLCV_BATCH_ARROW_SCHEMA)
+                )
+
+        if len(parts) == 1:
+            return parts[0]
+
+        sort_keys = ["symbol", "exchange", "timestamp"]
+        if as_arrow:
+            return pa.concat_tables(parts).sort_by([(key, "ascending") for key in sort_keys])
+        return pd.concat(parts, ignore_index=True).sort_values(sort_keys, ignore_index=True)
+
+    except Exception as e:
+        logger.exception(f"Error fetching batch OHLCV data: {e}")
+        return _empty_ohlcv(as_arrow, OHLCV_BATCH_ARROW_SCHEMA)
 
 
 def get_data_catalog() -> list[dict[str, Any]]:
@@ -1195,34 +1963,220 @@ def get_available_symbols() -> list[dict[str, str]]:
 
 def get_data_range(symbol: str, exchange: str, interval: str) -> dict[str, Any] | None:
     """
-    Get the date range of available data for a symbol.
+    Get the date range of available data for a symbol.
+
+    Returns:
+        Dictionary with first_timestamp, last_timestamp, record_count and
+        last_download_ts (epoch seconds of the latest download), or None if no data exists
+    """
+    try:
+        with get_connection() as conn:
+            result = conn.execute(
+                """
+                SELECT first_timestamp, last_timestamp, record_count,
+                       CAST(epoch(CAST(last_download_at AS TIMESTAMPTZ)) AS BIGINT)
+                FROM data_catalog
+                WHERE symbol = ? AND exchange = ? AND interval = ?
+            """,
+                [symbol.upper(), exchange.upper(), interval],
+            ).fetchone()
+
+        if result:
+            return {
+                "first_timestamp": result[0],
+                "last_timestamp": result[1],
+                "record_count": result[2],
+                "last_download_ts": result[3],
+            }
+        return None
+
+    except Exception as e:
+        logger.exception(f"Error fetching data range: {e}")
+        return None
+
+
+def get_stored_session_dates(
+    symbol: str, exchange: str, interval: str, start_date: date, end_date: date
+) -> set[date]:
+    """
+    Get the IST trading dates that have at least one stored candle.
+
+    Args:
+        symbol: Trading symbol
+        exchange: Exchange code
+        interval: Storage interval (1m, D)
+        start_date: First date (inclusive)
+        end_date: Last date (inclusive)
+
+    Returns:
+        Set of dates with data
+    """
+    ist_offset = 19800
+    start_ts = (start_date - date(1970, 1, 1)).days * 86400 - ist_offset
+    end_ts = (end_date - date(1970, 1, 1)).days * 86400 + 86400 - ist_offset
+
+    with get_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT DISTINCT (timestamp + ?) // 86400
+            FROM market_data
+            WHERE symbol = ? AND exchange = ? AND interval = ?
+              AND timestamp >= ? AND timestamp < ?
+        """,
+            [ist_offset, symbol.upper(), exchange.upper(), interval, start_ts, end_ts],
+        ).fetchall()
+
+    return {date(1970, 1, 1) + timedelta(days=int(row[0])) for row in rows}
+
+
+def get_empty_sessions(
+    symbol: str, exchange: str, interval: str, start_date: date, end_date: date
+) -> set[date]:
+    """Get the trading dates recorded as having no data at the broker."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT session_date FROM empty_sessions
+            WHERE symbol = ? AND exchange = ? AND interval = ?
+              AND session_date BETWEEN ? AND ?
+        """,
+            [symbol.upper(), exchange.upper(), interval, start_date, end_date],
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def mark_empty_sessions(symbol: str, exchange: str, interval: str, dates: list[date]) -> int:
+    """
+    Record trading dates the broker returned no data for.
+
+    Returns:
+        Number of dates recorded
+    """
+    if not dates:
+        return 0
+    with get_write_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO empty_sessions (symbol, exchange, interval, session_date)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT DO UPDATE SET checked_at = now()
+        """,
+            [[symbol.upper(), exchange.upper(), interval, d] for d in dates],
+        )
+    return len(dates)
+
+
+def rebuild_data_catalog(
+    symbol: str | None = None, exchange: str | None = None, interval: str | None = None
+) -> int:
+    """
+    Recompute data_catalog statistics from market_data.
+
+    upsert_market_data() maintains the catalog incrementally; this full rescan is
+    the repair operation for entries that drifted (manual edits, interrupted imports).
+
+    Args:
+        symbol: Only rebuild this symbol (optional)
+        exchange: Only rebuild this exchange (optional)
+        interval: Only rebuild this interval (optional)
+
+    Returns:
+        Number of catalog entries rebuilt
+    """
+    filters = []
+    params = []
+    for column, value in (
+        ("symbol", symbol.upper() if symbol else None),
+        ("exchange", exchange.upper() if exchange else None),
+        ("interval", interval),
+    ):
+        if value:
+            filters.append(f"{column} = ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    with get_write_connection() as conn:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            catalog_stats = conn.execute(
+                f"""
+                SELECT symbol, exchange, interval,
+                       MIN(timestamp) AS first_timestamp,
+                       MAX(timestamp) AS last_timestamp,
+                       COUNT(*) AS record_count
+                FROM market_data
+                {where}
+                GROUP BY symbol, exchange, interval
+            """,
+                params,
+            ).fetchdf()
+            conn.register("catalog_stats", catalog_stats)
+
+            conn.execute("""
+                UPDATE data_catalog SET
+                    first_timestamp = s.first_timestamp,
+                    last_timestamp = s.last_timestamp,
+                    record_count = s.record_count
+                FROM catalog_stats s
+                WHERE data_catalog.symbol = s.symbol
+                  AND data_catalog.exchange = s.exchange
+                  AND data_catalog.interval = s.interval
+            """)
+            conn.execute("""
+                INSERT INTO data_catalog
+                (id, symbol, exchange, interval, first_timestamp, last_timestamp, record_count)
+                SELECT nextval('data_catalog_id_seq'), s.symbol, s.exchange, s.interval,
+                       s.first_timestamp, s.last_timestamp, s.record_count
+                FROM catalog_stats s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM data_catalog c
+                    WHERE c.symbol = s.symbol AND c.exchange = s.exchange AND c.interval = s.interval
+                )
+            """)
+            # Entries left without any data
+            conn.execute(
+                f"""
+                DELETE FROM data_catalog
+                WHERE id IN (
+                    SELECT c.id FROM (SELECT * FROM data_catalog {where}) c
+                    ANTI JOIN catalog_stats s
+                    ON c.symbol = s.symbol AND c.exchange = s.exchange AND c.interval = s.interval
+                )
+            """,
+                params,
+            )
+
+            conn.execute("COMMIT")
+
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        finally:
+            conn.unregister("catalog_stats")
+
+    logger.info(f"Rebuilt {len(catalog_stats)} data catalog entries")
+    return len(catalog_stats)
+
+
+def _delete_market_data_rows(conn, symbol: str, exchange: str, interval: str | None = None) -> int:
+    """
+    Delete stored candles of a symbol (all intervals, or one interval).
+
+    With the Parquet backend this removes the symbol's partition directories.
 
     Returns:
-        Dictionary with first_timestamp, last_timestamp, record_count
-        or None if no data exists
+        Number of rows deleted (Parquet backend: 1 if partitions were removed, else 0)
     """
-    try:
-        with get_connection() as conn:
-            result = conn.execute(
-                """
-                SELECT first_timestamp, last_timestamp, record_count
-                FROM data_catalog
-                WHERE symbol = ? AND exchange = ? AND interval = ?
-            """,
-                [symbol.upper(), exchange.upper(), interval],
-            ).fetchone()
-
-        if result:
-            return {
-                "first_timestamp": result[0],
-                "last_timestamp": result[1],
-                "record_count": result[2],
-            }
-        return None
+    if is_parquet_backend():
+        return int(delete_partitions(symbol, exchange, interval))
 
-    except Exception as e:
-        logger.exception(f"Error fetching data range: {e}")
-        return None
+    query = "DELETE FROM market_data WHERE symbol = ? AND exchange = ?"
+    params = [symbol.upper(), exchange.upper()]
+    if interval:
+        query += " AND interval = ?"
+        params.append(interval)
+    return conn.execute(query, params).fetchone()[0]
 
 
 def delete_market_data(symbol: str, exchange: str, interval: str | None = None) -> tuple[bool, str]:
@@ -1238,31 +2192,37 @@ def delete_market_data(symbol: str, exchange: str, interval: str | None = None)
         Tuple of (success, message)
     """
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             if interval:
+                _delete_market_data_rows(conn, symbol, exchange, interval)
                 conn.execute(
                     """
-                    DELETE FROM market_data
+                    DELETE FROM data_catalog
                     WHERE symbol = ? AND exchange = ? AND interval = ?
                 """,
                     [symbol.upper(), exchange.upper(), interval],
                 )
                 conn.execute(
                     """
-                    DELETE FROM data_catalog
+                    DELETE FROM empty_sessions
                     WHERE symbol = ? AND exchange = ? AND interval = ?
                 """,
                     [symbol.upper(), exchange.upper(), interval],
                 )
+                # Rollups aggregated from the deleted interval
+                derived = [i for i in ROLLUP_INTERVALS if _rollup_source(i) == interval]
+                if derived:
+                    conn.execute(
+                        f"""
+                        DELETE FROM market_data_rollup
+                        WHERE symbol = ? AND exchange = ?
+                          AND interval IN ({", ".join("?" for _ in derived)})
+                    """,
+                        [symbol.upper(), exchange.upper()] + derived,
+                    )
                 msg = f"Deleted {symbol}:{exchange}:{interval} data"
             else:
-                conn.execute(
-                    """
-                    DELETE FROM market_data
-                    WHERE symbol = ? AND exchange = ?
-                """,
-                    [symbol.upper(), exchange.upper()],
-                )
+                _delete_market_data_rows(conn, symbol, exchange)
                 conn.execute(
                     """
                     DELETE FROM data_catalog
@@ -1270,8 +2230,17 @@ def delete_market_data(symbol: str, exchange: str, interval: str | None = None)
                 """,
                     [symbol.upper(), exchange.upper()],
                 )
+                for table in ("market_data_rollup", "empty_sessions"):
+                    conn.execute(
+                        f"""
+                        DELETE FROM {table}
+                        WHERE symbol = ? AND exchange = ?
+                    """,
+                        [symbol.upper(), exchange.upper()],
+                    )
                 msg = f"Deleted all {symbol}:{exchange} data"
 
+        get_query_cache().invalidate(symbol.upper(), exchange.upper(), interval)
         logger.info(msg)
         return True, msg
 
@@ -1297,7 +2266,7 @@ def bulk_delete_market_data(
     failed = []
 
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             for item in symbols:
                 symbol = item.get("symbol", "").upper()
                 exchange = item.get("exchange", "").upper()
@@ -1312,14 +2281,7 @@ def bulk_delete_market_data(
 
                 try:
                     # Delete from market_data
-                    result = conn.execute(
-                        """
-                        DELETE FROM market_data
-                        WHERE symbol = ? AND exchange = ?
-                        """,
-                        [symbol, exchange],
-                    )
-                    rows_deleted = result.rowcount if hasattr(result, 'rowcount') else 0
+                    rows_deleted = _delete_market_data_rows(conn, symbol, exchange)
 
                     # Delete from data_catalog
                     conn.execute(
@@ -1330,6 +2292,17 @@ def bulk_delete_market_data(
                         [symbol, exchange],
                     )
 
+                    # Delete materialized rollups and recorded empty sessions
+                    for table in ("market_data_rollup", "empty_sessions"):
+                        conn.execute(
+                            f"""
+                            DELETE FROM {table}
+                            WHERE symbol = ? AND exchange = ?
+                            """,
+                            [symbol, exchange],
+                        )
+                    get_query_cache().invalidate(symbol, exchange)
+
                     if rows_deleted > 0:
                         deleted += 1
                         logger.info(f"Bulk delete: Deleted {symbol}:{exchange}")
@@ -1358,6 +2331,103 @@ def bulk_delete_market_data(
 # =============================================================================
 
 
+# Compression codecs for CSV/TXT exports (DuckDB COPY) and the suffix they add
+EXPORT_TEXT_COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Compression codecs for Parquet exports
+EXPORT_PARQUET_COMPRESSIONS = ("zstd", "snappy", "gzip", "none")
+
+# Symbols aggregated per COPY statement in ZIP exports (one progress step each)
+EXPORT_CHUNK_SYMBOLS = int(os.getenv("HISTORIFY_EXPORT_CHUNK_SYMBOLS", "50"))
+
+# Date/time columns of text exports
+_EXPORT_DATE_TIME = """
+    strftime(to_timestamp(timestamp), '%Y-%m-%d') as date,
+    strftime(to_timestamp(timestamp), '%H:%M:%S') as time"""
+
+
+def _export_output_path(output_path: str) -> str | None:
+    """Absolute export path, or None if it is outside the temp directory."""
+    import tempfile
+
+    abs_output = os.path.abspath(output_path)
+    if not abs_output.startswith(os.path.abspath(tempfile.gettempdir())):
+        return None
+    return abs_output
+
+
+def _export_source(
+    symbols: list[dict[str, str]] | None = None,
+    interval: str | None = None,
+    start_timestamp: int | None = None,
+    end_timestamp: int | None = None,
+) -> tuple[str, list]:
+    """
+    FROM/WHERE clause selecting market_data rows for an export.
+
+    Requested symbols are joined in as a VALUES list instead of an OR chain.
+
+    Returns:
+        Tuple of (sql starting with FROM, params)
+    """
+    source = "FROM market_data"
+    params = []
+    if symbols:
+        keys = list(dict.fromkeys((s["symbol"].upper(), s["exchange"].upper()) for s in symbols))
+        source += f"""
+            JOIN (VALUES {", ".join(["(?, ?)"] * len(keys))}) k(symbol, exchange)
+            USING (symbol, exchange)"""
+        params += [value for key in keys for value in key]
+
+    conditions = []
+    if interval:
+        conditions.append("interval = ?")
+        params.append(interval)
+    if start_timestamp:
+        conditions.append("timestamp >= ?")
+        params.append(start_timestamp)
+    if end_timestamp:
+        conditions.append("timestamp <= ?")
+        params.append(end_timestamp)
+
+    return f"{source}\n            WHERE {' AND '.join(conditions) if conditions else '1=1'}", params
+
+
+def _text_copy_options(delimiter: str = ",", compression: str = "none") -> str:
+    """COPY options for a CSV/TXT export."""
+    if compression not in EXPORT_TEXT_COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    escaped = delimiter.replace("'", "''")
+    options = f"FORMAT CSV, HEADER, DELIMITER '{escaped}'"
+    if compression != "none":
+        options += f", COMPRESSION {compression}"
+    return options
+
+
+def _copy_to(conn, select_sql: str, params: list, output_path: str, options: str) -> int:
+    """
+    Stream a query result to a file with DuckDB COPY.
+
+    Rows are written by DuckDB as they are produced, so memory use does not
+    grow with the export size.
+
+    Returns:
+        Number of rows written
+    """
+    target = output_path.replace("'", "''")
+    row = conn.execute(f"COPY ({select_sql}) TO '{target}' ({options})", params).fetchone()
+    return row[0] if row else 0
+
+
+def _remove_file(path: str):
+    """Delete a partial export file, ignoring errors."""
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
 def export_to_csv(
     output_path: str,
     symbol: str | None = None,
@@ -1365,9 +2435,10 @@ def export_to_csv(
     interval: str | None = None,
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
+    compression: str = "none",
 ) -> tuple[bool, str]:
     """
-    Export market data to CSV file.
+    Export market data to CSV file (streamed by DuckDB COPY).
 
     Args:
         output_path: Path to save the CSV file
@@ -1376,6 +2447,7 @@ def export_to_csv(
         interval: Filter by interval (optional)
         start_timestamp: Start epoch timestamp (optional)
         end_timestamp: End epoch timestamp (optional)
+        compression: 'none', 'gzip' or 'zstd'
 
     Returns:
         Tuple of (success, message)
@@ -1405,9 +2477,7 @@ def export_to_csv(
 
         query = f"""
             SELECT
-                symbol, exchange, interval,
-                strftime(to_timestamp(timestamp), '%Y-%m-%d') as date,
-                strftime(to_timestamp(timestamp), '%H:%M:%S') as time,
+                symbol, exchange, interval,{_EXPORT_DATE_TIME},
                 open, high, low, close, volume, oi
             FROM market_data
             WHERE {where_clause}
@@ -1415,17 +2485,12 @@ def export_to_csv(
         """
 
         # Validate output path - must be within temp directory
-        import tempfile
-
-        temp_dir = tempfile.gettempdir()
-        abs_output = os.path.abspath(output_path)
-        if not abs_output.startswith(os.path.abspath(temp_dir)):
+        abs_output = _export_output_path(output_path)
+        if abs_output is None:
             return False, "Invalid output path: must be within temp directory"
 
         with get_connection() as conn:
-            # Always use parameterized query and pandas to_csv for safety
-            df = conn.execute(query, params).fetchdf()
-            df.to_csv(output_path, index=False)
+            _copy_to(conn, query, params, abs_output, _text_copy_options(compression=compression))
 
         logger.info(f"Exported data to {output_path}")
         return True, f"Data exported to {output_path}"
@@ -1484,13 +2549,19 @@ def get_database_stats() -> dict[str, Any]:
             ).fetchone()[0]
             watchlist_count = conn.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0]
 
-        return {
+        stats = {
             "database_path": db_path,
             "database_size_mb": round(db_size / (1024 * 1024), 2),
             "total_records": total_records,
             "total_symbols": total_symbols,
             "watchlist_count": watchlist_count,
+            "storage_backend": "parquet" if is_parquet_backend() else "duckdb",
+            "query_cache": get_query_cache().stats(),
         }
+        if is_parquet_backend():
+            stats["parquet_path"] = get_parquet_root()
+            stats["parquet_size_mb"] = round(get_parquet_size() / (1024 * 1024), 2)
+        return stats
 
     except Exception as e:
         logger.exception(f"Error fetching database stats: {e}")
@@ -1500,6 +2571,7 @@ def get_database_stats() -> dict[str, Any]:
             "total_records": 0,
             "total_symbols": 0,
             "watchlist_count": 0,
+            "query_cache": get_query_cache().stats(),
         }
 
 
@@ -1508,7 +2580,7 @@ def vacuum_database():
     Vacuum the database to reclaim space and optimize performance.
     """
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute("VACUUM")
         logger.info("Database vacuumed successfully")
     except Exception as e:
@@ -1783,7 +2855,7 @@ def create_download_job(
     import json
 
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Begin a transaction for atomicity
             conn.execute("BEGIN TRANSACTION")
 
@@ -1823,13 +2895,17 @@ def create_download_job(
 
                     # Atomic batch insert with computed IDs using ROW_NUMBER
                     # This generates IDs atomically without race conditions
-                    conn.execute("""
-                        INSERT INTO job_items (id, job_id, symbol, exchange, status)
-                        SELECT
-                            (SELECT COALESCE(MAX(id), 0) FROM job_items) + ROW_NUMBER() OVER () as id,
-                            job_id, symbol, exchange, status
-                        FROM symbols_df
-                    """)
+                    conn.register("symbols_df", symbols_df)
+                    try:
+                        conn.execute("""
+                            INSERT INTO job_items (id, job_id, symbol, exchange, status)
+                            SELECT
+                                (SELECT COALESCE(MAX(id), 0) FROM job_items) + ROW_NUMBER() OVER () as id,
+                                job_id, symbol, exchange, status
+                            FROM symbols_df
+                        """)
+                    finally:
+                        conn.unregister("symbols_df")
 
                 conn.execute("COMMIT")
 
@@ -1992,7 +3068,7 @@ def get_job_items(job_id: str, status: str = None) -> list[dict[str, Any]]:
 def update_job_status(job_id: str, status: str, error_message: str = None) -> bool:
     """Update the status of a download job."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             if status == "running":
                 conn.execute(
                     """
@@ -2034,7 +3110,7 @@ def update_job_item_status(
 ) -> bool:
     """Update the status of a job item."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             if status == "downloading":
                 conn.execute(
                     """
@@ -2074,7 +3150,7 @@ def update_job_item_status(
 def update_job_progress(job_id: str, completed: int, failed: int) -> bool:
     """Update job progress counters."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute(
                 """
                 UPDATE download_jobs
@@ -2093,7 +3169,7 @@ def update_job_progress(job_id: str, completed: int, failed: int) -> bool:
 def delete_download_job(job_id: str) -> tuple[bool, str]:
     """Delete a download job and its items."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute("DELETE FROM job_items WHERE job_id = ?", [job_id])
             conn.execute("DELETE FROM download_jobs WHERE id = ?", [job_id])
 
@@ -2124,7 +3200,7 @@ def upsert_symbol_metadata(symbols: list[dict[str, Any]]) -> int:
         return 0
 
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             for sym in symbols:
                 # Check if exists
                 existing = conn.execute(
@@ -2296,8 +3372,8 @@ def export_to_parquet(
     """
     Export market data to Parquet format with ZSTD compression.
 
-    DuckDB has native Parquet support, making this very efficient
-    for large datasets and ideal for backtesting tools.
+    DuckDB writes the file with COPY TO PARQUET, streaming row groups
+    instead of building the result in memory.
 
     Args:
         output_path: Path to save the Parquet file
@@ -2310,90 +3386,34 @@ def export_to_parquet(
     Returns:
         Tuple of (success, message, record_count)
     """
-    import tempfile
-
+    abs_output = None
     try:
-        # Build WHERE clause
-        conditions = []
-        params = []
-
-        if symbols and len(symbols) > 0:
-            symbol_conditions = []
-            for sym in symbols:
-                symbol_conditions.append("(symbol = ? AND exchange = ?)")
-                params.extend([sym["symbol"].upper(), sym["exchange"].upper()])
-            conditions.append(f"({' OR '.join(symbol_conditions)})")
-
-        if interval:
-            conditions.append("interval = ?")
-            params.append(interval)
-        if start_timestamp:
-            conditions.append("timestamp >= ?")
-            params.append(start_timestamp)
-        if end_timestamp:
-            conditions.append("timestamp <= ?")
-            params.append(end_timestamp)
-
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-
         # Validate output path - must be within temp directory
-        temp_dir = tempfile.gettempdir()
-        abs_output = os.path.abspath(output_path)
-        if not abs_output.startswith(os.path.abspath(temp_dir)):
+        abs_output = _export_output_path(output_path)
+        if abs_output is None:
             return False, "Invalid output path: must be within temp directory", 0
 
-        # Get record count first
-        count_query = f"SELECT COUNT(*) FROM market_data WHERE {where_clause}"
+        if compression not in EXPORT_PARQUET_COMPRESSIONS:
+            return False, f"Unsupported compression: {compression}", 0
+
+        source, params = _export_source(symbols, interval, start_timestamp, end_timestamp)
+        query = f"""
+            SELECT
+                symbol, exchange, interval, timestamp,
+                open, high, low, close, volume, oi,
+                to_timestamp(timestamp) as datetime
+            {source}
+            ORDER BY symbol, exchange, interval, timestamp
+        """
 
         with get_connection() as conn:
-            record_count = conn.execute(count_query, params).fetchone()[0]
-
-            if record_count == 0:
-                return False, "No data matching the criteria", 0
-
-            # Export using DuckDB's native COPY TO PARQUET
-            # Build the query string for COPY - need to embed values for COPY command
-            export_query = f"""
-                COPY (
-                    SELECT
-                        symbol, exchange, interval, timestamp,
-                        open, high, low, close, volume, oi,
-                        to_timestamp(timestamp) as datetime
-                    FROM market_data
-                    WHERE {where_clause}
-                    ORDER BY symbol, exchange, interval, timestamp
-                ) TO '{abs_output}'
-                (FORMAT PARQUET, COMPRESSION '{compression}')
-            """
+            record_count = _copy_to(
+                conn, query, params, abs_output, f"FORMAT PARQUET, COMPRESSION '{compression}'"
+            )
 
-            # For COPY command, we need to execute without parameters
-            # Build the full query with values embedded safely
-            if params:
-                # Re-execute with DataFrame approach for safety
-                select_query = f"""
-                    SELECT
-                        symbol, exchange, interval, timestamp,
-                        open, high, low, close, volume, oi
-                    FROM market_data
-                    WHERE {where_clause}
-                    ORDER BY symbol, exchange, interval, timestamp
-                """
-                df = conn.execute(select_query, params).fetchdf()
-                df["datetime"] = pd.to_datetime(df["timestamp"], unit="s")
-                df.to_parquet(abs_output, compression=compression, index=False)
-            else:
-                # No params - can use COPY directly
-                conn.execute(f"""
-                    COPY (
-                        SELECT
-                            symbol, exchange, interval, timestamp,
-                            open, high, low, close, volume, oi,
-                            to_timestamp(timestamp) as datetime
-                        FROM market_data
-                        ORDER BY symbol, exchange, interval, timestamp
-                    ) TO '{abs_output}'
-                    (FORMAT PARQUET, COMPRESSION '{compression}')
-                """)
+        if record_count == 0:
+            _remove_file(abs_output)
+            return False, "No data matching the criteria", 0
 
         file_size = os.path.getsize(abs_output) / (1024 * 1024)  # MB
         logger.info(f"Exported {record_count} records to Parquet ({file_size:.2f} MB)")
@@ -2401,6 +3421,8 @@ def export_to_parquet(
 
     except Exception as e:
         logger.exception(f"Error exporting to Parquet: {e}")
+        if abs_output:
+            _remove_file(abs_output)
         return False, str(e), 0
 
 
@@ -2411,6 +3433,7 @@ def export_to_txt(
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
     delimiter: str = "\t",
+    compression: str = "none",
 ) -> tuple[bool, str, int]:
     """
     Export market data to TXT format (tab or pipe delimited).
@@ -2422,67 +3445,59 @@ def export_to_txt(
         start_timestamp: Start epoch timestamp (optional)
         end_timestamp: End epoch timestamp (optional)
         delimiter: Column delimiter (default: tab)
+        compression: 'none', 'gzip' or 'zstd'
 
     Returns:
         Tuple of (success, message, record_count)
     """
-    import tempfile
-
-    try:
-        # Build WHERE clause
-        conditions = []
-        params = []
-
-        if symbols and len(symbols) > 0:
-            symbol_conditions = []
-            for sym in symbols:
-                symbol_conditions.append("(symbol = ? AND exchange = ?)")
-                params.extend([sym["symbol"].upper(), sym["exchange"].upper()])
-            conditions.append(f"({' OR '.join(symbol_conditions)})")
-
-        if interval:
-            conditions.append("interval = ?")
-            params.append(interval)
-        if start_timestamp:
-            conditions.append("timestamp >= ?")
-            params.append(start_timestamp)
-        if end_timestamp:
-            conditions.append("timestamp <= ?")
-            params.append(end_timestamp)
+    return _export_text(
+        "TXT", output_path, symbols, interval, start_timestamp, end_timestamp, delimiter, compression
+    )
 
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
 
+def _export_text(
+    label: str,
+    output_path: str,
+    symbols: list[dict[str, str]] | None,
+    interval: str | None,
+    start_timestamp: int | None,
+    end_timestamp: int | None,
+    delimiter: str,
+    compression: str,
+) -> tuple[bool, str, int]:
+    """Stream a multi-symbol delimited text export with DuckDB COPY."""
+    abs_output = None
+    try:
         # Validate output path
-        temp_dir = tempfile.gettempdir()
-        abs_output = os.path.abspath(output_path)
-        if not abs_output.startswith(os.path.abspath(temp_dir)):
+        abs_output = _export_output_path(output_path)
+        if abs_output is None:
             return False, "Invalid output path: must be within temp directory", 0
 
+        source, params = _export_source(symbols, interval, start_timestamp, end_timestamp)
         query = f"""
             SELECT
-                symbol, exchange, interval,
-                strftime(to_timestamp(timestamp), '%Y-%m-%d') as date,
-                strftime(to_timestamp(timestamp), '%H:%M:%S') as time,
+                symbol, exchange, interval,{_EXPORT_DATE_TIME},
                 open, high, low, close, volume, oi
-            FROM market_data
-            WHERE {where_clause}
+            {source}
             ORDER BY symbol, exchange, interval, timestamp
         """
 
         with get_connection() as conn:
-            df = conn.execute(query, params).fetchdf()
-
-            if df.empty:
-                return False, "No data matching the criteria", 0
+            record_count = _copy_to(
+                conn, query, params, abs_output, _text_copy_options(delimiter, compression)
+            )
 
-            df.to_csv(output_path, index=False, sep=delimiter)
-            record_count = len(df)
+        if record_count == 0:
+            _remove_file(abs_output)
+            return False, "No data matching the criteria", 0
 
-        logger.info(f"Exported {record_count} records to TXT")
+        logger.info(f"Exported {record_count} records to {label}")
         return True, f"Exported {record_count} records", record_count
 
     except Exception as e:
-        logger.exception(f"Error exporting to TXT: {e}")
+        logger.exception(f"Error exporting {label}: {e}")
+        if abs_output:
+            _remove_file(abs_output)
         return False, str(e), 0
 
 
@@ -2497,6 +3512,149 @@ def _sanitize_filename(name: str) -> str:
     return name
 
 
+def _export_keys(symbols: list[dict[str, str]] | None) -> list[tuple[str, str]]:
+    """(symbol, exchange) pairs to export: the requested symbols, or every catalog symbol."""
+    if symbols:
+        return list(dict.fromkeys((s["symbol"].upper(), s["exchange"].upper()) for s in symbols))
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT DISTINCT symbol, exchange FROM data_catalog
+            ORDER BY symbol, exchange
+        """).fetchall()
+
+
+def _zip_export_select(interval: str, batch_query: str, split: bool) -> str:
+    """
+    Wrap a get_ohlcv_batch() query with the ZIP export columns.
+
+    Stored intervals keep the date/time formatting of the CSV export; aggregated
+    candle starts are formatted in IST.
+    """
+    if interval in STORAGE_INTERVALS:
+        date_time = _EXPORT_DATE_TIME
+    else:
+        date_time = """
+            strftime(make_timestamp(CAST(timestamp + 19800 AS BIGINT) * 1000000), '%Y-%m-%d') as date,
+            strftime(make_timestamp(CAST(timestamp + 19800 AS BIGINT) * 1000000), '%H:%M:%S') as time"""
+    key_columns = "symbol, exchange" if split else "symbol, exchange, ? as interval"
+    return f"""
+        SELECT {key_columns},{date_time},
+            open, high, low, close, volume, oi
+        FROM ({batch_query})
+        ORDER BY symbol, exchange, timestamp
+    """
+
+
+def stage_zip_export(
+    staging_dir: str,
+    symbols: list[dict[str, str]] | None = None,
+    intervals: list[str] | None = None,
+    start_timestamp: int | None = None,
+    end_timestamp: int | None = None,
+    split_by: str = "symbol",
+    progress_callback=None,
+) -> tuple[list[tuple[str, str]], int, list[str]]:
+    """
+    Write the CSV files of a ZIP export into a staging directory.
+
+    Each interval is exported for a chunk of symbols by one COPY statement
+    (PARTITION_BY symbol and exchange when split_by is 'symbol'), with computed
+    intervals aggregated inside the query. Nothing is held in memory; the
+    caller zips the files from disk or streams them.
+
+    Args:
+        staging_dir: Empty directory inside the temp directory
+        symbols: List of dicts with 'symbol' and 'exchange' keys (optional - catalog if None)
+        intervals: Intervals to export (default ['D'])
+        start_timestamp: Start epoch timestamp (optional)
+        end_timestamp: End epoch timestamp (optional)
+        split_by: 'symbol' for one CSV per symbol/interval, 'none' for one CSV per interval
+        progress_callback: Called as progress_callback(done, total) after each COPY
+
+    Returns:
+        Tuple of (files as [(path, archive name)] in archive order, record count,
+        skipped 'SYMBOL:EXCHANGE:INTERVAL' entries for aggregated intervals without source data)
+    """
+    from urllib.parse import unquote
+
+    keys = _export_keys(symbols)
+    if not keys:
+        return [], 0, []
+    position = {key: i for i, key in enumerate(keys)}
+
+    intervals_to_export = intervals if intervals else ["D"]
+    split = split_by != "none"
+    chunk_size = max(EXPORT_CHUNK_SYMBOLS, 1) if split else len(keys)
+    chunks = [keys[i : i + chunk_size] for i in range(0, len(keys), chunk_size)]
+    total_steps = len(intervals_to_export) * len(chunks)
+
+    files = []
+    total_records = 0
+    skipped = []
+    step = 0
+
+    for interval_index, interval in enumerate(intervals_to_export):
+        aggregated = interval not in STORAGE_INTERVALS
+        exported = set()
+
+        for chunk_index, chunk in enumerate(chunks):
+            built = _batch_ohlcv_query(
+                interval, chunk, start_timestamp, end_timestamp, rollup=False, from_market_open=True
+            )
+            if built is None:
+                logger.warning(f"Cannot parse interval {interval}, skipping")
+                skipped.extend(f"{s}:{e}:{interval}" for s, e in chunk)
+                step += 1
+                continue
+
+            batch_query, params = built
+            query = _zip_export_select(interval, batch_query, split)
+            if not split:
+                params = [interval] + params
+            target = os.path.join(staging_dir, f"{interval_index}_{chunk_index}")
+
+            with get_connection() as conn:
+                if split:
+                    rows = _copy_to(
+                        conn, query, params, target, _text_copy_options() + ", PARTITION_BY (symbol, exchange)"
+                    )
+                else:
+                    rows = _copy_to(conn, query, params, target + ".csv", _text_copy_options())
+            total_records += rows
+
+            if split:
+                # DuckDB writes <target>/symbol=<s>/exchange=<e>/data_0.csv (values URL-encoded)
+                for root, _, names in os.walk(target):
+                    for name in sorted(names):
+                        parts = dict(
+                            part.split("=", 1)
+                            for part in os.path.relpath(root, target).split(os.sep)
+                            if "=" in part
+                        )
+                        sym, exch = unquote(parts["symbol"]), unquote(parts["exchange"])
+                        exported.add((sym, exch))
+                        filename = f"{_sanitize_filename(sym)}_{_sanitize_filename(exch)}_{_sanitize_filename(interval)}.csv"
+                        files.append(((position[(sym, exch)], interval_index), os.path.join(root, name), filename))
+            elif rows:
+                exported.update(chunk)
+                filename = f"all_symbols_{_sanitize_filename(interval)}.csv"
+                files.append(((0, interval_index), target + ".csv", filename))
+
+            step += 1
+            if progress_callback:
+                progress_callback(step, total_steps)
+
+        if aggregated and split:
+            for sym, exch in keys:
+                if (sym, exch) not in exported:
+                    logger.warning(f"No source data for {sym}:{exch}, skipping computed interval {interval}")
+                    skipped.append(f"{sym}:{exch}:{interval}")
+
+    # Same order as the per-symbol loop: symbols, then intervals
+    files.sort(key=lambda item: item[0])
+    return [(path, filename) for _, path, filename in files], total_records, skipped
+
+
 def export_to_zip(
     output_path: str,
     symbols: list[dict[str, str]] | None = None,
@@ -2504,6 +3662,7 @@ def export_to_zip(
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
     split_by: str = "symbol",
+    progress_callback=None,
 ) -> tuple[bool, str, int]:
     """
     Export market data to ZIP archive containing CSVs.
@@ -2512,6 +3671,9 @@ def export_to_zip(
     - Intraday (from 1m): 5m, 15m, 30m, 1h, 25m, 2h, etc.
     - Daily-based (from D): W, M, Q, Y
 
+    The CSVs are written by stage_zip_export() and copied into the archive
+    from disk in chunks.
+
     Args:
         output_path: Path to save the ZIP file
         symbols: List of dicts with 'symbol' and 'exchange' keys (optional)
@@ -2519,232 +3681,36 @@ def export_to_zip(
         start_timestamp: Start epoch timestamp (optional)
         end_timestamp: End epoch timestamp (optional)
         split_by: 'symbol' to create one CSV per symbol/interval, 'none' for combined
+        progress_callback: Called as progress_callback(done, total) while staging
 
     Returns:
         Tuple of (success, message, record_count)
     """
+    import shutil
     import tempfile
     import zipfile
 
-    try:
-        # Validate output path
-        temp_dir = tempfile.gettempdir()
-        abs_output = os.path.abspath(output_path)
-        if not abs_output.startswith(os.path.abspath(temp_dir)):
-            return False, "Invalid output path: must be within temp directory", 0
-
-        total_records = 0
-        skipped_intervals = []  # Track computed intervals with missing 1m data
-
-        # IST timezone offset from UTC (5 hours 30 minutes = 19800 seconds)
-        ist_offset = 19800
+    abs_output = _export_output_path(output_path)
+    if abs_output is None:
+        return False, "Invalid output path: must be within temp directory", 0
 
-        with zipfile.ZipFile(abs_output, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
-            with get_connection() as conn:
-                # Get symbols to export
-                if symbols and len(symbols) > 0:
-                    symbols_list = [(s["symbol"].upper(), s["exchange"].upper()) for s in symbols]
-                else:
-                    # Get all symbols from catalog
-                    symbols_df = conn.execute("""
-                        SELECT DISTINCT symbol, exchange FROM data_catalog
-                        ORDER BY symbol, exchange
-                    """).fetchdf()
-                    symbols_list = [
-                        (row["symbol"], row["exchange"]) for _, row in symbols_df.iterrows()
-                    ]
-
-                if not symbols_list:
-                    return False, "No symbols found to export", 0
-
-                # Determine intervals to export
-                intervals_to_export = intervals if intervals else ["D"]
-
-                for sym, exch in symbols_list:
-                    market_open_seconds = _get_market_open_seconds(exch)
-
-                    for interval in intervals_to_export:
-                        # Determine if this is a daily-aggregated interval (W, MO, Q, Y)
-                        is_daily_agg = is_daily_aggregated_interval(interval)
-
-                        # Determine if this is an intraday computed interval (standard or custom)
-                        is_intraday_computed = interval in COMPUTED_INTERVALS or is_custom_interval(
-                            interval
-                        )
+    keys = _export_keys(symbols)
+    if not keys:
+        return False, "No symbols found to export", 0
 
-                        if is_daily_agg:
-                            # Check if D data exists before attempting aggregation
-                            check_query = """
-                                SELECT COUNT(*) FROM market_data
-                                WHERE symbol = ? AND exchange = ? AND interval = 'D'
-                            """
-                            check_params = [sym, exch]
-                            if start_timestamp:
-                                check_query += " AND timestamp >= ?"
-                                check_params.append(start_timestamp)
-                            if end_timestamp:
-                                check_query += " AND timestamp <= ?"
-                                check_params.append(end_timestamp)
-
-                            count = conn.execute(check_query, check_params).fetchone()[0]
-                            if count == 0:
-                                logger.warning(
-                                    f"No D data for {sym}:{exch}, skipping daily-aggregated interval {interval}"
-                                )
-                                skipped_intervals.append(f"{sym}:{exch}:{interval}")
-                                continue
-
-                            # Use get_ohlcv which handles daily aggregation
-                            df = _get_daily_aggregated_ohlcv(
-                                symbol=sym,
-                                exchange=exch,
-                                target_interval=interval,
-                                start_timestamp=start_timestamp,
-                                end_timestamp=end_timestamp,
-                            )
-
-                            if not df.empty:
-                                # Format timestamp as date and time columns
-                                df["date"] = pd.to_datetime(
-                                    df["timestamp"] + ist_offset, unit="s"
-                                ).dt.strftime("%Y-%m-%d")
-                                df["time"] = pd.to_datetime(
-                                    df["timestamp"] + ist_offset, unit="s"
-                                ).dt.strftime("%H:%M:%S")
-                                df = df[
-                                    ["date", "time", "open", "high", "low", "close", "volume", "oi"]
-                                ]
-
-                                # Create CSV content
-                                csv_buffer = df.to_csv(index=False)
-
-                                # Sanitize filename
-                                safe_sym = _sanitize_filename(sym)
-                                safe_exch = _sanitize_filename(exch)
-                                safe_int = _sanitize_filename(interval)
-                                filename = f"{safe_sym}_{safe_exch}_{safe_int}.csv"
-
-                                zf.writestr(filename, csv_buffer)
-                                total_records += len(df)
-
-                        elif is_intraday_computed:
-                            # Check if 1m data exists before attempting aggregation
-                            check_query = """
-                                SELECT COUNT(*) FROM market_data
-                                WHERE symbol = ? AND exchange = ? AND interval = '1m'
-                            """
-                            check_params = [sym, exch]
-                            if start_timestamp:
-                                check_query += " AND timestamp >= ?"
-                                check_params.append(start_timestamp)
-                            if end_timestamp:
-                                check_query += " AND timestamp <= ?"
-                                check_params.append(end_timestamp)
-
-                            count = conn.execute(check_query, check_params).fetchone()[0]
-                            if count == 0:
-                                logger.warning(
-                                    f"No 1m data for {sym}:{exch}, skipping computed interval {interval}"
-                                )
-                                skipped_intervals.append(f"{sym}:{exch}:{interval}")
-                                continue
-
-                            # Aggregate from 1m data using the same logic as _get_aggregated_ohlcv
-                            # Filter to only include data after market open to avoid negative timestamp issues
-                            # Support both standard and custom intervals
-                            minutes = INTERVAL_MINUTES.get(interval)
-                            if minutes is None:
-                                parsed = parse_interval(interval)
-                                if parsed and parsed["type"] == "intraday":
-                                    minutes = parsed["minutes"]
-                                else:
-                                    logger.warning(f"Cannot parse interval {interval}, skipping")
-                                    skipped_intervals.append(f"{sym}:{exch}:{interval}")
-                                    continue
-                            interval_seconds = minutes * 60
-
-                            query = f"""
-                                SELECT
-                                    (FLOOR((timestamp + {ist_offset}) / 86400) * 86400 - {ist_offset}) +
-                                    {market_open_seconds} +
-                                    FLOOR((((timestamp + {ist_offset}) % 86400) - {market_open_seconds}) / {interval_seconds}) * {interval_seconds}
-                                    as ts,
-                                    FIRST(open ORDER BY timestamp) as open,
-                                    MAX(high) as high,
-                                    MIN(low) as low,
-                                    LAST(close ORDER BY timestamp) as close,
-                                    SUM(volume) as volume,
-                                    LAST(oi ORDER BY timestamp) as oi
-                                FROM market_data
-                                WHERE symbol = ? AND exchange = ? AND interval = '1m'
-                                AND ((timestamp + {ist_offset}) % 86400) >= {market_open_seconds}
-                            """
-                            params = [sym, exch]
-
-                            if start_timestamp:
-                                query += " AND timestamp >= ?"
-                                params.append(start_timestamp)
-
-                            if end_timestamp:
-                                query += " AND timestamp <= ?"
-                                params.append(end_timestamp)
-
-                            query += f"""
-                                GROUP BY (FLOOR((timestamp + {ist_offset}) / 86400) * 86400 - {ist_offset}) +
-                                         {market_open_seconds} +
-                                         FLOOR((((timestamp + {ist_offset}) % 86400) - {market_open_seconds}) / {interval_seconds}) * {interval_seconds}
-                                ORDER BY ts ASC
-                            """
-
-                            df = conn.execute(query, params).fetchdf()
-
-                            if not df.empty:
-                                # Format timestamp as date and time columns
-                                # Add IST offset (19800 seconds) for display since aggregated timestamps are UTC
-                                df["date"] = pd.to_datetime(
-                                    df["ts"] + ist_offset, unit="s"
-                                ).dt.strftime("%Y-%m-%d")
-                                df["time"] = pd.to_datetime(
-                                    df["ts"] + ist_offset, unit="s"
-                                ).dt.strftime("%H:%M:%S")
-                                df = df[
-                                    ["date", "time", "open", "high", "low", "close", "volume", "oi"]
-                                ]
-
-                        else:
-                            # Direct query for stored intervals (1m, D)
-                            query = """
-                                SELECT
-                                    strftime(to_timestamp(timestamp), '%Y-%m-%d') as date,
-                                    strftime(to_timestamp(timestamp), '%H:%M:%S') as time,
-                                    open, high, low, close, volume, oi
-                                FROM market_data
-                                WHERE symbol = ? AND exchange = ? AND interval = ?
-                            """
-                            params = [sym, exch, interval]
-
-                            if start_timestamp:
-                                query += " AND timestamp >= ?"
-                                params.append(start_timestamp)
-
-                            if end_timestamp:
-                                query += " AND timestamp <= ?"
-                                params.append(end_timestamp)
-
-                            query += " ORDER BY timestamp"
-
-                            df = conn.execute(query, params).fetchdf()
-
-                        if not df.empty:
-                            csv_content = df.to_csv(index=False)
-                            # Sanitize filename to prevent path traversal
-                            filename = f"{_sanitize_filename(sym)}_{_sanitize_filename(exch)}_{_sanitize_filename(interval)}.csv"
-                            zf.writestr(filename, csv_content)
-                            total_records += len(df)
+    staging_dir = tempfile.mkdtemp(prefix="historify_export_")
+    try:
+        files, total_records, skipped_intervals = stage_zip_export(
+            staging_dir,
+            symbols=[{"symbol": s, "exchange": e} for s, e in keys],
+            intervals=intervals,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            split_by=split_by,
+            progress_callback=progress_callback,
+        )
 
         if total_records == 0:
-            if os.path.exists(abs_output):
-                os.remove(abs_output)
             if skipped_intervals:
                 return (
                     False,
@@ -2753,6 +3719,10 @@ def export_to_zip(
                 )
             return False, "No data matching the criteria", 0
 
+        with zipfile.ZipFile(abs_output, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            for path, filename in files:
+                zf.write(path, filename)
+
         file_size = os.path.getsize(abs_output) / (1024 * 1024)  # MB
         message = f"Exported {total_records} records ({file_size:.2f} MB)"
         if skipped_intervals:
@@ -2763,13 +3733,12 @@ def export_to_zip(
     except Exception as e:
         logger.exception(f"Error exporting to ZIP: {e}")
         # Clean up partial file on error
-        if os.path.exists(abs_output):
-            try:
-                os.remove(abs_output)
-            except Exception:
-                pass
+        _remove_file(abs_output)
         return False, str(e), 0
 
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
 
 def export_bulk_csv(
     output_path: str,
@@ -2777,80 +3746,25 @@ def export_bulk_csv(
     interval: str | None = None,
     start_timestamp: int | None = None,
     end_timestamp: int | None = None,
+    compression: str = "none",
 ) -> tuple[bool, str, int]:
     """
     Export multiple symbols to a single CSV file.
 
     Args:
         output_path: Path to save the CSV file
-        symbols: List of dicts with 'symbol' and 'exchange' keys
+        symbols: List of dicts with 'symbol' and 'exchange' keys (all symbols if empty)
         interval: Filter by interval (optional)
         start_timestamp: Start epoch timestamp (optional)
         end_timestamp: End epoch timestamp (optional)
+        compression: 'none', 'gzip' or 'zstd'
 
     Returns:
         Tuple of (success, message, record_count)
     """
-    import tempfile
-
-    try:
-        # Build symbol filter
-        conditions = []
-        params = []
-
-        if symbols and len(symbols) > 0:
-            # Export specific symbols
-            symbol_conditions = []
-            for sym in symbols:
-                symbol_conditions.append("(symbol = ? AND exchange = ?)")
-                params.extend([sym["symbol"].upper(), sym["exchange"].upper()])
-            conditions.append(f"({' OR '.join(symbol_conditions)})")
-        # If no symbols specified, export all (no symbol filter needed)
-
-        if interval:
-            conditions.append("interval = ?")
-            params.append(interval)
-        if start_timestamp:
-            conditions.append("timestamp >= ?")
-            params.append(start_timestamp)
-        if end_timestamp:
-            conditions.append("timestamp <= ?")
-            params.append(end_timestamp)
-
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-
-        # Validate output path
-        temp_dir = tempfile.gettempdir()
-        abs_output = os.path.abspath(output_path)
-        if not abs_output.startswith(os.path.abspath(temp_dir)):
-            return False, "Invalid output path: must be within temp directory", 0
-
-        query = f"""
-            SELECT
-                symbol, exchange, interval,
-                strftime(to_timestamp(timestamp), '%Y-%m-%d') as date,
-                strftime(to_timestamp(timestamp), '%H:%M:%S') as time,
-                open, high, low, close, volume, oi
-            FROM market_data
-            WHERE {where_clause}
-            ORDER BY symbol, exchange, interval, timestamp
-        """
-
-        with get_connection() as conn:
-            df = conn.execute(query, params).fetchdf()
-
-            if df.empty:
-                return False, "No data matching the criteria", 0
-
-            df.to_csv(output_path, index=False)
-            record_count = len(df)
-
-        logger.info(f"Exported {record_count} records to CSV")
-        return True, f"Exported {record_count} records", record_count
-
-    except Exception as e:
-        logger.exception(f"Error exporting bulk CSV: {e}")
-        return False, str(e), 0
+    return _export_text(
+        "CSV", output_path, symbols, interval, start_timestamp, end_timestamp, ",", compression
+    )
 
 
 def get_export_preview(
@@ -2993,7 +3907,7 @@ def create_schedule(
         Tuple of (success, message)
     """
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Check if schedule ID already exists
             existing = conn.execute(
                 "SELECT id FROM historify_schedules WHERE id = ?", [schedule_id]
@@ -3184,7 +4098,7 @@ def update_schedule(
         params.append(schedule_id)
         query = f"UPDATE historify_schedules SET {', '.join(updates)} WHERE id = ?"
 
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute(query, params)
 
         logger.info(f"Updated schedule: {schedule_id}")
@@ -3198,7 +4112,7 @@ def update_schedule(
 def delete_schedule(schedule_id: str) -> tuple[bool, str]:
     """Delete a schedule and its execution history."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Delete execution history first
             conn.execute(
                 "DELETE FROM historify_schedule_executions WHERE schedule_id = ?", [schedule_id]
@@ -3217,7 +4131,7 @@ def delete_schedule(schedule_id: str) -> tuple[bool, str]:
 def increment_schedule_run_counts(schedule_id: str, is_success: bool) -> tuple[bool, str]:
     """Increment run counts for a schedule."""
     try:
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             if is_success:
                 conn.execute(
                     """
@@ -3262,7 +4176,7 @@ def create_schedule_execution(schedule_id: str, download_job_id: str | None = No
         # Format: last 9 digits of current timestamp in microseconds
         execution_id = int(time.time() * 1000000) % 1000000000
 
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             # Try inserting, if collision occurs retry with incremented ID
             for attempt in range(3):
                 try:
@@ -3336,7 +4250,7 @@ def update_schedule_execution(
         params.append(execution_id)
         query = f"UPDATE historify_schedule_executions SET {', '.join(updates)} WHERE id = ?"
 
-        with get_connection() as conn:
+        with get_write_connection() as conn:
             conn.execute(query, params)
 
         return True, "Execution updated"
@@ -0,0 +1,214 @@
+# database/historify_parquet.py
+"""
+Historify Partitioned Parquet Storage
+
+Optional storage backend that keeps OHLCV candles in hive-partitioned Parquet
+files instead of the market_data table inside historify.duckdb:
+
+    <root>/exchange=NSE/symbol=SBIN/interval=1m/year=2025/data.parquet
+
+DuckDB reads the files through a market_data view (see historify_db.init_database),
+so queries, exports and the catalog work unchanged. Deleting or replacing a symbol
+is a file operation, partitions for different symbols are written concurrently,
+and external backtesters can read the same files directly, e.g.:
+
+    duckdb.sql("SELECT * FROM read_parquet('db/historify_parquet/**/*.parquet', hive_partitioning = true)")
+
+Configuration (.env):
+- HISTORIFY_STORAGE_BACKEND: 'duckdb' (default) or 'parquet'
+- HISTORIFY_PARQUET_PATH: Root directory of the Parquet files (default: db/historify_parquet)
+"""
+
+import glob
+import os
+import shutil
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+STORAGE_BACKEND = os.getenv("HISTORIFY_STORAGE_BACKEND", "duckdb").strip().lower()
+HISTORIFY_PARQUET_PATH = os.getenv("HISTORIFY_PARQUET_PATH", "db/historify_parquet")
+
+# Columns stored in each file; exchange/symbol/interval/year come from the path
+FILE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume", "oi"]
+FILE_DTYPES = {
+    "timestamp": "int64",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "int64",
+    "oi": "int64",
+}
+
+# Partition year is the IST calendar year of the candle
+IST_OFFSET = 19800
+
+# Zero-row file that keeps the market_data view valid before any data is written
+# (DuckDB cannot bind read_parquet on a glob that matches no files)
+PLACEHOLDER_PARTITION = ("_", "_", "_", 0)
+
+# Per-partition write locks, so concurrent downloads of one symbol do not interleave
+_partition_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+_partition_locks_guard = threading.Lock()
+
+
+def is_parquet_backend() -> bool:
+    """True when HISTORIFY_STORAGE_BACKEND selects the Parquet backend."""
+    return STORAGE_BACKEND == "parquet"
+
+
+def get_parquet_root() -> str:
+    """Get absolute path to the Parquet root directory."""
+    if os.path.isabs(HISTORIFY_PARQUET_PATH):
+        return HISTORIFY_PARQUET_PATH
+    # Relative to the openalgo directory
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, HISTORIFY_PARQUET_PATH)
+
+
+def partition_dir(exchange: str, symbol: str, interval: str | None = None, year: int | None = None) -> str:
+    """
+    Directory of a partition (or of all intervals/years of a symbol).
+
+    Args:
+        exchange: Exchange code
+        symbol: Trading symbol
+        interval: Storage interval (optional)
+        year: Partition year (optional, requires interval)
+
+    Returns:
+        Absolute directory path
+    """
+    parts = [get_parquet_root(), f"exchange={exchange.upper()}", f"symbol={symbol.upper()}"]
+    if interval:
+        parts.append(f"interval={interval}")
+        if year is not None:
+            parts.append(f"year={int(year)}")
+    return os.path.join(*parts)
+
+
+def parquet_glob() -> str:
+    """Glob matching every data file below the root."""
+    return os.path.join(get_parquet_root(), "*", "*", "*", "*", "*.parquet")
+
+
+def market_data_view_sql() -> str:
+    """SQL for the market_data view over the partitioned files."""
+    path = parquet_glob().replace("'", "''")
+    return f"""
+        CREATE OR REPLACE VIEW market_data AS
+        SELECT symbol, exchange, interval, timestamp, open, high, low, close, volume, oi
+        FROM read_parquet(
+            '{path}',
+            hive_partitioning = true,
+            hive_types = {{'exchange': VARCHAR, 'symbol': VARCHAR, 'interval': VARCHAR, 'year': INTEGER}}
+        )
+    """
+
+
+def ensure_parquet_root():
+    """Create the root directory and the placeholder partition."""
+    exchange, symbol, interval, year = PLACEHOLDER_PARTITION
+    directory = os.path.join(
+        get_parquet_root(),
+        f"exchange={exchange}",
+        f"symbol={symbol}",
+        f"interval={interval}",
+        f"year={year}",
+    )
+    path = os.path.join(directory, "data.parquet")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        _write_file(pd.DataFrame(columns=FILE_COLUMNS), path)
+        logger.info(f"Created Historify Parquet store: {get_parquet_root()}")
+
+
+def has_data_files() -> bool:
+    """True if any partition besides the placeholder holds a data file."""
+    placeholder = f"{os.sep}exchange={PLACEHOLDER_PARTITION[0]}{os.sep}"
+    return any(placeholder not in path for path in glob.iglob(parquet_glob()))
+
+
+def _partition_lock(directory: str) -> threading.Lock:
+    with _partition_locks_guard:
+        return _partition_locks[directory]
+
+
+def _write_file(df: pd.DataFrame, path: str):
+    """Write a partition file atomically (readers never see a half-written file)."""
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    df[FILE_COLUMNS].fillna({"oi": 0}).astype(FILE_DTYPES).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def write_partitions(df: pd.DataFrame, symbol: str, exchange: str, interval: str) -> int:
+    """
+    Merge candles into their year partitions.
+
+    Rows with a timestamp already stored are replaced (the batch wins), matching
+    the ON CONFLICT upsert of the DuckDB backend.
+
+    Args:
+        df: DataFrame with unique timestamps and columns timestamp, open, high, low, close, volume, oi
+        symbol: Trading symbol
+        exchange: Exchange code
+        interval: Storage interval (1m, D)
+
+    Returns:
+        Number of batch rows that replaced already stored rows
+    """
+    replaced = 0
+    years = pd.to_datetime(df["timestamp"] + IST_OFFSET, unit="s").dt.year
+
+    for year, batch in df.groupby(years):
+        directory = partition_dir(exchange, symbol, interval, year)
+        with _partition_lock(directory):
+            os.makedirs(directory, exist_ok=True)
+            files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+            if files:
+                stored = pd.concat([pd.read_parquet(path, columns=FILE_COLUMNS) for path in files])
+                overlap = stored["timestamp"].isin(batch["timestamp"])
+                replaced += int(overlap.sum())
+                merged = pd.concat([stored[~overlap], batch[FILE_COLUMNS]])
+            else:
+                merged = batch[FILE_COLUMNS]
+
+            target = os.path.join(directory, "data.parquet")
+            _write_file(merged.sort_values("timestamp"), target)
+
+            # Files written by other tools are folded into data.parquet
+            for path in files:
+                if path != target:
+                    os.remove(path)
+
+    return replaced
+
+
+def delete_partitions(symbol: str, exchange: str, interval: str | None = None) -> bool:
+    """
+    Delete the files of a symbol (all intervals, or one interval).
+
+    Returns:
+        True if any files were deleted
+    """
+    directory = partition_dir(exchange, symbol, interval)
+    if not os.path.isdir(directory):
+        return False
+    shutil.rmtree(directory)
+
+    # Drop the symbol directory once its last interval is gone
+    symbol_dir = partition_dir(exchange, symbol)
+    if interval and os.path.isdir(symbol_dir) and not os.listdir(symbol_dir):
+        os.rmdir(symbol_dir)
+    return True
+
+
+def get_parquet_size() -> int:
+    """Total size of the Parquet store in bytes."""
+    return sum(os.path.getsize(path) for path in glob.iglob(parquet_glob()))
@@ -160,6 +160,11 @@ class BrokerSymbolCache:
         self.expiries_by_exchange: dict[str, set[str]] = defaultdict(set)
         self.underlyings_by_exchange: dict[str, set[str]] = defaultdict(set)
         self.expiries_by_exchange_underlying: dict[tuple[str, str], set[str]] = defaultdict(set)
+        # Sorted strikes per option series: (exchange, underlying, expiry, CE/PE) -> [strikes]
+        self.option_strikes: dict[tuple[str, str, str, str], list[float]] = defaultdict(list)
+
+        # Bumped on every clear/reload so dependent caches can tell they are stale
+        self.generation: int = 0
 
         # Cache statistics
         self.stats = CacheStats()
@@ -237,6 +242,13 @@ class BrokerSymbolCache:
                 sym_upper = sym.symbol.upper()
                 if underlying and (sym_upper.endswith("CE") or sym_upper.endswith("PE")):
                     self.underlyings_by_exchange[sym.exchange].add(underlying)
+                    if sym.expiry and sym.strike is not None and sym.instrumenttype in ("CE", "PE"):
+                        self.option_strikes[
+                            (sym.exchange, underlying, sym.expiry.upper(), sym.instrumenttype)
+                        ].append(sym.strike)
+
+            for key, strikes in self.option_strikes.items():
+                self.option_strikes[key] = sorted(set(strikes))
 
             # Update cache metadata
             self.active_broker = broker
@@ -630,6 +642,8 @@ class BrokerSymbolCache:
         self.expiries_by_exchange.clear()
         self.underlyings_by_exchange.clear()
         self.expiries_by_exchange_underlying.clear()
+        self.option_strikes.clear()
+        self.generation += 1
         self.cache_loaded = False
         self.active_broker = None
         logger.debug("Cache cleared")
@@ -1056,6 +1070,28 @@ def fno_search_symbols(
         return []
 
 
+def get_option_strikes_cached(
+    exchange: str, underlying: str, expiry: str, option_type: str
+) -> list[float] | None:
+    """
+    Get the sorted strikes of one option series from the pre-computed index.
+    Returns None if the cache is not available (caller falls back to database)
+
+    Args:
+        exchange: Options exchange (e.g., NFO)
+        underlying: Underlying name (e.g., NIFTY)
+        expiry: Expiry in DD-MMM-YY format (e.g., 28-OCT-25)
+        option_type: CE or PE
+    """
+    cache = get_cache()
+
+    if cache.cache_loaded and cache.is_cache_valid():
+        return cache.option_strikes.get(
+            (exchange.upper(), underlying.upper(), expiry.upper(), option_type.upper()), []
+        )
+    return None
+
+
 def get_distinct_expiries_cached(
     exchange: str | None = None, underlying: str | None = None
 ) -> list[str]:
@@ -12,6 +12,7 @@ export interface VolSurfaceData {
   strikes: number[]
   expiries: VolSurfaceExpiry[]
   surface: (number | null)[][]
+  fitted_surface?: (number | null)[][]
 }
 
 export interface VolSurfaceResponse {
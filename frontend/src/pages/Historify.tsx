@@ -1325,7 +1325,8 @@ export default function Historify() {
       // Convert Set to array for API
       const intervalsArray = Array.from(exportIntervals)
 
-      const response = await fetch('/historify/api/export/bulk', {
+      // Exports run as background jobs; poll until the files are written
+      const response = await fetch('/historify/api/export/jobs', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
         credentials: 'include',
@@ -1333,16 +1334,28 @@ export default function Historify() {
           format: exportFormat === 'csv' && intervalsArray.length > 1 ? 'zip' : exportFormat,  // Force ZIP if multiple intervals
           symbols,
           intervals: intervalsArray,  // Pass multiple intervals
-          compression: 'zstd',
+          compression: exportFormat === 'parquet' ? 'zstd' : 'none',
         }),
       })
-      const data = await response.json()
-      if (data.status === 'success') {
-        showToast.success(`${data.message}`, 'historify')
-        window.location.href = '/historify/api/export/bulk/download'
+      let data = await response.json()
+      if (data.status !== 'success') {
+        showToast.error(data.message || 'Failed to export data', 'historify')
+        return
+      }
+      const jobId = data.data.job_id
+      while (data.status === 'success' && data.data.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000))
+        const statusResponse = await fetch(`/historify/api/export/jobs/${jobId}`, {
+          credentials: 'include',
+        })
+        data = await statusResponse.json()
+      }
+      if (data.status === 'success' && data.data.status === 'completed') {
+        showToast.success(`${data.data.message}`, 'historify')
+        window.location.href = `/historify/api/export/jobs/${jobId}/download`
         setExportDialogOpen(false)
       } else {
-        showToast.error(data.message || 'Failed to export data', 'historify')
+        showToast.error(data.data?.message || data.message || 'Failed to export data', 'historify')
       }
     } catch (error) {
       showToast.error('Failed to export data', 'historify')
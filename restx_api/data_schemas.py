@@ -55,51 +55,72 @@ class MultiQuotesSchema(Schema):
     )
 
 
+HISTORY_INTERVALS = [
+    # Seconds intervals
+    "1s",
+    "5s",
+    "10s",
+    "15s",
+    "30s",
+    "45s",
+    # Minutes intervals
+    "1m",
+    "2m",
+    "3m",
+    "5m",
+    "10m",
+    "15m",
+    "20m",
+    "30m",
+    # Hours intervals
+    "1h",
+    "2h",
+    "3h",
+    "4h",
+    # Daily, Weekly, Monthly, Quarterly, Yearly intervals
+    "D",
+    "W",
+    "M",
+    "Q",
+    "Y",
+]
+
+
 class HistorySchema(Schema):
     apikey = fields.Str(required=True, validate=validate.Length(min=1, max=256))
     symbol = fields.Str(required=True)
     exchange = fields.Str(required=True, validate=validate.OneOf(VALID_EXCHANGES))  # Exchange (e.g., NSE, BSE)
-    interval = fields.Str(
-        required=True,
-        validate=validate.OneOf(
-            [
-                # Seconds intervals
-                "1s",
-                "5s",
-                "10s",
-                "15s",
-                "30s",
-                "45s",
-                # Minutes intervals
-                "1m",
-                "2m",
-                "3m",
-                "5m",
-                "10m",
-                "15m",
-                "20m",
-                "30m",
-                # Hours intervals
-                "1h",
-                "2h",
-                "3h",
-                "4h",
-                # Daily, Weekly, Monthly, Quarterly, Yearly intervals
-                "D",
-                "W",
-                "M",
-                "Q",
-                "Y",
-            ]
-        ),
-    )
+    interval = fields.Str(required=True, validate=validate.OneOf(HISTORY_INTERVALS))
     start_date = fields.Date(required=True, format="%Y-%m-%d")  # YYYY-MM-DD
     end_date = fields.Date(required=True, format="%Y-%m-%d")  # YYYY-MM-DD
     # Optional: Data source - 'api' (broker, default) or 'db' (DuckDB/Historify)
     source = fields.Str(required=False, load_default="api", validate=validate.OneOf(["api", "db"]))
+    # Optional: Response format - 'records' (default), 'columns' (JSON column arrays),
+    # 'arrow' (Arrow IPC stream) or 'parquet'
+    format = fields.Str(
+        required=False,
+        load_default="records",
+        validate=validate.OneOf(["records", "columns", "arrow", "parquet"]),
+    )
     # OI is now always included by default for F&O exchanges
 
 
+class HistoryBatchSchema(Schema):
+    apikey = fields.Str(required=True, validate=validate.Length(min=1, max=256))
+    symbols = fields.List(
+        fields.Nested(SymbolExchangePair), required=True, validate=validate.Length(min=1, max=500)
+    )
+    interval = fields.Str(required=True, validate=validate.OneOf(HISTORY_INTERVALS))
+    start_date = fields.Date(required=True, format="%Y-%m-%d")  # YYYY-MM-DD
+    end_date = fields.Date(required=True, format="%Y-%m-%d")  # YYYY-MM-DD
+    # Optional: Response format - long-format table with symbol and exchange columns
+    format = fields.Str(
+        required=False,
+        load_default="records",
+        validate=validate.OneOf(["records", "columns", "arrow", "parquet"]),
+    )
+
+
 class DepthSchema(Schema):
     apikey = fields.Str(required=True, validate=validate.Length(min=1, max=256))
     symbol = fields.Str(required=True)
@@ -252,9 +273,10 @@ class MultiOptionGreeksSchema(Schema):
     symbols = fields.List(
         fields.Nested(OptionSymbolRequest),
         required=True,
-        validate=validate.Length(min=1, max=50),  # Max 50 symbols per request
+        validate=validate.Length(min=1, max=1000),  # Max 1000 symbols, quoted in broker-sized chunks
     )
     interest_rate = fields.Float(
         required=False, validate=validate.Range(min=0, max=100)
     )  # Common interest rate for all
     expiry_time = fields.Str(required=False)  # Optional: Common expiry time for all
+    stream = fields.Bool(required=False, load_default=False)  # Optional: NDJSON response, one line per chunk
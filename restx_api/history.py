@@ -6,10 +6,10 @@ from flask_restx import Namespace, Resource
 from marshmallow import ValidationError
 
 from limiter import limiter
-from services.history_service import get_history
+from services.history_service import encode_history_table, get_history, get_history_batch
 from utils.logging import get_logger
 
-from .data_schemas import HistorySchema
+from .data_schemas import HistoryBatchSchema, HistorySchema
 
 API_RATE_LIMIT = os.getenv("API_RATE_LIMIT", "10 per second")
 api = Namespace("history", description="Historical Data API")
@@ -19,6 +19,7 @@ logger = get_logger(__name__)
 
 # Initialize schema
 history_schema = HistorySchema()
+history_batch_schema = HistoryBatchSchema()
 
 
 @api.route("/", strict_slashes=False)
@@ -37,6 +38,7 @@ class History(Resource):
             start_date = history_data["start_date"]
             end_date = history_data["end_date"]
             source = history_data.get("source", "api")  # Optional, defaults to 'api'
+            output_format = history_data.get("format", "records")  # Optional, defaults to 'records'
 
             # Call the service function to get historical data with API key
             success, response_data, status_code = get_history(
@@ -47,8 +49,14 @@ class History(Resource):
                 end_date=end_date,
                 api_key=api_key,
                 source=source,
+                output_format=output_format,
             )
 
+            # Columnar formats are encoded from the Arrow table without row dicts
+            if success and output_format != "records":
+                body, mimetype = encode_history_table(response_data["data"], output_format)
+                return make_response(body, status_code, {"Content-Type": mimetype})
+
             return make_response(jsonify(response_data), status_code)
 
         except ValidationError as err:
@@ -58,3 +66,37 @@ class History(Resource):
             return make_response(
                 jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
             )
+
+
+@api.route("/batch", strict_slashes=False)
+class HistoryBatch(Resource):
+    @limiter.limit(API_RATE_LIMIT)
+    def post(self):
+        """Get historical data for multiple symbols from the Historify database"""
+        try:
+            # Validate request data
+            batch_data = history_batch_schema.load(request.json)
+            output_format = batch_data.get("format", "records")
+
+            success, response_data, status_code = get_history_batch(
+                symbols=batch_data["symbols"],
+                interval=batch_data["interval"],
+                start_date=batch_data["start_date"],
+                end_date=batch_data["end_date"],
+                api_key=batch_data["apikey"],
+                output_format=output_format,
+            )
+
+            if success and output_format != "records":
+                body, mimetype = encode_history_table(response_data["data"], output_format)
+                return make_response(body, status_code, {"Content-Type": mimetype})
+
+            return make_response(jsonify(response_data), status_code)
+
+        except ValidationError as err:
+            return make_response(jsonify({"status": "error", "message": err.messages}), 400)
+        except Exception as e:
+            logger.exception(f"Unexpected error in history batch endpoint: {e}")
+            return make_response(
+                jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+            )
@@ -1,12 +1,17 @@
+import json
 import os
 
-from flask import jsonify, make_response, request
+from flask import Response, jsonify, make_response, request
 from flask_restx import Namespace, Resource
 from marshmallow import ValidationError
 
 from database.auth_db import verify_api_key
 from limiter import limiter
-from services.option_greeks_service import get_multi_option_greeks
+from services.option_greeks_service import (
+    get_multi_option_greeks,
+    multi_option_greeks_summary,
+    stream_multi_option_greeks,
+)
 from utils.logging import get_logger
 
 from .data_schemas import MultiOptionGreeksSchema
@@ -43,6 +48,8 @@ class MultiOptionGreeks(Resource):
         Optional fields:
         - interest_rate: Risk-free interest rate (annualized %). Applied to all symbols.
         - expiry_time: Custom expiry time in HH:MM format. Applied to all symbols.
+        - stream: If true, respond with NDJSON - one {"data": [...]} line per
+          broker-sized chunk in request order, then a {"status", "summary"} line.
 
         Example Request:
         {
@@ -111,6 +118,26 @@ class MultiOptionGreeks(Resource):
             # Get multi option Greeks
             logger.info(f"Calculating Greeks for {len(symbols)} symbols")
 
+            if validated_data.get("stream"):
+                success, chunks, status_code = stream_multi_option_greeks(
+                    symbols=symbols,
+                    interest_rate=interest_rate,
+                    expiry_time=expiry_time,
+                    api_key=api_key,
+                )
+                if not success:
+                    logger.error(f"Failed to calculate multi Greeks: {chunks.get('message')}")
+                    return make_response(jsonify(chunks), status_code)
+
+                def generate():
+                    results = []
+                    for chunk in chunks:
+                        results.extend(chunk)
+                        yield json.dumps({"data": chunk}) + "\n"
+                    yield json.dumps(multi_option_greeks_summary(results)) + "\n"
+
+                return Response(generate(), mimetype="application/x-ndjson")
+
             success, response, status_code = get_multi_option_greeks(
                 symbols=symbols,
                 interest_rate=interest_rate,
@@ -4,6 +4,7 @@ Catch-Up Processor - Handles missed scheduled jobs after app restart
 
 Features:
 - T+1 settlement catch-up for CNC positions
+- Same-day MIS square-off catch-up if the scheduled square-off was missed
 - Daily PnL reset catch-up if app was down during SESSION_EXPIRY_TIME
 - Called after master contract download completes (fresh login)
 """
@@ -140,6 +141,41 @@ def catch_up_mis_squareoff():
         logger.exception(f"Error in catch-up MIS square-off: {e}")
 
 
+def catch_up_missed_squareoff():
+    """
+    Square-off today's MIS positions if the scheduled square-off run was missed
+    (app down or scheduler not running at the exchange's square-off time)
+    Stale positions from previous days are handled by catch_up_mis_squareoff()
+    """
+    try:
+        from sandbox.replay_clock import sandbox_now
+        from sandbox.squareoff_manager import SquareOffManager, is_bulk_squareoff_enabled
+
+        som = SquareOffManager()
+        positions, orders = som.get_due_for_square_off(sandbox_now().time())
+
+        if not positions and not orders:
+            logger.debug("Catch-up: No missed MIS square-off")
+            return
+
+        logger.info(
+            f"Catch-up: Square-off was missed for {len(positions)} MIS positions "
+            f"and {len(orders)} open MIS orders"
+        )
+        if not is_bulk_squareoff_enabled():
+            som.check_and_square_off()
+            return
+
+        summary = som.bulk_square_off(positions, orders)
+        logger.info(
+            f"Catch-up: Missed square-off completed - {summary['closed']} closed, "
+            f"{summary['cancelled']} cancelled, {summary['deferred']} placed as market orders"
+        )
+
+    except Exception as e:
+        logger.exception(f"Error in catch-up missed square-off: {e}")
+
+
 def catch_up_t1_settlement():
     """
     Check and process T+1 settlement if needed
@@ -303,17 +339,24 @@ def run_catch_up_tasks():
     try:
         logger.info("Running catch-up tasks after master contract download...")
 
-        # Run MIS square-off catch-up (stale overnight positions)
-        catch_up_mis_squareoff()
+        from sandbox.margin_ledger import external_fund_write
+
+        # Catch-up writes fund rows directly - keep the margin ledger in sync
+        with external_fund_write():
+            # Run MIS square-off catch-up (stale overnight positions)
+            catch_up_mis_squareoff()
+
+            # Run missed same-day MIS square-off catch-up
+            catch_up_missed_squareoff()
 
-        # Run T+1 settlement catch-up
-        catch_up_t1_settlement()
+            # Run T+1 settlement catch-up
+            catch_up_t1_settlement()
 
-        # Run daily PnL reset catch-up
-        catch_up_daily_pnl_reset()
+            # Run daily PnL reset catch-up
+            catch_up_daily_pnl_reset()
 
-        # Run daily PnL snapshot catch-up (for missed days)
-        catch_up_daily_pnl_snapshot()
+            # Run daily PnL snapshot catch-up (for missed days)
+            catch_up_daily_pnl_snapshot()
 
         logger.info("Catch-up tasks completed")
 
@@ -9,24 +9,25 @@ Features:
 - Trade creation and position updates
 - Rate limit compliance (10 orders/second, 50 API calls/second)
 - Batch processing for efficiency
+- Optional write-behind persistence of fills (see fill_journal.py)
 """
 
 import os
 import sys
 import time
 import uuid
-from datetime import datetime
 from decimal import Decimal
 
-import pytz
-
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.auth_db import get_auth_token_broker
 from database.sandbox_db import SandboxOrders, SandboxPositions, SandboxTrades, db_session
 from database.token_db import get_symbol_info
+from sandbox.fill_journal import flush_pending_fills, get_fill_journal, is_fill_pending
 from sandbox.fund_manager import FundManager, reconcile_margin, validate_margin_consistency
+from sandbox.replay_clock import get_replay_clock, get_replaying_users, sandbox_now
+from sandbox.squareoff_manager import is_book_frozen
 from services.quotes_service import get_multiquotes, get_quotes
 from utils.logging import get_logger
 
@@ -36,20 +37,29 @@ logger = get_logger(__name__)
 class ExecutionEngine:
     """Executes pending orders based on market data"""
 
-    def __init__(self):
+    def __init__(self, write_behind=False):
         # Read rate limits from .env (same as API protection)
         self.order_rate_limit = int(os.getenv("ORDER_RATE_LIMIT", "10 per second").split()[0])
         self.api_rate_limit = int(os.getenv("API_RATE_LIMIT", "50 per second").split()[0])
         self.batch_delay = 1.0  # 1 second between batches
 
+        # Background engines journal fills and persist them in grouped transactions
+        self._journal = get_fill_journal() if write_behind else None
+
     def check_and_execute_pending_orders(self):
         """
         Main execution loop - checks all pending orders and executes if conditions met
         Respects rate limits through batch processing
         """
         try:
-            # Get all pending orders
-            pending_orders = SandboxOrders.query.filter_by(order_status="open").all()
+            # Get all pending orders (skipping fills still waiting in the write-behind journal,
+            # and users whose orders a historical replay executes from its own loop)
+            replaying = get_replaying_users()
+            pending_orders = [
+                order
+                for order in SandboxOrders.query.filter_by(order_status="open").all()
+                if not is_fill_pending(order.orderid) and order.user_id not in replaying
+            ]
 
             if not pending_orders:
                 logger.debug("No pending orders to process")
@@ -103,12 +113,57 @@ class ExecutionEngine:
         except Exception as e:
             logger.exception(f"Error in execution engine: {e}")
 
+    @staticmethod
+    def market_fill_price(action, quote):
+        """
+        Price a MARKET order fills at for a quote
+
+        Market orders execute immediately at bid/ask (more realistic)
+        BUY: Execute at ask price (pay seller's asking price)
+        SELL: Execute at bid price (receive buyer's bid price)
+        If bid/ask is 0, fall back to LTP
+
+        Returns:
+            Decimal: Fill price, or None if the quote has no valid LTP
+        """
+        ltp = Decimal(str(quote.get("ltp") or 0))
+        if ltp <= 0:
+            return None
+        side = "ask" if action == "BUY" else "bid"
+        price = Decimal(str(quote.get(side) or 0))
+        return price if price > 0 else ltp
+
+    def get_market_fill_prices(self, legs):
+        """
+        MARKET fill prices for many legs from one multiquotes call
+
+        Args:
+            legs: Iterable of (symbol, exchange, action)
+
+        Returns:
+            dict: (symbol, exchange, action) -> Decimal fill price; legs without a quote are left out
+        """
+        legs = set(legs)
+        quotes = self._fetch_quotes_batch(list({(symbol, exchange) for symbol, exchange, _ in legs}))
+        prices = {}
+        for symbol, exchange, action in legs:
+            quote = quotes.get((symbol, exchange))
+            price = self.market_fill_price(action, quote) if quote else None
+            if price is not None:
+                prices[(symbol, exchange, action)] = price
+        return prices
+
     def _fetch_quote(self, symbol, exchange):
         """
         Fetch real-time quote for a symbol using API key
         Returns dict with ltp, high, low, open, close, etc.
         Returns None if quote cannot be fetched (permission error, API error, etc.)
         """
+        # Replayed bars stand in for the broker in a historical replay's thread
+        clock = get_replay_clock()
+        if clock is not None:
+            return clock.get_quote(symbol, exchange)
+
         try:
             # Get any user's API key for fetching quotes
             from database.auth_db import ApiKeys, decrypt_token
@@ -154,6 +209,14 @@ class ExecutionEngine:
         if not symbols_list:
             return quote_cache
 
+        clock = get_replay_clock()
+        if clock is not None:
+            for symbol, exchange in symbols_list:
+                quote = clock.get_quote(symbol, exchange)
+                if quote:
+                    quote_cache[(symbol, exchange)] = quote
+            return quote_cache
+
         try:
             # Get any user's API key for fetching quotes
             from database.auth_db import ApiKeys, decrypt_token
@@ -211,6 +274,14 @@ class ExecutionEngine:
         Determines if order should be executed based on price type
         """
         try:
+            # Order already filled and waiting in the write-behind journal
+            if is_fill_pending(order.orderid):
+                return
+
+            # MIS book is being squared off in bulk
+            if order.product == "MIS" and is_book_frozen(order.user_id):
+                return
+
             # Check if this order already has a trade (prevent duplicates)
             # This can happen with MARKET orders that are executed immediately on placement
             # but the order status hasn't been updated to 'complete' yet due to race condition
@@ -225,7 +296,7 @@ class ExecutionEngine:
                     order.average_price = existing_trade.price
                     order.filled_quantity = order.quantity
                     order.pending_quantity = 0
-                    order.update_timestamp = datetime.now(pytz.timezone("Asia/Kolkata"))
+                    order.update_timestamp = sandbox_now()
                     db_session.commit()
                     logger.info(
                         f"Updated order {order.orderid} status to complete (was in race condition)"
@@ -233,8 +304,6 @@ class ExecutionEngine:
                 return
 
             ltp = Decimal(str(quote.get("ltp", 0)))
-            bid = Decimal(str(quote.get("bid", 0)))
-            ask = Decimal(str(quote.get("ask", 0)))
 
             if ltp <= 0:
                 logger.warning(f"Invalid LTP for order {order.orderid}: {ltp}")
@@ -245,15 +314,8 @@ class ExecutionEngine:
             execution_price = None
 
             if order.price_type == "MARKET":
-                # Market orders execute immediately at bid/ask (more realistic)
-                # BUY: Execute at ask price (pay seller's asking price)
-                # SELL: Execute at bid price (receive buyer's bid price)
-                # If bid/ask is 0, fall back to LTP
                 should_execute = True
-                if order.action == "BUY":
-                    execution_price = ask if ask > 0 else ltp
-                else:  # SELL
-                    execution_price = bid if bid > 0 else ltp
+                execution_price = self.market_fill_price(order.action, quote)
 
             elif order.price_type == "LIMIT":
                 # Limit BUY: Execute if LTP <= Limit Price, fill at limit price
@@ -307,6 +369,13 @@ class ExecutionEngine:
                 f"Executing order {order.orderid}: {order.symbol} {order.action} {order.quantity} @ {execution_price}"
             )
 
+            if self._journal is not None:
+                # Write-behind: position and funds update in memory, DB write is batched
+                tradeid = self._journal.record_fill(order, execution_price)
+                if tradeid:
+                    logger.info(f"Order {order.orderid} executed (journaled). Trade ID: {tradeid}")
+                return
+
             # Generate trade ID
             tradeid = self._generate_trade_id()
 
@@ -322,7 +391,7 @@ class ExecutionEngine:
                 price=execution_price,
                 product=order.product,
                 strategy=order.strategy,
-                trade_timestamp=datetime.now(pytz.timezone("Asia/Kolkata")),
+                trade_timestamp=sandbox_now(),
             )
 
             db_session.add(trade)
@@ -332,7 +401,7 @@ class ExecutionEngine:
             order.average_price = execution_price
             order.filled_quantity = order.quantity
             order.pending_quantity = 0
-            order.update_timestamp = datetime.now(pytz.timezone("Asia/Kolkata"))
+            order.update_timestamp = sandbox_now()
 
             db_session.commit()
 
@@ -349,7 +418,7 @@ class ExecutionEngine:
             try:
                 order.order_status = "rejected"
                 order.rejection_reason = f"Execution error: {str(e)}"
-                order.update_timestamp = datetime.now(pytz.timezone("Asia/Kolkata"))
+                order.update_timestamp = sandbox_now()
                 db_session.commit()
             except:
                 db_session.rollback()
@@ -364,6 +433,9 @@ class ExecutionEngine:
         positions are closed/reduced.
         """
         try:
+            # Write-behind fills may hold newer state for this position than the row below
+            flush_pending_fills()
+
             fund_manager = FundManager(order.user_id)
 
             # Check if position exists
@@ -376,224 +448,16 @@ class ExecutionEngine:
 
             if not position:
                 # Create new position
-                # Store the exact margin that was blocked at order placement time
-                order_margin = (
-                    order.margin_blocked
-                    if hasattr(order, "margin_blocked") and order.margin_blocked
-                    else Decimal("0.00")
-                )
-                position = SandboxPositions(
-                    user_id=order.user_id,
-                    symbol=order.symbol,
-                    exchange=order.exchange,
-                    product=order.product,
-                    quantity=order.quantity if order.action == "BUY" else -order.quantity,
-                    average_price=execution_price,
-                    ltp=execution_price,
-                    pnl=Decimal("0.00"),
-                    pnl_percent=Decimal("0.00"),
-                    accumulated_realized_pnl=Decimal("0.00"),
-                    margin_blocked=order_margin,  # Store exact margin from order
-                    created_at=datetime.now(pytz.timezone("Asia/Kolkata")),
-                )
+                position = SandboxPositions(**self._new_position_fields(order, execution_price))
                 db_session.add(position)
                 logger.info(
-                    f"Created new position: {order.symbol} {order.action} {order.quantity} (margin blocked: ₹{order_margin})"
+                    f"Created new position: {order.symbol} {order.action} {order.quantity} (margin blocked: ₹{position.margin_blocked})"
                 )
 
             else:
-                # Update existing position (netting logic)
-                old_quantity = position.quantity
-                new_quantity = order.quantity if order.action == "BUY" else -order.quantity
-                final_quantity = old_quantity + new_quantity
-
-                # Special case: Reopening a closed position (old_quantity = 0)
-                if old_quantity == 0:
-                    # Keep accumulated realized P&L from previous trades, start fresh unrealized P&L
-                    position.quantity = new_quantity
-                    position.average_price = execution_price
-                    position.ltp = execution_price
-                    position.pnl = Decimal("0.00")  # Reset current P&L (will be updated by MTM)
-                    position.pnl_percent = Decimal("0.00")
-                    # accumulated_realized_pnl stays as is from previous closed trades
-                    # today_realized_pnl: Keep current value (already reset at session boundary)
-                    # Store the exact margin that was blocked at order placement time
-                    order_margin = (
-                        order.margin_blocked
-                        if hasattr(order, "margin_blocked") and order.margin_blocked
-                        else Decimal("0.00")
-                    )
-                    position.margin_blocked = order_margin
-                    logger.info(
-                        f"Reopened position: {order.symbol} {order.action} {order.quantity} (accumulated realized P&L: ₹{position.accumulated_realized_pnl}) (margin blocked: ₹{order_margin})"
-                    )
-
-                elif final_quantity == 0:
-                    # Position closed completely
-                    # Calculate realized P&L
-                    _sym_cv_info = get_symbol_info(order.symbol, order.exchange)
-                    _cv = float(_sym_cv_info.contract_value) if _sym_cv_info and _sym_cv_info.contract_value else 1.0
-                    realized_pnl = self._calculate_realized_pnl(
-                        old_quantity, position.average_price, abs(new_quantity), execution_price, contract_value=_cv
-                    )
-
-                    # Release the EXACT margin that was stored in the position
-                    # This prevents over-release when execution price differs from order placement price
-                    margin_to_release = (
-                        position.margin_blocked
-                        if hasattr(position, "margin_blocked") and position.margin_blocked
-                        else Decimal("0.00")
-                    )
-
-                    if margin_to_release > 0:
-                        fund_manager.release_margin(
-                            margin_to_release, realized_pnl, f"Position closed: {order.symbol}"
-                        )
-                        logger.info(
-                            f"Released exact margin ₹{margin_to_release} for closed position (from position.margin_blocked)"
-                        )
-
-                    # Keep position with 0 quantity to show it was closed
-                    # Add realized P&L to accumulated realized P&L (all-time)
-                    position.accumulated_realized_pnl += realized_pnl
-                    # Add realized P&L to today's realized P&L (resets daily at session boundary)
-                    position.today_realized_pnl = (
-                        position.today_realized_pnl or Decimal("0.00")
-                    ) + realized_pnl
-
-                    position.quantity = 0
-                    position.margin_blocked = Decimal(
-                        "0.00"
-                    )  # Reset margin to 0 when position fully closed
-                    position.ltp = execution_price
-                    position.pnl = (
-                        position.today_realized_pnl
-                    )  # Display today's realized P&L for closed positions
-                    position.pnl_percent = Decimal("0.00")
-                    logger.info(
-                        f"Position closed: {order.symbol}, Realized P&L: ₹{realized_pnl}, Today's Realized P&L: ₹{position.today_realized_pnl}"
-                    )
-
-                elif (old_quantity > 0 and final_quantity > old_quantity) or (
-                    old_quantity < 0 and final_quantity < old_quantity
-                ):
-                    # Adding to existing position (same direction, position size increasing)
-                    # Calculate new average price
-                    total_value = (abs(old_quantity) * position.average_price) + (
-                        abs(new_quantity) * execution_price
-                    )
-                    total_quantity = abs(old_quantity) + abs(new_quantity)
-                    new_average_price = total_value / total_quantity
-
-                    position.quantity = final_quantity
-                    position.average_price = new_average_price
-                    position.ltp = execution_price
-
-                    # Accumulate margin - add the margin blocked for this order to existing position margin
-                    order_margin = (
-                        order.margin_blocked
-                        if hasattr(order, "margin_blocked") and order.margin_blocked
-                        else Decimal("0.00")
-                    )
-                    position.margin_blocked = (
-                        position.margin_blocked
-                        if hasattr(position, "margin_blocked") and position.margin_blocked
-                        else Decimal("0.00")
-                    ) + order_margin
-                    logger.info(
-                        f"Added to position: {order.symbol}, New qty: {final_quantity}, Avg: {new_average_price} (total margin blocked: ₹{position.margin_blocked})"
-                    )
-
-                else:
-                    # Reducing position (opposite direction) or position reversal
-                    reduced_quantity = min(abs(old_quantity), abs(new_quantity))
-
-                    # Calculate realized P&L for reduced portion
-                    _sym_cv_info = get_symbol_info(order.symbol, order.exchange)
-                    _cv = float(_sym_cv_info.contract_value) if _sym_cv_info and _sym_cv_info.contract_value else 1.0
-                    realized_pnl = self._calculate_realized_pnl(
-                        old_quantity, position.average_price, reduced_quantity, execution_price, contract_value=_cv
-                    )
-
-                    # Add realized P&L to accumulated realized P&L (all-time)
-                    # This tracks all partial closes
-                    position.accumulated_realized_pnl = (
-                        position.accumulated_realized_pnl or Decimal("0.00")
-                    ) + realized_pnl
-                    # Add realized P&L to today's realized P&L (resets daily at session boundary)
-                    position.today_realized_pnl = (
-                        position.today_realized_pnl or Decimal("0.00")
-                    ) + realized_pnl
-
-                    # Release margin PROPORTIONALLY for reduced quantity
-                    # Use exact margin stored in position, release proportionally
-                    current_margin = (
-                        position.margin_blocked
-                        if hasattr(position, "margin_blocked") and position.margin_blocked
-                        else Decimal("0.00")
-                    )
-
-                    if abs(old_quantity) > 0:
-                        # Calculate proportion of position being reduced
-                        reduction_proportion = Decimal(str(reduced_quantity)) / Decimal(
-                            str(abs(old_quantity))
-                        )
-                        margin_to_release = current_margin * reduction_proportion
-                    else:
-                        margin_to_release = Decimal("0.00")
-
-                    if margin_to_release > 0:
-                        fund_manager.release_margin(
-                            margin_to_release, realized_pnl, f"Position reduced: {order.symbol}"
-                        )
-                        logger.info(
-                            f"Released proportional margin ₹{margin_to_release} for reduced position ({reduction_proportion * 100:.1f}% of ₹{current_margin})"
-                        )
-
-                    # Update remaining margin after proportional release
-                    remaining_margin = current_margin - margin_to_release
-
-                    # If position reversed, set margin for new reversed position
-                    if abs(new_quantity) > abs(old_quantity):
-                        # Position reversed - remaining quantity creates opposite position
-                        remaining_quantity = abs(new_quantity) - abs(old_quantity)
-                        position.quantity = (
-                            remaining_quantity if order.action == "BUY" else -remaining_quantity
-                        )
-                        position.average_price = execution_price
-
-                        # For reversed position, the new margin comes from the excess quantity in the order
-                        # The old position's margin was fully released, new position gets fresh margin
-                        # Note: order.margin_blocked contains margin for the FULL order quantity
-                        # We need to calculate what portion corresponds to the excess quantity
-                        if abs(new_quantity) > 0:
-                            excess_proportion = Decimal(str(remaining_quantity)) / Decimal(
-                                str(abs(new_quantity))
-                            )
-                            order_margin = (
-                                order.margin_blocked
-                                if hasattr(order, "margin_blocked") and order.margin_blocked
-                                else Decimal("0.00")
-                            )
-                            new_position_margin = order_margin * excess_proportion
-                            position.margin_blocked = new_position_margin
-                            logger.info(
-                                f"Position reversed: {order.symbol}, New qty: {position.quantity} (new margin: ₹{new_position_margin})"
-                            )
-                        else:
-                            position.margin_blocked = Decimal("0.00")
-                    else:
-                        # Position reduced but not reversed - keep remaining margin
-                        position.quantity = final_quantity
-                        position.margin_blocked = remaining_margin
-                        logger.info(
-                            f"Position reduced: {order.symbol}, New qty: {final_quantity}, Remaining margin: ₹{remaining_margin}"
-                        )
-
-                    position.ltp = execution_price
-                    logger.info(
-                        f"Partial close: {order.symbol}, New qty: {final_quantity}, Realized P&L: ₹{realized_pnl}"
-                    )
+                self._apply_fill_to_position(
+                    position, order, execution_price, fund_manager.release_margin
+                )
 
             db_session.commit()
 
@@ -612,6 +476,230 @@ class ExecutionEngine:
             logger.exception(f"Error updating position for order {order.orderid}: {e}")
             raise
 
+    def _new_position_fields(self, order, execution_price):
+        """Column values for a position opened by this fill"""
+        # Store the exact margin that was blocked at order placement time
+        order_margin = (
+            order.margin_blocked
+            if hasattr(order, "margin_blocked") and order.margin_blocked
+            else Decimal("0.00")
+        )
+        return {
+            "user_id": order.user_id,
+            "symbol": order.symbol,
+            "exchange": order.exchange,
+            "product": order.product,
+            "quantity": order.quantity if order.action == "BUY" else -order.quantity,
+            "average_price": execution_price,
+            "ltp": execution_price,
+            "pnl": Decimal("0.00"),
+            "pnl_percent": Decimal("0.00"),
+            "accumulated_realized_pnl": Decimal("0.00"),
+            "today_realized_pnl": Decimal("0.00"),
+            "margin_blocked": order_margin,  # Store exact margin from order
+            "created_at": sandbox_now(),
+        }
+
+    def _apply_fill_to_position(self, position, order, execution_price, release_margin):
+        """
+        Apply a fill to an existing position (netting logic)
+
+        Works on a SandboxPositions row or on the in-memory state held by the fill journal.
+        release_margin is called as release_margin(amount, realized_pnl, description) whenever
+        the fill closes or reduces the position.
+        """
+        old_quantity = position.quantity
+        new_quantity = order.quantity if order.action == "BUY" else -order.quantity
+        final_quantity = old_quantity + new_quantity
+
+        # Special case: Reopening a closed position (old_quantity = 0)
+        if old_quantity == 0:
+            # Keep accumulated realized P&L from previous trades, start fresh unrealized P&L
+            position.quantity = new_quantity
+            position.average_price = execution_price
+            position.ltp = execution_price
+            position.pnl = Decimal("0.00")  # Reset current P&L (will be updated by MTM)
+            position.pnl_percent = Decimal("0.00")
+            # accumulated_realized_pnl stays as is from previous closed trades
+            # today_realized_pnl: Keep current value (already reset at session boundary)
+            # Store the exact margin that was blocked at order placement time
+            order_margin = (
+                order.margin_blocked
+                if hasattr(order, "margin_blocked") and order.margin_blocked
+                else Decimal("0.00")
+            )
+            position.margin_blocked = order_margin
+            logger.info(
+                f"Reopened position: {order.symbol} {order.action} {order.quantity} (accumulated realized P&L: ₹{position.accumulated_realized_pnl}) (margin blocked: ₹{order_margin})"
+            )
+
+        elif final_quantity == 0:
+            # Position closed completely
+            # Calculate realized P&L
+            _sym_cv_info = get_symbol_info(order.symbol, order.exchange)
+            _cv = float(_sym_cv_info.contract_value) if _sym_cv_info and _sym_cv_info.contract_value else 1.0
+            realized_pnl = self._calculate_realized_pnl(
+                old_quantity, position.average_price, abs(new_quantity), execution_price, contract_value=_cv
+            )
+
+            # Release the EXACT margin that was stored in the position
+            # This prevents over-release when execution price differs from order placement price
+            margin_to_release = (
+                position.margin_blocked
+                if hasattr(position, "margin_blocked") and position.margin_blocked
+                else Decimal("0.00")
+            )
+
+            if margin_to_release > 0:
+                release_margin(
+                    margin_to_release, realized_pnl, f"Position closed: {order.symbol}"
+                )
+                logger.info(
+                    f"Released exact margin ₹{margin_to_release} for closed position (from position.margin_blocked)"
+                )
+
+            # Keep position with 0 quantity to show it was closed
+            # Add realized P&L to accumulated realized P&L (all-time)
+            position.accumulated_realized_pnl += realized_pnl
+            # Add realized P&L to today's realized P&L (resets daily at session boundary)
+            position.today_realized_pnl = (
+                position.today_realized_pnl or Decimal("0.00")
+            ) + realized_pnl
+
+            position.quantity = 0
+            position.margin_blocked = Decimal(
+                "0.00"
+            )  # Reset margin to 0 when position fully closed
+            position.ltp = execution_price
+            position.pnl = (
+                position.today_realized_pnl
+            )  # Display today's realized P&L for closed positions
+            position.pnl_percent = Decimal("0.00")
+            logger.info(
+                f"Position closed: {order.symbol}, Realized P&L: ₹{realized_pnl}, Today's Realized P&L: ₹{position.today_realized_pnl}"
+            )
+
+        elif (old_quantity > 0 and final_quantity > old_quantity) or (
+            old_quantity < 0 and final_quantity < old_quantity
+        ):
+            # Adding to existing position (same direction, position size increasing)
+            # Calculate new average price
+            total_value = (abs(old_quantity) * position.average_price) + (
+                abs(new_quantity) * execution_price
+            )
+            total_quantity = abs(old_quantity) + abs(new_quantity)
+            new_average_price = total_value / total_quantity
+
+            position.quantity = final_quantity
+            position.average_price = new_average_price
+            position.ltp = execution_price
+
+            # Accumulate margin - add the margin blocked for this order to existing position margin
+            order_margin = (
+                order.margin_blocked
+                if hasattr(order, "margin_blocked") and order.margin_blocked
+                else Decimal("0.00")
+            )
+            position.margin_blocked = (
+                position.margin_blocked
+                if hasattr(position, "margin_blocked") and position.margin_blocked
+                else Decimal("0.00")
+            ) + order_margin
+            logger.info(
+                f"Added to position: {order.symbol}, New qty: {final_quantity}, Avg: {new_average_price} (total margin blocked: ₹{position.margin_blocked})"
+            )
+
+        else:
+            # Reducing position (opposite direction) or position reversal
+            reduced_quantity = min(abs(old_quantity), abs(new_quantity))
+
+            # Calculate realized P&L for reduced portion
+            _sym_cv_info = get_symbol_info(order.symbol, order.exchange)
+            _cv = float(_sym_cv_info.contract_value) if _sym_cv_info and _sym_cv_info.contract_value else 1.0
+            realized_pnl = self._calculate_realized_pnl(
+                old_quantity, position.average_price, reduced_quantity, execution_price, contract_value=_cv
+            )
+
+            # Add realized P&L to accumulated realized P&L (all-time)
+            # This tracks all partial closes
+            position.accumulated_realized_pnl = (
+                position.accumulated_realized_pnl or Decimal("0.00")
+            ) + realized_pnl
+            # Add realized P&L to today's realized P&L (resets daily at session boundary)
+            position.today_realized_pnl = (
+                position.today_realized_pnl or Decimal("0.00")
+            ) + realized_pnl
+
+            # Release margin PROPORTIONALLY for reduced quantity
+            # Use exact margin stored in position, release proportionally
+            current_margin = (
+                position.margin_blocked
+                if hasattr(position, "margin_blocked") and position.margin_blocked
+                else Decimal("0.00")
+            )
+
+            if abs(old_quantity) > 0:
+                # Calculate proportion of position being reduced
+                reduction_proportion = Decimal(str(reduced_quantity)) / Decimal(
+                    str(abs(old_quantity))
+                )
+                margin_to_release = current_margin * reduction_proportion
+            else:
+                margin_to_release = Decimal("0.00")
+
+            if margin_to_release > 0:
+                release_margin(
+                    margin_to_release, realized_pnl, f"Position reduced: {order.symbol}"
+                )
+                logger.info(
+                    f"Released proportional margin ₹{margin_to_release} for reduced position ({reduction_proportion * 100:.1f}% of ₹{current_margin})"
+                )
+
+            # Update remaining margin after proportional release
+            remaining_margin = current_margin - margin_to_release
+
+            # If position reversed, set margin for new reversed position
+            if abs(new_quantity) > abs(old_quantity):
+                # Position reversed - remaining quantity creates opposite position
+                remaining_quantity = abs(new_quantity) - abs(old_quantity)
+                position.quantity = (
+                    remaining_quantity if order.action == "BUY" else -remaining_quantity
+                )
+                position.average_price = execution_price
+
+                # For reversed position, the new margin comes from the excess quantity in the order
+                # The old position's margin was fully released, new position gets fresh margin
+                # Note: order.margin_blocked contains margin for the FULL order quantity
+                # We need to calculate what portion corresponds to the excess quantity
+                if abs(new_quantity) > 0:
+                    excess_proportion = Decimal(str(remaining_quantity)) / Decimal(
+                        str(abs(new_quantity))
+                    )
+                    order_margin = (
+                        order.margin_blocked
+                        if hasattr(order, "margin_blocked") and order.margin_blocked
+                        else Decimal("0.00")
+                    )
+                    new_position_margin = order_margin * excess_proportion
+                    position.margin_blocked = new_position_margin
+                    logger.info(
+                        f"Position reversed: {order.symbol}, New qty: {position.quantity} (new margin: ₹{new_position_margin})"
+                    )
+                else:
+                    position.margin_blocked = Decimal("0.00")
+            else:
+                # Position reduced but not reversed - keep remaining margin
+                position.quantity = final_quantity
+                position.margin_blocked = remaining_margin
+                logger.info(
+                    f"Position reduced: {order.symbol}, New qty: {final_quantity}, Remaining margin: ₹{remaining_margin}"
+                )
+
+            position.ltp = execution_price
+            logger.info(
+                f"Partial close: {order.symbol}, New qty: {final_quantity}, Realized P&L: ₹{realized_pnl}"
+            )
+
     def _calculate_realized_pnl(self, old_quantity, avg_price, close_quantity, close_price, contract_value=1.0):
         """Calculate realized P&L for closed positions, multiplied by contract_value (e.g. 0.01 for ETHUSD.P)."""
         try:
@@ -635,7 +723,7 @@ class ExecutionEngine:
 
     def _generate_trade_id(self):
         """Generate unique trade ID"""
-        now = datetime.now(pytz.timezone("Asia/Kolkata"))
+        now = sandbox_now()
         timestamp = now.strftime("%Y%m%d-%H%M%S")
         unique_id = str(uuid.uuid4())[:8]
         return f"TRADE-{timestamp}-{unique_id}"
@@ -643,7 +731,9 @@ class ExecutionEngine:
 
 def run_execution_engine_once():
     """Run one cycle of the execution engine"""
-    engine = ExecutionEngine()
+    from sandbox.fill_journal import is_write_behind_enabled
+
+    engine = ExecutionEngine(write_behind=is_write_behind_enabled())
     engine.check_and_execute_pending_orders()
 
 
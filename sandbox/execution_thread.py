@@ -41,9 +41,10 @@ class ExecutionEngineThread(threading.Thread):
     def run(self):
         """Main thread loop"""
         from sandbox.execution_engine import ExecutionEngine
+        from sandbox.fill_journal import is_write_behind_enabled
 
         logger.debug("Sandbox Execution Engine thread started")
-        engine = ExecutionEngine()
+        engine = ExecutionEngine(write_behind=is_write_behind_enabled())
 
         while not self.stop_event.is_set():
             try:
@@ -133,6 +134,11 @@ def start_execution_engine(engine_type: str = None):
 
         logger.debug(f"Starting execution engine with type: {engine_type}")
 
+        # Replay fills journaled but not persisted before the last shutdown
+        from sandbox.fill_journal import recover_fill_journal
+
+        recover_fill_journal()
+
         try:
             if engine_type == "websocket":
                 # Try WebSocket engine first
@@ -221,6 +227,22 @@ def stop_execution_engine():
             except Exception as e:
                 logger.exception(f"Error stopping polling execution engine: {e}")
 
+        # Persist any journaled fills before the engine goes away
+        try:
+            from sandbox.fill_journal import stop_fill_journal
+
+            stop_fill_journal()
+        except Exception as e:
+            logger.exception(f"Error stopping sandbox fill journal: {e}")
+
+        # Persist pending margin ledger movements
+        try:
+            from sandbox.margin_ledger import stop_margin_ledger
+
+            stop_margin_ledger()
+        except Exception as e:
+            logger.exception(f"Error stopping sandbox margin ledger: {e}")
+
         _current_engine_type = None
         _auto_upgrade_enabled = False
 
@@ -0,0 +1,612 @@
+# sandbox/fill_journal.py
+"""
+Fill Journal - Write-behind persistence for sandbox fills
+
+Features:
+- Fills are applied to in-memory position and fund state immediately
+- Trades, order status, positions and fund changes are flushed to sandbox_db in one
+  grouped transaction, on a short interval or once a size threshold is reached
+- Every fill is appended to a journal file before it is acknowledged, so fills that
+  were not yet flushed are replayed on the next startup
+- Used by the background execution engines only; orders executed at placement time
+  still go through the synchronous path
+- Orderbook, tradebook, positionbook and funds reads flush pending fills first
+
+Configuration (.env):
+- SANDBOX_WRITE_BEHIND: Enable write-behind for background order execution (default: false)
+- SANDBOX_JOURNAL_FLUSH_INTERVAL_MS: Max time a fill waits before being flushed (default: 200)
+- SANDBOX_JOURNAL_FLUSH_SIZE: Flush immediately once this many fills are pending (default: 100)
+- SANDBOX_JOURNAL_PATH: Journal file location (default: db/sandbox_fill_journal.jsonl)
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy.orm import sessionmaker
+
+from database.sandbox_db import (
+    SandboxFunds,
+    SandboxOrders,
+    SandboxPositions,
+    SandboxTrades,
+    db_session,
+)
+from database.sandbox_db import engine as sandbox_engine
+from sandbox.margin_ledger import get_active_margin_ledger
+from sandbox.replay_clock import sandbox_now
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+# Position columns the netting logic reads and updates
+POSITION_FIELDS = (
+    "quantity",
+    "average_price",
+    "ltp",
+    "pnl",
+    "pnl_percent",
+    "accumulated_realized_pnl",
+    "today_realized_pnl",
+    "margin_blocked",
+)
+
+# Columns owned by the journal. ltp/pnl of an open position belong to the MTM updater,
+# which may have repriced the row since the fill, so they are only written for new rows
+# and closed positions (the MTM updater skips those).
+JOURNAL_FIELDS = (
+    "quantity",
+    "average_price",
+    "accumulated_realized_pnl",
+    "today_realized_pnl",
+    "margin_blocked",
+)
+
+CENTS = Decimal("0.01")
+FIELD_SCALE = {"pnl_percent": Decimal("0.0001")}
+
+
+def is_write_behind_enabled() -> bool:
+    """Check if background execution should use the write-behind journal"""
+    return os.getenv("SANDBOX_WRITE_BEHIND", "false").lower() == "true"
+
+
+class FillJournal:
+    """
+    Write-behind journal for sandbox fills.
+
+    The in-memory state only holds positions and fund deltas touched by fills that have
+    not been flushed yet; once a batch is committed the state is dropped and the
+    database is the source of truth again.
+    """
+
+    def __init__(self, path=None, flush_interval_ms=None, flush_size=None):
+        self.path = path or os.getenv("SANDBOX_JOURNAL_PATH", "db/sandbox_fill_journal.jsonl")
+        self.flush_interval = (
+            int(flush_interval_ms or os.getenv("SANDBOX_JOURNAL_FLUSH_INTERVAL_MS", "200")) / 1000
+        )
+        self.flush_size = int(flush_size or os.getenv("SANDBOX_JOURNAL_FLUSH_SIZE", "100"))
+
+        # Guards pending fills, in-memory state and the journal file
+        self._lock = threading.RLock()
+        self._pending: list[dict] = []
+        self._pending_orderids: set[str] = set()
+        # (user_id, symbol, exchange, product) -> SimpleNamespace with POSITION_FIELDS
+        self._positions: dict[tuple, SimpleNamespace] = {}
+        # user_id -> {"used_margin": Decimal, "available_balance": Decimal, "realized_pnl": Decimal}
+        self._fund_deltas: dict[str, dict[str, Decimal]] = {}
+
+        self._file = None
+        self._session_factory = sessionmaker(bind=sandbox_engine, autoflush=False)
+        self._engine = None
+
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.stats = {"fills": 0, "flushes": 0, "flushed_fills": 0, "flush_errors": 0}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the background flusher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="SandboxFillJournal-Flusher"
+        )
+        self._thread.start()
+        logger.debug(
+            f"Fill journal started (interval={self.flush_interval * 1000:.0f}ms, size={self.flush_size})"
+        )
+
+    def stop(self):
+        """Flush remaining fills and stop the flusher thread"""
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(timeout=self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Error in fill journal flusher: {e}")
+
+    # ------------------------------------------------------------------
+    # Recording fills
+    # ------------------------------------------------------------------
+
+    def is_pending(self, orderid) -> bool:
+        """Check if an order has a journaled fill that is not flushed yet"""
+        return orderid in self._pending_orderids
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def record_fill(self, order, execution_price, tradeid=None, trade_timestamp=None):
+        """
+        Journal a fill and apply it to the in-memory position and fund state.
+
+        Returns:
+            str or None: Trade ID of the fill, or None if the order already has a pending fill
+        """
+        execution_price = Decimal(str(execution_price))
+        trade_timestamp = trade_timestamp or sandbox_now()
+
+        with self._lock:
+            if order.orderid in self._pending_orderids:
+                return None
+
+            record = {
+                "tradeid": tradeid or self._generate_trade_id(),
+                "orderid": order.orderid,
+                "user_id": order.user_id,
+                "symbol": order.symbol,
+                "exchange": order.exchange,
+                "action": order.action,
+                "quantity": order.quantity,
+                "price": str(execution_price),
+                "product": order.product,
+                "strategy": order.strategy,
+                "margin_blocked": str(order.margin_blocked or 0),
+                "timestamp": trade_timestamp.isoformat(),
+            }
+            self._append(record)
+
+            fill = self._record_to_order(record)
+            key = (order.user_id, order.symbol, order.exchange, order.product)
+            position = self._positions.get(key)
+
+            if position is None:
+                position = self._load_position(key)
+
+            engine = self._get_engine()
+            if position is None:
+                position = SimpleNamespace(**engine._new_position_fields(fill, execution_price))
+                logger.debug(
+                    f"Journal: new position {order.symbol} {order.action} {order.quantity} (margin blocked: ₹{position.margin_blocked})"
+                )
+            else:
+                engine._apply_fill_to_position(
+                    position,
+                    fill,
+                    execution_price,
+                    lambda amount, pnl=0, description="": self._release_margin(
+                        order.user_id, amount, pnl
+                    ),
+                )
+            # Round like the DECIMAL columns do, so later fills net against stored values
+            for field in POSITION_FIELDS[1:]:
+                value = getattr(position, field)
+                if value is not None:
+                    setattr(position, field, Decimal(str(value)).quantize(FIELD_SCALE.get(field, CENTS)))
+            self._positions[key] = position
+
+            self._pending.append(record)
+            self._pending_orderids.add(order.orderid)
+            self.stats["fills"] += 1
+
+            if len(self._pending) >= self.flush_size:
+                self._flush_event.set()
+
+            return record["tradeid"]
+
+    def _release_margin(self, user_id, amount, realized_pnl):
+        """In-memory counterpart of FundManager.release_margin"""
+        amount = Decimal(str(amount))
+        realized_pnl = Decimal(str(realized_pnl))
+        delta = self._fund_deltas.setdefault(
+            user_id,
+            {
+                "used_margin": Decimal("0.00"),
+                "available_balance": Decimal("0.00"),
+                "realized_pnl": Decimal("0.00"),
+            },
+        )
+        delta["used_margin"] -= amount
+        delta["available_balance"] += amount + realized_pnl
+        delta["realized_pnl"] += realized_pnl
+        return True, f"Margin release journaled: ₹{amount}, P&L: ₹{realized_pnl}"
+
+    def _load_position(self, key):
+        """Snapshot the current position row into in-memory state (None if it does not exist)"""
+        user_id, symbol, exchange, product = key
+        session = self._session_factory()
+        try:
+            row = (
+                session.query(SandboxPositions)
+                .filter_by(user_id=user_id, symbol=symbol, exchange=exchange, product=product)
+                .first()
+            )
+            if not row:
+                return None
+            state = SimpleNamespace(**{field: getattr(row, field) for field in POSITION_FIELDS})
+            for field in POSITION_FIELDS[1:]:
+                if getattr(state, field) is None:
+                    setattr(state, field, Decimal("0.00"))
+            return state
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def flush(self) -> int:
+        """
+        Write all pending fills to sandbox_db in a single transaction.
+
+        Returns:
+            int: Number of fills flushed
+        """
+        from sandbox.fund_manager import FundManager
+
+        with self._lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            start = time.perf_counter()
+            # The ledger's flush lock is held from the fund commit until its accounts
+            # mirror it, so an account loaded meanwhile cannot get the deltas twice
+            ledger = get_active_margin_ledger()
+            with ledger._flush_lock if ledger else nullcontext():
+                session = self._session_factory()
+                try:
+                    now = sandbox_now()
+
+                    for record in batch:
+                        session.add(
+                            SandboxTrades(
+                                tradeid=record["tradeid"],
+                                orderid=record["orderid"],
+                                user_id=record["user_id"],
+                                symbol=record["symbol"],
+                                exchange=record["exchange"],
+                                action=record["action"],
+                                quantity=record["quantity"],
+                                price=Decimal(record["price"]),
+                                product=record["product"],
+                                strategy=record["strategy"],
+                                trade_timestamp=datetime.fromisoformat(record["timestamp"]),
+                            )
+                        )
+
+                    orders = {
+                        o.orderid: o
+                        for o in session.query(SandboxOrders)
+                        .filter(SandboxOrders.orderid.in_([r["orderid"] for r in batch]))
+                        .all()
+                    }
+                    for record in batch:
+                        order = orders.get(record["orderid"])
+                        if order is None:
+                            continue
+                        order.order_status = "complete"
+                        order.average_price = Decimal(record["price"])
+                        order.filled_quantity = order.quantity
+                        order.pending_quantity = 0
+                        order.update_timestamp = now
+
+                    for (user_id, symbol, exchange, product), state in self._positions.items():
+                        row = (
+                            session.query(SandboxPositions)
+                            .filter_by(
+                                user_id=user_id, symbol=symbol, exchange=exchange, product=product
+                            )
+                            .first()
+                        )
+                        fields = JOURNAL_FIELDS
+                        if row is None or state.quantity == 0:
+                            fields = POSITION_FIELDS
+                        if row is None:
+                            row = SandboxPositions(
+                                user_id=user_id,
+                                symbol=symbol,
+                                exchange=exchange,
+                                product=product,
+                                created_at=getattr(state, "created_at", now),
+                            )
+                            session.add(row)
+                        for field in fields:
+                            setattr(row, field, getattr(state, field))
+
+                    # Fund rows are shared with order placement, so commit under the fund lock
+                    with FundManager._lock:
+                        for user_id, delta in self._fund_deltas.items():
+                            funds = session.query(SandboxFunds).filter_by(user_id=user_id).first()
+                            if funds is None:
+                                logger.warning(f"Journal flush: no funds record for user {user_id}")
+                                continue
+                            funds.used_margin += delta["used_margin"]
+                            funds.available_balance += delta["available_balance"]
+                            funds.realized_pnl += delta["realized_pnl"]
+                            funds.today_realized_pnl = (
+                                funds.today_realized_pnl or Decimal("0.00")
+                            ) + delta["realized_pnl"]
+                            funds.total_pnl = funds.realized_pnl + funds.unrealized_pnl
+
+                        session.commit()
+
+                except Exception as e:
+                    session.rollback()
+                    self.stats["flush_errors"] += 1
+                    logger.exception(f"Error flushing {len(batch)} journaled fills, will retry: {e}")
+                    return 0
+                finally:
+                    session.close()
+
+                # Keep in-memory margin accounts in step with the fund rows just written
+                if ledger:
+                    for user_id, delta in self._fund_deltas.items():
+                        ledger.apply_external(
+                            user_id,
+                            delta["available_balance"],
+                            delta["used_margin"],
+                            delta["realized_pnl"],
+                            "journaled fills",
+                        )
+
+            users = {record["user_id"] for record in batch}
+            self._pending = []
+            self._pending_orderids.clear()
+            self._positions.clear()
+            self._fund_deltas.clear()
+            self._truncate()
+
+            self.stats["flushes"] += 1
+            self.stats["flushed_fills"] += len(batch)
+            logger.debug(
+                f"Journal flushed {len(batch)} fills in {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+
+        self._validate_margins(users)
+        return len(batch)
+
+    def _validate_margins(self, users):
+        """Same post-fill margin check as the synchronous path, once per user per batch"""
+        from sandbox.fund_manager import reconcile_margin, validate_margin_consistency
+
+        for user_id in users:
+            is_consistent, discrepancy = validate_margin_consistency(user_id)
+            if not is_consistent:
+                logger.warning(
+                    f"Margin inconsistency detected after journal flush for user {user_id}: "
+                    f"discrepancy={discrepancy}. Auto-reconciling..."
+                )
+                reconcile_margin(user_id, auto_fix=True)
+
+    # ------------------------------------------------------------------
+    # Journal file
+    # ------------------------------------------------------------------
+
+    def _append(self, record):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def _truncate(self):
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.flush()
+        elif os.path.exists(self.path):
+            open(self.path, "w").close()
+
+    def recover(self) -> int:
+        """
+        Replay fills left in the journal by a previous run.
+
+        Fills whose trade already exists in sandbox_db were committed before the
+        journal was truncated and are skipped.
+
+        Returns:
+            int: Number of fills replayed
+        """
+        recovery_path = f"{self.path}.recover"
+
+        with self._lock:
+            if self._pending:
+                return 0
+
+            # A leftover recovery file means an earlier replay could not be flushed
+            records = []
+            for path in (recovery_path, self.path):
+                if not os.path.exists(path):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            records.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            # A partially written last line from a crash
+                            logger.warning("Skipping malformed fill journal entry")
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.replace(self.path, recovery_path)
+            elif not os.path.exists(recovery_path):
+                return 0
+
+            replayed = 0
+            if records:
+                session = self._session_factory()
+                try:
+                    existing = {
+                        t.tradeid
+                        for t in session.query(SandboxTrades.tradeid)
+                        .filter(SandboxTrades.tradeid.in_([r["tradeid"] for r in records]))
+                        .all()
+                    }
+                    open_orders = {
+                        o.orderid
+                        for o in session.query(SandboxOrders.orderid)
+                        .filter(
+                            SandboxOrders.orderid.in_([r["orderid"] for r in records]),
+                            SandboxOrders.order_status == "open",
+                        )
+                        .all()
+                    }
+                finally:
+                    session.close()
+
+                for record in records:
+                    if record["tradeid"] in existing or record["orderid"] not in open_orders:
+                        continue
+                    self.record_fill(
+                        self._record_to_order(record),
+                        record["price"],
+                        tradeid=record["tradeid"],
+                        trade_timestamp=datetime.fromisoformat(record["timestamp"]),
+                    )
+                    replayed += 1
+
+            if self.flush() < replayed:
+                # Keep the recovery file so nothing is lost if the replay could not be written
+                logger.error(f"Fill journal recovery could not be flushed, kept {recovery_path}")
+                return 0
+
+            os.remove(recovery_path)
+
+        if replayed:
+            logger.info(f"Recovered {replayed} unflushed sandbox fills from journal")
+        return replayed
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _get_engine(self):
+        if self._engine is None:
+            from sandbox.execution_engine import ExecutionEngine
+
+            self._engine = ExecutionEngine()
+        return self._engine
+
+    @staticmethod
+    def _record_to_order(record):
+        """Order-like view of a journal record for the netting logic"""
+        return SimpleNamespace(
+            orderid=record["orderid"],
+            user_id=record["user_id"],
+            symbol=record["symbol"],
+            exchange=record["exchange"],
+            action=record["action"],
+            quantity=record["quantity"],
+            product=record["product"],
+            strategy=record["strategy"],
+            margin_blocked=Decimal(record["margin_blocked"]),
+        )
+
+    @staticmethod
+    def _generate_trade_id():
+        """Generate unique trade ID (same format as ExecutionEngine)"""
+        now = sandbox_now()
+        return f"TRADE-{now.strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:8]}"
+
+
+# Global instance for singleton access
+_fill_journal: FillJournal | None = None
+_journal_lock = threading.Lock()
+
+
+def get_fill_journal() -> FillJournal:
+    """Get or create the singleton fill journal (starts the flusher thread)"""
+    global _fill_journal
+
+    with _journal_lock:
+        if _fill_journal is None:
+            _fill_journal = FillJournal()
+            _fill_journal.start()
+        return _fill_journal
+
+
+def is_fill_pending(orderid) -> bool:
+    """Check if an order has a journaled fill that is not flushed yet"""
+    return _fill_journal is not None and _fill_journal.is_pending(orderid)
+
+
+def flush_pending_fills() -> int:
+    """Flush journaled fills, if any, so the database reflects every executed order"""
+    if _fill_journal is None or not _fill_journal.has_pending():
+        return 0
+    flushed = _fill_journal.flush()
+    if flushed:
+        # Rows this thread already loaded were written by the journal's own session
+        db_session.expire_all()
+    return flushed
+
+
+def recover_fill_journal() -> int:
+    """Replay fills left unflushed by a previous run (called when the engine starts)"""
+    journal = FillJournal()
+    if not os.path.exists(journal.path) and not os.path.exists(f"{journal.path}.recover"):
+        return 0
+
+    with _journal_lock:
+        active = _fill_journal
+    try:
+        return (active or journal).recover()
+    except Exception as e:
+        logger.exception(f"Error recovering sandbox fill journal: {e}")
+        return 0
+
+
+def stop_fill_journal():
+    """Flush and stop the fill journal"""
+    global _fill_journal
+
+    with _journal_lock:
+        if _fill_journal is not None:
+            _fill_journal.stop()
+            _fill_journal = None
@@ -7,6 +7,7 @@ Features:
 - Automatic reset via APScheduler on configured day/time (default: Sunday 00:00 IST)
 - Leverage-based margin calculations
 - Real-time available balance tracking
+- Optional in-memory margin ledger with per-user locks (see margin_ledger.py)
 
 Auto-Reset:
 - Runs as APScheduler background job (see squareoff_thread.py)
@@ -34,6 +35,8 @@ from database.sandbox_db import (
     get_config,
 )
 from database.token_db import get_symbol_info
+from sandbox.fill_journal import flush_pending_fills
+from sandbox.margin_ledger import external_fund_write, get_margin_ledger, is_margin_ledger_enabled
 from utils.logging import get_logger
 from utils.symbol_utils import is_future, is_option
 
@@ -51,6 +54,9 @@ class FundManager:
         self.user_id = user_id
         self.starting_capital = Decimal(get_config("starting_capital", "10000000.00"))
 
+        # Margin checks and movements served from memory, persisted in the background
+        self._ledger = get_margin_ledger() if is_margin_ledger_enabled() else None
+
     def initialize_funds(self):
         """Initialize funds for a new user"""
         with self._lock:
@@ -90,6 +96,9 @@ class FundManager:
     def get_funds(self):
         """Get current fund status for user"""
         try:
+            # Include fills still in the write-behind journal (flushing takes the fund lock)
+            flush_pending_fills()
+
             funds = SandboxFunds.query.filter_by(user_id=self.user_id).first()
 
             if not funds:
@@ -103,20 +112,25 @@ class FundManager:
             # Check if reset is needed
             self._check_and_reset_funds(funds)
 
+            # Balances may be ahead of the row while ledger movements are being persisted
+            balances = funds
+            if self._ledger:
+                balances = self._ledger.get_account(self.user_id) or funds
+
             # Return fund details
             return {
-                "availablecash": float(funds.available_balance),
-                "availableliquidcash": float(funds.available_balance),  # No collateral in sandbox, liquid cash equals available cash
+                "availablecash": float(balances.available_balance),
+                "availableliquidcash": float(balances.available_balance),  # No collateral in sandbox, liquid cash equals available cash
                 "collateral": 0.00,  # No collateral in sandbox
-                "m2munrealized": float(funds.unrealized_pnl),
+                "m2munrealized": float(balances.unrealized_pnl),
                 "m2mrealized": float(
-                    funds.today_realized_pnl or 0
+                    balances.today_realized_pnl or 0
                 ),  # Today's realized P&L (resets daily)
-                "total_realized_pnl": float(funds.realized_pnl),  # All-time realized P&L
-                "today_realized_pnl": float(funds.today_realized_pnl or 0),
-                "utiliseddebits": float(funds.used_margin),
-                "grossexposure": float(funds.used_margin),
-                "totalpnl": float(funds.total_pnl),
+                "total_realized_pnl": float(balances.realized_pnl),  # All-time realized P&L
+                "today_realized_pnl": float(balances.today_realized_pnl or 0),
+                "utiliseddebits": float(balances.used_margin),
+                "grossexposure": float(balances.used_margin),
+                "totalpnl": float(balances.total_pnl),
                 "last_reset": funds.last_reset_date.strftime("%Y-%m-%d %H:%M:%S"),
                 "reset_count": funds.reset_count,
             }
@@ -159,7 +173,7 @@ class FundManager:
 
     def _reset_funds(self, funds):
         """Reset funds to starting capital"""
-        with self._lock:
+        with external_fund_write(self.user_id), self._lock:
             try:
                 logger.info(f"Resetting funds for user {self.user_id}")
 
@@ -205,23 +219,42 @@ class FundManager:
             funds = SandboxFunds.query.filter_by(user_id=self.user_id).first()
         return funds
 
+    def _ledger_call(self, method, *args, **kwargs):
+        """Run a ledger movement, initializing the funds row on first use"""
+        result = method(self.user_id, *args, **kwargs)
+        if result is None:
+            if not self._ensure_funds_initialized():
+                return None
+            result = method(self.user_id, *args, **kwargs)
+        return result
+
     def check_margin_available(self, required_margin):
         """Check if user has sufficient margin available"""
         try:
-            funds = self._ensure_funds_initialized()
+            if self._ledger:
+                found, available_balance = self._ledger_call(self._ledger.get_available) or (
+                    False,
+                    None,
+                )
+                if not found:
+                    return False, "Funds not initialized"
+            else:
+                funds = self._ensure_funds_initialized()
 
-            if not funds:
-                return False, "Funds not initialized"
+                if not funds:
+                    return False, "Funds not initialized"
+
+                available_balance = funds.available_balance
 
             required_margin = Decimal(str(required_margin))
 
-            if funds.available_balance >= required_margin:
+            if available_balance >= required_margin:
                 return True, "Sufficient margin available"
             else:
-                shortage = required_margin - funds.available_balance
+                shortage = required_margin - available_balance
                 return (
                     False,
-                    f"Insufficient funds. Required: ₹{required_margin}, Available: ₹{funds.available_balance}, Shortage: ₹{shortage}",
+                    f"Insufficient funds. Required: ₹{required_margin}, Available: ₹{available_balance}, Shortage: ₹{shortage}",
                 )
 
         except Exception as e:
@@ -230,6 +263,9 @@ class FundManager:
 
     def block_margin(self, amount, description=""):
         """Block margin for a trade"""
+        if self._ledger:
+            return self._ledger_block_margin(amount, description)
+
         with self._lock:
             try:
                 funds = self._ensure_funds_initialized()
@@ -259,8 +295,35 @@ class FundManager:
                 logger.exception(f"Error blocking margin for user {self.user_id}: {e}")
                 return False, f"Error blocking margin: {str(e)}"
 
+    def _ledger_block_margin(self, amount, description):
+        amount = Decimal(str(amount))
+        outcome = self._ledger_call(self._ledger.block, amount, description)
+
+        if outcome is None:
+            return False, "Funds not initialized"
+
+        success, available_balance = outcome
+        if not success:
+            return (
+                False,
+                f"Insufficient funds. Required: ₹{amount}, Available: ₹{available_balance}",
+            )
+
+        logger.info(f"Blocked ₹{amount} margin for user {self.user_id}. {description}")
+        return True, f"Margin blocked: ₹{amount}"
+
     def release_margin(self, amount, realized_pnl=0, description=""):
         """Release blocked margin and update P&L"""
+        if self._ledger:
+            amount = Decimal(str(amount))
+            realized_pnl = Decimal(str(realized_pnl))
+            if self._ledger_call(self._ledger.release, amount, realized_pnl, description) is None:
+                return False, "Funds not initialized"
+            logger.info(
+                f"Released ₹{amount} margin for user {self.user_id}. Realized P&L: ₹{realized_pnl}. {description}"
+            )
+            return True, f"Margin released: ₹{amount}, P&L: ₹{realized_pnl}"
+
         with self._lock:
             try:
                 funds = self._ensure_funds_initialized()
@@ -302,6 +365,15 @@ class FundManager:
         Reduces used_margin without crediting available_balance
         (the money is now represented in holdings value, not available cash)
         """
+        if self._ledger:
+            amount = Decimal(str(amount))
+            if self._ledger_call(self._ledger.transfer_to_holdings, amount, description) is None:
+                return False, "Funds not initialized"
+            logger.debug(
+                f"Transferred ₹{amount} margin to holdings for user {self.user_id}. {description}"
+            )
+            return True, f"Margin transferred to holdings: ₹{amount}"
+
         with self._lock:
             try:
                 funds = self._ensure_funds_initialized()
@@ -332,6 +404,13 @@ class FundManager:
         Credit sale proceeds from selling CNC holdings
         Increases available_balance when holdings are sold
         """
+        if self._ledger:
+            amount = Decimal(str(amount))
+            if self._ledger_call(self._ledger.credit, amount, description) is None:
+                return False, "Funds not initialized"
+            logger.info(f"Credited ₹{amount} sale proceeds for user {self.user_id}. {description}")
+            return True, f"Sale proceeds credited: ₹{amount}"
+
         with self._lock:
             try:
                 funds = self._ensure_funds_initialized()
@@ -358,6 +437,11 @@ class FundManager:
 
     def update_unrealized_pnl(self, unrealized_pnl):
         """Update unrealized P&L from open positions"""
+        if self._ledger:
+            if not self._ledger_call(self._ledger.set_unrealized, Decimal(str(unrealized_pnl))):
+                return False, "Funds not initialized"
+            return True, "Unrealized P&L updated"
+
         with self._lock:
             try:
                 funds = self._ensure_funds_initialized()
@@ -516,12 +600,16 @@ def reconcile_margin(user_id, auto_fix=True):
             if pos.quantity != 0  # Only count open positions
         )
 
-        # Get current used_margin from funds
-        funds = SandboxFunds.query.filter_by(user_id=user_id).first()
-        if not funds:
-            return False, Decimal("0"), "No funds record found for user"
+        # Get current used_margin from the margin ledger or funds
+        ledger = get_margin_ledger() if is_margin_ledger_enabled() else None
+        account = ledger.get_account(user_id) if ledger else None
+        funds = None
+        if account is None:
+            funds = SandboxFunds.query.filter_by(user_id=user_id).first()
+            if not funds:
+                return False, Decimal("0"), "No funds record found for user"
 
-        current_used_margin = Decimal(str(funds.used_margin or 0))
+        current_used_margin = Decimal(str((account or funds).used_margin or 0))
 
         # Calculate discrepancy
         discrepancy = current_used_margin - total_position_margin
@@ -538,9 +626,12 @@ def reconcile_margin(user_id, auto_fix=True):
 
         if auto_fix:
             # Fix the discrepancy by adjusting used_margin and available_balance
-            funds.used_margin = total_position_margin
-            funds.available_balance += discrepancy  # Release the stuck margin
-            db_session.commit()
+            if account is not None:
+                discrepancy = ledger.reconcile(user_id, total_position_margin)
+            else:
+                funds.used_margin = total_position_margin
+                funds.available_balance += discrepancy  # Release the stuck margin
+                db_session.commit()
 
             logger.info(
                 f"Margin reconciled for user {user_id}: "
@@ -625,8 +716,12 @@ def validate_margin_consistency(user_id):
             if pos.quantity != 0  # Only count open positions
         )
 
-        # Get current used_margin from funds
-        funds = SandboxFunds.query.filter_by(user_id=user_id).first()
+        # Get current used_margin from the margin ledger or funds
+        funds = None
+        if is_margin_ledger_enabled():
+            funds = get_margin_ledger().get_account(user_id)
+        if funds is None:
+            funds = SandboxFunds.query.filter_by(user_id=user_id).first()
         if not funds:
             return True, Decimal("0")  # No funds = no discrepancy to report
 
@@ -0,0 +1,534 @@
+# sandbox/margin_ledger.py
+"""
+Margin Ledger - In-memory fund accounts for the sandbox FundManager
+
+Features:
+- Serves margin checks, blocks, releases and P&L updates from memory
+- One lock per user, so concurrent basket/split orders for different users never contend
+- Every movement is recorded with before/after balances and checked against the ledger invariant
+- Balance changes are persisted asynchronously as deltas in one grouped transaction
+- Other writers to sandbox_funds (resets, catch-up, fill journal) sync through external_write()
+
+Enabled with SANDBOX_MARGIN_LEDGER=true. When disabled FundManager reads and commits
+the SandboxFunds row directly on every call.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import sessionmaker
+
+from database.sandbox_db import SandboxFunds
+from database.sandbox_db import engine as sandbox_engine
+from sandbox.replay_clock import sandbox_now
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+ZERO = Decimal("0.00")
+
+# Balance columns persisted as deltas
+DELTA_FIELDS = ("available_balance", "used_margin", "realized_pnl", "today_realized_pnl")
+
+
+def is_margin_ledger_enabled() -> bool:
+    """Check if FundManager should use the in-memory margin ledger"""
+    return os.getenv("SANDBOX_MARGIN_LEDGER", "false").lower() == "true"
+
+
+class Rejected:
+    """Movement outcome that leaves the account untouched and is not recorded"""
+
+    def __init__(self, result):
+        self.result = result
+
+
+@dataclass
+class LedgerEntry:
+    """One fund movement with the balances it produced"""
+
+    seq: int
+    timestamp: str
+    kind: str
+    available_delta: Decimal
+    used_delta: Decimal
+    realized_delta: Decimal
+    available_after: Decimal
+    used_after: Decimal
+    description: str = ""
+
+
+@dataclass
+class Account:
+    """In-memory state of one user's SandboxFunds row"""
+
+    user_id: str
+    available_balance: Decimal
+    used_margin: Decimal
+    realized_pnl: Decimal
+    today_realized_pnl: Decimal
+    unrealized_pnl: Decimal
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    # Changes not yet written to the database
+    pending: dict = field(default_factory=lambda: dict.fromkeys(DELTA_FIELDS, ZERO))
+    pending_unrealized: Decimal | None = None
+
+    # Invariant baseline: available + used moves only by P&L and cash flows
+    opening_cash: Decimal = ZERO
+    cash_flow: Decimal = ZERO
+
+    entries: deque = field(default_factory=deque)
+    detached: bool = False
+
+    @property
+    def total_pnl(self) -> Decimal:
+        return self.realized_pnl + self.unrealized_pnl
+
+    def has_pending(self) -> bool:
+        return self.pending_unrealized is not None or any(v != 0 for v in self.pending.values())
+
+    def take_pending(self):
+        pending, unrealized = self.pending, self.pending_unrealized
+        self.pending = dict.fromkeys(DELTA_FIELDS, ZERO)
+        self.pending_unrealized = None
+        return pending, unrealized
+
+
+class MarginLedger:
+    """Per-user in-memory fund accounts with asynchronous persistence"""
+
+    def __init__(self, flush_interval_ms=None, history=None):
+        self.flush_interval = (
+            int(flush_interval_ms or os.getenv("SANDBOX_LEDGER_FLUSH_INTERVAL_MS", "250")) / 1000
+        )
+        self.history = int(history or os.getenv("SANDBOX_LEDGER_HISTORY", "1000"))
+
+        self._accounts: dict[str, Account] = {}
+        self._accounts_lock = threading.Lock()
+
+        # Serializes database writes of the ledger against external writers
+        self._flush_lock = threading.RLock()
+        # Deltas whose write failed, retried on the next flush
+        self._carry: dict[str, tuple[dict, Decimal | None]] = {}
+
+        self._session_factory = sessionmaker(bind=sandbox_engine, autoflush=False)
+        self._seq = itertools.count(1)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.stats = {"movements": 0, "flushes": 0, "flush_errors": 0, "invariant_violations": 0}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the background persistence thread"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="SandboxMarginLedger-Flusher"
+        )
+        self._thread.start()
+        logger.debug(f"Margin ledger started (interval={self.flush_interval * 1000:.0f}ms)")
+
+    def stop(self):
+        """Persist remaining movements and stop the flusher thread"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(timeout=self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Error in margin ledger flusher: {e}")
+
+    # ------------------------------------------------------------------
+    # Accounts
+    # ------------------------------------------------------------------
+
+    def get_account(self, user_id) -> Account | None:
+        """Get the user's account, loading it from SandboxFunds on first use"""
+        account = self._accounts.get(user_id)
+        if account is not None:
+            return account
+
+        # Loads wait for in-flight flushes so the row read includes every persisted delta
+        with self._flush_lock, self._accounts_lock:
+            account = self._accounts.get(user_id)
+            if account is not None:
+                return account
+
+            session = self._session_factory()
+            try:
+                funds = session.query(SandboxFunds).filter_by(user_id=user_id).first()
+            finally:
+                session.close()
+            if not funds:
+                return None
+
+            account = Account(
+                user_id=user_id,
+                available_balance=funds.available_balance or ZERO,
+                used_margin=funds.used_margin or ZERO,
+                realized_pnl=funds.realized_pnl or ZERO,
+                today_realized_pnl=funds.today_realized_pnl or ZERO,
+                unrealized_pnl=funds.unrealized_pnl or ZERO,
+                entries=deque(maxlen=self.history),
+            )
+
+            # Movements whose write failed are still owed to the database
+            carried = self._carry.get(user_id)
+            if carried:
+                deltas, unrealized = carried
+                account.available_balance += deltas["available_balance"]
+                account.used_margin += deltas["used_margin"]
+                account.realized_pnl += deltas["realized_pnl"]
+                account.today_realized_pnl += deltas["today_realized_pnl"]
+                if unrealized is not None:
+                    account.unrealized_pnl = unrealized
+
+            account.opening_cash = account.available_balance + account.used_margin
+            self._accounts[user_id] = account
+            return account
+
+    def _apply(self, user_id, kind, fn, description="", persist=True):
+        """
+        Run a movement against the user's account under its lock.
+
+        fn(account) returns (available_delta, used_delta, realized_delta, cash_flow, result),
+        or Rejected(result) to leave the account unchanged.
+
+        Returns the movement result, or None if the user has no funds record.
+        """
+        while True:
+            account = self.get_account(user_id)
+            if account is None:
+                return None
+
+            with account.lock:
+                # Account was dropped for a reload while we waited - use the fresh one
+                if account.detached:
+                    continue
+
+                outcome = fn(account)
+                if isinstance(outcome, Rejected):
+                    return outcome.result
+                available_delta, used_delta, realized_delta, cash_flow, result = outcome
+
+                account.available_balance += available_delta
+                account.used_margin += used_delta
+                account.realized_pnl += realized_delta
+                account.today_realized_pnl += realized_delta
+                account.cash_flow += cash_flow
+
+                if persist:
+                    account.pending["available_balance"] += available_delta
+                    account.pending["used_margin"] += used_delta
+                    account.pending["realized_pnl"] += realized_delta
+                    account.pending["today_realized_pnl"] += realized_delta
+
+                account.entries.append(
+                    LedgerEntry(
+                        seq=next(self._seq),
+                        timestamp=sandbox_now().isoformat(),
+                        kind=kind,
+                        available_delta=available_delta,
+                        used_delta=used_delta,
+                        realized_delta=realized_delta,
+                        available_after=account.available_balance,
+                        used_after=account.used_margin,
+                        description=description,
+                    )
+                )
+                self.stats["movements"] += 1
+                self._check_invariant(account, kind)
+                return result
+
+    def _check_invariant(self, account, kind):
+        """available + used may only change by realized P&L and cash flows"""
+        expected = account.opening_cash + account.cash_flow
+        actual = account.available_balance + account.used_margin
+        if actual != expected:
+            self.stats["invariant_violations"] += 1
+            logger.error(
+                f"Margin ledger invariant broken for user {account.user_id} after {kind}: "
+                f"available+used={actual}, expected={expected}"
+            )
+        if account.used_margin < 0:
+            logger.warning(
+                f"Margin ledger: negative used_margin {account.used_margin} for user "
+                f"{account.user_id} after {kind}"
+            )
+
+    # ------------------------------------------------------------------
+    # Movements
+    # ------------------------------------------------------------------
+
+    def get_available(self, user_id):
+        """Return (account found, available_balance) without changing anything"""
+        account = self.get_account(user_id)
+        if account is None:
+            return False, ZERO
+        return True, account.available_balance
+
+    def block(self, user_id, amount, description=""):
+        """Block margin if available. Returns (success, available_before) or None if no account."""
+        amount = Decimal(str(amount))
+
+        def fn(account):
+            if account.available_balance < amount:
+                return Rejected((False, account.available_balance))
+            return -amount, amount, ZERO, ZERO, (True, account.available_balance)
+
+        return self._apply(user_id, "block", fn, description)
+
+    def release(self, user_id, amount, realized_pnl=0, description=""):
+        """Release blocked margin and book realized P&L"""
+        amount = Decimal(str(amount))
+        realized_pnl = Decimal(str(realized_pnl))
+        return self._apply(
+            user_id,
+            "release",
+            lambda account: (amount + realized_pnl, -amount, realized_pnl, realized_pnl, True),
+            description,
+        )
+
+    def transfer_to_holdings(self, user_id, amount, description=""):
+        """Reduce used margin without crediting cash (value now sits in holdings)"""
+        amount = Decimal(str(amount))
+        return self._apply(
+            user_id,
+            "holdings_transfer",
+            lambda account: (ZERO, -amount, ZERO, -amount, True),
+            description,
+        )
+
+    def credit(self, user_id, amount, description=""):
+        """Credit cash to the available balance"""
+        amount = Decimal(str(amount))
+        return self._apply(
+            user_id, "credit", lambda account: (amount, ZERO, ZERO, amount, True), description
+        )
+
+    def reconcile(self, user_id, position_margin):
+        """Set used margin to the margin held by open positions. Returns the released discrepancy."""
+        position_margin = Decimal(str(position_margin))
+
+        def fn(account):
+            discrepancy = account.used_margin - position_margin
+            if discrepancy == 0:
+                return Rejected(ZERO)
+            return discrepancy, -discrepancy, ZERO, ZERO, discrepancy
+
+        return self._apply(user_id, "reconcile", fn, "margin reconciliation")
+
+    def apply_external(self, user_id, available_delta, used_delta, realized_delta, description=""):
+        """Mirror a change another writer already committed to sandbox_funds"""
+        if user_id not in self._accounts:
+            return  # Loaded fresh from the database on next use
+        available_delta = Decimal(str(available_delta))
+        used_delta = Decimal(str(used_delta))
+        realized_delta = Decimal(str(realized_delta))
+        self._apply(
+            user_id,
+            "external",
+            lambda account: (
+                available_delta,
+                used_delta,
+                realized_delta,
+                available_delta + used_delta,
+                True,
+            ),
+            description,
+            persist=False,
+        )
+
+    def set_unrealized(self, user_id, unrealized_pnl, persist=True):
+        """Update unrealized P&L (persist=False when the caller already wrote it)"""
+        account = self.get_account(user_id) if persist else self._accounts.get(user_id)
+        if account is None:
+            return None
+        unrealized_pnl = Decimal(str(unrealized_pnl))
+        with account.lock:
+            account.unrealized_pnl = unrealized_pnl
+            account.pending_unrealized = unrealized_pnl if persist else None
+        return True
+
+    def get_movements(self, user_id, limit=100) -> list[LedgerEntry]:
+        """Most recent movements for a user (oldest first)"""
+        account = self._accounts.get(user_id)
+        if account is None:
+            return []
+        with account.lock:
+            return list(account.entries)[-limit:]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def flush(self, user_ids=None) -> int:
+        """Write pending deltas to sandbox_funds in one transaction. Returns users written."""
+        from sandbox.fund_manager import FundManager
+
+        with self._flush_lock:
+            batch = {}
+            for user_id, account in list(self._accounts.items()):
+                if user_ids is not None and user_id not in user_ids:
+                    continue
+                with account.lock:
+                    if account.has_pending():
+                        batch[user_id] = account.take_pending()
+
+            for user_id in list(self._carry):
+                if user_ids is not None and user_id not in user_ids:
+                    continue
+                deltas, unrealized = self._carry.pop(user_id)
+                if user_id in batch:
+                    newer, newer_unrealized = batch[user_id]
+                    for key in DELTA_FIELDS:
+                        deltas[key] += newer[key]
+                    unrealized = newer_unrealized if newer_unrealized is not None else unrealized
+                batch[user_id] = (deltas, unrealized)
+
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            table = SandboxFunds.__table__
+            params = [
+                {
+                    "_user_id": user_id,
+                    "_available": float(deltas["available_balance"]),
+                    "_used": float(deltas["used_margin"]),
+                    "_realized": float(deltas["realized_pnl"]),
+                    "_today": float(deltas["today_realized_pnl"]),
+                    "_unrealized": float(unrealized) if unrealized is not None else None,
+                }
+                for user_id, (deltas, unrealized) in batch.items()
+            ]
+            new_unrealized = func.coalesce(bindparam("_unrealized"), table.c.unrealized_pnl)
+            statement = (
+                update(table)
+                .where(table.c.user_id == bindparam("_user_id"))
+                .values(
+                    available_balance=table.c.available_balance + bindparam("_available"),
+                    used_margin=table.c.used_margin + bindparam("_used"),
+                    realized_pnl=table.c.realized_pnl + bindparam("_realized"),
+                    today_realized_pnl=func.coalesce(table.c.today_realized_pnl, 0)
+                    + bindparam("_today"),
+                    unrealized_pnl=new_unrealized,
+                    total_pnl=table.c.realized_pnl + bindparam("_realized") + new_unrealized,
+                )
+            )
+
+            session = self._session_factory()
+            try:
+                with FundManager._lock:
+                    session.execute(statement, params)
+                    session.commit()
+            except Exception as e:
+                session.rollback()
+                self.stats["flush_errors"] += 1
+                self._carry.update(batch)
+                logger.exception(f"Error persisting margin ledger for {len(batch)} users: {e}")
+                return 0
+            finally:
+                session.close()
+
+            self.stats["flushes"] += 1
+            logger.debug(
+                f"Margin ledger persisted {len(batch)} users in "
+                f"{(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+            return len(batch)
+
+    def reload(self, user_id=None):
+        """Persist and drop cached accounts so the next use reads sandbox_funds again"""
+        with self._flush_lock:
+            with self._accounts_lock:
+                users = [user_id] if user_id is not None else list(self._accounts)
+                accounts = [self._accounts.get(u) for u in users]
+
+            for account in accounts:
+                if account is None:
+                    continue
+                with account.lock:
+                    if account.has_pending():
+                        deltas, unrealized = account.take_pending()
+                        self._carry[account.user_id] = (deltas, unrealized)
+                    account.detached = True
+                with self._accounts_lock:
+                    if self._accounts.get(account.user_id) is account:
+                        del self._accounts[account.user_id]
+
+            self.flush(set(users))
+
+    @contextmanager
+    def external_write(self, user_id=None):
+        """
+        Wrap code that writes sandbox_funds directly (resets, catch-up).
+
+        Pending movements are persisted first; afterwards cached accounts are
+        reloaded so they pick up the external change.
+        """
+        with self._flush_lock:
+            self.flush({user_id} if user_id is not None else None)
+            try:
+                yield
+            finally:
+                self.reload(user_id)
+
+
+# Global instance for singleton access
+_margin_ledger: MarginLedger | None = None
+_ledger_lock = threading.Lock()
+
+
+def get_margin_ledger() -> MarginLedger:
+    """Get or create the singleton margin ledger (starts the flusher thread)"""
+    global _margin_ledger
+
+    with _ledger_lock:
+        if _margin_ledger is None:
+            _margin_ledger = MarginLedger()
+        # Restarts the flusher after stop_margin_ledger(); accounts stay cached
+        _margin_ledger.start()
+        return _margin_ledger
+
+
+def get_active_margin_ledger() -> MarginLedger | None:
+    """The running ledger, or None if it has not been used in this process"""
+    return _margin_ledger
+
+
+@contextmanager
+def external_fund_write(user_id=None):
+    """Sync the margin ledger around a direct sandbox_funds write (no-op when unused)"""
+    ledger = _margin_ledger
+    if ledger is None:
+        yield
+        return
+    with ledger.external_write(user_id):
+        yield
+
+
+def stop_margin_ledger():
+    """Persist pending movements and stop the flusher thread"""
+    with _ledger_lock:
+        if _margin_ledger is not None:
+            _margin_ledger.stop()
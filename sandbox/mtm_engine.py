@@ -0,0 +1,466 @@
+# sandbox/mtm_engine.py
+"""
+MTM Engine - Batched mark-to-market for sandbox positions
+
+Features:
+- Prices open positions in one vectorized NumPy pass instead of per-row Decimal math
+- LTPs read from one MarketDataService snapshot, multiquotes fallback for missing symbols
+- contract_value multipliers applied per symbol (e.g. 0.01 for ETHUSD.P), looked up
+  again after a master contract reload
+- All-users run writes positions and fund unrealized P&L in one bulk update,
+  and resets fund unrealized P&L of users whose positions have all closed
+- Per-user results cached until the LTP of a symbol in the user's book changes
+- Users in a historical replay are priced from their replay clock's quotes, and
+  only by their own replay; live runs leave them alone
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import bindparam, update
+
+from database.sandbox_db import SandboxFunds, SandboxPositions, db_session
+from database.token_db import get_symbol_info
+from database.token_db_enhanced import get_cache
+from sandbox.margin_ledger import get_active_margin_ledger
+from sandbox.replay_clock import get_replay_clock, get_replaying_users
+from services.market_data_service import get_market_data_service
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Maximum age (seconds) for WebSocket data to be considered fresh
+WEBSOCKET_DATA_MAX_AGE = 5
+
+
+def compute_mtm(quantity, average_price, ltp, contract_value):
+    """
+    Vectorized unrealized P&L for open positions.
+
+    Same formulas as PositionManager._calculate_position_pnl / _calculate_pnl_percent:
+    long P&L = (ltp - avg) * qty * cv, short P&L = (avg - ltp) * |qty| * cv.
+
+    Args:
+        quantity: Net quantities (negative for short)
+        average_price: Average entry prices
+        ltp: Last traded prices
+        contract_value: Contract value multipliers
+
+    Returns:
+        tuple: (pnl, pnl_percent) as float64 arrays rounded to column precision
+    """
+    quantity = np.asarray(quantity, dtype=np.float64)
+    average_price = np.asarray(average_price, dtype=np.float64)
+    ltp = np.asarray(ltp, dtype=np.float64)
+    contract_value = np.asarray(contract_value, dtype=np.float64)
+
+    # (ltp - avg) * qty covers both directions since qty carries the sign
+    pnl = (ltp - average_price) * quantity * contract_value
+
+    direction = np.where(quantity > 0, 1.0, -1.0)
+    safe_avg = np.where(average_price > 0, average_price, 1.0)
+    pnl_percent = np.where(
+        average_price > 0, (ltp - average_price) / safe_avg * 100.0 * direction, 0.0
+    )
+
+    return np.round(pnl, 2), np.round(pnl_percent, 4)
+
+
+class MTMEngine:
+    """Computes MTM for many positions at once from a shared LTP snapshot"""
+
+    def __init__(self):
+        self.market_data_service = get_market_data_service()
+        self._lock = threading.Lock()
+
+        # (symbol, exchange) -> contract_value, looked up once per symbol and master contract load
+        self._contract_values: dict[tuple[str, str], float] = {}
+        self._symbol_cache_generation: int | None = None
+
+        # user_id -> {"versions", "signature", "computed_at"}
+        self._user_cache: dict[str, dict] = {}
+
+    # ------------------------------------------------------------------
+    # Pricing inputs
+    # ------------------------------------------------------------------
+
+    def _get_ltps(self, symbol_keys, clock=None):
+        """
+        LTP per (symbol, exchange): fresh WebSocket data first, multiquotes for the rest.
+        With a replay clock, the replayed quotes only.
+
+        Returns:
+            tuple: (ltps dict, set of keys priced from WebSocket data)
+        """
+        if clock is not None:
+            ltps = {}
+            for key in symbol_keys:
+                quote = clock.get_quote(*key)
+                if quote and quote.get("ltp"):
+                    ltps[key] = float(quote["ltp"])
+            return ltps, set()
+
+        now = time.time()
+        snapshot = self.market_data_service.get_ltp_snapshot(symbol_keys)
+        ltps = {
+            key: float(value)
+            for key, (value, last_update) in snapshot.items()
+            if value > 0 and now - last_update <= WEBSOCKET_DATA_MAX_AGE
+        }
+
+        from_websocket = set(ltps)
+        missing = [key for key in symbol_keys if key not in ltps]
+        if missing:
+            logger.debug(
+                f"MTM: {len(ltps)} from WebSocket, {len(missing)} need multiquotes fallback"
+            )
+            from sandbox.execution_engine import ExecutionEngine
+
+            for key, quote in ExecutionEngine()._fetch_quotes_batch(missing).items():
+                ltp = float(quote.get("ltp") or 0)
+                if ltp > 0:
+                    ltps[key] = ltp
+
+        return ltps, from_websocket
+
+    def _sync_contract_values(self):
+        """Drop contract values looked up before the symbol cache was last (re)loaded"""
+        generation = get_cache().generation
+        if generation != self._symbol_cache_generation:
+            self._contract_values.clear()
+            self._symbol_cache_generation = generation
+
+    def _get_contract_value(self, symbol, exchange):
+        key = (symbol, exchange)
+        if key not in self._contract_values:
+            cv = 1.0
+            try:
+                sym_info = get_symbol_info(symbol, exchange)
+                if sym_info and sym_info.contract_value:
+                    cv = float(sym_info.contract_value)
+            except Exception:
+                pass
+            self._contract_values[key] = cv
+        return self._contract_values[key]
+
+    def _price(self, quantities, avg_prices, symbol_keys, clock=None):
+        """Vectorized MTM for parallel lists; returns (priced, ltp, pnl, pnl_percent, from_websocket) arrays"""
+        ltps, websocket_keys = self._get_ltps(list(dict.fromkeys(symbol_keys)), clock)
+        self._sync_contract_values()
+
+        ltp = np.array([ltps.get(key, 0.0) for key in symbol_keys], dtype=np.float64)
+        cv = np.array([self._get_contract_value(*key) for key in symbol_keys], dtype=np.float64)
+        pnl, pnl_percent = compute_mtm(quantities, avg_prices, ltp, cv)
+
+        from_websocket = np.array([key in websocket_keys for key in symbol_keys], dtype=bool)
+
+        return ltp > 0, ltp, pnl, pnl_percent, from_websocket
+
+    # ------------------------------------------------------------------
+    # Per-user cache
+    # ------------------------------------------------------------------
+
+    def _cache_valid(self, user_id, signature, versions):
+        cached = self._user_cache.get(user_id)
+        return (
+            cached is not None
+            and cached["signature"] == signature
+            and cached["versions"] == versions
+            and time.time() - cached["computed_at"] <= WEBSOCKET_DATA_MAX_AGE
+        )
+
+    def _store_cache(self, user_id, signature, versions):
+        self._user_cache[user_id] = {
+            "signature": signature,
+            "versions": versions,
+            "computed_at": time.time(),
+        }
+
+    @staticmethod
+    def _book_versions(symbol_keys, ltp_versions):
+        """LTP versions of the symbols in one book; changes only when one of their LTPs changes"""
+        return tuple(sorted((key, ltp_versions[key]) for key in set(symbol_keys)))
+
+    @staticmethod
+    def _signature(positions):
+        return tuple(
+            sorted((p.id, p.quantity, str(p.average_price)) for p in positions if p.quantity != 0)
+        )
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def update_user_positions(self, user_id, positions) -> bool:
+        """
+        Update MTM on a user's SandboxPositions rows in one vectorized pass.
+
+        Returns:
+            bool: True if MTM was recomputed, False if the cached result was still current
+        """
+        open_positions = [p for p in positions if p.quantity != 0]
+        signature = self._signature(open_positions)
+        symbol_keys = [(p.symbol, p.exchange) for p in open_positions]
+
+        clock = get_replay_clock() or get_replay_clock(user_id)
+        if clock is not None:
+            # Replayed prices carry no tick versions and are never cached
+            self._user_cache.pop(user_id, None)
+            return self._update_from_clock(open_positions, symbol_keys, clock)
+
+        versions = self._book_versions(
+            symbol_keys, self.market_data_service.get_ltp_versions(list(set(symbol_keys)))
+        )
+        if self._cache_valid(user_id, signature, versions):
+            return False
+
+        if not open_positions:
+            self._store_cache(user_id, signature, versions)
+            return True
+
+        priced, ltp, pnl, pnl_percent, from_websocket = self._price(
+            [p.quantity for p in open_positions],
+            [float(p.average_price) for p in open_positions],
+            symbol_keys,
+        )
+
+        for i in np.flatnonzero(priced):
+            position = open_positions[i]
+            position.ltp = Decimal(str(ltp[i]))
+            # pnl = unrealized only (broker standard - Zerodha Kite style)
+            position.pnl = Decimal(str(pnl[i]))
+            position.pnl_percent = Decimal(str(pnl_percent[i]))
+
+        db_session.commit()
+
+        # Only cache results priced entirely from ticks - polled quotes have no tick version
+        if from_websocket.all():
+            self._store_cache(user_id, signature, versions)
+
+        return True
+
+    def _update_from_clock(self, open_positions, symbol_keys, clock) -> bool:
+        """Price a replaying user's open positions from the replay clock's quotes"""
+        if open_positions:
+            priced, ltp, pnl, pnl_percent, _ = self._price(
+                [p.quantity for p in open_positions],
+                [float(p.average_price) for p in open_positions],
+                symbol_keys,
+                clock,
+            )
+            for i in np.flatnonzero(priced):
+                position = open_positions[i]
+                position.ltp = Decimal(str(ltp[i]))
+                position.pnl = Decimal(str(pnl[i]))
+                position.pnl_percent = Decimal(str(pnl_percent[i]))
+            db_session.commit()
+        return True
+
+    def update_all(self, user_ids=None):
+        """
+        Reprice every open sandbox position across all users.
+
+        Loads open positions once, prices them from one LTP snapshot and writes
+        positions and fund unrealized P&L back in a single transaction. Users
+        whose last position closed get their fund unrealized P&L reset to 0.
+        A replay passes its own user and prices from its clock; live runs skip
+        users who are in a replay.
+
+        Args:
+            user_ids: Only reprice these users (default: all users not in a replay)
+
+        Returns:
+            dict: Summary with positions, users, rows updated and flat users reset
+        """
+        from sandbox.fund_manager import FundManager
+
+        clock = get_replay_clock()
+        if user_ids is not None:
+            user_filter = SandboxPositions.user_id.in_(list(user_ids))
+            fund_filter = SandboxFunds.user_id.in_(list(user_ids))
+            if clock is not None:
+                for user in user_ids:
+                    self._user_cache.pop(user, None)
+        else:
+            replaying = list(get_replaying_users())
+            user_filter = SandboxPositions.user_id.notin_(replaying)
+            fund_filter = SandboxFunds.user_id.notin_(replaying)
+
+        with self._lock:
+            start = time.perf_counter()
+
+            rows = (
+                db_session.query(
+                    SandboxPositions.id,
+                    SandboxPositions.user_id,
+                    SandboxPositions.symbol,
+                    SandboxPositions.exchange,
+                    SandboxPositions.quantity,
+                    SandboxPositions.average_price,
+                    SandboxPositions.ltp,
+                    SandboxPositions.pnl,
+                )
+                .filter(SandboxPositions.quantity != 0, user_filter)
+                .all()
+            )
+
+            flat_users = self._reset_flat_users(fund_filter, {row.user_id for row in rows})
+            if not rows:
+                return {"positions": 0, "users": 0, "updated": 0, "reset": len(flat_users)}
+
+            ids, user_ids, symbols, exchanges, quantities, avg_prices, old_ltps, old_pnls = zip(
+                *rows
+            )
+            # Versions read before pricing, so a tick arriving meanwhile invalidates the cache
+            ltp_versions = self.market_data_service.get_ltp_versions(list(set(zip(symbols, exchanges))))
+            priced, ltp, pnl, pnl_percent, from_websocket = self._price(
+                quantities,
+                [float(a) for a in avg_prices],
+                list(zip(symbols, exchanges)),
+                clock,
+            )
+
+            old_ltp = np.array([float(v or 0) for v in old_ltps], dtype=np.float64)
+            old_pnl = np.array([float(v or 0) for v in old_pnls], dtype=np.float64)
+            changed = priced & ((ltp != old_ltp) | (pnl != old_pnl))
+
+            # Unpriced positions keep their last P&L in the fund total
+            current_pnl = np.where(priced, pnl, old_pnl)
+            users, user_index = np.unique(np.array(user_ids, dtype=object), return_inverse=True)
+            unrealized = np.round(np.bincount(user_index, weights=current_pnl), 2)
+            polled = np.bincount(user_index, weights=~from_websocket, minlength=len(users))
+
+            try:
+                positions_table = SandboxPositions.__table__
+                if changed.any():
+                    db_session.execute(
+                        update(positions_table)
+                        .where(positions_table.c.id == bindparam("_id"))
+                        .values(
+                            ltp=bindparam("_ltp"),
+                            pnl=bindparam("_pnl"),
+                            pnl_percent=bindparam("_pnl_percent"),
+                        ),
+                        [
+                            {
+                                "_id": ids[i],
+                                "_ltp": float(ltp[i]),
+                                "_pnl": float(pnl[i]),
+                                "_pnl_percent": float(pnl_percent[i]),
+                            }
+                            for i in np.flatnonzero(changed)
+                        ],
+                    )
+
+                funds_table = SandboxFunds.__table__
+                with FundManager._lock:
+                    db_session.execute(
+                        update(funds_table)
+                        .where(funds_table.c.user_id == bindparam("_user_id"))
+                        .values(
+                            unrealized_pnl=bindparam("_unrealized"),
+                            total_pnl=funds_table.c.realized_pnl + bindparam("_unrealized"),
+                        ),
+                        [
+                            {"_user_id": user, "_unrealized": float(total)}
+                            for user, total in zip(users, unrealized)
+                        ],
+                    )
+                    db_session.commit()
+
+            except Exception:
+                db_session.rollback()
+                raise
+
+            ledger = get_active_margin_ledger()
+            if ledger:
+                for user, total in zip(users, unrealized):
+                    ledger.set_unrealized(user, Decimal(str(total)), persist=False)
+
+            # Cache users whose positions were all priced from ticks
+            by_user: dict[str, list] = {}
+            user_keys: dict[str, list] = {}
+            for i, user in enumerate(user_ids):
+                by_user.setdefault(user, []).append((ids[i], quantities[i], str(avg_prices[i])))
+                user_keys.setdefault(user, []).append((symbols[i], exchanges[i]))
+            for user, polled_count in zip(users, polled):
+                if polled_count == 0:
+                    self._store_cache(
+                        user,
+                        tuple(sorted(by_user[user])),
+                        self._book_versions(user_keys[user], ltp_versions),
+                    )
+
+            logger.debug(
+                f"Batch MTM: {len(rows)} positions, {len(users)} users, "
+                f"{int(changed.sum())} rows updated in {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+            return {
+                "positions": len(rows),
+                "users": len(users),
+                "updated": int(changed.sum()),
+                "reset": len(flat_users),
+            }
+
+    def _reset_flat_users(self, fund_filter, open_users):
+        """
+        Reset fund unrealized P&L to 0 for users without open positions.
+
+        Only rows still carrying a non-zero unrealized P&L are written, so a
+        user is reset once, after their last position closes.
+
+        Returns:
+            list: Users whose fund unrealized P&L was reset
+        """
+        from sandbox.fund_manager import FundManager
+
+        flat_users = [
+            user
+            for (user,) in db_session.query(SandboxFunds.user_id)
+            .filter(fund_filter, SandboxFunds.unrealized_pnl != 0)
+            .all()
+            if user not in open_users
+        ]
+        if not flat_users:
+            db_session.rollback()
+            return flat_users
+
+        funds_table = SandboxFunds.__table__
+        try:
+            with FundManager._lock:
+                db_session.execute(
+                    update(funds_table)
+                    .where(funds_table.c.user_id.in_(flat_users))
+                    .values(unrealized_pnl=0, total_pnl=funds_table.c.realized_pnl)
+                )
+                db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+        ledger = get_active_margin_ledger()
+        if ledger:
+            for user in flat_users:
+                ledger.set_unrealized(user, Decimal("0.00"), persist=False)
+
+        for user in flat_users:
+            self._user_cache.pop(user, None)
+
+        return flat_users
+
+
+# Global instance for singleton access
+_mtm_engine: MTMEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_mtm_engine() -> MTMEngine:
+    """Get or create the singleton MTM engine"""
+    global _mtm_engine
+
+    with _engine_lock:
+        if _mtm_engine is None:
+            _mtm_engine = MTMEngine()
+        return _mtm_engine
@@ -14,18 +14,18 @@ import os
 import sys
 import time
 import uuid
-from datetime import datetime
 from decimal import Decimal
 
-import pytz
-
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.sandbox_db import SandboxOrders, SandboxPositions, SandboxTrades, db_session
 from database.symbol import SymToken
 from database.token_db import get_symbol_info
+from sandbox.fill_journal import flush_pending_fills, is_fill_pending
 from sandbox.fund_manager import FundManager
+from sandbox.replay_clock import replay_scoped, sandbox_now
+from sandbox.squareoff_manager import is_book_frozen
 from utils.logging import get_logger
 from utils.symbol_utils import is_future, is_option
 
@@ -39,6 +39,7 @@ class OrderManager:
         self.user_id = user_id
         self.fund_manager = FundManager(user_id)
 
+    @replay_scoped
     def place_order(self, order_data):
         """
         Place a new order in sandbox mode
@@ -59,6 +60,9 @@ class OrderManager:
             tuple: (success: bool, response: dict, status_code: int)
         """
         try:
+            # Position and fund checks below must see fills still in the write-behind journal
+            flush_pending_fills()
+
             # Validate order data
             is_valid, validation_msg = self._validate_order(order_data)
             if not is_valid:
@@ -79,6 +83,18 @@ class OrderManager:
             product = order_data["product"].upper()
             strategy = order_data.get("strategy", "")
 
+            # Bulk square-off is closing this user's MIS book right now
+            if product == "MIS" and is_book_frozen(self.user_id):
+                return (
+                    False,
+                    {
+                        "status": "error",
+                        "message": "MIS square-off in progress for this account. Please retry in a moment.",
+                        "mode": "analyze",
+                    },
+                    400,
+                )
+
             # Get symbol info for lot size validation (from cache)
             symbol_obj = get_symbol_info(symbol, exchange)
             if not symbol_obj:
@@ -117,8 +133,7 @@ class OrderManager:
                 square_off_time = som.square_off_times.get(exchange)
 
                 if square_off_time:
-                    ist = pytz.timezone("Asia/Kolkata")
-                    now = datetime.now(ist)
+                    now = sandbox_now()
                     current_time = now.time()
 
                     # Market opens at 9:00 AM IST
@@ -508,7 +523,7 @@ class OrderManager:
                     pending_quantity=0,
                     rejection_reason=cnc_sell_rejection_reason,
                     margin_blocked=Decimal("0"),  # No margin blocked for rejected orders
-                    order_timestamp=datetime.now(pytz.timezone("Asia/Kolkata")),
+                    order_timestamp=sandbox_now(),
                 )
 
                 db_session.add(order)
@@ -551,7 +566,7 @@ class OrderManager:
                 pending_quantity=quantity,
                 rejection_reason=None,
                 margin_blocked=actual_margin_to_block,  # Store exact margin blocked
-                order_timestamp=datetime.now(pytz.timezone("Asia/Kolkata")),
+                order_timestamp=sandbox_now(),
             )
 
             db_session.add(order)
@@ -633,6 +648,7 @@ class OrderManager:
                 500,
             )
 
+    @replay_scoped
     def modify_order(self, orderid, new_data):
         """
         Modify an existing open order
@@ -645,6 +661,10 @@ class OrderManager:
             tuple: (success: bool, response: dict, status_code: int)
         """
         try:
+            # A background fill for this order may still be in the write-behind journal
+            if is_fill_pending(orderid):
+                flush_pending_fills()
+
             # Get existing order
             order = SandboxOrders.query.filter_by(orderid=orderid, user_id=self.user_id).first()
 
@@ -692,7 +712,7 @@ class OrderManager:
             if "trigger_price" in new_data and new_data["trigger_price"]:
                 order.trigger_price = Decimal(str(new_data["trigger_price"]))
 
-            order.update_timestamp = datetime.now(pytz.timezone("Asia/Kolkata"))
+            order.update_timestamp = sandbox_now()
 
             db_session.commit()
 
@@ -722,6 +742,7 @@ class OrderManager:
                 500,
             )
 
+    @replay_scoped
     def cancel_order(self, orderid):
         """
         Cancel an existing open order
@@ -733,6 +754,10 @@ class OrderManager:
             tuple: (success: bool, response: dict, status_code: int)
         """
         try:
+            # A background fill for this order may still be in the write-behind journal
+            if is_fill_pending(orderid):
+                flush_pending_fills()
+
             # Get existing order
             order = SandboxOrders.query.filter_by(orderid=orderid, user_id=self.user_id).first()
 
@@ -756,7 +781,7 @@ class OrderManager:
 
             # Update order status
             order.order_status = "cancelled"
-            order.update_timestamp = datetime.now(pytz.timezone("Asia/Kolkata"))
+            order.update_timestamp = sandbox_now()
 
             # Release blocked margin using the exact amount that was blocked
             if (
@@ -865,6 +890,9 @@ class OrderManager:
     def get_orderbook(self):
         """Get all orders for the user for current session only"""
         try:
+            # Include fills still in the write-behind journal
+            flush_pending_fills()
+
             import os
             from datetime import datetime, timedelta
             from datetime import time as dt_time
@@ -952,6 +980,9 @@ class OrderManager:
     def get_order_status(self, orderid):
         """Get status of a specific order"""
         try:
+            if is_fill_pending(orderid):
+                flush_pending_fills()
+
             order = SandboxOrders.query.filter_by(orderid=orderid, user_id=self.user_id).first()
 
             if not order:
@@ -1086,7 +1117,7 @@ class OrderManager:
         """
         import random
 
-        now = datetime.now(pytz.timezone("Asia/Kolkata"))
+        now = sandbox_now()
         date_prefix = now.strftime("%y%m%d")  # YYMMDD format
 
         # Use microseconds (0-999999) + random (0-99) for 8-digit unique sequence
@@ -8,6 +8,7 @@ Features:
 - Position netting (same symbol/exchange/product)
 - Open position retrieval with live P&L
 - Background MTM updates (configurable interval)
+- Vectorized batch MTM with per-user caching between tick batches (see mtm_engine.py)
 """
 
 import os
@@ -23,8 +24,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.sandbox_db import SandboxPositions, SandboxTrades, db_session, get_config
 from database.token_db import get_symbol_info
+from sandbox.fill_journal import flush_pending_fills
 from sandbox.fund_manager import FundManager
 from sandbox.holdings_manager import HoldingsManager
+from sandbox.mtm_engine import get_mtm_engine
+from sandbox.replay_clock import get_replay_clock, get_replaying_users, replay_scoped
 from services.market_data_service import get_market_data_service
 from services.quotes_service import get_multiquotes, get_quotes
 from utils.logging import get_logger
@@ -344,6 +348,7 @@ class PositionManager:
 
         logger.info(f"Expired position {symbol} settled successfully for user {position.user_id}")
 
+    @replay_scoped
     def get_open_positions(self, update_mtm=True):
         """
         Get all open positions for the user
@@ -357,6 +362,9 @@ class PositionManager:
             tuple: (success: bool, response: dict, status_code: int)
         """
         try:
+            # Include fills still in the write-behind journal
+            flush_pending_fills()
+
             import os
             from datetime import datetime, time, timedelta
 
@@ -457,8 +465,9 @@ class PositionManager:
             # This handles NRML positions where the contract has expired
             positions = self._check_and_close_expired_positions(positions)
 
+            mtm_updated = False
             if update_mtm:
-                self._update_positions_mtm(positions)
+                mtm_updated = self._update_positions_mtm(positions)
 
             positions_list = []
             total_unrealized_pnl = Decimal("0.00")  # Only from open positions
@@ -529,7 +538,8 @@ class PositionManager:
 
             # Update fund unrealized P&L (only from open positions)
             # Closed position P&L is already in realized_pnl, so don't include it here
-            if update_mtm:
+            # Skipped when MTM came from cache - funds already hold this value
+            if mtm_updated:
                 self.fund_manager.update_unrealized_pnl(total_unrealized_pnl)
 
             return (
@@ -592,80 +602,18 @@ class PositionManager:
         """
         Update MTM for all positions with live quotes.
         Uses WebSocket data first, falls back to multiquotes API if WebSocket data is stale.
+        Pricing runs in one vectorized pass through the shared MTM engine.
+
+        Returns:
+            bool: True if MTM was recomputed, False if the cached MTM is still current
         """
         try:
-            if not positions:
-                return
-
-            # Get unique symbols
-            symbols_to_fetch = set()
-            for position in positions:
-                if position.quantity != 0:  # Only fetch for open positions
-                    symbols_to_fetch.add((position.symbol, position.exchange))
-
-            if not symbols_to_fetch:
-                return
-
-            symbols_list = list(symbols_to_fetch)
-
-            # Try WebSocket data first (from MarketDataService)
-            quote_cache = self._fetch_quotes_from_websocket(symbols_list)
-            ws_count = len(quote_cache)
-
-            # Find symbols that need fallback to multiquotes
-            missing_symbols = [
-                s for s in symbols_list if s not in quote_cache or quote_cache[s] is None
-            ]
-
-            if missing_symbols:
-                # Fallback to multiquotes for missing symbols (no individual quote fallback to avoid rate limiting)
-                logger.debug(
-                    f"Positions MTM: {ws_count} from WebSocket, {len(missing_symbols)} need multiquotes fallback"
-                )
-                multiquotes_cache = self._fetch_quotes_batch(missing_symbols)
-                quote_cache.update(multiquotes_cache)
-
-                # Log any symbols that couldn't be fetched (don't fall back to individual quotes)
-                still_missing = [
-                    s for s in missing_symbols if s not in quote_cache or quote_cache[s] is None
-                ]
-                if still_missing:
-                    logger.debug(f"{len(still_missing)} symbols not available via multiquotes, waiting for WebSocket data")
-            else:
-                logger.debug(f"Positions MTM: All {ws_count} symbols from WebSocket (no API calls)")
-
-            # Update MTM for each position
-            for position in positions:
-                # Skip MTM update for closed positions (quantity = 0)
-                # They already have today's realized P&L stored in position.pnl
-                if position.quantity == 0:
-                    continue
-
-                quote = quote_cache.get((position.symbol, position.exchange))
-                if quote:
-                    ltp = Decimal(str(quote.get("ltp", 0)))
-                    if ltp > 0:
-                        position.ltp = ltp
-
-                        # Calculate current unrealized P&L for open position
-                        cv = self._get_contract_value(position.symbol, position.exchange)
-                        current_unrealized_pnl = self._calculate_position_pnl(
-                            position.quantity, position.average_price, ltp, contract_value=cv
-                        )
-
-                        # pnl = unrealized only (broker standard - Zerodha Kite style)
-                        # This is the primary P&L field for open positions
-                        position.pnl = current_unrealized_pnl
-
-                        position.pnl_percent = self._calculate_pnl_percent(
-                            position.average_price, ltp, position.quantity
-                        )
-
-            db_session.commit()
+            return get_mtm_engine().update_user_positions(self.user_id, positions)
 
         except Exception as e:
             db_session.rollback()
             logger.exception(f"Error updating positions MTM: {e}")
+            return True
 
     def _update_single_position_mtm(self, position):
         """
@@ -794,6 +742,11 @@ class PositionManager:
 
     def _fetch_quote(self, symbol, exchange):
         """Fetch real-time quote for a symbol using API key"""
+        # Replayed bars stand in for the broker during this user's historical replay
+        clock = get_replay_clock() or get_replay_clock(self.user_id)
+        if clock is not None:
+            return clock.get_quote(symbol, exchange)
+
         try:
             # Get any user's API key for fetching quotes
             from database.auth_db import ApiKeys, decrypt_token
@@ -835,6 +788,14 @@ class PositionManager:
         if not symbols_list:
             return quote_cache
 
+        clock = get_replay_clock() or get_replay_clock(self.user_id)
+        if clock is not None:
+            for symbol, exchange in symbols_list:
+                quote = clock.get_quote(symbol, exchange)
+                if quote:
+                    quote_cache[(symbol, exchange)] = quote
+            return quote_cache
+
         try:
             # Get any user's API key for fetching quotes
             from database.auth_db import ApiKeys, decrypt_token
@@ -886,6 +847,7 @@ class PositionManager:
 
         return quote_cache
 
+    @replay_scoped
     def close_position(self, symbol, exchange, product):
         """
         Close a position (square-off)
@@ -958,6 +920,9 @@ class PositionManager:
     def get_tradebook(self):
         """Get all executed trades for the user for current session only"""
         try:
+            # Include fills still in the write-behind journal
+            flush_pending_fills()
+
             import os
             from datetime import datetime, time, timedelta
 
@@ -1131,6 +1096,41 @@ class PositionManager:
             )
 
 
+def settle_expired_positions():
+    """
+    Auto-close open F&O positions of all users whose contract has expired.
+
+    Expiry is looked up once per symbol; only users holding an expired contract
+    are settled. Users in a historical replay are left to their replay.
+
+    Returns:
+        int: Number of positions settled
+    """
+    from datetime import date
+
+    open_positions = SandboxPositions.query.filter(
+        SandboxPositions.quantity != 0,
+        SandboxPositions.user_id.notin_(list(get_replaying_users())),
+    ).all()
+
+    today = date.today()
+    expired_keys = set()
+    for key in {(p.symbol, p.exchange) for p in open_positions}:
+        expiry_date = get_contract_expiry(*key)
+        if expiry_date is not None and today > expiry_date:
+            expired_keys.add(key)
+
+    expired_by_user = {}
+    for position in open_positions:
+        if (position.symbol, position.exchange) in expired_keys:
+            expired_by_user.setdefault(position.user_id, []).append(position)
+
+    for user_id, positions in expired_by_user.items():
+        PositionManager(user_id)._check_and_close_expired_positions(positions)
+
+    return sum(len(positions) for positions in expired_by_user.values())
+
+
 def update_all_positions_mtm():
     """Background task to update MTM for all positions"""
     try:
@@ -1141,21 +1141,24 @@ def update_all_positions_mtm():
             logger.debug("Market closed - skipping MTM update")
             return
 
-        # Get all unique users with positions
-        positions = SandboxPositions.query.all()
+        # Include fills still in the write-behind journal
+        flush_pending_fills()
 
-        if not positions:
-            logger.debug("No positions to update")
-            return
+        # Expired contracts are closed before pricing, so they drop out of the batch
+        settle_expired_positions()
 
-        users = set(p.user_id for p in positions)
-        logger.info(f"Updating MTM for {len(positions)} positions across {len(users)} users")
+        # Price every open position across all users in one batch
+        # (users in a historical replay are marked to market by their replay)
+        summary = get_mtm_engine().update_all()
 
-        for user_id in users:
-            pm = PositionManager(user_id)
-            pm.get_open_positions(update_mtm=True)
+        if not summary["positions"]:
+            logger.debug("No positions to update")
+            return
 
-        logger.info("MTM update completed")
+        logger.info(
+            f"MTM update completed: {summary['positions']} positions across {summary['users']} users "
+            f"({summary['updated']} changed)"
+        )
 
     except Exception as e:
         logger.exception(f"Error updating MTM for all positions: {e}")
@@ -0,0 +1,154 @@
+# sandbox/replay_clock.py
+"""
+Replay Clock - Sandbox time source
+
+Features:
+- sandbox_now() returns wall-clock IST time normally
+- Each historical replay owns a clock for the user who started it; the simulated
+  bar time replaces wall-clock time only for that user's sandbox, so order
+  timestamps, MIS cut-offs and square-off follow replayed time
+- A clock is bound to the replay thread, and to the replaying user's own order
+  and position calls, so other users keep live time and live quotes
+- Replay quotes registry used by the execution engine and MTM instead of broker quotes
+"""
+
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytz
+
+IST = pytz.timezone("Asia/Kolkata")
+
+
+class ReplayClock:
+    """Holds the simulated time and latest quotes of one user's replay"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._lock = threading.Lock()
+        self._current: datetime | None = None
+
+        # (symbol, exchange) -> quote dict built from replayed bars
+        self._quotes: dict[tuple[str, str], dict] = {}
+
+    @property
+    def active(self) -> bool:
+        return self._current is not None
+
+    def now(self) -> datetime | None:
+        return self._current
+
+    def set(self, current: datetime):
+        """Advance simulated time (timezone-aware IST datetime)"""
+        with self._lock:
+            self._current = current
+
+    def set_quote(self, symbol: str, exchange: str, quote: dict):
+        with self._lock:
+            self._quotes[(symbol, exchange)] = quote
+
+    def get_quote(self, symbol: str, exchange: str) -> dict | None:
+        with self._lock:
+            return self._quotes.get((symbol, exchange))
+
+    def reset(self):
+        """Return the sandbox to wall-clock time"""
+        with self._lock:
+            self._current = None
+            self._quotes.clear()
+
+
+# user_id -> clock of that user's running replay
+_clocks: dict[str, ReplayClock] = {}
+_clocks_lock = threading.Lock()
+
+# Clock bound to the current thread
+_bound = threading.local()
+
+
+def start_replay_clock(user_id: str) -> ReplayClock | None:
+    """Register a clock for a new replay; None if the user already has a replay running"""
+    with _clocks_lock:
+        if user_id in _clocks:
+            return None
+        clock = ReplayClock(user_id)
+        _clocks[user_id] = clock
+        return clock
+
+
+def stop_replay_clock(clock: ReplayClock):
+    """Unregister a replay clock and return its user to wall-clock time"""
+    with _clocks_lock:
+        if _clocks.get(clock.user_id) is clock:
+            del _clocks[clock.user_id]
+    clock.reset()
+
+
+@contextmanager
+def bind_replay_clock(clock: ReplayClock):
+    """Make the clock the sandbox time and quote source for the current thread"""
+    previous = getattr(_bound, "clock", None)
+    _bound.clock = clock
+    try:
+        yield clock
+    finally:
+        _bound.clock = previous
+
+
+@contextmanager
+def user_replay_scope(user_id: str):
+    """Bind the user's replay clock to the current thread while that user is replaying"""
+    clock = get_replay_clock(user_id)
+    if clock is None or get_replay_clock() is clock:
+        yield
+        return
+    with bind_replay_clock(clock):
+        yield
+
+
+def replay_scoped(method):
+    """Run a sandbox manager method (with a user_id attribute) under its user's replay clock"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with user_replay_scope(self.user_id):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def get_replay_clock(user_id: str | None = None) -> ReplayClock | None:
+    """
+    Get a replay clock
+
+    Args:
+        user_id: Return this user's running replay clock; None for the clock
+                 bound to the current thread
+    """
+    if user_id is None:
+        return getattr(_bound, "clock", None)
+    with _clocks_lock:
+        return _clocks.get(user_id)
+
+
+def get_replaying_users() -> set[str]:
+    """Users whose sandbox is currently driven by a historical replay"""
+    with _clocks_lock:
+        return set(_clocks)
+
+
+def is_replay_active(user_id: str | None = None) -> bool:
+    """Check if a historical replay drives the current thread, or the given user's sandbox"""
+    clock = get_replay_clock(user_id)
+    return clock is not None and clock.active
+
+
+def sandbox_now(user_id: str | None = None) -> datetime:
+    """Current sandbox time in IST - simulated time during the user's replay, wall clock otherwise"""
+    clock = get_replay_clock()
+    if clock is None and user_id is not None:
+        clock = get_replay_clock(user_id)
+    current = clock.now() if clock is not None else None
+    return current if current is not None else datetime.now(IST)
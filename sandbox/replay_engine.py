@@ -0,0 +1,359 @@
+# sandbox/replay_engine.py
+"""
+Replay Engine - Drives the sandbox from recorded Historify bars
+
+Features:
+- Synthesizes ticks from Historify OHLCV bars into the replay clock's quotes
+- Scoped to the user who started it: only that user's orders, positions and
+  square-off are driven, and live market data is left untouched
+- Advances the user's replay clock to each bar's time (see replay_clock.py)
+- Pending orders execute through ExecutionEngine._process_order, the same path as paper trading
+- MIS square-off and MTM follow simulated time, priced from replayed quotes
+- One replay per user at a time
+- Configurable speed: 0 = as fast as possible, N = N x real time
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from database.sandbox_db import SandboxOrders, db_session
+from sandbox.replay_clock import IST, bind_replay_clock, start_replay_clock, stop_replay_clock
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Position of each synthesized tick inside a bar, as a fraction of the bar length.
+# Ticks follow open -> first extreme -> second extreme -> close.
+TICK_OFFSETS = (0.0, 0.25, 0.5, 0.99)
+
+
+def bar_tick_path(open_, high, low, close):
+    """
+    Price path through a bar.
+
+    Up bars are assumed to visit the low before the high and down bars the
+    high before the low, so stops and limits inside the range are crossed
+    in a plausible order.
+    """
+    if close >= open_:
+        return (open_, low, high, close)
+    return (open_, high, low, close)
+
+
+class ReplayEngine:
+    """Replays Historify bars through the sandbox execution code paths"""
+
+    def __init__(
+        self,
+        user_id: str,
+        symbols: list[dict[str, str]],
+        start_date: str,
+        end_date: str,
+        interval: str = "1m",
+        speed: float | None = None,
+        mtm_every: int | None = None,
+    ):
+        """
+        Args:
+            user_id: Sandbox user whose orders and positions are replayed
+            symbols: List of {"symbol": ..., "exchange": ...}
+            start_date: First day to replay (YYYY-MM-DD)
+            end_date: Last day to replay (YYYY-MM-DD, inclusive)
+            interval: Historify interval to replay (1m or any intraday computed interval)
+            speed: Replay speed multiplier, 0 = as fast as possible
+            mtm_every: Run MTM every N bars
+        """
+        self.user_id = user_id
+        self.symbols = [(s["symbol"].upper(), s["exchange"].upper()) for s in symbols]
+        self.start_date = start_date
+        self.end_date = end_date
+        self.interval = interval
+        self.speed = float(speed if speed is not None else os.getenv("SANDBOX_REPLAY_SPEED", "0"))
+        self.mtm_every = max(1, int(mtm_every or os.getenv("SANDBOX_REPLAY_MTM_EVERY", "1")))
+
+        from database.historify_db import parse_interval
+
+        parsed = parse_interval(interval)
+        if not parsed or parsed.get("type") != "intraday":
+            raise ValueError(f"Replay needs an intraday interval, got '{interval}'")
+        self.interval_seconds = parsed["minutes"] * 60
+
+        self._stop_event = threading.Event()
+        self._bars: pd.DataFrame | None = None
+        self.status = {
+            "state": "idle",
+            "bars_total": 0,
+            "bars_processed": 0,
+            "orders_filled": 0,
+            "current_time": None,
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+
+    # ------------------------------------------------------------------
+    # Data
+    # ------------------------------------------------------------------
+
+    def load(self) -> int:
+        """Load bars for all symbols, merged in time order. Returns the number of bars."""
+        from database.historify_db import get_ohlcv
+
+        start_ts = int(IST.localize(datetime.strptime(self.start_date, "%Y-%m-%d")).timestamp())
+        end_ts = int(
+            IST.localize(datetime.strptime(self.end_date, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+        ) - 1
+
+        frames = []
+        for symbol, exchange in self.symbols:
+            df = get_ohlcv(symbol, exchange, self.interval, start_ts, end_ts)
+            if df is None or df.empty:
+                logger.warning(f"Replay: no {self.interval} data for {exchange}:{symbol}")
+                continue
+            df = df[["timestamp", "open", "high", "low", "close", "volume"]].copy()
+            df["symbol"] = symbol
+            df["exchange"] = exchange
+            frames.append(df)
+
+        if frames:
+            self._bars = (
+                pd.concat(frames, ignore_index=True)
+                .sort_values("timestamp", kind="stable")
+                .reset_index(drop=True)
+            )
+        else:
+            self._bars = pd.DataFrame()
+
+        self.status["bars_total"] = len(self._bars)
+        logger.info(
+            f"Replay loaded {len(self._bars)} bars for {len(frames)} symbols "
+            f"({self.start_date} to {self.end_date}, {self.interval})"
+        )
+        return len(self._bars)
+
+    def _load_open_orders(self, keys):
+        """The replaying user's open orders for the given (symbol, exchange) keys, grouped by key"""
+        symbols = {symbol for symbol, _ in keys}
+        orders_by_key: dict[tuple[str, str], list] = {}
+        for order in SandboxOrders.query.filter(
+            SandboxOrders.user_id == self.user_id,
+            SandboxOrders.order_status == "open",
+            SandboxOrders.symbol.in_(symbols),
+        ).all():
+            key = (order.symbol, order.exchange)
+            if key in keys:
+                orders_by_key.setdefault(key, []).append(order)
+        return orders_by_key
+
+    # ------------------------------------------------------------------
+    # Replay loop
+    # ------------------------------------------------------------------
+
+    def run(self):
+        """Replay all loaded bars. Blocks until finished or stopped."""
+        from sandbox.execution_engine import ExecutionEngine
+        from sandbox.mtm_engine import get_mtm_engine
+        from sandbox.squareoff_manager import SquareOffManager
+
+        if self._bars is None:
+            self.load()
+
+        clock = start_replay_clock(self.user_id)
+        if clock is None:
+            raise RuntimeError(f"A replay is already running for user {self.user_id}")
+
+        # Fills are written synchronously so the next tick sees updated positions and orders
+        engine = ExecutionEngine()
+        squareoff = SquareOffManager()
+        mtm = get_mtm_engine()
+        users = [self.user_id]
+
+        self.status.update(state="running", started_at=datetime.now(IST).isoformat())
+        bars = self._bars
+
+        try:
+            # Sandbox time and quotes in this thread come from the replay clock
+            with bind_replay_clock(clock):
+                self._replay_bars(clock, bars, engine, squareoff, mtm, users)
+
+            self.status["state"] = "stopped" if self._stop_event.is_set() else "completed"
+
+        except Exception as e:
+            logger.exception(f"Replay failed: {e}")
+            self.status.update(state="error", error=str(e))
+            db_session.rollback()
+            raise
+
+        finally:
+            stop_replay_clock(clock)
+            db_session.remove()
+            self.status["finished_at"] = datetime.now(IST).isoformat()
+            logger.info(
+                f"Replay {self.status['state']} for user {self.user_id}: "
+                f"{self.status['bars_processed']}/{self.status['bars_total']} bars, "
+                f"{self.status['orders_filled']} fills"
+            )
+
+    def _replay_bars(self, clock, bars, engine, squareoff, mtm, users):
+        """Step the clock through every bar, filling orders, squaring off and marking to market"""
+        if bars.empty:
+            return
+
+        timestamps = bars["timestamp"].to_numpy(dtype=np.int64)
+        opens = bars["open"].to_numpy(dtype=np.float64)
+        highs = bars["high"].to_numpy(dtype=np.float64)
+        lows = bars["low"].to_numpy(dtype=np.float64)
+        closes = bars["close"].to_numpy(dtype=np.float64)
+        volumes = bars["volume"].fillna(0).to_numpy()
+        keys = list(zip(bars["symbol"], bars["exchange"]))
+
+        # Row ranges sharing one bar timestamp
+        boundaries = np.flatnonzero(np.diff(timestamps)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(timestamps)]))
+
+        previous_ts = None
+        for group, (start, end) in enumerate(zip(starts, ends)):
+            if self._stop_event.is_set():
+                logger.info("Replay stopped")
+                break
+
+            wall_start = time.perf_counter()
+            bar_ts = int(timestamps[start])
+            rows = range(start, end)
+            orders_by_key = self._load_open_orders({keys[i] for i in rows})
+            paths = {i: bar_tick_path(opens[i], highs[i], lows[i], closes[i]) for i in rows}
+
+            for step, offset in enumerate(TICK_OFFSETS):
+                clock.set(datetime.fromtimestamp(bar_ts + offset * self.interval_seconds, IST))
+                for i in rows:
+                    symbol, exchange = keys[i]
+                    ltp = float(paths[i][step])
+                    is_close = step == len(TICK_OFFSETS) - 1
+                    quote = {
+                        "ltp": ltp,
+                        "bid": ltp,
+                        "ask": ltp,
+                        "open": float(opens[i]),
+                        "high": float(max(paths[i][: step + 1])),
+                        "low": float(min(paths[i][: step + 1])),
+                        "volume": int(volumes[i]) if is_close else 0,
+                    }
+                    # Replayed prices stay on the clock; the live LTP cache is never touched
+                    clock.set_quote(symbol, exchange, quote)
+                    self._execute_orders(engine, orders_by_key.get(keys[i]), quote)
+
+            # Bar close: square-off and MTM at simulated time
+            clock.set(datetime.fromtimestamp(bar_ts + self.interval_seconds, IST))
+            squareoff.check_and_square_off(user_ids=users)
+            if (group + 1) % self.mtm_every == 0:
+                mtm.update_all(user_ids=users)
+
+            self.status["bars_processed"] = int(end)
+            self.status["current_time"] = clock.now().isoformat()
+
+            if self.speed > 0:
+                # Overnight and weekend gaps are compressed to one bar
+                gap = self.interval_seconds
+                if previous_ts is not None:
+                    gap = min(bar_ts - previous_ts, self.interval_seconds)
+                delay = gap / self.speed - (time.perf_counter() - wall_start)
+                if delay > 0:
+                    self._stop_event.wait(delay)
+            previous_ts = bar_ts
+
+        mtm.update_all(user_ids=users)
+
+    def _execute_orders(self, engine, orders, quote):
+        """Run still-open orders for one symbol through the paper trading execution path"""
+        if not orders:
+            return
+
+        for order in list(orders):
+            engine._process_order(order, quote)
+            if order.order_status != "open":
+                orders.remove(order)
+                if order.order_status == "complete":
+                    self.status["orders_filled"] += 1
+
+    def stop(self):
+        """Ask the replay loop to stop after the current bar"""
+        self._stop_event.set()
+
+
+# user_id -> (replay, thread) of each user's current or last replay
+_replays: dict[str, tuple[ReplayEngine, threading.Thread]] = {}
+_replay_lock = threading.Lock()
+
+
+def start_replay(
+    user_id: str,
+    symbols: list[dict[str, str]],
+    start_date: str,
+    end_date: str,
+    interval: str = "1m",
+    speed: float | None = None,
+) -> tuple[bool, str]:
+    """
+    Start a historical replay of the user's sandbox in a background thread
+
+    Returns:
+        Tuple of (success, message)
+    """
+    with _replay_lock:
+        if is_replay_running(user_id):
+            return False, "A replay is already running"
+
+        try:
+            replay = ReplayEngine(user_id, symbols, start_date, end_date, interval=interval, speed=speed)
+            if not replay.load():
+                return False, "No Historify data found for the requested symbols and dates"
+        except ValueError as e:
+            return False, str(e)
+
+        def _run():
+            try:
+                replay.run()
+            except Exception:
+                pass  # Already logged and recorded in status
+
+        thread = threading.Thread(target=_run, daemon=True, name=f"SandboxReplay-{user_id}")
+        _replays[user_id] = (replay, thread)
+        thread.start()
+
+    logger.info(
+        f"Replay started for user {user_id}: {replay.status['bars_total']} bars "
+        f"at speed {replay.speed or 'max'}"
+    )
+    return True, f"Replay started with {replay.status['bars_total']} bars"
+
+
+def stop_replay(user_id: str) -> tuple[bool, str]:
+    """Stop the user's running replay"""
+    with _replay_lock:
+        if not is_replay_running(user_id):
+            return False, "No replay is running"
+        replay, thread = _replays[user_id]
+        replay.stop()
+
+    thread.join(timeout=30)
+    return True, "Replay stopped"
+
+
+def is_replay_running(user_id: str) -> bool:
+    """Check if the user's replay thread is active"""
+    entry = _replays.get(user_id)
+    return entry is not None and entry[1].is_alive()
+
+
+def get_replay_status(user_id: str) -> dict:
+    """Get progress of the user's current or last replay"""
+    entry = _replays.get(user_id)
+    if entry is None:
+        return {"state": "idle"}
+    return dict(entry[0].status)
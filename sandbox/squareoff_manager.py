@@ -6,12 +6,18 @@ Features:
 - Auto square-off for MIS positions at configured times
 - Exchange-specific timings (NSE/BSE: 3:15 PM, CDS/BCD: 4:45 PM, MCX: 11:30 PM, NCDEX: 5:00 PM)
 - Market order creation for position closure
+- Bulk square-off (opt-in): affected books frozen, one quote snapshot, one transaction
 - Background scheduler for automatic execution
+- Users in a historical replay are squared off by their replay at simulated time
 - Configurable square-off times
 """
 
 import os
+import random
 import sys
+import threading
+import time as time_module
+from contextlib import contextmanager
 from datetime import datetime, time
 from decimal import Decimal
 
@@ -20,12 +26,55 @@ import pytz
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database.sandbox_db import SandboxPositions, db_session, get_config
+from database.sandbox_db import (
+    SandboxFunds,
+    SandboxOrders,
+    SandboxPositions,
+    SandboxTrades,
+    db_session,
+    get_config,
+)
 from sandbox.position_manager import PositionManager
+from sandbox.replay_clock import get_replaying_users, sandbox_now
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Users whose MIS book is being squared off in bulk. Their MIS orders are
+# neither placed nor filled until the square-off transaction has committed.
+_frozen_users: set[str] = set()
+_frozen_lock = threading.Lock()
+
+
+def is_bulk_squareoff_enabled() -> bool:
+    """Check if square-off should close positions in one bulk transaction"""
+    return os.getenv("SANDBOX_BULK_SQUAREOFF", "false").lower() == "true"
+
+
+def is_book_frozen(user_id) -> bool:
+    """Check if a bulk square-off is currently closing this user's MIS book"""
+    return user_id in _frozen_users
+
+
+def user_filter(model, user_ids=None):
+    """Limit a query to the given users, or to users not in a historical replay"""
+    if user_ids is not None:
+        return model.user_id.in_(list(user_ids))
+    return model.user_id.notin_(list(get_replaying_users()))
+
+
+@contextmanager
+def frozen_books(user_ids):
+    """Freeze the MIS books of the given users for the duration of the block"""
+    user_ids = set(user_ids)
+    with _frozen_lock:
+        _frozen_users.update(user_ids)
+    try:
+        yield
+    finally:
+        with _frozen_lock:
+            _frozen_users.difference_update(user_ids)
+
 
 class SquareOffManager:
     """Manages automatic square-off of MIS positions"""
@@ -54,22 +103,41 @@ class SquareOffManager:
             logger.exception(f"Error parsing time '{time_str}': {e}")
             return time(15, 15)  # Default to 3:15 PM
 
-    def check_and_square_off(self):
+    def check_and_square_off(self, user_ids=None):
         """
         Check if it's time to square-off positions and execute
         Should be called frequently (e.g., every minute)
+
+        Args:
+            user_ids: Only square off these users (default: all users not in a replay)
         """
         try:
-            now = datetime.now(self.ist)
+            now = sandbox_now()
             current_time = now.time()
 
+            if is_bulk_squareoff_enabled():
+                positions_to_close, orders_to_cancel = self.get_due_for_square_off(
+                    current_time, user_ids
+                )
+                if positions_to_close or orders_to_cancel:
+                    logger.info(
+                        f"Found {len(positions_to_close)} MIS positions and "
+                        f"{len(orders_to_cancel)} open MIS orders to square-off"
+                    )
+                    self.bulk_square_off(positions_to_close, orders_to_cancel)
+                else:
+                    logger.debug(
+                        f"No positions due for square-off at {current_time.strftime('%H:%M')}"
+                    )
+                return
+
             # Step 1: Cancel all open MIS orders past square-off time
-            self._cancel_open_mis_orders(current_time)
+            self._cancel_open_mis_orders(current_time, user_ids)
 
             # Step 2: Get all open MIS positions (quantity != 0)
             mis_positions = (
                 SandboxPositions.query.filter_by(product="MIS")
-                .filter(SandboxPositions.quantity != 0)
+                .filter(SandboxPositions.quantity != 0, user_filter(SandboxPositions, user_ids))
                 .all()
             )
 
@@ -101,14 +169,261 @@ class SquareOffManager:
         except Exception as e:
             logger.exception(f"Error checking square-off conditions: {e}")
 
-    def _cancel_open_mis_orders(self, current_time):
+    def get_due_for_square_off(self, current_time, user_ids=None):
+        """
+        MIS positions and open MIS orders whose exchange is past its square-off time
+
+        Args:
+            current_time: Sandbox time of day
+            user_ids: Only these users (default: all users not in a replay)
+
+        Returns:
+            tuple: (positions, orders)
+        """
+        due_exchanges = [
+            exchange
+            for exchange, square_off_time in self.square_off_times.items()
+            if current_time >= square_off_time
+        ]
+        if not due_exchanges:
+            return [], []
+
+        positions = (
+            SandboxPositions.query.filter_by(product="MIS")
+            .filter(
+                SandboxPositions.quantity != 0,
+                SandboxPositions.exchange.in_(due_exchanges),
+                user_filter(SandboxPositions, user_ids),
+            )
+            .all()
+        )
+        orders = SandboxOrders.query.filter(
+            SandboxOrders.product == "MIS",
+            SandboxOrders.order_status == "open",
+            SandboxOrders.exchange.in_(due_exchanges),
+            user_filter(SandboxOrders, user_ids),
+        ).all()
+        return positions, orders
+
+    def bulk_square_off(self, positions, orders=()):
+        """
+        Close MIS positions and cancel open MIS orders in one pass
+
+        The affected users' MIS books are frozen, every position is filled at
+        the bid/ask of one quote snapshot (the MARKET order price of
+        ExecutionEngine), and all closing orders, trades, position updates and
+        fund releases are written in a single transaction. Positions without a
+        quote are handed to the regular order path afterwards.
+
+        Returns:
+            dict: Counts of closed positions, cancelled orders and deferred positions
+        """
+        from sandbox.execution_engine import ExecutionEngine
+        from sandbox.fill_journal import flush_pending_fills
+        from sandbox.fund_manager import FundManager
+        from sandbox.margin_ledger import external_fund_write
+
+        summary = {"closed": 0, "cancelled": 0, "deferred": 0}
+        position_ids = [p.id for p in positions]
+        order_ids = [o.orderid for o in orders]
+        user_ids = {p.user_id for p in positions} | {o.user_id for o in orders}
+        if not user_ids:
+            return summary
+
+        start = time_module.perf_counter()
+        unpriced = []
+        unblocked_orders = []
+
+        with frozen_books(user_ids):
+            # Fills journaled before the freeze have to be netted against
+            flush_pending_fills()
+
+            with external_fund_write():
+                try:
+                    db_session.expire_all()
+                    positions = (
+                        SandboxPositions.query.filter(
+                            SandboxPositions.id.in_(position_ids), SandboxPositions.quantity != 0
+                        ).all()
+                        if position_ids
+                        else []
+                    )
+                    orders = (
+                        SandboxOrders.query.filter(
+                            SandboxOrders.orderid.in_(order_ids),
+                            SandboxOrders.order_status == "open",
+                        ).all()
+                        if order_ids
+                        else []
+                    )
+
+                    now = sandbox_now()
+                    # user_id -> [margin released, realized P&L]
+                    fund_deltas: dict[str, list[Decimal]] = {}
+
+                    def releaser(user_id):
+                        def release(amount, realized_pnl=0, description=""):
+                            delta = fund_deltas.setdefault(user_id, [Decimal("0"), Decimal("0")])
+                            delta[0] += Decimal(str(amount))
+                            delta[1] += Decimal(str(realized_pnl))
+
+                        return release
+
+                    for order in orders:
+                        if not order.margin_blocked:
+                            # Old orders without stored margin need the recalculating cancel path
+                            unblocked_orders.append((order.user_id, order.orderid))
+                            continue
+                        order.order_status = "cancelled"
+                        order.update_timestamp = now
+                        releaser(order.user_id)(order.margin_blocked)
+                        summary["cancelled"] += 1
+
+                    engine = ExecutionEngine()
+
+                    def close_leg(position):
+                        action = "SELL" if position.quantity > 0 else "BUY"
+                        return position.symbol, position.exchange, action
+
+                    prices = engine.get_market_fill_prices(close_leg(p) for p in positions)
+                    priced = [p for p in positions if close_leg(p) in prices]
+                    unpriced = [p.id for p in positions if close_leg(p) not in prices]
+
+                    for position, orderid in zip(priced, self._new_order_ids(len(priced), now)):
+                        leg = close_leg(position)
+                        price = prices[leg]
+                        quantity = abs(position.quantity)
+                        close_order = SandboxOrders(
+                            orderid=orderid,
+                            user_id=position.user_id,
+                            strategy="AUTO_SQUARE_OFF",
+                            symbol=position.symbol,
+                            exchange=position.exchange,
+                            action=leg[2],
+                            quantity=quantity,
+                            price=price,
+                            price_type="MARKET",
+                            product=position.product,
+                            order_status="complete",
+                            average_price=price,
+                            filled_quantity=quantity,
+                            pending_quantity=0,
+                            margin_blocked=Decimal("0.00"),
+                            order_timestamp=now,
+                            update_timestamp=now,
+                        )
+                        db_session.add(close_order)
+                        db_session.add(
+                            SandboxTrades(
+                                tradeid=engine._generate_trade_id(),
+                                orderid=orderid,
+                                user_id=position.user_id,
+                                symbol=position.symbol,
+                                exchange=position.exchange,
+                                action=close_order.action,
+                                quantity=quantity,
+                                price=price,
+                                product=position.product,
+                                strategy="AUTO_SQUARE_OFF",
+                                trade_timestamp=now,
+                            )
+                        )
+                        engine._apply_fill_to_position(
+                            position, close_order, price, releaser(position.user_id)
+                        )
+                        summary["closed"] += 1
+
+                    # Same fund changes as FundManager.release_margin, one row update per user
+                    with FundManager._lock:
+                        if fund_deltas:
+                            for funds in SandboxFunds.query.filter(
+                                SandboxFunds.user_id.in_(list(fund_deltas))
+                            ).all():
+                                released, realized_pnl = fund_deltas[funds.user_id]
+                                funds.used_margin -= released
+                                funds.available_balance += released + realized_pnl
+                                funds.realized_pnl += realized_pnl
+                                funds.today_realized_pnl = (
+                                    funds.today_realized_pnl or Decimal("0.00")
+                                ) + realized_pnl
+                                funds.total_pnl = funds.realized_pnl + funds.unrealized_pnl
+                        db_session.commit()
+
+                except Exception as e:
+                    db_session.rollback()
+                    logger.exception(f"Bulk square-off failed, will retry on the next check: {e}")
+                    return {"closed": 0, "cancelled": 0, "deferred": 0}
+
+        logger.info(
+            f"Bulk square-off: {summary['closed']} positions closed, {summary['cancelled']} orders "
+            f"cancelled for {len(user_ids)} users in {(time_module.perf_counter() - start) * 1000:.1f}ms"
+        )
+
+        self._validate_margins(user_ids)
+
+        from sandbox.order_manager import OrderManager
+
+        for user_id, orderid in unblocked_orders:
+            success, _, _ = OrderManager(user_id).cancel_order(orderid)
+            if success:
+                summary["cancelled"] += 1
+
+        if unpriced:
+            logger.warning(
+                f"Bulk square-off: no quote for {len(unpriced)} positions, placing market orders instead"
+            )
+            self._square_off_positions(
+                SandboxPositions.query.filter(
+                    SandboxPositions.id.in_(unpriced),
+                    SandboxPositions.quantity != 0,
+                ).all()
+            )
+            summary["deferred"] = len(unpriced)
+
+        return summary
+
+    def _new_order_ids(self, count, now):
+        """Order IDs in the OrderManager format, unique within the batch and the order book"""
+        date_prefix = now.strftime("%y%m%d")
+        orderids: set[str] = set()
+        while len(orderids) < count:
+            candidates = {
+                f"{date_prefix}{random.randrange(10**8):08d}" for _ in range(count - len(orderids))
+            }
+            taken = {
+                row.orderid
+                for row in SandboxOrders.query.with_entities(SandboxOrders.orderid)
+                .filter(SandboxOrders.orderid.in_(candidates))
+                .all()
+            }
+            orderids |= candidates - taken
+        return list(orderids)
+
+    def _validate_margins(self, user_ids):
+        """Post-fill margin check of the regular execution path, once per user"""
+        from sandbox.fund_manager import reconcile_margin, validate_margin_consistency
+
+        for user_id in user_ids:
+            is_consistent, discrepancy = validate_margin_consistency(user_id)
+            if not is_consistent:
+                logger.warning(
+                    f"Margin inconsistency detected after bulk square-off for user {user_id}: "
+                    f"discrepancy={discrepancy}. Auto-reconciling..."
+                )
+                reconcile_margin(user_id, auto_fix=True)
+
+    def _cancel_open_mis_orders(self, current_time, user_ids=None):
         """Cancel all open MIS orders past their exchange's square-off time"""
         try:
             from database.sandbox_db import SandboxOrders
             from sandbox.order_manager import OrderManager
 
             # Get all open MIS orders
-            open_orders = SandboxOrders.query.filter_by(product="MIS", order_status="open").all()
+            open_orders = (
+                SandboxOrders.query.filter_by(product="MIS", order_status="open")
+                .filter(user_filter(SandboxOrders, user_ids))
+                .all()
+            )
 
             if not open_orders:
                 return
@@ -194,7 +509,10 @@ class SquareOffManager:
                 return True, "No positions to square-off"
 
             logger.warning(f"Force squaring-off {len(mis_positions)} MIS positions")
-            self._square_off_positions(mis_positions)
+            if is_bulk_squareoff_enabled():
+                self.bulk_square_off(mis_positions)
+            else:
+                self._square_off_positions(mis_positions)
 
             return True, f"Force square-off initiated for {len(mis_positions)} positions"
 
@@ -210,7 +528,7 @@ class SquareOffManager:
             if not square_off_time:
                 return None
 
-            now = datetime.now(self.ist)
+            now = sandbox_now()
             current_time = now.time()
 
             # Create datetime objects for comparison
@@ -230,7 +548,7 @@ class SquareOffManager:
     def get_square_off_status(self):
         """Get status of square-off times for all exchanges"""
         try:
-            now = datetime.now(self.ist)
+            now = sandbox_now()
             current_time = now.time()
 
             status = {}
@@ -260,8 +578,6 @@ def run_square_off_check():
 
 if __name__ == "__main__":
     """Run square-off manager in standalone mode"""
-    import time as time_module
-
     logger.info("Starting Sandbox Square-Off Manager")
 
     from database.sandbox_db import init_db
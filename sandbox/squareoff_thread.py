@@ -274,16 +274,18 @@ def _schedule_square_off_jobs(scheduler):
             """Reset today_realized_pnl for all users at session boundary"""
             try:
                 from database.sandbox_db import SandboxFunds, SandboxPositions, db_session
+                from sandbox.margin_ledger import external_fund_write
 
-                # Reset funds - today_realized_pnl
-                funds_count = SandboxFunds.query.update({"today_realized_pnl": Decimal("0.00")})
+                with external_fund_write():
+                    # Reset funds - today_realized_pnl
+                    funds_count = SandboxFunds.query.update({"today_realized_pnl": Decimal("0.00")})
 
-                # Reset positions - today_realized_pnl
-                positions_count = SandboxPositions.query.update(
-                    {"today_realized_pnl": Decimal("0.00")}
-                )
+                    # Reset positions - today_realized_pnl
+                    positions_count = SandboxPositions.query.update(
+                        {"today_realized_pnl": Decimal("0.00")}
+                    )
 
-                db_session.commit()
+                    db_session.commit()
                 logger.info(
                     f"Daily P&L reset completed: {funds_count} funds, {positions_count} positions reset"
                 )
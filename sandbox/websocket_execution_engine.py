@@ -21,6 +21,8 @@ from typing import Dict, List, Optional, Set
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.sandbox_db import SandboxOrders, db_session
+from sandbox.fill_journal import is_fill_pending
+from sandbox.replay_clock import get_replaying_users
 from services.market_data_service import get_market_data_service
 from services.websocket_service import subscribe_to_symbols, unsubscribe_from_symbols
 from utils.logging import get_logger
@@ -59,8 +61,9 @@ class WebSocketExecutionEngine:
 
         # Import execution engine for order processing and fallback
         from sandbox.execution_engine import ExecutionEngine
+        from sandbox.fill_journal import is_write_behind_enabled
 
-        self._execution_engine = ExecutionEngine()
+        self._execution_engine = ExecutionEngine(write_behind=is_write_behind_enabled())
 
     def start(self):
         """Start the WebSocket execution engine"""
@@ -262,6 +265,10 @@ class WebSocketExecutionEngine:
                     self.notify_order_completed(order_id, "", None)
                 return
 
+            # A historical replay executes this user's orders from its own loop
+            if order.user_id in get_replaying_users():
+                return
+
             # Create a mock quote for the execution engine's _process_order method
             quote = {
                 "ltp": float(ltp),
@@ -273,9 +280,9 @@ class WebSocketExecutionEngine:
             self._execution_engine._process_order(order, quote)
 
             # If order was executed, remove from index
-            # Refresh the order to check status
+            # Refresh the order to check status (journaled fills are not in the DB yet)
             db_session.refresh(order)
-            if order.order_status != "open":
+            if order.order_status != "open" or is_fill_pending(order_id):
                 symbol_key = f"{order.exchange}:{order.symbol}"
                 self.notify_order_completed(order_id, symbol_key, order.user_id)
 
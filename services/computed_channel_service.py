@@ -0,0 +1,541 @@
+"""
+Computed Channel Service
+
+Derived analytics streamed by the WebSocket proxy. Instead of every option
+chain, GEX or straddle page polling a REST endpoint that recomputes the whole
+chain, clients subscribe to a computed channel and share one computation:
+
+    {"action": "subscribe_computed", "channels": ["CHAIN_GREEKS:NIFTY:28NOV25"],
+     "exchange": "NFO", "strike_count": 10}
+
+Channels (<KIND>:<UNDERLYING>:<EXPIRY>):
+- CHAIN_GREEKS: IV, delta, gamma, theta and vega of every CE/PE in the window
+- NET_GEX: gamma exposure per strike (gamma * OI * lot size) and net totals
+- STRADDLE: ATM straddle premium and synthetic future
+- PCR: OI/volume put-call ratio and max pain of the window
+
+All channels of one user and underlying/expiry/window share one computation,
+which reads the chain with that user's own API key. With OPTION_CHAIN_STREAMING
+enabled the chain is the user's live chain session, and a chain is recomputed
+only after that session applied a tick (at most every COMPUTED_CHANNEL_INTERVAL
+seconds) and once a minute for time decay. Otherwise every read is a broker
+snapshot, so the chain is re-read only every COMPUTED_CHANNEL_POLL_INTERVAL
+seconds. Due chains are recomputed concurrently. Greeks are
+re-solved only for legs whose price or the underlying moved since the last pass,
+and a payload is pushed only when it changed.
+
+Configuration (.env):
+- COMPUTED_CHANNEL_INTERVAL: Minimum seconds between recomputations of a chain (default: 1)
+- COMPUTED_CHANNEL_POLL_INTERVAL: Seconds between snapshot reads of chains that are
+  not streamed (default: 5, never below COMPUTED_CHANNEL_INTERVAL)
+- COMPUTED_CHANNEL_STRIKE_COUNT: Default strikes each side of ATM (default: 10)
+- COMPUTED_CHANNEL_WORKERS: Chains recomputed in parallel (default: 4)
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from services import option_chain_service
+from services.oi_tracker_service import compute_oi_analytics
+from services.option_chain_service import get_option_chain
+from services.option_chain_session_service import get_option_chain_sessions, session_key
+from services.option_greeks_service import calculate_greeks_batch
+from utils.constants import CRYPTO_EXCHANGES
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+COMPUTE_INTERVAL = float(os.getenv("COMPUTED_CHANNEL_INTERVAL", "1"))
+POLL_INTERVAL = max(COMPUTE_INTERVAL, float(os.getenv("COMPUTED_CHANNEL_POLL_INTERVAL", "5")))
+DEFAULT_STRIKE_COUNT = int(os.getenv("COMPUTED_CHANNEL_STRIKE_COUNT", "10"))
+COMPUTE_WORKERS = max(1, int(os.getenv("COMPUTED_CHANNEL_WORKERS", "4")))
+MAX_STRIKE_COUNT = 50
+
+CHANNEL_KINDS = ("CHAIN_GREEKS", "NET_GEX", "STRADDLE", "PCR")
+
+_GREEK_FIELDS = ("delta", "gamma", "theta", "vega")
+
+
+def parse_channel(channel: str) -> tuple[str, str, str]:
+    """
+    Split a channel name into (kind, underlying, expiry).
+
+    Args:
+        channel: Channel name, e.g. "CHAIN_GREEKS:NIFTY:28NOV25"
+
+    Returns:
+        Tuple of (kind, underlying, expiry_date), upper-cased
+
+    Raises:
+        ValueError: If the name is malformed or the kind is unknown
+    """
+    parts = [part.strip().upper() for part in str(channel or "").split(":")]
+    if len(parts) != 3 or not all(parts):
+        raise ValueError(f"Invalid channel '{channel}', expected KIND:UNDERLYING:EXPIRY")
+    if parts[0] not in CHANNEL_KINDS:
+        raise ValueError(
+            f"Unknown channel type '{parts[0]}', supported: {', '.join(CHANNEL_KINDS)}"
+        )
+    return parts[0], parts[1], parts[2]
+
+
+def _options_exchange(exchange: str) -> str:
+    exchange = exchange.upper()
+    if exchange in ("NSE_INDEX", "NSE"):
+        return "NFO"
+    if exchange in ("BSE_INDEX", "BSE"):
+        return "BFO"
+    return exchange
+
+
+class ChainComputation:
+    """Shared analytics state for one user's underlying/exchange/expiry/strike window"""
+
+    def __init__(
+        self,
+        underlying: str,
+        exchange: str,
+        expiry_date: str,
+        strike_count: int,
+        username: str,
+        api_key: str,
+    ):
+        self.underlying = underlying
+        self.exchange = exchange
+        self.expiry_date = expiry_date
+        self.strike_count = strike_count
+        self.options_exchange = _options_exchange(exchange)
+        self.username = username
+        self.api_key = api_key  # the subscribing user's key, used for every chain read
+        # Same key as the user's chain session, so its ticks map to this computation
+        self.key = session_key(username, underlying, exchange, expiry_date, strike_count)
+
+        self.subscribers: dict[str, set[Any]] = {kind: set() for kind in CHANNEL_KINDS}
+        self.payloads: dict[str, dict[str, Any]] = {}  # last pushed payload per kind
+        self.last_compute_at = 0.0
+        self.last_error: str | None = None
+        self.ticked = True  # the chain changed since the last pass (first pass always runs)
+
+        # symbol -> ((ltp, spot, minute), greeks) - legs with unchanged inputs are reused
+        self._greeks_cache: dict[str, tuple[tuple, dict[str, Any] | None]] = {}
+        self.legs_computed = 0
+        self.legs_reused = 0
+
+    def channel(self, kind: str) -> str:
+        return f"{kind}:{self.underlying}:{self.expiry_date}"
+
+    def has_subscribers(self) -> bool:
+        return any(self.subscribers.values())
+
+    def compute(self, chain_response: dict[str, Any]) -> dict[str, dict[str, Any]]:
+        """
+        Build every channel payload from one option chain response.
+
+        Args:
+            chain_response: get_option_chain() response
+
+        Returns:
+            Dict of kind -> payload
+        """
+        chain = chain_response.get("chain", [])
+        spot = chain_response.get("underlying_ltp") or 0
+        atm_strike = chain_response.get("atm_strike")
+        greeks = self._leg_greeks(chain, spot)
+
+        header = {
+            "underlying": self.underlying,
+            "exchange": self.exchange,
+            "expiry_date": self.expiry_date,
+            "spot_price": spot,
+            "atm_strike": atm_strike,
+        }
+
+        greeks_rows = []
+        gex_rows = []
+        total_ce_gex = total_pe_gex = 0.0
+        straddle = None
+        strikes, ce_oi, pe_oi, ce_volume, pe_volume = [], [], [], [], []
+
+        for item in chain:
+            strike = item["strike"]
+            ce, pe = item.get("ce"), item.get("pe")
+            greeks_row = {"strike": strike}
+            gex_row = {"strike": strike, "ce_gex": 0.0, "pe_gex": 0.0}
+            for key, leg in (("ce", ce), ("pe", pe)):
+                if not leg:
+                    greeks_row[key] = None
+                    continue
+                leg_greeks = greeks.get(leg.get("symbol"))
+                greeks_row[key] = {
+                    "symbol": leg.get("symbol"),
+                    "ltp": leg.get("ltp"),
+                    "iv": leg_greeks["iv"] if leg_greeks else None,
+                    **{name: leg_greeks[name] if leg_greeks else None for name in _GREEK_FIELDS},
+                }
+                gamma = (leg_greeks or {}).get("gamma") or 0
+                gex_row[f"{key}_gex"] = round(
+                    gamma * (leg.get("oi") or 0) * (leg.get("lotsize") or 1), 2
+                )
+            gex_row["net_gex"] = round(gex_row["ce_gex"] - gex_row["pe_gex"], 2)
+            total_ce_gex += gex_row["ce_gex"]
+            total_pe_gex += gex_row["pe_gex"]
+            greeks_rows.append(greeks_row)
+            gex_rows.append(gex_row)
+
+            strikes.append(strike)
+            ce_oi.append((ce or {}).get("oi") or 0)
+            pe_oi.append((pe or {}).get("oi") or 0)
+            ce_volume.append((ce or {}).get("volume") or 0)
+            pe_volume.append((pe or {}).get("volume") or 0)
+
+            if strike == atm_strike and ce and pe:
+                ce_ltp, pe_ltp = ce.get("ltp") or 0, pe.get("ltp") or 0
+                straddle = {
+                    "ce_symbol": ce.get("symbol"),
+                    "pe_symbol": pe.get("symbol"),
+                    "ce_ltp": ce_ltp,
+                    "pe_ltp": pe_ltp,
+                    "straddle_premium": round(ce_ltp + pe_ltp, 2),
+                    "synthetic_future": round(strike + ce_ltp - pe_ltp, 2),
+                }
+
+        analytics = compute_oi_analytics(strikes, ce_oi, pe_oi, ce_volume, pe_volume)
+
+        return {
+            "CHAIN_GREEKS": {**header, "chain": greeks_rows},
+            "NET_GEX": {
+                **header,
+                "chain": gex_rows,
+                "total_ce_gex": round(total_ce_gex, 2),
+                "total_pe_gex": round(total_pe_gex, 2),
+                "total_net_gex": round(total_ce_gex - total_pe_gex, 2),
+            },
+            "STRADDLE": {**header, **(straddle or {"straddle_premium": None})},
+            "PCR": {
+                **header,
+                "total_ce_oi": int(analytics["total_ce_oi"]),
+                "total_pe_oi": int(analytics["total_pe_oi"]),
+                "pcr_oi": analytics["pcr_oi"],
+                "pcr_volume": analytics["pcr_volume"],
+                "max_pain_strike": analytics["max_pain_strike"],
+            },
+        }
+
+    def _leg_greeks(self, chain: list[dict[str, Any]], spot: float) -> dict[str, dict | None]:
+        """Greeks per option symbol, solving only legs whose inputs changed"""
+        minute = int(time.time() // 60)
+        result: dict[str, dict | None] = {}
+        requests, inputs = [], []
+        for item in chain:
+            for leg in (item.get("ce"), item.get("pe")):
+                if not leg or not leg.get("symbol"):
+                    continue
+                symbol = leg["symbol"]
+                key = (leg.get("ltp") or 0, spot, minute)
+                cached = self._greeks_cache.get(symbol)
+                if cached is not None and cached[0] == key:
+                    result[symbol] = cached[1]
+                    self.legs_reused += 1
+                elif key[0] > 0 and spot > 0:
+                    requests.append(
+                        {
+                            "symbol": symbol,
+                            "exchange": self.options_exchange,
+                            "spot_price": spot,
+                            "option_price": key[0],
+                        }
+                    )
+                    inputs.append(key)
+                else:
+                    result[symbol] = None
+                    self._greeks_cache[symbol] = (key, None)
+
+        if requests:
+            for request, key, (ok, response, _) in zip(
+                requests, inputs, calculate_greeks_batch(requests)
+            ):
+                values = None
+                if ok and response.get("status") == "success":
+                    values = {"iv": response.get("implied_volatility")}
+                    values.update({name: response["greeks"].get(name) for name in _GREEK_FIELDS})
+                result[request["symbol"]] = values
+                self._greeks_cache[request["symbol"]] = (key, values)
+            self.legs_computed += len(requests)
+
+        # Drop legs that left the window (ATM re-centre)
+        if len(self._greeks_cache) > len(result):
+            self._greeks_cache = {
+                symbol: entry for symbol, entry in self._greeks_cache.items() if symbol in result
+            }
+        return result
+
+
+class ComputedChannelManager:
+    """Computed channel subscriptions and the shared chain computations behind them"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chains: dict[tuple, ChainComputation] = {}
+        self._client_channels: dict[Any, set[tuple[tuple, str]]] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._wakeup: Callable[[], None] | None = None
+        self.metrics = {"computations": 0, "pushes": 0, "errors": 0}
+
+    def set_wakeup(self, callback: Callable[[], None] | None) -> None:
+        """Register a thread-safe callback run when a subscribed chain ticks"""
+        self._wakeup = callback
+
+    def subscribe(
+        self,
+        client_id: Any,
+        channels: list[str],
+        username: str,
+        api_key: str,
+        exchange: str = "NFO",
+        strike_count: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Subscribe a client to computed channels.
+
+        Args:
+            client_id: Proxy client ID
+            channels: Channel names
+            username: Client's user; computations are shared only between a user's clients
+            api_key: Client's API key, used to read that user's option chain
+            exchange: Options exchange (NFO, BFO) or index exchange
+            strike_count: Strikes each side of ATM (default COMPUTED_CHANNEL_STRIKE_COUNT)
+
+        Returns:
+            Per-channel status dicts; successful ones carry the last payload if any
+        """
+        strike_count = min(int(strike_count or DEFAULT_STRIKE_COUNT), MAX_STRIKE_COUNT)
+        exchange = (exchange or "NFO").upper()
+        results = []
+        with self._lock:
+            for channel in channels or []:
+                try:
+                    kind, underlying, expiry_date = parse_channel(channel)
+                except ValueError as e:
+                    results.append({"channel": channel, "status": "error", "message": str(e)})
+                    continue
+                chain_key = session_key(username, underlying, exchange, expiry_date, strike_count)
+                computation = self._chains.get(chain_key)
+                if computation is None:
+                    computation = ChainComputation(
+                        underlying, exchange, expiry_date, strike_count, username, api_key
+                    )
+                    self._chains[chain_key] = computation
+                computation.subscribers[kind].add(client_id)
+                self._client_channels.setdefault(client_id, set()).add((chain_key, kind))
+                result = {"channel": computation.channel(kind), "status": "success"}
+                if kind in computation.payloads:
+                    result["data"] = computation.payloads[kind]
+                results.append(result)
+            listen = bool(self._chains)
+
+        if listen:
+            get_option_chain_sessions().add_tick_listener(self._on_session_tick)
+        return results
+
+    def unsubscribe(
+        self,
+        client_id: Any,
+        channels: list[str] | None = None,
+        exchange: str = "NFO",
+        strike_count: int | None = None,
+    ) -> list[str]:
+        """
+        Unsubscribe a client from computed channels.
+
+        Args:
+            client_id: Proxy client ID
+            channels: Channel names, or None for all of the client's channels
+            exchange: Exchange used when subscribing
+            strike_count: Strike count used when subscribing
+
+        Returns:
+            Names of the channels removed
+        """
+        with self._lock:
+            subscribed = self._client_channels.get(client_id, set())
+            if channels is None:
+                targets = set(subscribed)
+            else:
+                strike_count = min(int(strike_count or DEFAULT_STRIKE_COUNT), MAX_STRIKE_COUNT)
+                exchange = (exchange or "NFO").upper()
+                wanted = set()
+                for channel in channels:
+                    try:
+                        kind, underlying, expiry_date = parse_channel(channel)
+                    except ValueError:
+                        continue
+                    wanted.add((underlying, exchange, expiry_date, strike_count, kind))
+                # Chain keys start with the client's user
+                targets = {
+                    (chain_key, kind)
+                    for chain_key, kind in subscribed
+                    if (*chain_key[1:], kind) in wanted
+                }
+
+            removed = []
+            for chain_key, kind in targets:
+                subscribed.discard((chain_key, kind))
+                computation = self._chains.get(chain_key)
+                if computation is None:
+                    continue
+                computation.subscribers[kind].discard(client_id)
+                removed.append(computation.channel(kind))
+                if not computation.has_subscribers():
+                    del self._chains[chain_key]
+            if not subscribed:
+                self._client_channels.pop(client_id, None)
+            idle = not self._chains
+
+        if idle:
+            get_option_chain_sessions().remove_tick_listener(self._on_session_tick)
+        return removed
+
+    def has_subscriptions(self) -> bool:
+        return bool(self._chains)
+
+    def remove_client(self, client_id: Any) -> None:
+        """Drop every computed subscription of a disconnected client"""
+        self.unsubscribe(client_id)
+
+    def _on_session_tick(self, key: tuple) -> None:
+        """Chain session tick listener: mark the matching computation for recompute"""
+        computation = self._chains.get(key)
+        if computation is None:
+            return
+        computation.ticked = True
+        wakeup = self._wakeup
+        if wakeup is not None:
+            wakeup()
+
+    @staticmethod
+    def _tick_driven(computation: ChainComputation) -> bool:
+        """Chains read from a live session are recomputed on its ticks, others every poll interval"""
+        return (
+            option_chain_service.OPTION_CHAIN_STREAMING
+            and computation.exchange not in CRYPTO_EXCHANGES
+        )
+
+    def compute_due(self, now: float | None = None) -> list[tuple[Any, dict[str, Any]]]:
+        """
+        Recompute chains that changed and collect the messages to push.
+
+        A streamed chain is due once COMPUTE_INTERVAL elapsed since its last pass
+        and its session ticked or a new minute began. A chain that is not streamed
+        is due every POLL_INTERVAL. Due chains are recomputed concurrently.
+        Blocking (may take an option chain snapshot); the proxy runs it in an
+        executor.
+
+        Returns:
+            List of (client_id, message) for payloads that changed
+        """
+        now = now or time.time()
+        with self._lock:
+            due = []
+            for computation in self._chains.values():
+                if not computation.has_subscribers():
+                    continue
+                elapsed = now - computation.last_compute_at
+                if not self._tick_driven(computation):
+                    if elapsed >= POLL_INTERVAL:
+                        due.append(computation)
+                    continue
+                if elapsed < COMPUTE_INTERVAL:
+                    continue
+                new_minute = int(now // 60) != int(computation.last_compute_at // 60)
+                if computation.ticked or new_minute:
+                    due.append(computation)
+            for computation in due:
+                computation.last_compute_at = now
+                computation.ticked = False
+
+        if len(due) > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=COMPUTE_WORKERS, thread_name_prefix="computed_channel"
+                )
+            results = list(self._executor.map(lambda c: self._compute_chain(c, now), due))
+        else:
+            results = [self._compute_chain(computation, now) for computation in due]
+        return [message for messages in results for message in messages]
+
+    def _compute_chain(
+        self, computation: ChainComputation, now: float
+    ) -> list[tuple[Any, dict[str, Any]]]:
+        """Read one chain with its user's key, recompute it and collect changed payloads"""
+        try:
+            success, response, _ = get_option_chain(
+                computation.underlying,
+                computation.exchange,
+                computation.expiry_date,
+                computation.strike_count,
+                computation.api_key,
+            )
+            if not success:
+                raise ValueError(response.get("message", "Option chain unavailable"))
+            payloads = computation.compute(response)
+            computation.last_error = None
+        except Exception as e:
+            with self._lock:
+                self.metrics["errors"] += 1
+            if computation.last_error != str(e):
+                logger.warning(f"Computed channels for {computation.underlying}: {e}")
+            computation.last_error = str(e)
+            return []
+
+        messages = []
+        with self._lock:
+            self.metrics["computations"] += 1
+            for kind, payload in payloads.items():
+                clients = computation.subscribers[kind]
+                if not clients or computation.payloads.get(kind) == payload:
+                    continue
+                computation.payloads[kind] = payload
+                message = {
+                    "type": "computed",
+                    "channel": computation.channel(kind),
+                    "data": payload,
+                    "timestamp": int(now * 1000),
+                }
+                messages.extend((client_id, message) for client_id in clients)
+                self.metrics["pushes"] += len(clients)
+        return messages
+
+    def stats(self) -> dict[str, Any]:
+        """Active computations and counters for health monitoring"""
+        with self._lock:
+            return {
+                "active_chains": len(self._chains),
+                "subscribed_clients": len(self._client_channels),
+                "channels": [
+                    computation.channel(kind)
+                    for computation in self._chains.values()
+                    for kind, clients in computation.subscribers.items()
+                    if clients
+                ],
+                "legs_computed": sum(c.legs_computed for c in self._chains.values()),
+                "legs_reused": sum(c.legs_reused for c in self._chains.values()),
+                **self.metrics,
+            }
+
+
+_computed_channels = None
+_computed_channels_lock = threading.Lock()
+
+
+def get_computed_channels() -> ComputedChannelManager:
+    """Get the process-wide computed channel manager"""
+    global _computed_channels
+    if _computed_channels is None:
+        with _computed_channels_lock:
+            if _computed_channels is None:
+                _computed_channels = ComputedChannelManager()
+    return _computed_channels
@@ -16,11 +16,11 @@ from datetime import datetime, timedelta
 import pandas as pd
 import pytz
 
-from services.history_service import get_history
+from services.leg_history_service import fetch_leg_histories
 from services.option_symbol_service import (
     construct_crypto_option_symbol,
     construct_option_symbol,
-    find_atm_strike_from_actual,
+    find_atm_strikes,
     get_available_strikes,
     get_option_exchange,
 )
@@ -96,11 +96,10 @@ def get_custom_straddle_simulation(
             }, 404
 
         # Fetch underlying history
-        success_u, resp_u, _ = get_history(
-            symbol=underlying_quote_symbol, exchange=quote_exchange,
-            interval=interval, start_date=start_date_str,
-            end_date=end_date_str, api_key=api_key,
-        )
+        underlying_leg = (underlying_quote_symbol, quote_exchange)
+        success_u, resp_u, _ = fetch_leg_histories(
+            [underlying_leg], interval, start_date_str, end_date_str, api_key
+        )[underlying_leg]
         if not success_u:
             return False, {
                 "status": "error",
@@ -116,54 +115,50 @@ def get_custom_straddle_simulation(
             return False, {"status": "error", "message": "Failed to parse timestamps"}, 500
 
         # Compute ATM per candle
-        atm_per_row = []
-        for _, row in df_underlying.iterrows():
-            atm = find_atm_strike_from_actual(float(row["close"]), available_strikes)
-            atm_per_row.append(atm)
+        atm_per_row = find_atm_strikes(df_underlying["close"].astype(float), available_strikes)
         df_underlying["atm_strike"] = atm_per_row
 
         unique_strikes = set(s for s in atm_per_row if s is not None)
         if not unique_strikes:
             return False, {"status": "error", "message": "Could not determine ATM strikes"}, 400
 
-        # Fetch option history for all unique ATM strikes
+        # Fetch option history for all unique ATM strikes (every roll) concurrently
         _build_sym = (
             construct_crypto_option_symbol
             if exchange.upper() in CRYPTO_EXCHANGES
             else construct_option_symbol
         )
-        strike_data = {}
-        for strike in sorted(unique_strikes):
-            ce_symbol = _build_sym(base_symbol, expiry_date.upper(), strike, "CE")
-            pe_symbol = _build_sym(base_symbol, expiry_date.upper(), strike, "PE")
+        strike_symbols = {
+            strike: (
+                _build_sym(base_symbol, expiry_date.upper(), strike, "CE"),
+                _build_sym(base_symbol, expiry_date.upper(), strike, "PE"),
+            )
+            for strike in sorted(unique_strikes)
+        }
+        leg_histories = fetch_leg_histories(
+            [(symbol, options_exchange) for pair in strike_symbols.values() for symbol in pair],
+            interval, start_date_str, end_date_str, api_key,
+        )
 
+        strike_data = {}
+        for strike, (ce_symbol, pe_symbol) in strike_symbols.items():
             ce_lookup, pe_lookup = {}, {}
 
-            success_ce, resp_ce, _ = get_history(
-                symbol=ce_symbol, exchange=options_exchange,
-                interval=interval, start_date=start_date_str,
-                end_date=end_date_str, api_key=api_key,
-            )
+            success_ce, resp_ce, _ = leg_histories[(ce_symbol, options_exchange)]
             if success_ce:
                 df_ce = pd.DataFrame(resp_ce.get("data", []))
                 if not df_ce.empty:
                     df_ce = _convert_timestamp_to_ist(df_ce)
                     if df_ce is not None:
-                        for ts, row in df_ce.iterrows():
-                            ce_lookup[ts] = float(row["close"])
+                        ce_lookup = dict(zip(df_ce.index, df_ce["close"].astype(float)))
 
-            success_pe, resp_pe, _ = get_history(
-                symbol=pe_symbol, exchange=options_exchange,
-                interval=interval, start_date=start_date_str,
-                end_date=end_date_str, api_key=api_key,
-            )
+            success_pe, resp_pe, _ = leg_histories[(pe_symbol, options_exchange)]
             if success_pe:
                 df_pe = pd.DataFrame(resp_pe.get("data", []))
                 if not df_pe.empty:
                     df_pe = _convert_timestamp_to_ist(df_pe)
                     if df_pe is not None:
-                        for ts, row in df_pe.iterrows():
-                            pe_lookup[ts] = float(row["close"])
+                        pe_lookup = dict(zip(df_pe.index, df_pe["close"].astype(float)))
 
             strike_data[strike] = {"ce": ce_lookup, "pe": pe_lookup}
 
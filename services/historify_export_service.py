@@ -0,0 +1,515 @@
+# services/historify_export_service.py
+"""
+Historify Export Jobs
+
+Runs bulk exports (CSV, TXT, Parquet, ZIP) in the background:
+- Every format is written by DuckDB COPY ... TO, so rows are streamed to disk
+  and memory stays flat regardless of export size
+- CSV/TXT exports can be gzip or zstd compressed
+- ZIP exports stage one CSV per symbol/interval; the archive is assembled while
+  it is streamed to the client, so it never exists in full on disk or in memory
+- Progress and completion are emitted as Socket.IO events
+  (historify_export_progress, historify_export_complete)
+
+Finished exports can be downloaded once; files not downloaded are removed
+after HISTORIFY_EXPORT_TTL seconds.
+
+Configuration (.env):
+- HISTORIFY_EXPORT_WORKERS: Exports running at the same time (default: 2)
+- HISTORIFY_EXPORT_TTL: Seconds a finished export is kept for download (default: 3600)
+- HISTORIFY_EXPORT_CHUNK_SYMBOLS: Symbols per COPY statement in ZIP exports (default: 50)
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any
+
+from database.historify_db import (
+    EXPORT_PARQUET_COMPRESSIONS,
+    EXPORT_TEXT_COMPRESSIONS,
+    export_bulk_csv,
+    export_to_parquet,
+    export_to_txt,
+    export_to_zip,
+    is_custom_interval,
+    parse_interval,
+    stage_zip_export,
+)
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# File extension and mimetype of each export format
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "txt": (".txt", "text/plain"),
+    "parquet": (".parquet", "application/octet-stream"),
+    "zip": (".zip", "application/zip"),
+}
+
+# Mimetypes of compressed CSV/TXT exports
+COMPRESSED_MIMETYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+EXPORT_TTL_SECONDS = int(os.getenv("HISTORIFY_EXPORT_TTL", "3600"))
+
+_export_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("HISTORIFY_EXPORT_WORKERS", "2")), thread_name_prefix="historify-export"
+)
+
+# Export jobs by id (in memory - exports do not survive a restart)
+_export_jobs: dict[str, dict[str, Any]] = {}
+_export_jobs_lock = threading.Lock()
+
+
+def prepare_export_request(data: dict[str, Any]) -> tuple[bool, dict[str, Any], int]:
+    """
+    Validate and normalize a bulk export request.
+
+    Args:
+        data: Request body with format, symbols, interval/intervals, start_date,
+            end_date, split_by and compression
+
+    Returns:
+        Tuple of (success, export parameters or error response, status_code)
+    """
+    format_type = (data.get("format") or "csv").lower()
+    if format_type not in EXPORT_FORMATS:
+        return False, {"status": "error", "message": f"Unsupported format: {format_type}"}, 400
+
+    symbols = data.get("symbols")  # Optional list of {symbol, exchange}
+    interval = data.get("interval")  # Single interval (legacy)
+    intervals = data.get("intervals")  # Multiple intervals (new)
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    split_by = data.get("split_by", "symbol")  # For ZIP: 'symbol' or 'none'
+
+    # Validate intervals parameter using parse_interval for dynamic validation
+    if intervals is not None:
+        if not isinstance(intervals, list):
+            return False, {"status": "error", "message": "intervals must be an array"}, 400
+        if len(intervals) == 0:
+            return False, {"status": "error", "message": "At least one interval must be specified"}, 400
+        intervals = list(dict.fromkeys(intervals))  # Remove duplicates
+        invalid = [i for i in intervals if parse_interval(i) is None]
+        if invalid:
+            return False, {"status": "error", "message": f"Invalid intervals: {invalid}"}, 400
+
+    # Force ZIP format if:
+    # 1. Multiple intervals selected, OR
+    # 2. Any computed/custom interval is selected (since only ZIP supports aggregation)
+    has_computed = intervals and any(is_custom_interval(i) for i in intervals)
+    if (intervals and len(intervals) > 1) or has_computed:
+        format_type = "zip"
+
+    # Validate compression against allowlists (the codec is part of the COPY statement)
+    compression = data.get("compression")
+    if format_type == "parquet":
+        if compression not in EXPORT_PARQUET_COMPRESSIONS:
+            compression = "zstd"
+    elif format_type in ("csv", "txt"):
+        if compression not in EXPORT_TEXT_COMPRESSIONS:
+            compression = "none"
+    else:
+        compression = None
+
+    # Convert dates to timestamps if provided
+    start_timestamp = None
+    end_timestamp = None
+    if start_date:
+        start_timestamp = int(datetime.strptime(start_date, "%Y-%m-%d").timestamp())
+    if end_date:
+        # End of day
+        end_timestamp = int(datetime.strptime(end_date, "%Y-%m-%d").timestamp()) + 86400
+
+    # Generate filename
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if symbols and len(symbols) == 1:
+        base_name = f"historify_{symbols[0]['symbol']}_{timestamp_str}"
+    else:
+        base_name = f"historify_export_{timestamp_str}"
+
+    file_ext, mime_type = EXPORT_FORMATS[format_type]
+    if compression in COMPRESSED_MIMETYPES and format_type in ("csv", "txt"):
+        file_ext += EXPORT_TEXT_COMPRESSIONS[compression]
+        mime_type = COMPRESSED_MIMETYPES[compression]
+
+    return (
+        True,
+        {
+            "format": format_type,
+            "symbols": symbols or None,
+            "interval": intervals[0] if intervals else interval,
+            "intervals": intervals if intervals else ([interval] if interval else None),
+            "start_timestamp": start_timestamp,
+            "end_timestamp": end_timestamp,
+            "split_by": split_by,
+            "compression": compression,
+            "filename": f"{base_name}{file_ext}",
+            "mime_type": mime_type,
+        },
+        200,
+    )
+
+
+def run_export(
+    params: dict[str, Any], output_path: str, progress_callback=None
+) -> tuple[bool, str, int]:
+    """
+    Write an export prepared by prepare_export_request() to a file.
+
+    Args:
+        params: Export parameters
+        output_path: Destination file inside the temp directory
+        progress_callback: Called as progress_callback(done, total) for ZIP exports
+
+    Returns:
+        Tuple of (success, message, record_count)
+    """
+    format_type = params["format"]
+    if format_type == "parquet":
+        return export_to_parquet(
+            output_path=output_path,
+            symbols=params["symbols"],
+            interval=params["interval"],
+            start_timestamp=params["start_timestamp"],
+            end_timestamp=params["end_timestamp"],
+            compression=params["compression"],
+        )
+    if format_type == "zip":
+        return export_to_zip(
+            output_path=output_path,
+            symbols=params["symbols"],
+            intervals=params["intervals"],
+            start_timestamp=params["start_timestamp"],
+            end_timestamp=params["end_timestamp"],
+            split_by=params["split_by"],
+            progress_callback=progress_callback,
+        )
+    if format_type == "txt":
+        return export_to_txt(
+            output_path=output_path,
+            symbols=params["symbols"],
+            interval=params["interval"],
+            start_timestamp=params["start_timestamp"],
+            end_timestamp=params["end_timestamp"],
+            compression=params["compression"],
+        )
+    return export_bulk_csv(
+        output_path=output_path,
+        symbols=params["symbols"] or [],
+        interval=params["interval"],
+        start_timestamp=params["start_timestamp"],
+        end_timestamp=params["end_timestamp"],
+        compression=params["compression"],
+    )
+
+
+# =============================================================================
+# Background Export Jobs
+# =============================================================================
+
+
+def _public_job(job: dict[str, Any]) -> dict[str, Any]:
+    """Job fields returned by the API (no file system paths)."""
+    return {
+        key: job[key]
+        for key in (
+            "job_id",
+            "status",
+            "format",
+            "filename",
+            "current",
+            "total",
+            "record_count",
+            "message",
+            "created_at",
+            "completed_at",
+        )
+    }
+
+
+def start_export_job(data: dict[str, Any]) -> tuple[bool, dict[str, Any], int]:
+    """
+    Validate an export request and run it in the background.
+
+    Args:
+        data: Bulk export request body (see prepare_export_request)
+
+    Returns:
+        Tuple of (success, response_data, status_code)
+    """
+    try:
+        success, params, status_code = prepare_export_request(data)
+        if not success:
+            return False, params, status_code
+
+        cleanup_expired_exports()
+
+        job_id = str(uuid.uuid4())[:8]
+        job = {
+            "job_id": job_id,
+            "status": "running",
+            "format": params["format"],
+            "filename": params["filename"],
+            "mime_type": params["mime_type"],
+            "current": 0,
+            "total": 0,
+            "record_count": 0,
+            "message": None,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "finished": None,
+            "output_path": None,
+            "staging_dir": None,
+            "files": None,
+        }
+        with _export_jobs_lock:
+            _export_jobs[job_id] = job
+
+        _export_executor.submit(_run_export_job, job_id, params)
+
+        return True, {"status": "success", "data": _public_job(job)}, 200
+
+    except Exception as e:
+        logger.exception(f"Error starting export job: {e}")
+        return False, {"status": "error", "message": str(e)}, 500
+
+
+def _update_job(job_id: str, **fields):
+    with _export_jobs_lock:
+        job = _export_jobs.get(job_id)
+        if job:
+            job.update(fields)
+
+
+def _run_export_job(job_id: str, params: dict[str, Any]):
+    """Write the export files of a job and record the result."""
+
+    def progress(current: int, total: int):
+        _update_job(job_id, current=current, total=total)
+        _emit_export_progress(job_id, current, total)
+
+    staging_dir = tempfile.mkdtemp(prefix=f"historify_export_{job_id}_")
+    try:
+        if params["format"] == "zip":
+            # Only the CSVs are written here; the archive is built while downloading
+            files, record_count, skipped = stage_zip_export(
+                staging_dir,
+                symbols=params["symbols"],
+                intervals=params["intervals"],
+                start_timestamp=params["start_timestamp"],
+                end_timestamp=params["end_timestamp"],
+                split_by=params["split_by"],
+                progress_callback=progress,
+            )
+            success = record_count > 0
+            if success:
+                message = f"Exported {record_count} records in {len(files)} file(s)"
+                if skipped:
+                    message += f". Note: {len(skipped)} computed interval(s) skipped due to missing source data."
+            elif skipped:
+                message = f"No data exported. Missing source data for computed intervals: {len(skipped)} symbol(s)"
+            else:
+                message = "No data matching the criteria"
+            _update_job(job_id, files=files)
+        else:
+            progress(0, 1)
+            output_path = os.path.join(staging_dir, params["filename"])
+            success, message, record_count = run_export(params, output_path)
+            _update_job(job_id, output_path=output_path)
+            progress(1, 1)
+
+        _update_job(
+            job_id,
+            status="completed" if success else "failed",
+            record_count=record_count,
+            message=message,
+            staging_dir=staging_dir,
+            completed_at=datetime.now().isoformat(),
+            finished=time.monotonic(),
+        )
+        if not success:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    except Exception as e:
+        logger.exception(f"Error in export job {job_id}: {e}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        _update_job(
+            job_id,
+            status="failed",
+            message=str(e),
+            completed_at=datetime.now().isoformat(),
+            finished=time.monotonic(),
+        )
+
+    with _export_jobs_lock:
+        job = dict(_export_jobs.get(job_id) or {})
+    if job:
+        _emit_export_complete(_public_job(job))
+
+
+def get_export_job(job_id: str) -> tuple[bool, dict[str, Any], int]:
+    """
+    Get status and progress of an export job.
+
+    Returns:
+        Tuple of (success, response_data, status_code)
+    """
+    with _export_jobs_lock:
+        job = _export_jobs.get(job_id)
+        if not job:
+            return False, {"status": "error", "message": "Export job not found"}, 404
+        return True, {"status": "success", "data": _public_job(job)}, 200
+
+
+def open_export_download(job_id: str) -> tuple[bool, dict[str, Any], int]:
+    """
+    Hand over a completed export for download.
+
+    The job is removed from the registry; call the returned 'cleanup' once the
+    response is closed to delete the export files.
+
+    Returns:
+        Tuple of (success, response_data, status_code). On success the response
+        has 'stream' (iterator of bytes), 'cleanup', 'filename' and 'mime_type'.
+    """
+    with _export_jobs_lock:
+        job = _export_jobs.get(job_id)
+        if not job:
+            return False, {"status": "error", "message": "Export job not found"}, 404
+        if job["status"] != "completed":
+            return False, {"status": "error", "message": f"Export is {job['status']}"}, 409
+        del _export_jobs[job_id]
+
+    if job["files"] is not None:
+        stream = stream_zip(job["files"])
+    else:
+        stream = _stream_file(job["output_path"])
+
+    return (
+        True,
+        {
+            "stream": stream,
+            "cleanup": lambda: shutil.rmtree(job["staging_dir"], ignore_errors=True),
+            "filename": job["filename"],
+            "mime_type": job["mime_type"],
+        },
+        200,
+    )
+
+
+def cleanup_expired_exports():
+    """Remove finished exports that were not downloaded within HISTORIFY_EXPORT_TTL."""
+    now = time.monotonic()
+    with _export_jobs_lock:
+        expired = [
+            job_id
+            for job_id, job in _export_jobs.items()
+            if job["finished"] is not None and now - job["finished"] > EXPORT_TTL_SECONDS
+        ]
+        jobs = [_export_jobs.pop(job_id) for job_id in expired]
+
+    for job in jobs:
+        if job["staging_dir"]:
+            shutil.rmtree(job["staging_dir"], ignore_errors=True)
+    if jobs:
+        logger.info(f"Removed {len(jobs)} expired export(s)")
+
+
+# =============================================================================
+# Streaming
+# =============================================================================
+
+
+class _ZipOutput:
+    """Write-only, unseekable file object that collects ZIP output between yields"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files: list[tuple[str, str]], chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    Build a ZIP archive from files on disk while yielding it.
+
+    Entries use data descriptors (the output is not seekable), so only the
+    current chunk is held in memory.
+
+    Args:
+        files: List of (path, archive name)
+        chunk_size: Bytes read from each file at a time
+
+    Yields:
+        ZIP archive bytes
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for path, name in files:
+            info = zipfile.ZipInfo.from_file(path, name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, "rb") as src, zf.open(info, "w") as dst:
+                while chunk := src.read(chunk_size):
+                    dst.write(chunk)
+                    data = output.drain()
+                    if data:
+                        yield data
+    yield output.drain()
+
+
+def _stream_file(path: str, chunk_size: int = 65536) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+# =============================================================================
+# Socket.IO Events
+# =============================================================================
+
+
+def _emit_export_progress(job_id: str, current: int, total: int):
+    """Emit Socket.IO export progress event."""
+    try:
+        from extensions import socketio
+
+        socketio.emit(
+            "historify_export_progress",
+            {
+                "job_id": job_id,
+                "current": current,
+                "total": total,
+                "percent": round((current / total) * 100, 1) if total else 0,
+            },
+        )
+    except Exception as e:
+        logger.debug(f"Could not emit export progress: {e}")
+
+
+def _emit_export_complete(job: dict[str, Any]):
+    """Emit Socket.IO export completion event."""
+    try:
+        from extensions import socketio
+
+        socketio.emit("historify_export_complete", job)
+    except Exception as e:
+        logger.debug(f"Could not emit export completion: {e}")
@@ -0,0 +1,256 @@
+# services/historify_planner_service.py
+"""
+Historify Gap-Aware Download Planner
+
+Plans incremental downloads per trading session instead of per symbol range:
+- Expected sessions come from the market calendar (weekends, exchange holidays,
+  special sessions such as Muhurat trading, admin-edited session timings)
+- Stored sessions come from data_catalog and market_data (IST trading dates with candles)
+- A session whose last download happened before it closed is planned again
+- Sessions the broker returned no data for (symbol not listed yet, no trades) are
+  remembered in empty_sessions, so they are not requested again every night
+- Consecutive missing sessions are merged into one download range; gaps in the
+  middle of stored data become their own ranges
+
+verify_gaps() reports the missing sessions without downloading anything.
+"""
+
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from database.historify_db import (
+    get_data_range,
+    get_empty_sessions,
+    get_stored_session_dates,
+    mark_empty_sessions,
+)
+from database.historify_db import get_watchlist as db_get_watchlist
+from database.market_calendar_db import (
+    DEFAULT_MARKET_TIMINGS,
+    get_holidays_by_year,
+    get_market_timing,
+)
+from utils.constants import CRYPTO_EXCHANGES
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+IST_OFFSET = 19800
+
+# Historify exchanges that follow another exchange's calendar
+CALENDAR_EXCHANGES = {"NSE_INDEX": "NSE", "BSE_INDEX": "BSE", "MCX_INDEX": "MCX"}
+
+
+def _ist_midnight(day: date) -> int:
+    """Epoch seconds of 00:00 IST on a date."""
+    return int(datetime(day.year, day.month, day.day, tzinfo=UTC).timestamp()) - IST_OFFSET
+
+
+def get_trading_sessions(exchange: str, start_date: date, end_date: date) -> list[dict[str, Any]]:
+    """
+    Get the trading sessions of an exchange between two dates.
+
+    Args:
+        exchange: Historify exchange code (index exchanges use their parent calendar)
+        start_date: First date (inclusive)
+        end_date: Last date (inclusive)
+
+    Returns:
+        List of dicts with date, start_ts and end_ts (epoch seconds), in date order
+    """
+    exchange = exchange.upper()
+    calendar_exchange = CALENDAR_EXCHANGES.get(exchange, exchange)
+    crypto = calendar_exchange in CRYPTO_EXCHANGES
+
+    timing = get_market_timing(calendar_exchange) or {}
+    default = DEFAULT_MARKET_TIMINGS.get(calendar_exchange, DEFAULT_MARKET_TIMINGS["NSE"])
+    start_offset = timing.get("start_offset", default["start_offset"]) // 1000
+    end_offset = timing.get("end_offset", default["end_offset"]) // 1000
+
+    holidays = {}
+    if not crypto:
+        for year in range(start_date.year, end_date.year + 1):
+            holidays.update({h["date"]: h for h in get_holidays_by_year(year)})
+
+    sessions = []
+    day = start_date
+    while day <= end_date:
+        midnight = _ist_midnight(day)
+        session = {"date": day, "start_ts": midnight + start_offset, "end_ts": midnight + end_offset}
+        holiday = holidays.get(day.strftime("%Y-%m-%d"))
+
+        if crypto:
+            sessions.append(session)
+        elif holiday and holiday["holiday_type"] != "SETTLEMENT_HOLIDAY":
+            # Special sessions and partially open holidays (e.g. MCX evening) use their own timings
+            special = next(
+                (o for o in holiday["open_exchanges"] if o["exchange"] == calendar_exchange), None
+            )
+            if special and special.get("start_time") and special.get("end_time"):
+                session["start_ts"] = special["start_time"] // 1000
+                session["end_ts"] = special["end_time"] // 1000
+                sessions.append(session)
+            elif (
+                holiday["holiday_type"] == "TRADING_HOLIDAY"
+                and calendar_exchange not in holiday["closed_exchanges"]
+                and day.weekday() < 5
+            ):
+                sessions.append(session)
+        elif day.weekday() < 5:
+            sessions.append(session)
+
+        day += timedelta(days=1)
+
+    return sessions
+
+
+def plan_downloads(
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start_date: str,
+    end_date: str,
+    now: int | None = None,
+) -> dict[str, Any]:
+    """
+    Compute the trading sessions missing for a symbol and the ranges to download.
+
+    Args:
+        symbol: Trading symbol
+        exchange: Exchange code
+        interval: Storage interval (1m, D)
+        start_date: Requested start date (YYYY-MM-DD)
+        end_date: Requested end date (YYYY-MM-DD)
+        now: Current epoch seconds (sessions that have not started are ignored)
+
+    Returns:
+        Dict with session counts, missing_sessions (YYYY-MM-DD) and
+        ranges ([start_date, end_date] pairs to download)
+    """
+    now = now if now is not None else int(datetime.now(UTC).timestamp())
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    sessions = [s for s in get_trading_sessions(exchange, start, end) if s["start_ts"] <= now]
+
+    stored = set()
+    empty = set()
+    catalog = get_data_range(symbol, exchange, interval)
+    if sessions and catalog and catalog.get("record_count"):
+        stored = get_stored_session_dates(symbol, exchange, interval, start, end)
+
+        # The latest stored session is incomplete if it was downloaded before it closed
+        last_download_ts = catalog.get("last_download_ts")
+        if last_download_ts is not None:
+            last_day = date(1970, 1, 1) + timedelta(
+                days=(catalog["last_timestamp"] + IST_OFFSET) // 86400
+            )
+            last_session = next((s for s in sessions if s["date"] == last_day), None)
+            if last_session and last_download_ts < last_session["end_ts"]:
+                stored.discard(last_day)
+
+    if sessions:
+        empty = get_empty_sessions(symbol, exchange, interval, start, end)
+
+    missing_index = [
+        i for i, s in enumerate(sessions) if s["date"] not in stored and s["date"] not in empty
+    ]
+
+    # Merge sessions that are consecutive in the trading calendar into one range
+    ranges = []
+    for i in missing_index:
+        day = sessions[i]["date"].strftime("%Y-%m-%d")
+        if ranges and ranges[-1][2] == i - 1:
+            ranges[-1][1] = day
+            ranges[-1][2] = i
+        else:
+            ranges.append([day, day, i])
+
+    return {
+        "symbol": symbol.upper(),
+        "exchange": exchange.upper(),
+        "interval": interval,
+        "expected_sessions": len(sessions),
+        "stored_sessions": sum(1 for s in sessions if s["date"] in stored),
+        "empty_sessions": sum(1 for s in sessions if s["date"] in empty),
+        "missing_sessions": [sessions[i]["date"].strftime("%Y-%m-%d") for i in missing_index],
+        "ranges": [[first, last] for first, last, _ in ranges],
+    }
+
+
+def record_empty_sessions(plan: dict[str, Any], now: int | None = None) -> int:
+    """
+    After downloading a plan, remember closed sessions that still have no data.
+
+    Args:
+        plan: Result of plan_downloads() whose ranges were downloaded successfully
+        now: Current epoch seconds
+
+    Returns:
+        Number of sessions recorded as empty
+    """
+    if not plan["missing_sessions"]:
+        return 0
+    now = now if now is not None else int(datetime.now(UTC).timestamp())
+
+    missing = [datetime.strptime(d, "%Y-%m-%d").date() for d in plan["missing_sessions"]]
+    stored = get_stored_session_dates(
+        plan["symbol"], plan["exchange"], plan["interval"], missing[0], missing[-1]
+    )
+    # Sessions still open may get data later today
+    closed = {
+        s["date"]
+        for s in get_trading_sessions(plan["exchange"], missing[0], missing[-1])
+        if s["end_ts"] <= now
+    }
+    empty = [d for d in missing if d not in stored and d in closed]
+
+    return mark_empty_sessions(plan["symbol"], plan["exchange"], plan["interval"], empty)
+
+
+def verify_gaps(
+    symbols: list[dict[str, str]] | None, interval: str, start_date: str, end_date: str
+) -> tuple[bool, dict[str, Any], int]:
+    """
+    Report missing trading sessions without downloading (verify mode).
+
+    Args:
+        symbols: List of dicts with 'symbol' and 'exchange' keys (watchlist if empty)
+        interval: Storage interval (1m, D)
+        start_date: Start date (YYYY-MM-DD)
+        end_date: End date (YYYY-MM-DD)
+
+    Returns:
+        Tuple of (success, response_data, status_code)
+    """
+    try:
+        if not start_date or not end_date:
+            return False, {"status": "error", "message": "start_date and end_date are required"}, 400
+
+        if not symbols:
+            symbols = [{"symbol": w["symbol"], "exchange": w["exchange"]} for w in db_get_watchlist()]
+
+        plans = [
+            plan_downloads(item["symbol"], item["exchange"], interval, start_date, end_date)
+            for item in symbols
+        ]
+        with_gaps = [p for p in plans if p["missing_sessions"]]
+
+        return (
+            True,
+            {
+                "status": "success",
+                "data": with_gaps,
+                "summary": {
+                    "symbols_checked": len(plans),
+                    "symbols_with_gaps": len(with_gaps),
+                    "missing_sessions": sum(len(p["missing_sessions"]) for p in plans),
+                    "download_requests": sum(len(p["ranges"]) for p in plans),
+                },
+            },
+            200,
+        )
+
+    except Exception as e:
+        logger.exception(f"Error verifying data gaps: {e}")
+        return False, {"status": "error", "message": str(e)}, 500
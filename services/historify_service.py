@@ -26,6 +26,8 @@ from database.historify_db import (
     get_database_stats,
     get_ohlcv,
     init_database,
+    rebuild_data_catalog,
+    rebuild_rollups,
     upsert_market_data,
 )
 from database.historify_db import add_to_watchlist as db_add_to_watchlist
@@ -39,6 +41,7 @@ from database.historify_db import remove_from_watchlist as db_remove_from_watchl
 from database.historify_db import bulk_remove_from_watchlist as db_bulk_remove_from_watchlist
 from database.historify_db import bulk_delete_market_data as db_bulk_delete_market_data
 from database.token_db_enhanced import get_symbol_info
+from services.historify_planner_service import plan_downloads, record_empty_sessions
 from services.history_service import get_history
 from services.intervals_service import get_intervals
 from utils.logging import get_logger
@@ -780,6 +783,38 @@ def get_stats() -> tuple[bool, dict[str, Any], int]:
         return False, {"status": "error", "message": str(e)}, 500
 
 
+def rebuild_catalog(
+    symbol: str = None, exchange: str = None, interval: str = None
+) -> tuple[bool, dict[str, Any], int]:
+    """
+    Recompute data catalog statistics and materialized rollups from stored market data.
+
+    Args:
+        symbol: Trading symbol (optional - all symbols if not specified)
+        exchange: Exchange code (optional)
+        interval: Time interval (optional, catalog only)
+
+    Returns:
+        Tuple of (success, response_data, status_code)
+    """
+    try:
+        rebuilt = rebuild_data_catalog(symbol, exchange, interval)
+        rollup_candles = rebuild_rollups(symbol, exchange)
+        return (
+            True,
+            {
+                "status": "success",
+                "message": f"Rebuilt {rebuilt} catalog entries",
+                "rebuilt": rebuilt,
+                "rollup_candles": rollup_candles,
+            },
+            200,
+        )
+    except Exception as e:
+        logger.exception(f"Error rebuilding catalog: {e}")
+        return False, {"status": "error", "message": str(e)}, 500
+
+
 def delete_symbol_data(
     symbol: str, exchange: str, interval: str = None
 ) -> tuple[bool, dict[str, Any], int]:
@@ -1293,15 +1328,17 @@ def get_option_chain_symbols(
 # Download Job Operations
 # =============================================================================
 
-import random
 import threading
-import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 # Job executor pool - shared across all job operations
 _job_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HISTORIFY_MAX_WORKERS", "5")))
 
+# Symbols downloaded concurrently within one job; broker requests are paced by
+# the per-broker history rate governor (utils/history_rate_governor.py)
+HISTORIFY_JOB_CONCURRENCY = int(os.getenv("HISTORIFY_JOB_CONCURRENCY", "4"))
+
 # Track running jobs for cancellation and pause state
 _running_jobs: dict[str, bool] = {}
 _paused_jobs: dict[str, threading.Event] = {}  # Event is set when NOT paused
@@ -1429,23 +1466,23 @@ def _process_download_job(job_id: str, api_key: str):
     """
     Background job processor with Socket.IO progress updates.
 
-    This runs in a separate thread and downloads data for each symbol.
+    This runs in a separate thread and hands each symbol to a per-job worker pool
+    of HISTORIFY_JOB_CONCURRENCY threads. Broker requests are paced by the shared
+    per-broker history rate governor, so workers never exceed the broker limit.
     Features:
-    - Random delay (1-3 seconds) between downloads to avoid rate limits
-    - Pause/resume support via threading.Event
+    - Concurrent downloads, bounded per job
+    - Pause/resume support via threading.Event (in-flight symbols finish, no new ones start)
     - Checkpoint support - resumes from pending items
     - Incremental download - only fetches data after last available timestamp
     """
     import json
 
     from database.historify_db import (
-        get_data_range,
         get_download_job,
         get_job_items,
         update_job_item_status,
         update_job_progress,
         update_job_status,
-        upsert_symbol_metadata,
     )
 
     try:
@@ -1480,10 +1517,6 @@ def _process_download_job(job_id: str, api_key: str):
 
         incremental = config.get("incremental", False)
 
-        # Get delay settings from environment (min and max seconds)
-        delay_min = float(os.getenv("HISTORIFY_DELAY_MIN", "1"))
-        delay_max = float(os.getenv("HISTORIFY_DELAY_MAX", "3"))
-
         # Count already completed items
         already_completed = sum(1 for item in items if item["status"] == "success")
         already_failed = sum(1 for item in items if item["status"] == "error")
@@ -1493,186 +1526,76 @@ def _process_download_job(job_id: str, api_key: str):
         total_items = len(items)
         processed_count = already_completed + already_failed
 
-        for item in pending_items:
-            # Check for cancellation with thread-safe access
-            with _job_state_lock:
-                is_cancelled = not _running_jobs.get(job_id, False)
-                pause_event = _paused_jobs.get(job_id)
+        concurrency = max(1, HISTORIFY_JOB_CONCURRENCY)
+        in_flight = set()
+        cancelled = False
 
-            if is_cancelled:
-                logger.info(f"Job {job_id} cancelled")
-                update_job_status(job_id, "cancelled")
-                _cleanup_job(job_id)
+        def collect(block: bool):
+            """Record finished downloads; block until at least one finishes if requested"""
+            nonlocal completed, failed
+            if not in_flight:
                 return
-
-            # Check for pause - wait if paused
-            if pause_event:
-                while not pause_event.is_set():
-                    # Emit paused status
-                    _emit_job_paused(job_id, processed_count, total_items)
-                    # Wait for resume signal (check every 1 second)
-                    pause_event.wait(timeout=1.0)
-                    # Check for cancellation while paused (with lock)
-                    with _job_state_lock:
-                        is_cancelled = not _running_jobs.get(job_id, False)
-                    if is_cancelled:
-                        logger.info(f"Job {job_id} cancelled while paused")
-                        update_job_status(job_id, "cancelled")
-                        _cleanup_job(job_id)
-                        return
-
-            # Update item status
-            update_job_item_status(item["id"], "downloading")
-
-            processed_count += 1
-            # Emit progress via Socket.IO
-            _emit_progress(job_id, processed_count, total_items, item["symbol"])
-
-            try:
-                # Determine date ranges - use incremental if enabled
-                requested_start = job["start_date"]
-                requested_end = job["end_date"]
-                total_records = 0
-                download_error = None
-
-                if incremental:
-                    # Check existing data range for this symbol
-                    data_range = get_data_range(item["symbol"], item["exchange"], job["interval"])
-
-                    if (
-                        data_range
-                        and data_range.get("first_timestamp")
-                        and data_range.get("last_timestamp")
-                    ):
-                        first_ts = data_range["first_timestamp"]
-                        last_ts = data_range["last_timestamp"]
-                        first_datetime = datetime.fromtimestamp(first_ts)
-                        last_datetime = datetime.fromtimestamp(last_ts)
-
-                        requested_start_dt = datetime.strptime(requested_start, "%Y-%m-%d")
-                        requested_end_dt = datetime.strptime(requested_end, "%Y-%m-%d")
-
-                        # Determine what needs to be downloaded:
-                        # 1. Data BEFORE existing data (if requested_start < first_timestamp)
-                        # 2. Data AFTER existing data (if requested_end > last_timestamp)
-
-                        need_before = requested_start_dt.date() < first_datetime.date()
-                        need_after = requested_end_dt.date() > last_datetime.date()
-
-                        # For 1m data, be more precise about timing
-                        if job["interval"] == "1m":
-                            need_after = requested_end_dt.date() >= last_datetime.date()
-
-                        if not need_before and not need_after:
-                            # Data already covers the requested range
-                            update_job_item_status(
-                                item["id"], "skipped", 0, "Data already covers requested range"
-                            )
-                            logger.info(
-                                f"Skipping {item['symbol']} - data already covers requested range"
-                            )
-                            continue
-
-                        # Download data BEFORE existing range if needed
-                        if need_before:
-                            # End date for "before" download is the day before first existing data
-                            if job["interval"] == "1m":
-                                before_end = first_datetime.strftime("%Y-%m-%d")
-                            else:
-                                before_end = (first_datetime - timedelta(days=1)).strftime(
-                                    "%Y-%m-%d"
-                                )
-
-                            if requested_start <= before_end:
-                                logger.debug(
-                                    f"Incremental (before): {item['symbol']} from {requested_start} to {before_end}"
-                                )
-                                success_before, response_before, _ = download_data(
-                                    symbol=item["symbol"],
-                                    exchange=item["exchange"],
-                                    interval=job["interval"],
-                                    start_date=requested_start,
-                                    end_date=before_end,
-                                    api_key=api_key,
-                                )
-                                if success_before:
-                                    total_records += response_before.get("records", 0)
-                                else:
-                                    download_error = response_before.get(
-                                        "message", "Error downloading earlier data"
-                                    )
-
-                        # Download data AFTER existing range if needed
-                        if need_after and download_error is None:
-                            # Start date for "after" download
-                            if job["interval"] == "1m":
-                                after_start = last_datetime.strftime("%Y-%m-%d")
-                            else:
-                                after_start = (last_datetime + timedelta(days=1)).strftime(
-                                    "%Y-%m-%d"
-                                )
-
-                            if after_start <= requested_end:
-                                logger.debug(
-                                    f"Incremental (after): {item['symbol']} from {after_start} to {requested_end}"
-                                )
-                                success_after, response_after, _ = download_data(
-                                    symbol=item["symbol"],
-                                    exchange=item["exchange"],
-                                    interval=job["interval"],
-                                    start_date=after_start,
-                                    end_date=requested_end,
-                                    api_key=api_key,
-                                )
-                                if success_after:
-                                    total_records += response_after.get("records", 0)
-                                else:
-                                    download_error = response_after.get(
-                                        "message", "Error downloading later data"
-                                    )
-
-                        # Update status based on results
-                        if download_error:
-                            update_job_item_status(
-                                item["id"], "error", total_records, download_error
-                            )
-                            failed += 1
-                        else:
-                            update_job_item_status(item["id"], "success", total_records)
-                            completed += 1
-                        continue
-
-                # Non-incremental or no existing data: download full range
-                success, response, _ = download_data(
-                    symbol=item["symbol"],
-                    exchange=item["exchange"],
-                    interval=job["interval"],
-                    start_date=requested_start,
-                    end_date=requested_end,
-                    api_key=api_key,
-                )
-
-                if success:
-                    records = response.get("records", 0)
-                    update_job_item_status(item["id"], "success", records)
+            done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                status = future.result()
+                if status == "success":
                     completed += 1
-                else:
-                    error_msg = response.get("message", "Unknown error")
-                    update_job_item_status(item["id"], "error", 0, error_msg)
+                elif status == "error":
                     failed += 1
-
-            except Exception as e:
-                logger.exception(f"Error downloading {item['symbol']}: {e}")
-                update_job_item_status(item["id"], "error", 0, str(e))
-                failed += 1
-
-            # Update progress counters in database
-            update_job_progress(job_id, completed, failed)
-
-            # Random delay between 1-3 seconds (configurable)
-            delay = random.uniform(delay_min, delay_max)
-            logger.debug(f"Waiting {delay:.1f}s before next download...")
-            time.sleep(delay)
+            if done:
+                # Update progress counters in database
+                update_job_progress(job_id, completed, failed)
+
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix=f"historify-{job_id}"
+        ) as pool:
+            for item in pending_items:
+                # Wait for a free worker before claiming the next symbol
+                while len(in_flight) >= concurrency:
+                    collect(block=True)
+
+                # Check for cancellation with thread-safe access
+                with _job_state_lock:
+                    cancelled = not _running_jobs.get(job_id, False)
+                    pause_event = _paused_jobs.get(job_id)
+                if cancelled:
+                    break
+
+                # Check for pause - wait if paused (running downloads finish meanwhile)
+                if pause_event:
+                    while not pause_event.is_set():
+                        # Emit paused status
+                        _emit_job_paused(job_id, processed_count, total_items)
+                        # Wait for resume signal (check every 1 second)
+                        pause_event.wait(timeout=1.0)
+                        collect(block=False)
+                        # Check for cancellation while paused (with lock)
+                        with _job_state_lock:
+                            cancelled = not _running_jobs.get(job_id, False)
+                        if cancelled:
+                            break
+                    if cancelled:
+                        break
+
+                # Update item status
+                update_job_item_status(item["id"], "downloading")
+
+                processed_count += 1
+                # Emit progress via Socket.IO
+                _emit_progress(job_id, processed_count, total_items, item["symbol"])
+
+                in_flight.add(pool.submit(_download_job_item, job, item, api_key, incremental))
+
+            # Let symbols already downloading finish (also on cancel)
+            while in_flight:
+                collect(block=True)
+
+        if cancelled:
+            logger.info(f"Job {job_id} cancelled")
+            update_job_status(job_id, "cancelled")
+            _cleanup_job(job_id)
+            return
 
         # Job completed
         final_status = "completed" if failed == 0 else "completed_with_errors"
@@ -1692,6 +1615,94 @@ def _process_download_job(job_id: str, api_key: str):
         _cleanup_job(job_id)
 
 
+def _download_job_item(job: dict[str, Any], item: dict[str, Any], api_key: str, incremental: bool) -> str:
+    """
+    Download one job item and record its result (runs on a job worker thread).
+
+    Args:
+        job: Download job row
+        item: Job item row (symbol, exchange)
+        api_key: OpenAlgo API key
+        incremental: Only fetch trading sessions missing from storage
+
+    Returns:
+        Final item status: 'success', 'error' or 'skipped'
+    """
+    from database.historify_db import update_job_item_status
+
+    try:
+        # Determine date ranges - use incremental if enabled
+        requested_start = job["start_date"]
+        requested_end = job["end_date"]
+        total_records = 0
+        download_error = None
+
+        if incremental:
+            # Download only the trading sessions missing from storage
+            plan = plan_downloads(
+                item["symbol"], item["exchange"], job["interval"], requested_start, requested_end
+            )
+
+            if not plan["ranges"]:
+                # Data already covers the requested range
+                update_job_item_status(
+                    item["id"], "skipped", 0, "Data already covers requested range"
+                )
+                logger.info(f"Skipping {item['symbol']} - data already covers requested range")
+                return "skipped"
+
+            logger.debug(
+                f"Incremental: {item['symbol']} {len(plan['missing_sessions'])} missing sessions "
+                f"in {len(plan['ranges'])} ranges"
+            )
+            for range_start, range_end in plan["ranges"]:
+                success, response, _ = download_data(
+                    symbol=item["symbol"],
+                    exchange=item["exchange"],
+                    interval=job["interval"],
+                    start_date=range_start,
+                    end_date=range_end,
+                    api_key=api_key,
+                )
+                if not success:
+                    download_error = response.get("message", "Error downloading missing sessions")
+                    break
+                total_records += response.get("records", 0)
+
+            # Update status based on results
+            if download_error:
+                update_job_item_status(item["id"], "error", total_records, download_error)
+                return "error"
+
+            record_empty_sessions(plan)
+            update_job_item_status(item["id"], "success", total_records)
+            return "success"
+
+        # Non-incremental or no existing data: download full range
+        success, response, _ = download_data(
+            symbol=item["symbol"],
+            exchange=item["exchange"],
+            interval=job["interval"],
+            start_date=requested_start,
+            end_date=requested_end,
+            api_key=api_key,
+        )
+
+        if success:
+            records = response.get("records", 0)
+            update_job_item_status(item["id"], "success", records)
+            return "success"
+
+        error_msg = response.get("message", "Unknown error")
+        update_job_item_status(item["id"], "error", 0, error_msg)
+        return "error"
+
+    except Exception as e:
+        logger.exception(f"Error downloading {item['symbol']}: {e}")
+        update_job_item_status(item["id"], "error", 0, str(e))
+        return "error"
+
+
 def _cleanup_job(job_id: str):
     """Clean up job tracking state with thread-safe access."""
     with _job_state_lock:
@@ -1,32 +1,83 @@
 import importlib
-import time
 import traceback
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from database.auth_db import get_auth_token_broker
 from database.token_db import get_token
 from utils.constants import VALID_EXCHANGES
+from utils.history_rate_governor import get_history_rate_governor
 from utils.logging import get_logger
 
 # Initialize logger
 logger = get_logger(__name__)
 
-# Rate limiter: max 3 broker history API requests per second
-# Uses minimum interval between calls to prevent burst requests
-_last_history_call: float = 0.0
-_MIN_HISTORY_INTERVAL = 0.35  # 350ms between calls (~3 req/sec, evenly spaced)
+# Response formats: 'records' returns a list of row dicts in response["data"].
+# Columnar formats return a pyarrow Table in response["data"]; the API layer
+# encodes it with encode_history_table() as JSON column arrays ('columns'),
+# an Arrow IPC stream ('arrow') or a Parquet file ('parquet').
+HISTORY_FORMATS = ("records", "columns", "arrow", "parquet")
 
+HISTORY_MIMETYPES = {
+    "columns": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
 
-def _enforce_rate_limit():
-    """Block until enough time has passed since the last request (~3 per second)."""
-    global _last_history_call
-    now = time.monotonic()
-    elapsed = now - _last_history_call
-    if elapsed < _MIN_HISTORY_INTERVAL:
-        time.sleep(_MIN_HISTORY_INTERVAL - elapsed)
-    _last_history_call = time.monotonic()
+
+def _column_values(column: pa.ChunkedArray):
+    """Column as a numpy array when orjson can serialize it natively, else a list."""
+    if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+        if column.null_count == 0 or pa.types.is_floating(column.type):
+            return column.to_numpy()
+    return column.to_pylist()
+
+
+def encode_history_table(table: pa.Table, output_format: str) -> tuple[bytes, str]:
+    """
+    Encode a columnar history response body.
+
+    Args:
+        table: History data as returned in response["data"] for a columnar format
+        output_format: 'columns', 'arrow' or 'parquet'
+
+    Returns:
+        Tuple of (body bytes, mimetype)
+    """
+    if output_format == "columns":
+        body = orjson.dumps(
+            {
+                "status": "success",
+                "format": "columns",
+                "data": {name: _column_values(table.column(name)) for name in table.column_names},
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        )
+    elif output_format == "arrow":
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        body = sink.getvalue().to_pybytes()
+    elif output_format == "parquet":
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink)
+        body = sink.getvalue().to_pybytes()
+    else:
+        raise ValueError(f"Unsupported history format: {output_format}")
+
+    return body, HISTORY_MIMETYPES[output_format]
+
+
+def _acquire_history_slot(broker: str):
+    """Block until the broker's history rate limit allows another request."""
+    governor = get_history_rate_governor()
+    # Adapters that split long ranges into several requests take a slot per request
+    if not governor.is_self_governed(broker):
+        governor.acquire(broker)
 
 
 def validate_symbol_exchange(symbol: str, exchange: str) -> tuple[bool, str | None]:
@@ -84,6 +135,7 @@ def get_history_with_auth(
     interval: str,
     start_date: str,
     end_date: str,
+    output_format: str = "records",
 ) -> tuple[bool, dict[str, Any], int]:
     """
     Get historical data for a symbol using provided auth tokens.
@@ -97,6 +149,7 @@ def get_history_with_auth(
         interval: Time interval (e.g., 1m, 5m, 15m, 1h, 1d)
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
+        output_format: One of HISTORY_FORMATS (default 'records')
 
     Returns:
         Tuple containing:
@@ -136,6 +189,10 @@ def get_history_with_auth(
         if "oi" not in df.columns:
             df["oi"] = 0
 
+        if output_format != "records":
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            return True, {"status": "success", "data": table}, 200
+
         return True, {"status": "success", "data": df.to_dict(orient="records")}, 200
     except Exception as e:
         logger.error(f"Error in broker_module.get_history: {e}")
@@ -143,8 +200,34 @@ def get_history_with_auth(
         return False, {"status": "error", "message": str(e)}, 500
 
 
+def _db_timestamp_range(start_date, end_date) -> tuple[int, int]:
+    """Epoch range for a Historify query: start of start_date to end of end_date."""
+    from datetime import date, datetime
+
+    # Convert dates to timestamps (handle both string and date objects)
+    if isinstance(start_date, date):
+        start_dt = datetime.combine(start_date, datetime.min.time())
+    else:
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+
+    if isinstance(end_date, date):
+        end_dt = datetime.combine(end_date, datetime.min.time())
+    else:
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+
+    # Set end_date to end of day
+    end_dt = end_dt.replace(hour=23, minute=59, second=59)
+
+    return int(start_dt.timestamp()), int(end_dt.timestamp())
+
+
 def get_history_from_db(
-    symbol: str, exchange: str, interval: str, start_date: str, end_date: str
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start_date: str,
+    end_date: str,
+    output_format: str = "records",
 ) -> tuple[bool, dict[str, Any], int]:
     """
     Get historical data from DuckDB/Historify database.
@@ -155,6 +238,8 @@ def get_history_from_db(
         interval: Time interval (e.g., 1m, 5m, 15m, 1h, D, W, M, Q, Y)
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
+        output_format: One of HISTORY_FORMATS (default 'records'); columnar
+            formats are fetched from DuckDB as Arrow without building row dicts
 
     Returns:
         Tuple containing:
@@ -163,37 +248,22 @@ def get_history_from_db(
         - HTTP status code (int)
     """
     try:
-        from datetime import date, datetime
-
         from database.historify_db import get_ohlcv
 
-        # Convert dates to timestamps (handle both string and date objects)
-        if isinstance(start_date, date):
-            start_dt = datetime.combine(start_date, datetime.min.time())
-        else:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-
-        if isinstance(end_date, date):
-            end_dt = datetime.combine(end_date, datetime.min.time())
-        else:
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-
-        # Set end_date to end of day
-        end_dt = end_dt.replace(hour=23, minute=59, second=59)
-
-        start_timestamp = int(start_dt.timestamp())
-        end_timestamp = int(end_dt.timestamp())
+        start_timestamp, end_timestamp = _db_timestamp_range(start_date, end_date)
 
         # Get data from DuckDB
+        columnar = output_format != "records"
         df = get_ohlcv(
             symbol=symbol,
             exchange=exchange,
             interval=interval,
             start_timestamp=start_timestamp,
             end_timestamp=end_timestamp,
+            as_arrow=columnar,
         )
 
-        if df.empty:
+        if len(df) == 0:
             return (
                 False,
                 {
@@ -203,6 +273,10 @@ def get_history_from_db(
                 404,
             )
 
+        if columnar:
+            # Arrow table already has the API columns in order
+            return True, {"status": "success", "data": df}, 200
+
         # Ensure 'oi' column exists
         if "oi" not in df.columns:
             df["oi"] = 0
@@ -219,6 +293,93 @@ def get_history_from_db(
         return False, {"status": "error", "message": str(e)}, 500
 
 
+def get_history_batch(
+    symbols: list[dict[str, str]],
+    interval: str,
+    start_date: str,
+    end_date: str,
+    api_key: str | None = None,
+    output_format: str = "records",
+) -> tuple[bool, dict[str, Any], int]:
+    """
+    Get historical data for many symbols from the DuckDB/Historify database.
+
+    All series come from one scan (see historify_db.get_ohlcv_batch), with
+    computed intervals aggregated in the same query. The result is long format:
+    one row per candle with symbol and exchange columns, grouped by symbol.
+
+    Args:
+        symbols: List of dicts with 'symbol' and 'exchange' keys
+        interval: Time interval (e.g., 1m, 5m, 15m, 1h, D, W, M, Q, Y)
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        api_key: OpenAlgo API key (verified when given)
+        output_format: One of HISTORY_FORMATS (default 'records')
+
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict) - 'missing' lists symbols without data
+        - HTTP status code (int)
+    """
+    try:
+        from database.auth_db import verify_api_key
+        from database.historify_db import get_ohlcv_batch
+
+        if api_key is not None and not verify_api_key(api_key):
+            return False, {"status": "error", "message": "Invalid openalgo apikey"}, 403
+
+        if not symbols:
+            return False, {"status": "error", "message": "At least one symbol is required"}, 400
+
+        start_timestamp, end_timestamp = _db_timestamp_range(start_date, end_date)
+
+        columnar = output_format != "records"
+        data = get_ohlcv_batch(
+            symbols=symbols,
+            interval=interval,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            as_arrow=columnar,
+        )
+
+        if len(data) == 0:
+            return (
+                False,
+                {
+                    "status": "error",
+                    "message": f"No data found for the requested symbols interval {interval} in local database. Download data first using Historify.",
+                },
+                404,
+            )
+
+        if columnar:
+            keys = data.group_by(["symbol", "exchange"]).aggregate([])
+            found = set(zip(keys.column("symbol").to_pylist(), keys.column("exchange").to_pylist()))
+        else:
+            found = set(data[["symbol", "exchange"]].drop_duplicates().itertuples(index=False, name=None))
+        missing = [
+            {"symbol": s["symbol"].upper(), "exchange": s["exchange"].upper()}
+            for s in symbols
+            if (s["symbol"].upper(), s["exchange"].upper()) not in found
+        ]
+
+        return (
+            True,
+            {
+                "status": "success",
+                "data": data if columnar else data.to_dict(orient="records"),
+                "missing": missing,
+            },
+            200,
+        )
+
+    except Exception as e:
+        logger.error(f"Error fetching batch history from DB: {e}")
+        traceback.print_exc()
+        return False, {"status": "error", "message": str(e)}, 500
+
+
 def get_history(
     symbol: str,
     exchange: str,
@@ -230,6 +391,7 @@ def get_history(
     feed_token: str | None = None,
     broker: str | None = None,
     source: str = "api",
+    output_format: str = "records",
 ) -> tuple[bool, dict[str, Any], int]:
     """
     Get historical data for a symbol.
@@ -246,6 +408,8 @@ def get_history(
         feed_token: Direct broker feed token (for internal calls)
         broker: Direct broker name (for internal calls)
         source: Data source - 'api' (broker, default) or 'db' (DuckDB/Historify)
+        output_format: One of HISTORY_FORMATS - 'records' (default) or a columnar
+            format whose response["data"] is a pyarrow Table
 
     Returns:
         Tuple containing:
@@ -261,11 +425,10 @@ def get_history(
             interval=interval,
             start_date=start_date,
             end_date=end_date,
+            output_format=output_format,
         )
 
-    # Source: 'api' (default) - Fetch from broker API
-    # Enforce 3 requests/second rate limit for broker history calls
-    _enforce_rate_limit()
+    # Source: 'api' (default) - Fetch from broker API, within the broker's history rate limit
 
     # Case 1: API-based authentication
     if api_key and not (auth_token and broker):
@@ -274,14 +437,32 @@ def get_history(
         )
         if AUTH_TOKEN is None:
             return False, {"status": "error", "message": "Invalid openalgo apikey"}, 403
+        _acquire_history_slot(broker_name)
         return get_history_with_auth(
-            AUTH_TOKEN, FEED_TOKEN, broker_name, symbol, exchange, interval, start_date, end_date
+            AUTH_TOKEN,
+            FEED_TOKEN,
+            broker_name,
+            symbol,
+            exchange,
+            interval,
+            start_date,
+            end_date,
+            output_format,
         )
 
     # Case 2: Direct internal call with auth_token and broker
     elif auth_token and broker:
+        _acquire_history_slot(broker)
         return get_history_with_auth(
-            auth_token, feed_token, broker, symbol, exchange, interval, start_date, end_date
+            auth_token,
+            feed_token,
+            broker,
+            symbol,
+            exchange,
+            interval,
+            start_date,
+            end_date,
+            output_format,
         )
 
     # Case 3: Invalid parameters
@@ -4,14 +4,24 @@ Calculates intraday Implied Volatility time series for option symbols.
 
 Uses historical OHLCV candle data and Black-76 model to compute IV at each
 candle's close price. Returns IV time series suitable for charting.
+
+The series is solved in one vectorized pass (utils/black76.py) and the rows of
+finished sessions are cached per (symbol, interval, day), so a chart refresh
+only recomputes today's candles.
+
+Configuration (.env):
+- IV_CHART_CACHE_SESSIONS: Finished sessions kept in the IV series cache (default: 2048, 0 disables)
 """
 
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 import pandas as pd
 import pytz
 
-from services.history_service import get_history
+from services.leg_history_service import fetch_leg_histories
 from services.option_greeks_service import (
     DEFAULT_INTEREST_RATES,
     parse_option_symbol,
@@ -28,11 +38,18 @@ from services.quotes_service import get_quotes
 from utils.constants import CRYPTO_EXCHANGES, INSTRUMENT_PERPFUT
 from utils.logging import get_logger
 
-# py_vollib is lazy-loaded inside _calculate_iv_series() and get_iv_chart_data()
-# to avoid loading scipy/numba/llvmlite at startup
+# numpy/scipy (utils.black76) are lazy-loaded inside _compute_iv_rows()
+# to keep them out of startup
 
 logger = get_logger(__name__)
 
+# Finished-session IV rows: {(option_symbol, underlying_symbol, interval, strike,
+# expiry, flag, rate, day): [rows]}, least recently used evicted first
+IV_SESSION_CACHE_SIZE = int(os.getenv("IV_CHART_CACHE_SESSIONS", "2048"))
+_IV_SESSION_CACHE: OrderedDict[tuple, list[dict]] = OrderedDict()
+_IV_SESSION_CACHE_LOCK = threading.Lock()
+_IV_CACHE_STATS = {"hits": 0, "misses": 0, "total_queries": 0}
+
 # Index symbols that need NSE_INDEX/BSE_INDEX for quotes
 NSE_INDEX_SYMBOLS = {
     "NIFTY",
@@ -151,18 +168,6 @@ def get_iv_chart_data(
     Returns:
         Tuple of (success, response_dict, status_code)
     """
-    try:
-        from py_vollib.black.implied_volatility import implied_volatility as black_iv  # noqa: F401
-    except ImportError:
-        return (
-            False,
-            {
-                "status": "error",
-                "message": "py_vollib library required for IV calculation. Install with: pip install py_vollib",
-            },
-            500,
-        )
-
     try:
         ist = pytz.timezone("Asia/Kolkata")
         today = datetime.now(ist).date()
@@ -237,36 +242,17 @@ def get_iv_chart_data(
         interest_rate_pct = DEFAULT_INTEREST_RATES.get(options_exchange, 0)
         interest_rate_decimal = interest_rate_pct / 100.0
 
-        # Step 6: Fetch intraday history for underlying and both option symbols
+        # Step 6: Fetch intraday history for underlying and both option symbols concurrently
         # Underlying history - use the underlying exchange for index symbols
-        underlying_history_exchange = quote_exchange
-        # For index symbols like NIFTY on NSE_INDEX, the history service needs the right exchange
-        success_u, resp_u, _ = get_history(
-            symbol=underlying_quote_symbol,
-            exchange=underlying_history_exchange,
-            interval=interval,
-            start_date=start_date_str,
-            end_date=end_date_str,
-            api_key=api_key,
-        )
-
-        success_ce, resp_ce, _ = get_history(
-            symbol=ce_symbol,
-            exchange=options_exchange,
-            interval=interval,
-            start_date=start_date_str,
-            end_date=end_date_str,
-            api_key=api_key,
-        )
-
-        success_pe, resp_pe, _ = get_history(
-            symbol=pe_symbol,
-            exchange=options_exchange,
-            interval=interval,
-            start_date=start_date_str,
-            end_date=end_date_str,
-            api_key=api_key,
+        underlying_leg = (underlying_quote_symbol, quote_exchange)
+        ce_leg = (ce_symbol, options_exchange)
+        pe_leg = (pe_symbol, options_exchange)
+        leg_histories = fetch_leg_histories(
+            [underlying_leg, ce_leg, pe_leg], interval, start_date_str, end_date_str, api_key
         )
+        success_u, resp_u, _ = leg_histories[underlying_leg]
+        success_ce, resp_ce, _ = leg_histories[ce_leg]
+        success_pe, resp_pe, _ = leg_histories[pe_leg]
 
         if not success_u:
             return (
@@ -301,6 +287,7 @@ def get_iv_chart_data(
                     expiry_dt=expiry_dt,
                     flag="c",
                     interest_rate=interest_rate_decimal,
+                    cache_key=(ce_symbol, underlying_quote_symbol, interval),
                 )
                 series_results.append({
                     "symbol": ce_symbol,
@@ -320,6 +307,7 @@ def get_iv_chart_data(
                     expiry_dt=expiry_dt,
                     flag="p",
                     interest_rate=interest_rate_decimal,
+                    cache_key=(pe_symbol, underlying_quote_symbol, interval),
                 )
                 series_results.append({
                     "symbol": pe_symbol,
@@ -357,10 +345,144 @@ def get_iv_chart_data(
         return False, {"status": "error", "message": str(e)}, 500
 
 
-def _calculate_iv_series(df_option, df_underlying, strike, expiry_dt, flag, interest_rate):
+def _session_cache_get(key):
+    """Cached IV rows of a finished session, or None"""
+    with _IV_SESSION_CACHE_LOCK:
+        _IV_CACHE_STATS["total_queries"] += 1
+        rows = _IV_SESSION_CACHE.get(key)
+        if rows is None:
+            _IV_CACHE_STATS["misses"] += 1
+            return None
+        _IV_SESSION_CACHE.move_to_end(key)
+        _IV_CACHE_STATS["hits"] += 1
+        return rows
+
+
+def _session_cache_put(key, rows):
+    """Store the IV rows of a finished session, evicting the least recently used"""
+    if IV_SESSION_CACHE_SIZE <= 0:
+        return
+    with _IV_SESSION_CACHE_LOCK:
+        _IV_SESSION_CACHE[key] = rows
+        _IV_SESSION_CACHE.move_to_end(key)
+        while len(_IV_SESSION_CACHE) > IV_SESSION_CACHE_SIZE:
+            _IV_SESSION_CACHE.popitem(last=False)
+
+
+def get_iv_series_cache_stats() -> dict:
+    """Get IV session cache statistics for monitoring"""
+    with _IV_SESSION_CACHE_LOCK:
+        total = _IV_CACHE_STATS["total_queries"]
+        hit_rate = (_IV_CACHE_STATS["hits"] / total * 100) if total > 0 else 0.0
+        return {
+            "hits": _IV_CACHE_STATS["hits"],
+            "misses": _IV_CACHE_STATS["misses"],
+            "total_queries": total,
+            "hit_rate": f"{hit_rate:.2f}%",
+            "cached_sessions": len(_IV_SESSION_CACHE),
+        }
+
+
+def clear_iv_series_cache():
+    """Clear the IV session cache"""
+    with _IV_SESSION_CACHE_LOCK:
+        _IV_SESSION_CACHE.clear()
+        _IV_CACHE_STATS.update({"hits": 0, "misses": 0, "total_queries": 0})
+    logger.info("IV series cache cleared")
+
+
+def _align_closes(df_option, df_underlying):
+    """
+    Inner-join option and underlying closes on their candle timestamps.
+
+    Returns:
+        DataFrame indexed by timestamp (sorted) with option_close and underlying_close
+    """
+    option_close = df_option["close"][~df_option.index.duplicated(keep="last")]
+    underlying_close = df_underlying["close"][~df_underlying.index.duplicated(keep="last")]
+    aligned = pd.concat(
+        [option_close.rename("option_close"), underlying_close.rename("underlying_close")],
+        axis=1,
+        join="inner",
+    ).sort_index()
+    return aligned.astype(float)
+
+
+def _compute_iv_rows(aligned, strike, expiry_dt, flag, interest_rate):
+    """
+    Solve IV and Greeks for every aligned candle in one vectorized pass.
+
+    Args:
+        aligned: Output of _align_closes()
+        strike: Option strike price
+        expiry_dt: Expiry datetime (naive, IST)
+        flag: "c" for call, "p" for put
+        interest_rate: Decimal interest rate
+
+    Returns:
+        List of dicts with time (unix seconds), iv, delta, gamma, theta, vega,
+        option_price, underlying_price
+    """
+    import numpy as np
+
+    from utils.black76 import greeks as black_greeks
+    from utils.black76 import implied_volatility as black_iv
+
+    if aligned.empty:
+        return []
+
+    option_close = aligned["option_close"].to_numpy()
+    underlying_close = aligned["underlying_close"].to_numpy()
+
+    # Time to expiry from each candle (naive IST wall time), as in calculate_time_to_expiry_at()
+    candle_times = aligned.index.tz_localize(None) if aligned.index.tz is not None else aligned.index
+    seconds = (pd.Timestamp(expiry_dt) - candle_times).total_seconds().to_numpy()
+    years = np.where(seconds > 0, np.maximum(seconds / (60 * 60 * 24) / 365.0, 0.0001), 0.0)
+
+    iv = black_iv(option_close, underlying_close, strike, interest_rate, years, flag)
+    has_greeks = np.isfinite(iv) & (iv > 0)
+    greeks = black_greeks(
+        flag, underlying_close, strike, np.where(years > 0, years, 1.0), interest_rate, np.where(has_greeks, iv, 0.2)
+    )
+
+    def column(values, decimals, mask):
+        rounded = np.round(values, decimals)
+        return [float(v) if ok else None for v, ok in zip(rounded, mask)]
+
+    times = aligned.index.as_unit("s").asi8.tolist()
+    columns = {
+        "iv": column(iv * 100.0, 2, np.isfinite(iv)),
+        "delta": column(greeks["delta"], 4, has_greeks),
+        "gamma": column(greeks["gamma"], 6, has_greeks),
+        "theta": column(greeks["theta"], 4, has_greeks),
+        "vega": column(greeks["vega"], 4, has_greeks),
+    }
+    return [
+        {
+            "time": times[i],
+            "iv": columns["iv"][i],
+            "delta": columns["delta"][i],
+            "gamma": columns["gamma"][i],
+            "theta": columns["theta"][i],
+            "vega": columns["vega"][i],
+            "option_price": float(option_close[i]),
+            "underlying_price": float(underlying_close[i]),
+        }
+        for i in range(len(times))
+    ]
+
+
+def _calculate_iv_series(
+    df_option, df_underlying, strike, expiry_dt, flag, interest_rate, cache_key=None
+):
     """
     Calculate IV at each candle timestamp by aligning option and underlying data.
 
+    The whole series is solved at once with the vectorized Black-76 engine
+    (utils/black76.py). With a cache_key, the rows of finished sessions (days
+    before today in IST) are cached, so only the live session is recomputed
+    when the chart refreshes.
+
     Args:
         df_option: DataFrame with option OHLCV (datetime index in IST)
         df_underlying: DataFrame with underlying OHLCV (datetime index in IST)
@@ -368,76 +490,37 @@ def _calculate_iv_series(df_option, df_underlying, strike, expiry_dt, flag, inte
         expiry_dt: Expiry datetime (naive, IST)
         flag: "c" for call, "p" for put
         interest_rate: Decimal interest rate (e.g., 0.0 for 0%)
+        cache_key: Optional (option_symbol, underlying_symbol, interval) tuple
+            identifying the series for the session cache
 
     Returns:
         List of dicts with time (unix seconds), iv, option_price, underlying_price
     """
-    from py_vollib.black.greeks.analytical import delta as black_delta
-    from py_vollib.black.greeks.analytical import gamma as black_gamma
-    from py_vollib.black.greeks.analytical import theta as black_theta
-    from py_vollib.black.greeks.analytical import vega as black_vega
-    from py_vollib.black.implied_volatility import implied_volatility as black_iv
-
-    iv_data = []
-
-    # Align on common timestamps using inner join
-    common_index = df_option.index.intersection(df_underlying.index)
-
-    for ts in common_index:
-        option_close = float(df_option.loc[ts, "close"])
-        underlying_close = float(df_underlying.loc[ts, "close"])
-
-        # Calculate time to expiry from this candle's timestamp
-        # Remove timezone info for comparison with naive expiry_dt
-        candle_time_naive = ts.replace(tzinfo=None)
-        years_to_expiry, _ = calculate_time_to_expiry_at(candle_time_naive, expiry_dt)
-
-        iv_value = None
-        delta_value = None
-        gamma_value = None
-        theta_value = None
-        vega_value = None
-
-        if years_to_expiry > 0 and option_close > 0 and underlying_close > 0:
-            try:
-                iv_decimal = black_iv(
-                    option_close,
-                    underlying_close,
-                    strike,
-                    interest_rate,
-                    years_to_expiry,
-                    flag,
-                )
-                iv_value = round(iv_decimal * 100.0, 2)
-
-                # Calculate Greeks using the computed IV
-                if iv_decimal > 0:
-                    try:
-                        delta_value = round(black_delta(flag, underlying_close, strike, years_to_expiry, interest_rate, iv_decimal), 4)
-                        gamma_value = round(black_gamma(flag, underlying_close, strike, years_to_expiry, interest_rate, iv_decimal), 6)
-                        theta_value = round(black_theta(flag, underlying_close, strike, years_to_expiry, interest_rate, iv_decimal), 4)
-                        vega_value = round(black_vega(flag, underlying_close, strike, years_to_expiry, interest_rate, iv_decimal), 4)
-                    except Exception:
-                        pass
-            except Exception:
-                # IV calculation failed (deep ITM, no time value, etc.)
-                iv_value = None
-
-        # Convert timestamp to Unix seconds (UTC) for lightweight-charts
-        unix_seconds = int(ts.timestamp())
-
-        iv_data.append({
-            "time": unix_seconds,
-            "iv": iv_value,
-            "delta": delta_value,
-            "gamma": gamma_value,
-            "theta": theta_value,
-            "vega": vega_value,
-            "option_price": option_close,
-            "underlying_price": underlying_close,
-        })
-
-    return iv_data
+    import numpy as np
+
+    aligned = _align_closes(df_option, df_underlying)
+    if cache_key is None or aligned.empty:
+        return _compute_iv_rows(aligned, strike, expiry_dt, flag, interest_rate)
+
+    today = datetime.now(pytz.timezone("Asia/Kolkata")).date()
+    days = aligned.index.date
+    session_rows = {}
+    for day in sorted(set(days)):
+        if day < today:
+            rows = _session_cache_get((*cache_key, strike, expiry_dt, flag, interest_rate, day))
+            if rows is not None:
+                session_rows[day] = rows
+
+    uncached = ~np.isin(days, list(session_rows))
+    if uncached.any():
+        computed = _compute_iv_rows(aligned[uncached], strike, expiry_dt, flag, interest_rate)
+        for row, day in zip(computed, days[uncached]):
+            session_rows.setdefault(day, []).append(row)
+        for day in set(days[uncached]):
+            if day < today:
+                _session_cache_put((*cache_key, strike, expiry_dt, flag, interest_rate, day), session_rows[day])
+
+    return [row for day in sorted(session_rows) for row in session_rows[day]]
 
 
 def get_default_symbols(underlying, exchange, expiry_date, api_key):
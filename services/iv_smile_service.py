@@ -9,7 +9,7 @@ Plots Call IV and Put IV across strikes, calculates ATM IV and Skew.
 from typing import Any
 
 from services.option_chain_service import get_option_chain
-from services.option_greeks_service import calculate_greeks
+from services.option_greeks_service import calculate_greeks_batch
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -21,8 +21,8 @@ def get_iv_smile_data(
     """
     Get IV Smile data for all strikes.
 
-    Fetches option chain, computes IV for each CE/PE using Black-76,
-    then returns IV curves along with ATM IV and IV Skew.
+    Fetches option chain, computes IV for every CE/PE in one vectorized
+    Black-76 pass, then returns IV curves along with ATM IV and IV Skew.
 
     Args:
         underlying: Underlying symbol (e.g., NIFTY, BANKNIFTY)
@@ -60,6 +60,28 @@ def get_iv_smile_data(
         elif options_exchange in ("BSE_INDEX", "BSE"):
             options_exchange = "BFO"
 
+        # IV for every CE/PE with a price, solved in one pass
+        greeks_requests = []
+        for item in full_chain:
+            for leg in (item.get("ce"), item.get("pe")):
+                if leg and leg.get("symbol") and (leg.get("ltp") or 0) > 0:
+                    greeks_requests.append(
+                        {
+                            "symbol": leg["symbol"],
+                            "exchange": options_exchange,
+                            "spot_price": spot_price,
+                            "option_price": leg["ltp"],
+                        }
+                    )
+        iv_by_symbol = {}
+        for request, (ok, greeks_resp, _) in zip(
+            greeks_requests, calculate_greeks_batch(greeks_requests)
+        ):
+            if ok and greeks_resp.get("status") == "success":
+                iv_val = greeks_resp.get("implied_volatility", 0)
+                if iv_val and iv_val > 0:
+                    iv_by_symbol[request["symbol"]] = round(iv_val, 2)
+
         iv_chain = []
         atm_ce_iv = None
         atm_pe_iv = None
@@ -69,44 +91,8 @@ def get_iv_smile_data(
             ce = item.get("ce")
             pe = item.get("pe")
 
-            ce_iv = None
-            pe_iv = None
-
-            # Compute CE IV
-            if ce and ce.get("symbol"):
-                ce_ltp = ce.get("ltp", 0) or 0
-                if ce_ltp > 0:
-                    try:
-                        ok, greeks_resp, _ = calculate_greeks(
-                            option_symbol=ce["symbol"],
-                            exchange=options_exchange,
-                            spot_price=spot_price,
-                            option_price=ce_ltp,
-                        )
-                        if ok and greeks_resp.get("status") == "success":
-                            iv_val = greeks_resp.get("implied_volatility", 0)
-                            if iv_val and iv_val > 0:
-                                ce_iv = round(iv_val, 2)
-                    except Exception:
-                        pass
-
-            # Compute PE IV
-            if pe and pe.get("symbol"):
-                pe_ltp = pe.get("ltp", 0) or 0
-                if pe_ltp > 0:
-                    try:
-                        ok, greeks_resp, _ = calculate_greeks(
-                            option_symbol=pe["symbol"],
-                            exchange=options_exchange,
-                            spot_price=spot_price,
-                            option_price=pe_ltp,
-                        )
-                        if ok and greeks_resp.get("status") == "success":
-                            iv_val = greeks_resp.get("implied_volatility", 0)
-                            if iv_val and iv_val > 0:
-                                pe_iv = round(iv_val, 2)
-                    except Exception:
-                        pass
+            ce_iv = iv_by_symbol.get(ce["symbol"]) if ce and ce.get("symbol") else None
+            pe_iv = iv_by_symbol.get(pe["symbol"]) if pe and pe.get("symbol") else None
 
             # Track ATM IV
             if strike == atm_strike:
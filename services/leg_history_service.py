@@ -0,0 +1,261 @@
+"""
+Leg History Service
+Fetches intraday history for the legs of an options chart (underlying, CE and PE
+of one or more strikes) in one call.
+
+- Legs are requested concurrently; each request still takes a slot from the
+  broker's history rate governor inside get_history, so the worker count only
+  bounds how many requests wait in flight, never the broker's rate.
+- Identical requests in flight from concurrent chart requests (two users on the
+  same straddle, the straddle and IV charts of the same expiry) share one broker
+  call.
+- Candles of finished sessions do not change, so they are cached per leg and
+  trading day; once the earlier days of a range are cached only today is fetched.
+  A day without candles is cached (as empty) only when the market calendar marks
+  it a holiday or weekend; a trading day the broker returned nothing for is
+  fetched again next time.
+
+Configuration (.env):
+- LEG_HISTORY_WORKERS: Concurrent leg history requests per chart (default: 4)
+- LEG_HISTORY_CACHE_SIZE: Cached finished-session candle sets (default: 2000)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import pytz
+
+from database.auth_db import get_auth_token_broker
+from database.market_calendar_db import is_market_holiday
+from services.history_service import get_history
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+LEG_HISTORY_WORKERS = int(os.getenv("LEG_HISTORY_WORKERS", "4"))
+LEG_HISTORY_CACHE_SIZE = int(os.getenv("LEG_HISTORY_CACHE_SIZE", "2000"))
+
+IST = pytz.timezone("Asia/Kolkata")
+
+# Candles of these intervals span several sessions, so a past timestamp is no finished session
+_UNCACHED_INTERVALS = {"W", "M", "Q", "Y"}
+
+# (broker, exchange, symbol, interval, day) -> candles of that finished session
+_SESSION_CACHE: OrderedDict[tuple[str, str, str, str, date], list[dict]] = OrderedDict()
+_SESSION_CACHE_LOCK = threading.Lock()
+_SESSION_CACHE_STATS = {"hits": 0, "misses": 0, "fetches": 0, "shared_fetches": 0}
+
+# (broker, exchange, symbol, interval, start, end) -> Future of the get_history result
+_IN_FLIGHT: dict[tuple, Future] = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def _candle_day(timestamp: Any) -> date | None:
+    """IST trading day of an epoch timestamp (seconds or milliseconds), None if not epoch."""
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+        return None
+    seconds = timestamp / 1000 if timestamp > 1e11 else timestamp
+    return datetime.fromtimestamp(seconds, IST).date()
+
+
+def _session_cache_get(leg_key: tuple, days: list[date]) -> list[dict] | None:
+    """Candles of all given days in order, or None unless every day is cached."""
+    with _SESSION_CACHE_LOCK:
+        keys = [(*leg_key, day) for day in days]
+        if not all(key in _SESSION_CACHE for key in keys):
+            _SESSION_CACHE_STATS["misses"] += 1
+            return None
+        candles = []
+        for key in keys:
+            _SESSION_CACHE.move_to_end(key)
+            candles.extend(_SESSION_CACHE[key])
+        _SESSION_CACHE_STATS["hits"] += 1
+        return candles
+
+
+def _session_cache_put(leg_key: tuple, days: list[date], candles: list[dict]) -> bool:
+    """
+    Store the candles of finished days, one entry per day.
+
+    Days without candles are stored empty only if they were market holidays, so
+    a trading day missing from one broker response is not cached for good.
+    Returns False, storing nothing, when a candle's day cannot be determined.
+    """
+    wanted = set(days)
+    by_day: dict[date, list[dict]] = {}
+    for candle in candles:
+        day = _candle_day(candle.get("timestamp"))
+        if day is None:
+            return False
+        if day in wanted:
+            by_day.setdefault(day, []).append(candle)
+
+    exchange = leg_key[1]
+    by_day = {
+        day: by_day.get(day, [])
+        for day in days
+        if day in by_day or is_market_holiday(day, exchange)
+    }
+
+    with _SESSION_CACHE_LOCK:
+        for day, day_candles in by_day.items():
+            _SESSION_CACHE[(*leg_key, day)] = day_candles
+            _SESSION_CACHE.move_to_end((*leg_key, day))
+        while len(_SESSION_CACHE) > LEG_HISTORY_CACHE_SIZE:
+            _SESSION_CACHE.popitem(last=False)
+    return True
+
+
+def get_leg_history_cache_stats() -> dict:
+    """Finished-session cache and request sharing counters."""
+    with _SESSION_CACHE_LOCK:
+        stats = {**_SESSION_CACHE_STATS, "cached_sessions": len(_SESSION_CACHE)}
+    with _IN_FLIGHT_LOCK:
+        stats["in_flight"] = len(_IN_FLIGHT)
+    return stats
+
+
+def clear_leg_history_cache():
+    """Drop all cached sessions and reset the counters."""
+    with _SESSION_CACHE_LOCK:
+        _SESSION_CACHE.clear()
+        _SESSION_CACHE_STATS.update({"hits": 0, "misses": 0, "fetches": 0, "shared_fetches": 0})
+
+
+def _shared_fetch(
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start_date: str,
+    end_date: str,
+    auth_token: str,
+    feed_token: str | None,
+    broker: str,
+) -> tuple[bool, dict[str, Any], int]:
+    """get_history, with identical concurrent requests sharing one broker call."""
+    key = (broker, exchange, symbol, interval, start_date, end_date)
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _IN_FLIGHT[key] = future
+
+    if not leader:
+        with _SESSION_CACHE_LOCK:
+            _SESSION_CACHE_STATS["shared_fetches"] += 1
+        return future.result()
+
+    try:
+        with _SESSION_CACHE_LOCK:
+            _SESSION_CACHE_STATS["fetches"] += 1
+        result = get_history(
+            symbol=symbol,
+            exchange=exchange,
+            interval=interval,
+            start_date=start_date,
+            end_date=end_date,
+            auth_token=auth_token,
+            feed_token=feed_token,
+            broker=broker,
+        )
+    except Exception as e:
+        logger.exception(f"Error fetching history for {symbol}: {e}")
+        result = (False, {"status": "error", "message": str(e)}, 500)
+    finally:
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT.pop(key, None)
+    future.set_result(result)
+    return result
+
+
+def _fetch_leg(
+    symbol: str,
+    exchange: str,
+    interval: str,
+    start: date,
+    end: date,
+    today: date,
+    auth_token: str,
+    feed_token: str | None,
+    broker: str,
+) -> tuple[bool, dict[str, Any], int]:
+    """History of one leg, serving finished sessions from the cache."""
+    leg_key = (broker, exchange, symbol, interval)
+    past_days = []
+    if interval not in _UNCACHED_INTERVALS:
+        day = start
+        while day <= min(end, today - timedelta(days=1)):
+            past_days.append(day)
+            day += timedelta(days=1)
+
+    if past_days:
+        cached = _session_cache_get(leg_key, past_days)
+        if cached is not None:
+            if end < today:
+                return True, {"status": "success", "data": list(cached)}, 200
+            success, response, status_code = _shared_fetch(
+                symbol, exchange, interval, today.isoformat(), end.isoformat(), auth_token, feed_token, broker
+            )
+            if not success:
+                return success, response, status_code
+            return True, {"status": "success", "data": cached + list(response.get("data") or [])}, 200
+
+    success, response, status_code = _shared_fetch(
+        symbol, exchange, interval, start.isoformat(), end.isoformat(), auth_token, feed_token, broker
+    )
+    if success and past_days and isinstance(response.get("data"), list):
+        _session_cache_put(leg_key, past_days, response["data"])
+    return success, response, status_code
+
+
+def fetch_leg_histories(
+    legs: list[tuple[str, str]],
+    interval: str,
+    start_date: str,
+    end_date: str,
+    api_key: str,
+) -> dict[tuple[str, str], tuple[bool, dict[str, Any], int]]:
+    """
+    Fetch history for several legs concurrently.
+
+    Args:
+        legs: (symbol, exchange) pairs; duplicates are fetched once
+        interval: Candle interval (e.g., 1m, 5m)
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+        api_key: OpenAlgo API key
+
+    Returns:
+        Dict mapping each (symbol, exchange) to its get_history result tuple
+        (success, response, status_code)
+    """
+    unique_legs = list(dict.fromkeys(legs))
+    if not unique_legs:
+        return {}
+
+    auth_token, feed_token, broker = get_auth_token_broker(api_key, include_feed_token=True)
+    if auth_token is None:
+        error = (False, {"status": "error", "message": "Invalid openalgo apikey"}, 403)
+        return dict.fromkeys(unique_legs, error)
+
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        error = (False, {"status": "error", "message": "Dates must be in YYYY-MM-DD format"}, 400)
+        return dict.fromkeys(unique_legs, error)
+    today = datetime.now(IST).date()
+
+    def fetch(leg: tuple[str, str]) -> tuple[bool, dict[str, Any], int]:
+        return _fetch_leg(leg[0], leg[1], interval, start, end, today, auth_token, feed_token, broker)
+
+    if len(unique_legs) == 1:
+        return {unique_legs[0]: fetch(unique_legs[0])}
+
+    with ThreadPoolExecutor(max_workers=min(LEG_HISTORY_WORKERS, len(unique_legs))) as executor:
+        return dict(zip(unique_legs, executor.map(fetch, unique_legs)))
@@ -15,6 +15,7 @@ Features:
 - Health status API
 """
 
+import itertools
 import threading
 import time
 from collections import defaultdict
@@ -335,6 +336,9 @@ class MarketDataService:
         # User-specific data tracking
         self.user_access_tracking = defaultdict(dict)
 
+        # Process-wide sequence for per-symbol LTP versions (never reused, even after cleanup)
+        self._ltp_version_seq = itertools.count(1)
+
         # Initialize components
         self.validator = MarketDataValidator()
         self.health_monitor = ConnectionHealthMonitor()
@@ -414,6 +418,7 @@ class MarketDataService:
                     }
 
                 cache_entry = self.market_data_cache[symbol_key]
+                previous_ltp = (cache_entry.get("ltp") or {}).get("value")
 
                 # Update based on mode
                 if mode == 1:  # LTP
@@ -460,6 +465,8 @@ class MarketDataService:
                         "timestamp": market_data.get("timestamp", timestamp),
                     }
 
+                if (cache_entry.get("ltp") or {}).get("value") != previous_ltp:
+                    cache_entry["ltp_version"] = next(self._ltp_version_seq)
                 cache_entry["last_update"] = timestamp
                 self.metrics["total_updates"] += 1
 
@@ -726,6 +733,58 @@ class MarketDataService:
 
         return result
 
+    def get_ltp_snapshot(
+        self, symbol_keys: list[tuple[str, str]] | None = None
+    ) -> dict[tuple[str, str], tuple[float, float]]:
+        """
+        Get LTPs for many symbols under a single lock acquisition
+
+        Args:
+            symbol_keys: Optional list of (symbol, exchange) tuples (default: all cached symbols)
+
+        Returns:
+            Dictionary mapping (symbol, exchange) to (ltp, last_update)
+        """
+        snapshot = {}
+
+        with self.data_lock:
+            if symbol_keys is None:
+                entries = self.market_data_cache.values()
+            else:
+                entries = [
+                    self.market_data_cache[f"{exchange}:{symbol}"]
+                    for symbol, exchange in symbol_keys
+                    if f"{exchange}:{symbol}" in self.market_data_cache
+                ]
+
+            for entry in entries:
+                ltp_data = entry.get("ltp")
+                if ltp_data and ltp_data.get("value"):
+                    snapshot[(entry["symbol"], entry["exchange"])] = (
+                        ltp_data["value"],
+                        entry.get("last_update", 0),
+                    )
+
+        return snapshot
+
+    def get_ltp_versions(self, symbol_keys: list[tuple[str, str]]) -> dict[tuple[str, str], int]:
+        """
+        Get the LTP version of each symbol; a version changes whenever the symbol's LTP changes
+
+        Args:
+            symbol_keys: List of (symbol, exchange) tuples
+
+        Returns:
+            Dictionary mapping (symbol, exchange) to its version (0 if not cached)
+        """
+        with self.data_lock:
+            return {
+                (symbol, exchange): self.market_data_cache.get(f"{exchange}:{symbol}", {}).get(
+                    "ltp_version", 0
+                )
+                for symbol, exchange in symbol_keys
+            }
+
     def is_data_fresh(
         self, symbol: str = None, exchange: str = None, max_age_seconds: float = 30
     ) -> bool:
@@ -9,20 +9,46 @@ Three panels:
 
 Current OI is fetched efficiently via option chain (multiquotes).
 Daily OI change is computed from daily history (parallel execution).
+
+Previous-session OI does not change during the day, so it is cached per
+option symbol and trading day: the first view of the day fetches daily history
+for the chain (concurrently, paced by the broker's history rate governor),
+later views only need the option chain and the futures candles.
+
+Configuration (.env):
+- OI_PROFILE_HISTORY_WORKERS: Concurrent daily-history requests (default: 4)
+- OI_PROFILE_PREV_OI_CACHE_SIZE: Cached previous-session OI values (default: 5000)
 """
 
+import os
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from typing import Any
 
+import pytz
+
 from database.token_db_enhanced import fno_search_symbols
 from services.history_service import get_history
+from services.oi_tracker_service import compute_oi_analytics
 from services.option_chain_service import get_option_chain
 from utils.constants import CRYPTO_EXCHANGES, INSTRUMENT_PERPFUT
 from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+IST = pytz.timezone("Asia/Kolkata")
+
+OI_PROFILE_HISTORY_WORKERS = int(os.getenv("OI_PROFILE_HISTORY_WORKERS", "4"))
+PREV_OI_CACHE_SIZE = int(os.getenv("OI_PROFILE_PREV_OI_CACHE_SIZE", "5000"))
+
+# (trading day, exchange, symbol) -> previous session OI
+_PREV_OI_CACHE: OrderedDict[tuple[date, str, str], float] = OrderedDict()
+_PREV_OI_CACHE_LOCK = threading.Lock()
+_PREV_OI_CACHE_STATS = {"hits": 0, "misses": 0, "fetch_failures": 0}
+
 # Index symbols that need special exchange for quotes
 NSE_INDEX_SYMBOLS = {
     "NIFTY",
@@ -95,15 +121,74 @@ def _find_futures_symbol(
         return None
 
 
+def _prev_oi_cache_get(day: date, exchange: str, symbols: list[str]) -> dict[str, float]:
+    """Cached previous-session OI for the symbols that have it"""
+    found = {}
+    with _PREV_OI_CACHE_LOCK:
+        for symbol in symbols:
+            key = (day, exchange, symbol)
+            if key in _PREV_OI_CACHE:
+                _PREV_OI_CACHE.move_to_end(key)
+                found[symbol] = _PREV_OI_CACHE[key]
+        _PREV_OI_CACHE_STATS["hits"] += len(found)
+        _PREV_OI_CACHE_STATS["misses"] += len(symbols) - len(found)
+    return found
+
+
+def _prev_oi_cache_put(day: date, exchange: str, values: dict[str, float]):
+    """Store previous-session OI, dropping other days and the least recently used"""
+    if PREV_OI_CACHE_SIZE <= 0 or not values:
+        return
+    with _PREV_OI_CACHE_LOCK:
+        if _PREV_OI_CACHE and next(iter(_PREV_OI_CACHE))[0] != day:
+            for key in [key for key in _PREV_OI_CACHE if key[0] != day]:
+                del _PREV_OI_CACHE[key]
+        for symbol, prev_oi in values.items():
+            _PREV_OI_CACHE[(day, exchange, symbol)] = prev_oi
+            _PREV_OI_CACHE.move_to_end((day, exchange, symbol))
+        while len(_PREV_OI_CACHE) > PREV_OI_CACHE_SIZE:
+            _PREV_OI_CACHE.popitem(last=False)
+
+
+def get_prev_oi_cache_stats() -> dict:
+    """Get previous-session OI cache statistics for monitoring"""
+    with _PREV_OI_CACHE_LOCK:
+        return {**_PREV_OI_CACHE_STATS, "cached_symbols": len(_PREV_OI_CACHE)}
+
+
+def clear_prev_oi_cache():
+    """Clear the previous-session OI cache"""
+    with _PREV_OI_CACHE_LOCK:
+        _PREV_OI_CACHE.clear()
+        _PREV_OI_CACHE_STATS.update({"hits": 0, "misses": 0, "fetch_failures": 0})
+    logger.info("OI profile previous-session OI cache cleared")
+
+
+def _previous_session_oi(data: list[dict], today: date) -> float:
+    """OI of the last daily candle before today in IST (falls back to the second-last candle)"""
+    timestamps = [bar.get("timestamp") for bar in data]
+    if all(isinstance(ts, (int, float)) for ts in timestamps):
+        # Daily candles are stamped at 00:00 IST, so bucket them by IST date
+        previous = [
+            bar for bar in data if datetime.fromtimestamp(bar["timestamp"], IST).date() < today
+        ]
+        return float(previous[-1].get("oi", 0) or 0) if previous else 0.0
+    if len(data) >= 2:
+        return float(data[-2].get("oi", 0) or 0)
+    return 0.0
+
+
 def _fetch_daily_oi_changes(
     option_symbols: list[dict], options_exchange: str, api_key: str
 ) -> dict[str, float]:
     """
     Fetch daily history for options and return previous day's OI.
 
-    Uses sequential batch processing with rate-limit handling to avoid
-    broker 429 errors. Processes symbols in batches with delays between
-    batches and retries individual failures with exponential backoff.
+    Previous-session OI is served from the per-day cache; symbols not cached
+    yet are fetched concurrently (OI_PROFILE_HISTORY_WORKERS). Every request
+    takes a slot from the broker's history rate governor in get_history(), and
+    429 responses are still retried with exponential backoff. Only successful
+    fetches are cached, so a failed symbol is retried on the next load.
 
     Args:
         option_symbols: List of dicts with 'symbol' key
@@ -113,23 +198,26 @@ def _fetch_daily_oi_changes(
     Returns:
         Dict mapping symbol -> previous_day_oi
     """
-    end = datetime.now().strftime("%Y-%m-%d")
-    start = (datetime.now() - timedelta(days=14)).strftime("%Y-%m-%d")
-
-    results = {}
+    today = datetime.now(IST).date()
+    end = today.strftime("%Y-%m-%d")
+    start = (today - timedelta(days=14)).strftime("%Y-%m-%d")
 
     # Only fetch for symbols with non-zero current OI
     symbols_to_fetch = [s["symbol"] for s in option_symbols if s.get("oi", 0) > 0]
 
     if not symbols_to_fetch:
+        return {}
+
+    results = _prev_oi_cache_get(today, options_exchange, symbols_to_fetch)
+    missing = [symbol for symbol in symbols_to_fetch if symbol not in results]
+    if not missing:
         return results
 
-    BATCH_SIZE = 5
-    BATCH_DELAY = 0.5  # seconds between batches
     MAX_RETRIES = 2
     RETRY_BASE_DELAY = 1.0  # seconds, doubles each retry
 
-    def fetch_one_with_retry(symbol: str) -> tuple[str, float]:
+    def fetch_one_with_retry(symbol: str) -> tuple[str, float | None]:
+        """Previous-session OI, or None if the history request failed"""
         for attempt in range(MAX_RETRIES + 1):
             try:
                 success, resp, status_code = get_history(
@@ -140,12 +228,8 @@ def _fetch_daily_oi_changes(
                     end_date=end,
                     api_key=api_key,
                 )
-                if success and resp.get("data"):
-                    data = resp["data"]
-                    if len(data) >= 2:
-                        prev_oi = data[-2].get("oi", 0) or 0
-                        return symbol, float(prev_oi)
-                    return symbol, 0.0
+                if success:
+                    return symbol, _previous_session_oi(resp.get("data") or [], today)
 
                 # Rate limited - retry with backoff
                 if status_code == 429 and attempt < MAX_RETRIES:
@@ -154,28 +238,58 @@ def _fetch_daily_oi_changes(
                     time.sleep(delay)
                     continue
 
-                return symbol, 0.0
+                return symbol, None
             except Exception as e:
                 if attempt < MAX_RETRIES and "429" in str(e):
                     delay = RETRY_BASE_DELAY * (2**attempt)
                     logger.warning(f"Rate limited fetching {symbol}, retry {attempt + 1} after {delay}s")
                     time.sleep(delay)
                     continue
-                return symbol, 0.0
-        return symbol, 0.0
+                return symbol, None
+        return symbol, None
+
+    fetched = {}
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(OI_PROFILE_HISTORY_WORKERS, len(missing)))) as executor:
+        for symbol, prev_oi in executor.map(fetch_one_with_retry, missing):
+            if prev_oi is None:
+                failures += 1
+                results[symbol] = 0.0
+            else:
+                fetched[symbol] = prev_oi
+                results[symbol] = prev_oi
+
+    _prev_oi_cache_put(today, options_exchange, fetched)
+    if failures:
+        with _PREV_OI_CACHE_LOCK:
+            _PREV_OI_CACHE_STATS["fetch_failures"] += failures
+        logger.warning(f"Daily OI history unavailable for {failures}/{len(missing)} symbols")
 
-    # Process in batches to respect rate limits
-    for i in range(0, len(symbols_to_fetch), BATCH_SIZE):
-        batch = symbols_to_fetch[i : i + BATCH_SIZE]
-        for symbol in batch:
-            sym, prev_oi = fetch_one_with_retry(symbol)
-            results[sym] = prev_oi
+    return results
 
-        # Delay between batches (skip after last batch)
-        if i + BATCH_SIZE < len(symbols_to_fetch):
-            time.sleep(BATCH_DELAY)
 
-    return results
+def _fetch_futures_candles(
+    underlying: str, options_exchange: str, expiry_date: str, interval: str, days: int, api_key: str
+) -> tuple[str | None, list]:
+    """Futures symbol for the expiry and its intraday candles"""
+    futures_info = _find_futures_symbol(underlying, options_exchange, expiry_date, api_key)
+    if not futures_info:
+        return None, []
+
+    end_date = datetime.now().strftime("%Y-%m-%d")
+    start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    success_h, hist_response, _ = get_history(
+        symbol=futures_info["symbol"],
+        exchange=futures_info["exchange"],
+        interval=interval,
+        start_date=start_date,
+        end_date=end_date,
+        api_key=api_key,
+    )
+
+    candles = hist_response["data"] if success_h and hist_response.get("data") else []
+    return futures_info["symbol"], candles
 
 
 def get_oi_profile_data(
@@ -271,34 +385,16 @@ def get_oi_profile_data(
                 }
             )
 
-        # Step 2: Find futures symbol and fetch candles
-        futures_info = _find_futures_symbol(underlying, options_exchange, expiry_date, api_key)
-        candles = []
-        futures_symbol = None
-
-        if futures_info:
-            futures_symbol = futures_info["symbol"]
-            fut_exchange = futures_info["exchange"]
-
-            end_date = datetime.now().strftime("%Y-%m-%d")
-            start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-
-            success_h, hist_response, _ = get_history(
-                symbol=futures_symbol,
-                exchange=fut_exchange,
-                interval=interval,
-                start_date=start_date,
-                end_date=end_date,
-                api_key=api_key,
+        # Steps 2 and 3 run concurrently: futures candles alongside the
+        # previous-session OI (cached after the first load of the day)
+        with ThreadPoolExecutor(max_workers=1) as candle_executor:
+            candle_future = candle_executor.submit(
+                _fetch_futures_candles, underlying, options_exchange, expiry_date, interval, days, api_key
             )
-
-            if success_h and hist_response.get("data"):
-                candles = hist_response["data"]
-
-        # Step 3: Fetch daily OI changes (parallel)
-        prev_oi_map = _fetch_daily_oi_changes(
-            option_symbols_for_history, options_exchange, api_key
-        )
+            prev_oi_map = _fetch_daily_oi_changes(
+                option_symbols_for_history, options_exchange, api_key
+            )
+            futures_symbol, candles = candle_future.result()
 
         # Step 4: Compute OI changes
         for item in oi_chain:
@@ -315,6 +411,27 @@ def get_oi_profile_data(
             item.pop("ce_symbol", None)
             item.pop("pe_symbol", None)
 
+        # Max pain, PCR and OI-change totals from the same per-strike arrays
+        valid_chain = [
+            item for item in oi_chain if isinstance(item["strike"], (int, float)) and item["strike"] > 0
+        ]
+        analytics = compute_oi_analytics(
+            strikes=[item["strike"] for item in valid_chain],
+            ce_oi=[item["ce_oi"] for item in valid_chain],
+            pe_oi=[item["pe_oi"] for item in valid_chain],
+            ce_oi_change=[item["ce_oi_change"] for item in valid_chain],
+            pe_oi_change=[item["pe_oi_change"] for item in valid_chain],
+        )
+        summary = {
+            "max_pain_strike": analytics["max_pain_strike"],
+            "pcr_oi": analytics["pcr_oi"],
+            "total_ce_oi": int(analytics["total_ce_oi"]),
+            "total_pe_oi": int(analytics["total_pe_oi"]),
+            "total_ce_oi_change": int(analytics["total_ce_oi_change"]),
+            "total_pe_oi_change": int(analytics["total_pe_oi_change"]),
+            "pcr_oi_change": analytics["pcr_oi_change"],
+        }
+
         return (
             True,
             {
@@ -328,6 +445,7 @@ def get_oi_profile_data(
                 "interval": interval,
                 "candles": candles,
                 "oi_chain": oi_chain,
+                "summary": summary,
             },
             200,
         )
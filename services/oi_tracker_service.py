@@ -7,10 +7,14 @@ for option chains. Reuses the existing option chain service for OI data.
 Functions:
     get_oi_data() - Get OI data for all strikes with PCR and futures price
     calculate_max_pain() - Calculate max pain strike and pain distribution
+    calculate_max_pain_multi() - Max pain per expiry and aggregated across expiries
+    compute_oi_analytics() - Max pain, PCR and OI-change totals from strike arrays
 """
 
 from typing import Any
 
+import numpy as np
+
 from database.auth_db import get_auth_token_broker
 from database.token_db_enhanced import fno_search_symbols
 from services.option_chain_service import get_option_chain
@@ -120,6 +124,156 @@ def _get_nearest_futures_price(
         return None
 
 
+def compute_oi_analytics(
+    strikes,
+    ce_oi,
+    pe_oi,
+    ce_volume=None,
+    pe_volume=None,
+    ce_oi_change=None,
+    pe_oi_change=None,
+) -> dict[str, Any]:
+    """
+    Max pain, PCR and OI-change analytics for one set of strikes in a single pass.
+
+    Writer pain at every candidate strike c is computed from prefix sums over
+    the sorted strikes instead of a loop over all other strikes:
+    - CE pain(c) = sum over strikes s < c of (c - s) * ce_oi
+                 = c * cum(ce_oi) - cum(s * ce_oi)
+    - PE pain(c) = sum over strikes s > c of (s - c) * pe_oi
+                 = rest(s * pe_oi) - c * rest(pe_oi)
+    which is O(n log n) for the sort and O(n) vectorized after it.
+
+    Args:
+        strikes: Strike prices (any order)
+        ce_oi: CE open interest per strike
+        pe_oi: PE open interest per strike
+        ce_volume: Optional CE volume per strike
+        pe_volume: Optional PE volume per strike
+        ce_oi_change: Optional CE OI change per strike
+        pe_oi_change: Optional PE OI change per strike
+
+    Returns:
+        Dict with arrays sorted by strike (strikes, ce_oi, pe_oi, ce_pain,
+        pe_pain, total_pain, strike_pcr) and totals (max_pain_strike,
+        total_ce_oi, total_pe_oi, pcr_oi, pcr_volume and, when changes are
+        given, total_ce_oi_change, total_pe_oi_change, pcr_oi_change)
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    order = np.argsort(strikes, kind="stable")
+    strikes = strikes[order]
+
+    def sorted_column(values):
+        if values is None:
+            return None
+        return np.nan_to_num(np.asarray(values, dtype=float)[order])
+
+    ce_oi, pe_oi = sorted_column(ce_oi), sorted_column(pe_oi)
+
+    # Sums over strikes strictly below each candidate (CE) and strictly above it (PE)
+    ce_below = np.cumsum(ce_oi) - ce_oi
+    ce_weighted_below = np.cumsum(strikes * ce_oi) - strikes * ce_oi
+    pe_above = pe_oi.sum() - np.cumsum(pe_oi)
+    pe_weighted_above = (strikes * pe_oi).sum() - np.cumsum(strikes * pe_oi)
+
+    ce_pain = strikes * ce_below - ce_weighted_below
+    pe_pain = pe_weighted_above - strikes * pe_above
+    # Equal strikes contribute (c - s) = 0 but leave rounding residue
+    ce_pain = np.maximum(ce_pain, 0.0)
+    pe_pain = np.maximum(pe_pain, 0.0)
+    total_pain = ce_pain + pe_pain
+
+    total_ce_oi = float(ce_oi.sum())
+    total_pe_oi = float(pe_oi.sum())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strike_pcr = np.where(ce_oi > 0, pe_oi / ce_oi, 0.0)
+
+    analytics = {
+        "strikes": strikes,
+        "ce_oi": ce_oi,
+        "pe_oi": pe_oi,
+        "ce_pain": ce_pain,
+        "pe_pain": pe_pain,
+        "total_pain": total_pain,
+        "strike_pcr": strike_pcr,
+        "max_pain_strike": float(strikes[np.argmin(total_pain)]) if len(strikes) else None,
+        "total_ce_oi": total_ce_oi,
+        "total_pe_oi": total_pe_oi,
+        "pcr_oi": round(total_pe_oi / total_ce_oi, 2) if total_ce_oi > 0 else 0,
+        "pcr_volume": 0,
+    }
+
+    if ce_volume is not None and pe_volume is not None:
+        total_ce_volume = float(sorted_column(ce_volume).sum())
+        total_pe_volume = float(sorted_column(pe_volume).sum())
+        analytics["total_ce_volume"] = total_ce_volume
+        analytics["total_pe_volume"] = total_pe_volume
+        analytics["pcr_volume"] = (
+            round(total_pe_volume / total_ce_volume, 2) if total_ce_volume > 0 else 0
+        )
+
+    if ce_oi_change is not None and pe_oi_change is not None:
+        total_ce_change = float(sorted_column(ce_oi_change).sum())
+        total_pe_change = float(sorted_column(pe_oi_change).sum())
+        analytics["total_ce_oi_change"] = total_ce_change
+        analytics["total_pe_oi_change"] = total_pe_change
+        analytics["pcr_oi_change"] = (
+            round(total_pe_change / total_ce_change, 2) if total_ce_change != 0 else 0
+        )
+
+    return analytics
+
+
+def _aggregate_chains(chains: list[list[dict]]) -> dict[str, np.ndarray]:
+    """Sum CE/PE OI and volume per strike across several OI chains (union of strikes)"""
+    rows = [item for chain in chains for item in chain]
+    strikes = np.array([item["strike"] for item in rows], dtype=float)
+    unique_strikes, position = np.unique(strikes, return_inverse=True)
+
+    def summed(key):
+        values = np.array([item.get(key, 0) or 0 for item in rows], dtype=float)
+        return np.bincount(position, weights=values, minlength=len(unique_strikes))
+
+    return {
+        "strikes": unique_strikes,
+        "ce_oi": summed("ce_oi"),
+        "pe_oi": summed("pe_oi"),
+        "ce_volume": summed("ce_volume"),
+        "pe_volume": summed("pe_volume"),
+    }
+
+
+def _pain_data(analytics: dict[str, Any]) -> list[dict[str, Any]]:
+    """Per-strike pain rows for the max pain chart"""
+    rows = zip(
+        analytics["strikes"].tolist(),
+        np.round(analytics["ce_pain"], 2).tolist(),
+        np.round(analytics["pe_pain"], 2).tolist(),
+        np.round(analytics["total_pain"], 2).tolist(),
+        # Convert to Crores for display
+        np.round(analytics["total_pain"] / 10000000, 2).tolist(),
+    )
+    return [
+        {
+            "strike": strike,
+            "ce_pain": ce_pain,
+            "pe_pain": pe_pain,
+            "total_pain": total_pain,
+            "total_pain_cr": total_pain_cr,
+        }
+        for strike, ce_pain, pe_pain, total_pain, total_pain_cr in rows
+    ]
+
+
+def _valid_strikes(chain: list[dict]) -> list[dict]:
+    """Chain rows with a usable positive strike"""
+    return [
+        item
+        for item in chain
+        if isinstance(item.get("strike"), (int, float)) and item["strike"] > 0
+    ]
+
+
 def get_oi_data(
     underlying: str, exchange: str, expiry_date: str, api_key: str
 ) -> tuple[bool, dict[str, Any], int]:
@@ -157,45 +311,33 @@ def get_oi_data(
         atm_strike = chain_response.get("atm_strike")
         spot_price = chain_response.get("underlying_ltp")
 
-        # Compute PCR and totals from the full chain
-        total_ce_oi = 0
-        total_pe_oi = 0
-        total_ce_volume = 0
-        total_pe_volume = 0
-        lot_size = None
-
-        for item in full_chain:
-            if item.get("ce"):
-                total_ce_oi += item["ce"].get("oi", 0) or 0
-                total_ce_volume += item["ce"].get("volume", 0) or 0
-                if lot_size is None and item["ce"].get("lotsize"):
-                    lot_size = item["ce"]["lotsize"]
-            if item.get("pe"):
-                total_pe_oi += item["pe"].get("oi", 0) or 0
-                total_pe_volume += item["pe"].get("volume", 0) or 0
-                if lot_size is None and item["pe"].get("lotsize"):
-                    lot_size = item["pe"]["lotsize"]
-
-        pcr_oi = round(total_pe_oi / total_ce_oi, 2) if total_ce_oi > 0 else 0
-        pcr_volume = round(total_pe_volume / total_ce_volume, 2) if total_ce_volume > 0 else 0
-
         # Build OI chain for chart
+        lot_size = None
         oi_chain = []
         for item in full_chain:
-            ce_oi = 0
-            pe_oi = 0
-            if item.get("ce"):
-                ce_oi = item["ce"].get("oi", 0) or 0
-            if item.get("pe"):
-                pe_oi = item["pe"].get("oi", 0) or 0
+            ce = item.get("ce") or {}
+            pe = item.get("pe") or {}
+            if lot_size is None:
+                lot_size = ce.get("lotsize") or pe.get("lotsize")
             oi_chain.append(
                 {
                     "strike": item["strike"],
-                    "ce_oi": ce_oi,
-                    "pe_oi": pe_oi,
+                    "ce_oi": ce.get("oi", 0) or 0,
+                    "pe_oi": pe.get("oi", 0) or 0,
+                    "ce_volume": ce.get("volume", 0) or 0,
+                    "pe_volume": pe.get("volume", 0) or 0,
                 }
             )
 
+        # PCR and totals from the same arrays used for max pain
+        valid_chain = _valid_strikes(oi_chain)
+        analytics = compute_oi_analytics(
+            strikes=[item["strike"] for item in valid_chain],
+            ce_oi=[item["ce_oi"] for item in valid_chain],
+            pe_oi=[item["pe_oi"] for item in valid_chain],
+            ce_volume=[item["ce_volume"] for item in valid_chain],
+            pe_volume=[item["pe_volume"] for item in valid_chain],
+        )
         # Get futures price (single get_quotes call)
         # exchange is already the options exchange (NFO/BFO) from the frontend
         futures_price = _get_nearest_futures_price(
@@ -213,10 +355,10 @@ def get_oi_data(
                 "spot_price": spot_price,
                 "futures_price": futures_price,
                 "lot_size": lot_size or 1,
-                "pcr_oi": pcr_oi,
-                "pcr_volume": pcr_volume,
-                "total_ce_oi": total_ce_oi,
-                "total_pe_oi": total_pe_oi,
+                "pcr_oi": analytics["pcr_oi"],
+                "pcr_volume": analytics["pcr_volume"],
+                "total_ce_oi": int(analytics["total_ce_oi"]),
+                "total_pe_oi": int(analytics["total_pe_oi"]),
                 "atm_strike": atm_strike,
                 "expiry_date": expiry_date,
                 "chain": oi_chain,
@@ -246,6 +388,8 @@ def calculate_max_pain(
     - Total pain = CE loss + PE loss
     - Max pain = strike with minimum total pain
 
+    All candidates are evaluated at once with prefix sums (compute_oi_analytics).
+
     Args:
         underlying: Underlying symbol
         exchange: Exchange
@@ -274,46 +418,17 @@ def calculate_max_pain(
             return False, {"status": "error", "message": "No OI data available"}, 404
 
         # Filter out invalid entries
-        chain = [item for item in chain if isinstance(item.get("strike"), (int, float)) and item["strike"] > 0]
+        chain = _valid_strikes(chain)
         if not chain:
             return False, {"status": "error", "message": "No valid strike data available"}, 404
 
-        # Calculate pain at each strike
-        pain_data = []
-        for candidate in chain:
-            candidate_strike = candidate["strike"]
-            ce_pain = 0
-            pe_pain = 0
-
-            for item in chain:
-                strike = item["strike"]
-                ce_oi = item["ce_oi"]
-                pe_oi = item["pe_oi"]
-
-                # CE writers lose when underlying > strike (CE is ITM)
-                if candidate_strike > strike and ce_oi > 0:
-                    ce_pain += (candidate_strike - strike) * ce_oi
-
-                # PE writers lose when underlying < strike (PE is ITM)
-                if candidate_strike < strike and pe_oi > 0:
-                    pe_pain += (strike - candidate_strike) * pe_oi
-
-            total_pain = ce_pain + pe_pain
-
-            pain_data.append(
-                {
-                    "strike": candidate_strike,
-                    "ce_pain": round(ce_pain, 2),
-                    "pe_pain": round(pe_pain, 2),
-                    "total_pain": round(total_pain, 2),
-                    # Convert to Crores for display
-                    "total_pain_cr": round(total_pain / 10000000, 2),
-                }
-            )
-
-        # Find max pain strike (minimum total pain)
-        max_pain_entry = min(pain_data, key=lambda x: x["total_pain"])
-        max_pain_strike = max_pain_entry["strike"]
+        analytics = compute_oi_analytics(
+            strikes=[item["strike"] for item in chain],
+            ce_oi=[item["ce_oi"] for item in chain],
+            pe_oi=[item["pe_oi"] for item in chain],
+        )
+        pain_data = _pain_data(analytics)
+        max_pain_strike = analytics["max_pain_strike"]
 
         return (
             True,
@@ -340,3 +455,111 @@ def calculate_max_pain(
             {"status": "error", "message": "Error calculating max pain"},
             500,
         )
+
+
+def calculate_max_pain_multi(
+    underlying: str, exchange: str, expiry_dates: list[str], api_key: str
+) -> tuple[bool, dict[str, Any], int]:
+    """
+    Calculate Max Pain for several expiries and aggregated across them.
+
+    Each expiry gets its own max pain, PCR and pain distribution. The
+    aggregate sums CE/PE OI per strike over all expiries (union of strikes)
+    and runs the same analytics on the combined arrays, which is the
+    positioning that matters for stock and MCX options with open interest
+    spread across several expiries.
+
+    Args:
+        underlying: Underlying symbol
+        exchange: Exchange
+        expiry_dates: Expiries in DDMMMYY format
+        api_key: OpenAlgo API key
+
+    Returns:
+        Tuple of (success, response_data, status_code)
+    """
+    try:
+        expiries = []
+        chains = []
+        errors = []
+        first_response = None
+
+        for expiry_date in expiry_dates:
+            success, oi_response, _ = get_oi_data(
+                underlying=underlying,
+                exchange=exchange,
+                expiry_date=expiry_date,
+                api_key=api_key,
+            )
+            chain = _valid_strikes(oi_response.get("chain", [])) if success else []
+            if not chain:
+                errors.append(
+                    {
+                        "expiry_date": expiry_date,
+                        "message": oi_response.get("message", "No OI data available"),
+                    }
+                )
+                continue
+
+            first_response = first_response or oi_response
+            analytics = compute_oi_analytics(
+                strikes=[item["strike"] for item in chain],
+                ce_oi=[item["ce_oi"] for item in chain],
+                pe_oi=[item["pe_oi"] for item in chain],
+            )
+            pain_data = _pain_data(analytics)
+            chains.append(chain)
+            expiries.append(
+                {
+                    "expiry_date": expiry_date,
+                    "futures_price": oi_response.get("futures_price"),
+                    "max_pain_strike": analytics["max_pain_strike"],
+                    "lot_size": oi_response.get("lot_size", 1),
+                    "pcr_oi": oi_response.get("pcr_oi"),
+                    "pcr_volume": oi_response.get("pcr_volume"),
+                    "total_ce_oi": oi_response.get("total_ce_oi"),
+                    "total_pe_oi": oi_response.get("total_pe_oi"),
+                    "pain_data": pain_data,
+                }
+            )
+
+        if not chains:
+            return (
+                False,
+                {"status": "error", "message": "No OI data available", "errors": errors},
+                404,
+            )
+
+        combined = _aggregate_chains(chains)
+        analytics = compute_oi_analytics(**combined)
+        pain_data = _pain_data(analytics)
+
+        return (
+            True,
+            {
+                "status": "success",
+                "underlying": first_response.get("underlying", underlying),
+                "spot_price": first_response.get("spot_price"),
+                "atm_strike": first_response.get("atm_strike"),
+                "expiries": expiries,
+                "aggregate": {
+                    "expiry_dates": [item["expiry_date"] for item in expiries],
+                    "max_pain_strike": analytics["max_pain_strike"],
+                    "pcr_oi": analytics["pcr_oi"],
+                    "pcr_volume": analytics["pcr_volume"],
+                    "total_ce_oi": int(analytics["total_ce_oi"]),
+                    "total_pe_oi": int(analytics["total_pe_oi"]),
+                    "pain_data": pain_data,
+                },
+                "errors": errors,
+            },
+            200,
+        )
+
+    except Exception as e:
+        logger.exception(f"Error calculating multi-expiry max pain: {e}")
+        return (
+            False,
+            {"status": "error", "message": "Error calculating max pain"},
+            500,
+        )
@@ -43,6 +43,14 @@ Strike Labels (different for CE and PE):
     - ATM: At-The-Money strike (same for both CE and PE)
     - Strike BELOW ATM: CE is ITM, PE is OTM
     - Strike ABOVE ATM: CE is OTM, PE is ITM
+
+Live sessions:
+    For F&O exchanges get_option_chain() is served from a streaming session
+    (services/option_chain_session_service) that takes one snapshot and then
+    applies WebSocket ticks. Responses then include a "freshness" block.
+
+Configuration (.env):
+    OPTION_CHAIN_STREAMING: Serve chains from live sessions (default: false)
 """
 
 import os
@@ -70,6 +78,9 @@ from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Serve chains from live WebSocket-maintained sessions instead of polling multiquotes
+OPTION_CHAIN_STREAMING = os.getenv("OPTION_CHAIN_STREAMING", "false").lower() == "true"
+
 
 def _subscribe_symbols_background(symbols: list[dict[str, str]], api_key: str) -> None:
     """Fire-and-forget WebSocket subscription so the next call hits the cache.
@@ -254,6 +265,29 @@ def get_option_symbols_for_chain(
     return chain_symbols
 
 
+def get_underlying_quote_exchange(base_symbol: str, exchange: str) -> str:
+    """
+    Exchange to quote the underlying on for an option chain request.
+
+    Index options on NFO/BFO are quoted on NSE_INDEX/BSE_INDEX, stock options
+    on the cash segment; other exchanges (MCX, CDS, crypto) quote as given.
+    """
+    if exchange.upper() in ["NFO", "BFO"]:
+        if base_symbol in [
+            "NIFTY",
+            "BANKNIFTY",
+            "FINNIFTY",
+            "MIDCPNIFTY",
+            "NIFTYNXT50",
+            "INDIAVIX",
+        ]:
+            return "NSE_INDEX"
+        if base_symbol in ["SENSEX", "BANKEX", "SENSEX50"]:
+            return "BSE_INDEX"
+        return "NSE" if exchange.upper() == "NFO" else "BSE"
+    return exchange
+
+
 def get_option_chain(
     underlying: str, exchange: str, expiry_date: str, strike_count: int, api_key: str,
     side: str | None = None,
@@ -261,12 +295,46 @@ def get_option_chain(
     """
     Main function to get option chain data.
 
+    With OPTION_CHAIN_STREAMING enabled, non-crypto chains are served
+    from a live chain session (services/option_chain_session_service.py) that
+    is snapshotted once and then kept current from WebSocket ticks, instead of
+    a multiquote call on every request.
+
     Args:
         underlying: Underlying symbol (e.g., NIFTY, BANKNIFTY, RELIANCE)
         exchange: Exchange (NSE_INDEX, NSE, NFO, BSE_INDEX, BSE, BFO, MCX, CDS)
         expiry_date: Expiry date in DDMMMYY format (e.g., 28NOV25)
         strike_count: Number of strikes above and below ATM
         api_key: OpenAlgo API key
+        side: Optional "ITM"/"OTM" filter (ATM is always included)
+
+    Returns:
+        Tuple of (success, response_data, status_code)
+    """
+    if OPTION_CHAIN_STREAMING and exchange.upper() not in CRYPTO_EXCHANGES:
+        from services.option_chain_session_service import get_option_chain_sessions
+
+        return get_option_chain_sessions().get_chain(
+            underlying, exchange, expiry_date, strike_count, api_key, side
+        )
+
+    return fetch_option_chain(underlying, exchange, expiry_date, strike_count, api_key, side)
+
+
+def fetch_option_chain(
+    underlying: str, exchange: str, expiry_date: str, strike_count: int, api_key: str,
+    side: str | None = None,
+) -> tuple[bool, dict[str, Any], int]:
+    """
+    Fetch option chain data from the broker (multiquotes for all CE/PE symbols).
+
+    Args:
+        underlying: Underlying symbol (e.g., NIFTY, BANKNIFTY, RELIANCE)
+        exchange: Exchange (NSE_INDEX, NSE, NFO, BSE_INDEX, BSE, BFO, MCX, CDS)
+        expiry_date: Expiry date in DDMMMYY format (e.g., 28NOV25)
+        strike_count: Number of strikes above and below ATM
+        api_key: OpenAlgo API key
+        side: Optional "ITM"/"OTM" filter (ATM is always included)
 
     Returns:
         Tuple of (success, response_data, status_code)
@@ -283,22 +351,8 @@ def get_option_chain(
         _use_ws_cache = bool(os.getenv("ZERODHA_ENCTOKEN"))
 
         # Step 2: Determine quote exchange for underlying LTP
-        quote_exchange = exchange
-        if exchange.upper() in ["NFO", "BFO"]:
-            if base_symbol in [
-                "NIFTY",
-                "BANKNIFTY",
-                "FINNIFTY",
-                "MIDCPNIFTY",
-                "NIFTYNXT50",
-                "INDIAVIX",
-            ]:
-                quote_exchange = "NSE_INDEX"
-            elif base_symbol in ["SENSEX", "BANKEX", "SENSEX50"]:
-                quote_exchange = "BSE_INDEX"
-            else:
-                quote_exchange = "NSE" if exchange.upper() == "NFO" else "BSE"
-        elif exchange.upper() in CRYPTO_EXCHANGES:
+        quote_exchange = get_underlying_quote_exchange(base_symbol, exchange)
+        if exchange.upper() in CRYPTO_EXCHANGES:
             # CRYPTO: look up the canonical perpetual symbol from DB (e.g. BTC -> BTCUSD.P)
             quote_exchange = exchange.upper()
             _perp = fno_search_symbols(
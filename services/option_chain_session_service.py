@@ -0,0 +1,556 @@
+"""
+Option Chain Session Service
+
+Live option chains maintained from WebSocket ticks. The option chain UI, GEX,
+IV smile, OI tracker and flows poll get_option_chain() every few seconds; a
+chain session turns those polls into in-memory reads:
+
+- One session per user and (underlying, exchange, expiry, strike window),
+  snapshotted once with fetch_option_chain() (one multiquotes call); the
+  session keeps the credentials of the user who opened it
+- The underlying (Quote mode) and every CE/PE symbol of the window (Depth mode,
+  so bid/ask stream with the LTP) are subscribed once on that user's WebSocket
+  connection and the session table is updated from MarketDataService ticks
+- When the underlying moves to a new ATM strike the window is re-centred with
+  a fresh snapshot and the subscriptions are adjusted
+- If no option tick arrived within OPTION_CHAIN_STREAM_MAX_AGE seconds (stream
+  down, market closed), the next read refreshes the snapshot - so a dead stream
+  costs no more than polling did; underlying ticks alone do not keep it fresh
+- Every response carries a "freshness" block (source, tick/snapshot age)
+- Tick listeners (computed channels) are told which session a tick changed
+- Sessions not read for OPTION_CHAIN_SESSION_IDLE_SECONDS are evicted; subscriptions
+  are refcounted per user, so a symbol is unsubscribed only when no session of that
+  user uses it, and symbols the connection already had are never unsubscribed
+
+Configuration (.env):
+- OPTION_CHAIN_STREAMING: Serve option chains from live sessions (default: false)
+- OPTION_CHAIN_STREAM_MAX_AGE: Seconds without ticks before a read refreshes the snapshot (default: 5)
+- OPTION_CHAIN_SESSION_IDLE_SECONDS: Idle seconds before a session is evicted (default: 120)
+- OPTION_CHAIN_MAX_SESSIONS: Maximum live sessions, least recently read evicted first (default: 16)
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from database.auth_db import get_auth_token_broker, verify_api_key
+from services.market_data_service import SubscriberPriority, get_market_data_service
+from services.option_chain_service import fetch_option_chain, get_underlying_quote_exchange
+from services.option_symbol_service import (
+    get_available_strikes,
+    get_option_exchange,
+    parse_underlying_symbol,
+)
+from services.websocket_service import get_websocket_subscriptions
+from services.websocket_service import subscribe_to_symbols as ws_subscribe_to_symbols
+from services.websocket_service import unsubscribe_from_symbols as ws_unsubscribe_from_symbols
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+STREAM_MAX_AGE = float(os.getenv("OPTION_CHAIN_STREAM_MAX_AGE", "5"))
+SESSION_IDLE_SECONDS = float(os.getenv("OPTION_CHAIN_SESSION_IDLE_SECONDS", "120"))
+MAX_SESSIONS = int(os.getenv("OPTION_CHAIN_MAX_SESSIONS", "16"))
+
+# Subscription modes: option legs need depth for bid/ask, the underlying only its LTP
+UNDERLYING_MODE = "Quote"
+LEG_MODE = "Depth"
+
+# Option quote fields updated from ticks: tick field -> chain field
+_TICK_FIELDS = {
+    "ltp": "ltp",
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "prev_close",
+    "volume": "volume",
+    "oi": "oi",
+}
+
+
+def _side_wanted(label: str, side: str | None) -> bool:
+    """Same side filter as fetch_option_chain(): ATM always, else label prefix"""
+    if not side:
+        return True
+    label = (label or "").upper()
+    return label == "ATM" or label.startswith(side.upper())
+
+
+def session_key(
+    username: str, underlying: str, exchange: str, expiry_date: str, strike_count: int | None
+) -> tuple:
+    """Key of the session serving a user's chain request"""
+    return (username, underlying.upper(), exchange.upper(), (expiry_date or "").upper(), strike_count)
+
+
+def _nearest_strike(strikes: list[float], ltp: float) -> float | None:
+    """Closest strike to ltp (lower one on a tie), as find_atm_strike_from_actual()"""
+    if not strikes:
+        return None
+    index = bisect.bisect_left(strikes, ltp)
+    if index == 0:
+        return strikes[0]
+    if index == len(strikes):
+        return strikes[-1]
+    lower, upper = strikes[index - 1], strikes[index]
+    return lower if ltp - lower <= upper - ltp else upper
+
+
+class OptionChainSession:
+    """Live chain table for one underlying/expiry/strike window"""
+
+    def __init__(
+        self,
+        username: str,
+        underlying: str,
+        exchange: str,
+        expiry_date: str,
+        strike_count: int | None,
+        api_key: str,
+    ):
+        self.username = username
+        self.underlying = underlying
+        self.exchange = exchange
+        self.expiry_date = expiry_date
+        self.strike_count = strike_count
+        self.api_key = api_key  # the owning user's key, used for every snapshot and subscription
+
+        base_symbol, embedded_expiry = parse_underlying_symbol(underlying)
+        self.quote_exchange = get_underlying_quote_exchange(base_symbol, exchange)
+        self.quote_symbol = base_symbol if embedded_expiry else underlying
+        self.options_exchange = get_option_exchange(self.quote_exchange)
+        self.base_symbol = base_symbol
+        self.final_expiry = embedded_expiry or expiry_date
+
+        self.lock = threading.Lock()  # chain table, shared with the tick callback
+        self.refresh_lock = threading.Lock()  # serializes snapshots
+        self.response: dict[str, Any] | None = None
+        self.legs: dict[str, dict[str, Any]] = {}  # option symbol -> ce/pe dict in response
+        self.strikes: list[float] = []
+        self.symbol_keys: set[str] = set()
+        self.subscriber_id: int | None = None
+
+        self.snapshot_at = 0.0
+        self.last_tick_at = 0.0
+        self.tick_count = 0
+        self.recentre_pending = False
+        self.last_access = time.time()
+        self.on_update: Callable[[tuple], None] | None = None  # called after a tick is applied
+
+    @property
+    def key(self) -> tuple:
+        return session_key(
+            self.username, self.underlying, self.exchange, self.expiry_date, self.strike_count
+        )
+
+    @property
+    def underlying_key(self) -> str:
+        return f"{self.quote_exchange}:{self.quote_symbol}"
+
+    def refresh(self) -> tuple[bool, dict[str, Any], int]:
+        """
+        Take a broker snapshot of the window around the current ATM.
+
+        Returns:
+            The fetch_option_chain() result
+        """
+        success, response, status_code = fetch_option_chain(
+            self.underlying, self.exchange, self.expiry_date, self.strike_count, self.api_key
+        )
+        if not success:
+            return success, response, status_code
+
+        strikes = get_available_strikes(
+            self.base_symbol, self.final_expiry, "CE", self.options_exchange
+        )
+        legs = {}
+        for item in response["chain"]:
+            for leg in (item.get("ce"), item.get("pe")):
+                if leg:
+                    legs[leg["symbol"]] = leg
+
+        with self.lock:
+            self.response = response
+            self.legs = legs
+            self.strikes = sorted(strikes)
+            self.snapshot_at = time.time()
+            self.recentre_pending = False
+        return success, response, status_code
+
+    def on_tick(self, data: dict[str, Any]) -> None:
+        """MarketDataService callback: fold a tick into the chain table"""
+        if self._apply_tick(data) and self.on_update is not None:
+            self.on_update(self.key)
+
+    def _apply_tick(self, data: dict[str, Any]) -> bool:
+        """Update the chain table from a tick; returns whether anything changed"""
+        symbol = data.get("symbol")
+        exchange = data.get("exchange")
+        market_data = data.get("data") or {}
+        now = time.time()
+
+        with self.lock:
+            if self.response is None:
+                return False
+
+            if symbol == self.quote_symbol and exchange == self.quote_exchange:
+                ltp = market_data.get("ltp")
+                if not ltp:
+                    return False
+                self.response["underlying_ltp"] = ltp
+                if market_data.get("close"):
+                    self.response["underlying_prev_close"] = market_data["close"]
+                atm = _nearest_strike(self.strikes, float(ltp))
+                if atm is not None and atm != self.response.get("atm_strike"):
+                    self.recentre_pending = True
+                # Only option ticks make the chain fresh
+                return True
+
+            leg = self.legs.get(symbol)
+            if leg is None or exchange != self.options_exchange:
+                return False
+            for tick_field, chain_field in _TICK_FIELDS.items():
+                value = market_data.get(tick_field)
+                if value is not None and (value or chain_field in ("volume", "oi")):
+                    leg[chain_field] = value
+
+            # Depth ticks carry the best bid/ask
+            depth = market_data.get("depth") or {}
+            buy = depth.get("buy") if isinstance(depth, dict) else None
+            sell = depth.get("sell") if isinstance(depth, dict) else None
+            if buy:
+                leg["bid"] = buy[0].get("price", leg.get("bid", 0))
+            if sell:
+                leg["ask"] = sell[0].get("price", leg.get("ask", 0))
+
+            self.last_tick_at = now
+            self.tick_count += 1
+        return True
+
+    def is_fresh(self, now: float) -> bool:
+        """Option ticks (or a snapshot) arrived recently enough to serve from memory"""
+        return now - max(self.last_tick_at, self.snapshot_at) <= STREAM_MAX_AGE
+
+    def read(self, side: str | None) -> dict[str, Any]:
+        """Copy of the live chain, with the side filter and a freshness block"""
+        now = time.time()
+        with self.lock:
+            response = dict(self.response)
+            chain = []
+            for item in response["chain"]:
+                row = {"strike": item["strike"]}
+                for key in ("ce", "pe"):
+                    leg = item.get(key)
+                    row[key] = dict(leg) if leg and _side_wanted(leg["label"], side) else None
+                chain.append(row)
+            response["chain"] = chain
+            response["freshness"] = {
+                "source": "stream" if self.last_tick_at > self.snapshot_at else "snapshot",
+                "snapshot_age_seconds": round(now - self.snapshot_at, 2),
+                "tick_age_seconds": round(now - self.last_tick_at, 2) if self.last_tick_at else None,
+                "ticks": self.tick_count,
+            }
+        return response
+
+
+class OptionChainSessionManager:
+    """Creates, serves, re-centres and evicts option chain sessions"""
+
+    def __init__(self):
+        self._sessions: OrderedDict[tuple, OptionChainSession] = OrderedDict()
+        # (username, "EXCHANGE:SYMBOL") -> sessions of that user using the symbol
+        self._symbol_refs: dict[tuple[str, str], int] = {}
+        # Symbols another consumer had already subscribed on the user's connection;
+        # sessions listen to them but never unsubscribe them
+        self._borrowed: set[tuple[str, str]] = set()
+        self._listeners: list[Callable[[tuple], None]] = []
+        self._lock = threading.Lock()
+        self.metrics = {"reads": 0, "stream_reads": 0, "snapshots": 0, "recentres": 0, "evictions": 0}
+
+    def get_chain(
+        self,
+        underlying: str,
+        exchange: str,
+        expiry_date: str,
+        strike_count: int | None,
+        api_key: str,
+        side: str | None = None,
+    ) -> tuple[bool, dict[str, Any], int]:
+        """
+        get_option_chain() served from a live session of the API key's user.
+
+        Args:
+            underlying: Underlying symbol (e.g., NIFTY, BANKNIFTY, RELIANCE)
+            exchange: Exchange (NSE_INDEX, NSE, NFO, BSE_INDEX, BSE, BFO, MCX, CDS)
+            expiry_date: Expiry date in DDMMMYY format
+            strike_count: Number of strikes above and below ATM
+            api_key: OpenAlgo API key
+            side: Optional "ITM"/"OTM" filter
+
+        Returns:
+            Tuple of (success, response_data, status_code)
+        """
+        username = verify_api_key(api_key) if api_key else None
+        if not username:
+            # Invalid keys get fetch_option_chain()'s error response
+            return fetch_option_chain(underlying, exchange, expiry_date, strike_count, api_key, side)
+
+        key = session_key(username, underlying, exchange, expiry_date, strike_count)
+        self._evict_idle()
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = OptionChainSession(
+                    username, underlying, exchange, expiry_date, strike_count, api_key
+                )
+                session.on_update = self._notify_listeners
+                self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            session.last_access = time.time()
+
+        # One request per session takes snapshots; others wait and read the result
+        with session.refresh_lock:
+            now = time.time()
+            if session.response is None or session.recentre_pending or not session.is_fresh(now):
+                recentre = session.response is not None and session.recentre_pending
+                success, response, status_code = session.refresh()
+                if not success:
+                    if session.response is None:
+                        self._drop(key)
+                    return success, response, status_code
+                self.metrics["snapshots"] += 1
+                self.metrics["recentres"] += int(recentre)
+                self._sync_subscriptions(session)
+            else:
+                self.metrics["stream_reads"] += 1
+
+        self.metrics["reads"] += 1
+        self._enforce_capacity()
+        return True, session.read(side), 200
+
+    def add_tick_listener(self, callback: Callable[[tuple], None]) -> None:
+        """
+        Register a callback run with a session's key after each tick it applied.
+
+        Callbacks run on the MarketDataService thread and must return quickly.
+        """
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_tick_listener(self, callback: Callable[[tuple], None]) -> None:
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify_listeners(self, key: tuple) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(key)
+            except Exception as e:
+                logger.debug(f"Option chain tick listener error: {e}")
+
+    def _sync_subscriptions(self, session: OptionChainSession) -> None:
+        """Subscribe new window symbols, release the ones that left the window"""
+        wanted = {session.underlying_key} | {
+            f"{session.options_exchange}:{symbol}" for symbol in session.legs
+        }
+        added = wanted - session.symbol_keys
+        removed = session.symbol_keys - wanted
+        if not added and not removed and session.subscriber_id is not None:
+            return
+        session.symbol_keys = wanted
+
+        service = get_market_data_service()
+        if session.subscriber_id is not None:
+            service.unsubscribe_priority(session.subscriber_id)
+        session.subscriber_id = service.subscribe_with_priority(
+            SubscriberPriority.LOW,
+            "all",
+            session.on_tick,
+            filter_symbols=set(wanted),
+            name=f"option_chain:{session.underlying}:{session.expiry_date}",
+        )
+
+        with self._lock:
+            to_subscribe = self._acquire(session.username, added)
+            to_unsubscribe = self._release(session.username, removed)
+
+        self._ws_request(session, to_subscribe, subscribe=True)
+        self._ws_request(session, to_unsubscribe, subscribe=False)
+
+    def _acquire(self, username: str, symbol_keys: set[str]) -> list[str]:
+        """Add references to symbols; returns those the user's sessions did not use yet (caller holds lock)"""
+        first_use = []
+        for symbol_key in symbol_keys:
+            ref = (username, symbol_key)
+            if ref not in self._symbol_refs:
+                first_use.append(symbol_key)
+            self._symbol_refs[ref] = self._symbol_refs.get(ref, 0) + 1
+        return first_use
+
+    def _release(self, username: str, symbol_keys: set[str]) -> list[str]:
+        """
+        Drop references to symbols (caller holds lock).
+
+        Returns:
+            Symbols no session of the user uses anymore and that the sessions
+            subscribed themselves
+        """
+        unused = []
+        for symbol_key in symbol_keys:
+            ref = (username, symbol_key)
+            count = self._symbol_refs.get(ref, 0) - 1
+            if count > 0:
+                self._symbol_refs[ref] = count
+                continue
+            self._symbol_refs.pop(ref, None)
+            if ref in self._borrowed:
+                self._borrowed.discard(ref)
+            else:
+                unused.append(symbol_key)
+        return unused
+
+    @staticmethod
+    def _stream_mode(session: OptionChainSession, symbol_key: str) -> str:
+        return UNDERLYING_MODE if symbol_key == session.underlying_key else LEG_MODE
+
+    def _ws_request(self, session: OptionChainSession, symbol_keys: list[str], subscribe: bool) -> None:
+        """Subscribe/unsubscribe symbols on the session owner's WebSocket connection in the background"""
+        if not symbol_keys or not session.api_key:
+            return
+        username = session.username
+
+        def _task() -> None:
+            try:
+                _, broker = get_auth_token_broker(session.api_key)
+                if not broker:
+                    return
+
+                keys = symbol_keys
+                if subscribe:
+                    keys = self._borrow_existing(session, symbol_keys)
+
+                by_mode: dict[str, list[dict[str, str]]] = {}
+                for symbol_key in keys:
+                    exchange, symbol = symbol_key.split(":", 1)
+                    by_mode.setdefault(self._stream_mode(session, symbol_key), []).append(
+                        {"exchange": exchange, "symbol": symbol}
+                    )
+                for mode, symbols in by_mode.items():
+                    if subscribe:
+                        success, response, _ = ws_subscribe_to_symbols(username, broker, symbols, mode)
+                    else:
+                        success, response, _ = ws_unsubscribe_from_symbols(username, broker, symbols, mode)
+                    if not success:
+                        logger.debug(
+                            f"Option chain session {'subscribe' if subscribe else 'unsubscribe'} "
+                            f"failed: {response.get('message')}"
+                        )
+            except Exception as e:
+                logger.debug(f"Option chain session WebSocket request error: {e}")
+
+        threading.Thread(target=_task, daemon=True).start()
+
+    def _borrow_existing(self, session: OptionChainSession, symbol_keys: list[str]) -> list[str]:
+        """
+        Leave out symbols the user's connection already streams in the needed mode.
+
+        Those subscriptions belong to another consumer (a flow, the WebSocket UI);
+        they are marked borrowed so releasing the session never unsubscribes them.
+        """
+        success, response, _ = get_websocket_subscriptions(session.username)
+        existing = set()
+        if success:
+            existing = {
+                (f"{item['exchange']}:{item['symbol']}", item["mode"])
+                for item in response.get("subscriptions", [])
+            }
+
+        to_subscribe = []
+        with self._lock:
+            for symbol_key in symbol_keys:
+                ref = (session.username, symbol_key)
+                if (symbol_key, self._stream_mode(session, symbol_key)) in existing:
+                    if ref in self._symbol_refs:
+                        self._borrowed.add(ref)
+                else:
+                    to_subscribe.append(symbol_key)
+        return to_subscribe
+
+    def _evict_idle(self) -> None:
+        now = time.time()
+        with self._lock:
+            idle = [
+                key
+                for key, session in self._sessions.items()
+                if now - session.last_access > SESSION_IDLE_SECONDS
+            ]
+        for key in idle:
+            self._drop(key)
+
+    def _enforce_capacity(self) -> None:
+        while True:
+            with self._lock:
+                if len(self._sessions) <= MAX_SESSIONS:
+                    return
+                oldest = next(iter(self._sessions))
+            self._drop(oldest)
+
+    def _drop(self, key: tuple) -> None:
+        """Evict a session: stop its tick callback and release its subscriptions"""
+        with self._lock:
+            session = self._sessions.pop(key, None)
+            if session is None:
+                return
+            unused = self._release(session.username, session.symbol_keys)
+            self.metrics["evictions"] += 1
+        if session.subscriber_id is not None:
+            get_market_data_service().unsubscribe_priority(session.subscriber_id)
+        self._ws_request(session, unused, subscribe=False)
+        logger.debug(f"Evicted option chain session {key}")
+
+    def clear(self) -> None:
+        """Evict every session"""
+        with self._lock:
+            keys = list(self._sessions)
+        for key in keys:
+            self._drop(key)
+
+    def stats(self) -> dict[str, Any]:
+        """Session and read counters for monitoring"""
+        with self._lock:
+            sessions = [
+                {
+                    "user": session.username,
+                    "underlying": session.underlying,
+                    "exchange": session.exchange,
+                    "expiry_date": session.expiry_date,
+                    "strike_count": session.strike_count,
+                    "symbols": len(session.symbol_keys),
+                    "ticks": session.tick_count,
+                    "idle_seconds": round(time.time() - session.last_access, 1),
+                }
+                for session in self._sessions.values()
+            ]
+        return {**self.metrics, "active_sessions": len(sessions), "sessions": sessions}
+
+
+_manager: OptionChainSessionManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_option_chain_sessions() -> OptionChainSessionManager:
+    """Get the process-wide option chain session manager"""
+    global _manager
+
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = OptionChainSessionManager()
+    return _manager
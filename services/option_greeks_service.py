@@ -5,20 +5,31 @@ for options across all supported exchanges (NFO, BFO, CDS, MCX)
 
 Uses Black-76 model (py_vollib) - appropriate for options on futures/forwards
 which is the correct model for Indian F&O markets (NFO, BFO, MCX, CDS)
+
+Multi-option requests are split into broker-sized multiquote chunks that are
+fetched concurrently and solved per chunk (stream_multi_option_greeks).
+
+Configuration (.env):
+- MULTI_GREEKS_QUOTE_WORKERS: Concurrent multiquote chunks per request (default: 4)
 """
 
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any, Dict, Optional, Tuple
 
 from utils.constants import CRYPTO_EXCHANGES
 from utils.logging import get_logger
+from utils.quote_rate_governor import get_quote_rate_governor
 
 # py_vollib is lazy-loaded inside calculate_greeks() and check_pyvollib_availability()
 # to avoid loading scipy/numba/llvmlite at startup
 
 logger = get_logger(__name__)
 
+MULTI_GREEKS_QUOTE_WORKERS = int(os.getenv("MULTI_GREEKS_QUOTE_WORKERS", "4"))
+
 # Exchange-specific symbol mappings
 NSE_INDEX_SYMBOLS = {
     "NIFTY",
@@ -529,6 +540,207 @@ def calculate_greeks(
         )
 
 
+def _theoretical_itm_response(base: dict[str, Any], opt_type: str, note: str) -> dict[str, Any]:
+    """Deep ITM response (no time value): IV 0, delta +/-1, other Greeks 0"""
+    return {
+        **base,
+        "implied_volatility": 0,
+        "greeks": {
+            "delta": 1.0 if opt_type == "CE" else -1.0,
+            "gamma": 0,
+            "theta": 0,
+            "vega": 0,
+            "rho": 0,
+        },
+        "note": note,
+    }
+
+
+def calculate_greeks_batch(
+    options: list[dict[str, Any]],
+    interest_rate: float = None,
+    expiry_time: str = None,
+) -> list[tuple[bool, dict[str, Any], int]]:
+    """
+    Calculate Option Greeks for many options with the vectorized Black-76 engine.
+
+    Produces the same responses as calling calculate_greeks() per option, but
+    IV and Greeks for the whole list are solved in one NumPy pass
+    (utils/black76.py) instead of one py_vollib call per option. Used by the
+    chain-level services (GEX, IV smile, vol surface, multi-option Greeks).
+
+    Args:
+        options: List of dicts with 'symbol', 'exchange', 'spot_price' and 'option_price'
+        interest_rate: Risk-free interest rate (annualized %), default per exchange
+        expiry_time: Optional custom expiry time in "HH:MM" format
+
+    Returns:
+        List of (success, response_dict, status_code) tuples, in input order
+    """
+    import numpy as np
+
+    from utils.black76 import greeks as black_greeks
+    from utils.black76 import implied_volatility as black_iv
+
+    results: list[tuple[bool, dict[str, Any], int] | None] = [None] * len(options)
+    expiry_years: dict[datetime, tuple[float, float]] = {}
+    pending = []  # options that need an IV solve
+
+    for index, option in enumerate(options):
+        option_symbol = option.get("symbol")
+        exchange = option.get("exchange")
+        spot_price = option.get("spot_price") or 0
+        option_price = option.get("option_price") or 0
+        try:
+            base_symbol, expiry, strike, opt_type = parse_option_symbol(
+                option_symbol, exchange, expiry_time
+            )
+        except ValueError as e:
+            results[index] = (False, {"status": "error", "message": str(e)}, 400)
+            continue
+
+        # One time-to-expiry per expiry, so every option of a chain shares the same clock
+        if expiry not in expiry_years:
+            expiry_years[expiry] = calculate_time_to_expiry(expiry)
+        time_to_expiry_years, time_to_expiry_days = expiry_years[expiry]
+
+        if time_to_expiry_years <= 0:
+            results[index] = (
+                False,
+                {
+                    "status": "error",
+                    "message": f"Option has expired on {expiry.strftime('%d-%b-%Y')}",
+                },
+                400,
+            )
+            continue
+
+        rate = interest_rate
+        if rate is None:
+            rate = DEFAULT_INTEREST_RATES.get(exchange, 0)
+
+        if spot_price <= 0 or option_price <= 0:
+            results[index] = (
+                False,
+                {"status": "error", "message": "Spot price and option price must be positive"},
+                400,
+            )
+            continue
+
+        if strike <= 0:
+            results[index] = (
+                False,
+                {"status": "error", "message": "Strike price must be positive"},
+                400,
+            )
+            continue
+
+        if opt_type == "CE":
+            intrinsic_value = max(spot_price - strike, 0)
+        else:
+            intrinsic_value = max(strike - spot_price, 0)
+        time_value = option_price - intrinsic_value
+
+        base = {
+            "status": "success",
+            "symbol": option_symbol,
+            "exchange": exchange,
+            "underlying": base_symbol,
+            "strike": round(strike, 2),
+            "option_type": opt_type,
+            "expiry_date": expiry.strftime("%d-%b-%Y"),
+            "days_to_expiry": round(time_to_expiry_days, 4),
+            "spot_price": round(spot_price, 2),
+            "option_price": round(option_price, 2),
+        }
+
+        if time_value <= 0 or (intrinsic_value > 0 and time_value < 0.01):
+            response = _theoretical_itm_response(
+                {
+                    **base,
+                    "intrinsic_value": round(intrinsic_value, 2),
+                    "time_value": round(max(time_value, 0), 2),
+                    "interest_rate": round(rate, 2),
+                },
+                opt_type,
+                "Deep ITM option with no time value - theoretical Greeks returned",
+            )
+            results[index] = (True, response, 200)
+            continue
+
+        pending.append(
+            {
+                "index": index,
+                "base": base,
+                "flag": "c" if opt_type == "CE" else "p",
+                "forward": spot_price,
+                "strike": strike,
+                "years": time_to_expiry_years,
+                "rate": rate,
+                "price": option_price,
+                "opt_type": opt_type,
+                "intrinsic_value": intrinsic_value,
+                "time_value": time_value,
+            }
+        )
+
+    if pending:
+        flags = np.array([item["flag"] for item in pending])
+        forwards, strikes, years, rates, prices = (
+            np.array([item[key] for item in pending], dtype=float)
+            for key in ("forward", "strike", "years", "rate", "price")
+        )
+        rates = rates / 100.0
+
+        iv = black_iv(prices, forwards, strikes, rates, years, flags)
+        solved = np.isfinite(iv)
+        greeks = black_greeks(flags, forwards, strikes, years, rates, np.where(solved, iv, 0.2))
+        # Undiscounted price above the no-arbitrage maximum (vs. at/below intrinsic)
+        above_maximum = prices * np.exp(rates * years) >= np.where(
+            flags == "c", forwards, strikes
+        )
+
+        for row, item in enumerate(pending):
+            if solved[row]:
+                response = {
+                    **item["base"],
+                    "interest_rate": round(item["rate"], 2),
+                    "implied_volatility": round(float(iv[row]) * 100.0, 2),
+                    "greeks": {
+                        "delta": round(float(greeks["delta"][row]), 4),
+                        "gamma": round(float(greeks["gamma"][row]), 6),
+                        "theta": round(float(greeks["theta"][row]), 4),
+                        "vega": round(float(greeks["vega"][row]), 4),
+                        "rho": round(float(greeks["rho"][row]), 6),
+                    },
+                }
+                results[item["index"]] = (True, response, 200)
+            elif above_maximum[row]:
+                results[item["index"]] = (
+                    False,
+                    {
+                        "status": "error",
+                        "message": "Failed to calculate Implied Volatility: option price is above the maximum Black-76 value",
+                    },
+                    500,
+                )
+            else:
+                # Discounted price at or below intrinsic value - no IV exists
+                response = _theoretical_itm_response(
+                    {
+                        **item["base"],
+                        "intrinsic_value": round(item["intrinsic_value"], 2),
+                        "time_value": round(max(item["time_value"], 0), 2),
+                        "interest_rate": round(item["rate"], 2),
+                    },
+                    item["opt_type"],
+                    "IV calculation not possible - theoretical deep ITM Greeks returned",
+                )
+                results[item["index"]] = (True, response, 200)
+
+    return results
+
+
 def get_option_greeks(
     option_symbol: str,
     exchange: str,
@@ -636,15 +848,105 @@ def get_option_greeks(
         return False, {"status": "error", "message": f"Failed to get option Greeks: {str(e)}"}, 500
 
 
-def get_multi_option_greeks(
+def _spot_source(symbol_request: dict[str, Any], expiry_time: str | None) -> tuple[str, str] | None:
+    """(exchange, symbol) of the underlying quote used as the spot price for an option request"""
+    underlying_symbol = symbol_request.get("underlying_symbol")
+    underlying_exchange = symbol_request.get("underlying_exchange")
+    if underlying_symbol and underlying_exchange:
+        return underlying_exchange, underlying_symbol
+
+    exchange = symbol_request.get("exchange")
+    try:
+        base_symbol, _, _, _ = parse_option_symbol(symbol_request.get("symbol"), exchange, expiry_time)
+    except Exception as exc:
+        logger.warning(f"Failed to derive underlying for {symbol_request.get('symbol')}: {exc}")
+        return None
+    return get_underlying_exchange(base_symbol, exchange), base_symbol
+
+
+def _quote_lookup(quotes_response: dict[str, Any]) -> dict[tuple[str, str], dict]:
+    """Map (exchange, symbol) to quote data from a multiquotes response"""
+    quote_lookup = {}
+    for result in quotes_response.get("results", []):
+        symbol = result.get("symbol")
+        exchange = result.get("exchange")
+        if not symbol or not exchange:
+            continue
+        if "data" in result:
+            quote_lookup[(exchange, symbol)] = result["data"]
+        elif "error" not in result:
+            quote_lookup[(exchange, symbol)] = result
+    return quote_lookup
+
+
+def _solve_chunk(
+    chunk: list[dict[str, Any]],
+    spot_sources: list[tuple[str, str] | None],
+    quotes: tuple[bool, dict[str, Any], int],
+    spot_lookup: dict[tuple[str, str], dict],
+    interest_rate: float | None,
+    expiry_time: str | None,
+) -> list[dict[str, Any]]:
+    """Greeks for one chunk of symbol requests from its multiquotes result, in request order"""
+    success_quotes, quotes_response, _ = quotes
+    quote_lookup = _quote_lookup(quotes_response) if success_quotes else {}
+
+    results: list[dict[str, Any] | None] = [None] * len(chunk)
+    greeks_requests = []
+    positions = []
+    for index, (symbol_request, spot_source) in enumerate(zip(chunk, spot_sources)):
+        symbol = symbol_request.get("symbol")
+        exchange = symbol_request.get("exchange")
+
+        def error(message):
+            return {"status": "error", "symbol": symbol, "exchange": exchange, "message": message}
+
+        if not success_quotes:
+            results[index] = error(f"Failed to fetch quotes: {quotes_response.get('message', 'Unknown error')}")
+            continue
+
+        option_quote = quote_lookup.get((exchange, symbol))
+        option_price = option_quote.get("ltp") if option_quote else None
+        if not option_price:
+            results[index] = error("Option LTP not available")
+            continue
+
+        underlying_quote = spot_lookup.get(spot_source) if spot_source else None
+        if not underlying_quote or not underlying_quote.get("ltp"):
+            results[index] = error("Underlying LTP not available")
+            continue
+
+        greeks_requests.append(
+            {
+                "symbol": symbol,
+                "exchange": exchange,
+                "spot_price": underlying_quote.get("ltp"),
+                "option_price": option_price,
+            }
+        )
+        positions.append(index)
+
+    batch = calculate_greeks_batch(greeks_requests, interest_rate=interest_rate, expiry_time=expiry_time)
+    for index, request, (success, response, _) in zip(positions, greeks_requests, batch):
+        if not success:
+            response = {"symbol": request["symbol"], "exchange": request["exchange"], **response}
+        results[index] = response
+    return results
+
+
+def stream_multi_option_greeks(
     symbols: list,
     interest_rate: float | None = None,
     expiry_time: str | None = None,
     api_key: str | None = None,
-) -> tuple[bool, dict[str, Any], int]:
+) -> tuple[bool, Any, int]:
     """
-    Get option Greeks for multiple symbols in a single call.
-    Uses concurrent execution for efficiency.
+    Get option Greeks for many symbols, chunk by chunk.
+
+    The symbols are split into chunks of the broker's multiquote batch size.
+    Each chunk's quotes are fetched concurrently (paced by the broker's quote
+    rate governor), each underlying is quoted once for the whole request, and
+    each chunk is solved in one vectorized pass as soon as its quotes arrive.
 
     Args:
         symbols: List of dicts with 'symbol', 'exchange', optional 'underlying_symbol', 'underlying_exchange'
@@ -653,192 +955,133 @@ def get_multi_option_greeks(
         api_key: API key for authentication
 
     Returns:
-        Tuple of (success, response_dict, status_code)
+        Tuple of (success, response, status_code). On success the response is an
+        iterator of per-chunk result lists in request order; otherwise an error dict.
     """
-    # Early return for empty symbols list
-    if not symbols:
-        return (
-            True,
-            {"status": "success", "data": [], "summary": {"total": 0, "success": 0, "failed": 0}},
-            200,
-        )
+    # Import here to avoid circular dependency
+    from database.auth_db import get_auth_token_broker
+    from services.quotes_service import get_multiquotes
 
-    results = []
-    success_count = 0
-    failed_count = 0
+    auth_token, feed_token, broker = get_auth_token_broker(api_key, include_feed_token=True)
+    if auth_token is None:
+        return False, {"status": "error", "message": "Invalid openalgo apikey"}, 403
 
-    def fetch_single_greeks(symbol_request, quote_lookup, default_spot_price):
-        """Fetch Greeks for a single symbol using pre-fetched quotes"""
-        try:
-            symbol = symbol_request.get("symbol")
-            exchange = symbol_request.get("exchange")
-            underlying_symbol = symbol_request.get("underlying_symbol")
-            underlying_exchange = symbol_request.get("underlying_exchange")
-
-            option_quote = quote_lookup.get((exchange, symbol))
-            if not option_quote:
-                return {
-                    "success": False,
-                    "response": {
-                        "status": "error",
-                        "symbol": symbol,
-                        "exchange": exchange,
-                        "message": "Option LTP not available",
-                    },
-                    "symbol": symbol,
-                    "exchange": exchange,
-                }
+    governor = get_quote_rate_governor()
+    batch_size = governor.get_limit(broker).batch_size
 
-            option_price = option_quote.get("ltp")
-            if not option_price:
-                return {
-                    "success": False,
-                    "response": {
-                        "status": "error",
-                        "symbol": symbol,
-                        "exchange": exchange,
-                        "message": "Option LTP not available",
-                    },
-                    "symbol": symbol,
-                    "exchange": exchange,
-                }
+    spot_sources = [_spot_source(symbol_request, expiry_time) for symbol_request in symbols]
+    underlyings = list(dict.fromkeys(source for source in spot_sources if source))
 
-            spot_price = default_spot_price
-            if underlying_symbol and underlying_exchange:
-                underlying_quote = quote_lookup.get((underlying_exchange, underlying_symbol))
-                if not underlying_quote or not underlying_quote.get("ltp"):
-                    return {
-                        "success": False,
-                        "response": {
-                            "status": "error",
-                            "symbol": symbol,
-                            "exchange": exchange,
-                            "message": "Underlying LTP not available",
-                        },
-                        "symbol": symbol,
-                        "exchange": exchange,
-                    }
-                spot_price = underlying_quote.get("ltp")
-
-            success, response, status_code = calculate_greeks(
-                option_symbol=symbol,
-                exchange=exchange,
-                spot_price=spot_price,
-                option_price=option_price,
-                interest_rate=interest_rate,
-                expiry_time=expiry_time,
-                api_key=api_key,
+    def fetch_quotes(quote_keys: list[tuple[str, str]]) -> tuple[bool, dict[str, Any], int]:
+        governor.acquire(broker)
+        try:
+            return get_multiquotes(
+                symbols=[{"symbol": symbol, "exchange": exchange} for exchange, symbol in quote_keys],
+                auth_token=auth_token,
+                feed_token=feed_token,
+                broker=broker,
             )
-
-            return {
-                "success": success,
-                "response": response,
-                "symbol": symbol,
-                "exchange": exchange,
-            }
         except Exception as e:
-            logger.exception(f"Error fetching Greeks for {symbol_request.get('symbol')}: {e}")
-            return {
-                "success": False,
-                "response": {
-                    "status": "error",
-                    "symbol": symbol_request.get("symbol"),
-                    "exchange": symbol_request.get("exchange"),
-                    "message": str(e),
-                },
-                "symbol": symbol_request.get("symbol"),
-                "exchange": symbol_request.get("exchange"),
-            }
+            logger.exception(f"Error fetching multiquotes chunk: {e}")
+            return False, {"status": "error", "message": str(e)}, 500
+
+    # The underlyings ride in the first chunk, so a request that fits one batch is one call
+    first_size = max(0, batch_size - len(underlyings))
+    bounds = [(0, min(first_size, len(symbols)))] + [
+        (start, min(start + batch_size, len(symbols))) for start in range(first_size, len(symbols), batch_size)
+    ]
+
+    executor = ThreadPoolExecutor(max_workers=MULTI_GREEKS_QUOTE_WORKERS)
+    futures = []
+    for index, (start, end) in enumerate(bounds):
+        quote_keys = [
+            (symbol_request.get("exchange"), symbol_request.get("symbol")) for symbol_request in symbols[start:end]
+        ]
+        if index == 0:
+            quote_keys = underlyings + quote_keys
+        futures.append(executor.submit(fetch_quotes, list(dict.fromkeys(quote_keys))))
+
+    success_quotes, quotes_response, status_code = futures[0].result()
+    if not success_quotes or "results" not in quotes_response:
+        executor.shutdown(wait=False, cancel_futures=True)
+        return False, quotes_response, status_code
 
-    from services.quotes_service import get_multiquotes
+    first_lookup = _quote_lookup(quotes_response)
+    spot_lookup = {source: first_lookup[source] for source in underlyings if source in first_lookup}
+    if not any(quote.get("ltp") for quote in spot_lookup.values()):
+        executor.shutdown(wait=False, cancel_futures=True)
+        return False, {"status": "error", "message": "Failed to fetch underlying price for batch"}, 502
 
-    default_underlying_symbol = None
-    default_underlying_exchange = None
-    if symbols:
-        first_symbol = symbols[0].get("symbol")
-        first_exchange = symbols[0].get("exchange")
-        if first_symbol and first_exchange:
-            try:
-                base_symbol, _, _, _ = parse_option_symbol(first_symbol, first_exchange, expiry_time)
-                default_underlying_symbol = base_symbol
-                default_underlying_exchange = get_underlying_exchange(base_symbol, first_exchange)
-            except Exception as exc:
-                logger.warning(f"Failed to derive default underlying: {exc}")
-
-    quote_requests = []
-    for symbol_request in symbols:
-        symbol = symbol_request.get("symbol")
-        exchange = symbol_request.get("exchange")
-        if symbol and exchange:
-            quote_requests.append({"symbol": symbol, "exchange": exchange})
-
-    if default_underlying_symbol and default_underlying_exchange:
-        quote_requests.append(
-            {"symbol": default_underlying_symbol, "exchange": default_underlying_exchange}
-        )
+    def chunk_results():
+        try:
+            for (start, end), future in zip(bounds, futures):
+                if start == end:
+                    continue
+                yield _solve_chunk(
+                    symbols[start:end],
+                    spot_sources[start:end],
+                    future.result(),
+                    spot_lookup,
+                    interest_rate,
+                    expiry_time,
+                )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    for symbol_request in symbols:
-        underlying_symbol = symbol_request.get("underlying_symbol")
-        underlying_exchange = symbol_request.get("underlying_exchange")
-        if underlying_symbol and underlying_exchange:
-            quote_requests.append(
-                {"symbol": underlying_symbol, "exchange": underlying_exchange}
-            )
+    return True, chunk_results(), 200
 
-    success_quotes, quotes_response, status_code = get_multiquotes(
-        symbols=quote_requests, api_key=api_key
-    )
-    if not success_quotes or "results" not in quotes_response:
-        return False, quotes_response, status_code
 
-    quote_lookup = {}
-    for result in quotes_response.get("results", []):
-        symbol = result.get("symbol")
-        exchange = result.get("exchange")
-        if not symbol or not exchange:
-            continue
-        if "data" in result:
-            quote_lookup[(exchange, symbol)] = result["data"]
-        elif "error" not in result:
-            quote_lookup[(exchange, symbol)] = result
+def get_multi_option_greeks(
+    symbols: list,
+    interest_rate: float | None = None,
+    expiry_time: str | None = None,
+    api_key: str | None = None,
+) -> tuple[bool, dict[str, Any], int]:
+    """
+    Get option Greeks for multiple symbols in a single call.
+    Quotes are fetched in broker-sized chunks concurrently and IV/Greeks are
+    solved per chunk in one vectorized pass (see stream_multi_option_greeks).
 
-    default_spot_price = None
-    if default_underlying_symbol and default_underlying_exchange:
-        default_quote = quote_lookup.get((default_underlying_exchange, default_underlying_symbol))
-        if default_quote:
-            default_spot_price = default_quote.get("ltp")
+    Args:
+        symbols: List of dicts with 'symbol', 'exchange', optional 'underlying_symbol', 'underlying_exchange'
+        interest_rate: Optional common interest rate for all symbols
+        expiry_time: Optional common expiry time for all symbols
+        api_key: API key for authentication
 
-    if default_spot_price is None:
+    Returns:
+        Tuple of (success, response_dict, status_code)
+    """
+    # Early return for empty symbols list
+    if not symbols:
         return (
-            False,
-            {
-                "status": "error",
-                "message": "Failed to fetch underlying price for batch",
-            },
-            502,
+            True,
+            {"status": "success", "data": [], "summary": {"total": 0, "success": 0, "failed": 0}},
+            200,
         )
 
-    for sym in symbols:
-        result = fetch_single_greeks(sym, quote_lookup, default_spot_price)
-        if result["success"]:
-            success_count += 1
-        else:
-            failed_count += 1
-        results.append(result["response"])
+    success, chunks, status_code = stream_multi_option_greeks(
+        symbols, interest_rate=interest_rate, expiry_time=expiry_time, api_key=api_key
+    )
+    if not success:
+        return False, chunks, status_code
 
-    # Sort results to maintain original order
-    symbol_order = {sym["symbol"]: idx for idx, sym in enumerate(symbols)}
-    results.sort(key=lambda x: symbol_order.get(x.get("symbol"), 999))
+    results = [result for chunk in chunks for result in chunk]
+    response = multi_option_greeks_summary(results)
+    response["data"] = results
 
-    response = {
-        "status": "success" if failed_count == 0 else "partial" if success_count > 0 else "error",
-        "data": results,
-        "summary": {"total": len(symbols), "success": success_count, "failed": failed_count},
-    }
-
-    logger.info(f"Multi Greeks completed: {success_count}/{len(symbols)} successful")
+    logger.info(f"Multi Greeks completed: {response['summary']['success']}/{len(symbols)} successful")
 
     # Return False only when ALL operations fail (status='error')
     # Return True for 'success' or 'partial' (at least some succeeded)
     is_success = response["status"] != "error"
     return is_success, response, 200
+
+
+def multi_option_greeks_summary(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Overall status and success/failure counts for a list of per-symbol results"""
+    success_count = sum(1 for result in results if result.get("status") == "success")
+    failed_count = len(results) - success_count
+    return {
+        "status": "success" if failed_count == 0 else "partial" if success_count > 0 else "error",
+        "summary": {"total": len(results), "success": success_count, "failed": failed_count},
+    }
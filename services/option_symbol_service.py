@@ -31,15 +31,29 @@ Example Usage (OLD METHOD - Legacy):
 
     Output:
         symbol: "NIFTY28OCT2523500CE"  (if ATM is 23600, ITM2 = 23600 - 2*50 = 23500)
+
+Strikes come from the symbol cache's sorted per-series strike index and ATM/offsets
+are found by binary search. Resolved contracts are cached per (underlying, expiry,
+offset, option type, ATM strike), so repeated orders while the underlying stays in
+the same ATM bucket skip symbol construction and lookup. Both caches are dropped
+when the master contract is reloaded.
+
+Configuration (.env):
+- OPTION_SYMBOL_CACHE_SIZE: Cached resolved option contracts (default: 5000)
 """
 
+import bisect
 import importlib
+import os
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from database.auth_db import get_auth_token_broker
 from database.symbol import SymToken, db_session
+from database.token_db_enhanced import get_cache, get_option_strikes_cached, get_symbol_info
 from services.quotes_service import get_quotes
 from utils.constants import CRYPTO_EXCHANGES
 from utils.logging import get_logger
@@ -53,6 +67,18 @@ logger = get_logger(__name__)
 _STRIKES_CACHE: dict[tuple[str, str, str, str], list[float]] = {}
 _CACHE_STATS = {"hits": 0, "misses": 0, "total_queries": 0}
 
+# ============================================================================
+# RESOLUTION CACHE - Resolved option contracts per ATM bucket
+# ============================================================================
+# (base_symbol, expiry, options_exchange, strike_int, offset, option_type, atm_strike) -> contract details
+OPTION_SYMBOL_CACHE_SIZE = int(os.getenv("OPTION_SYMBOL_CACHE_SIZE", "5000"))
+_RESOLUTION_CACHE: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+_RESOLUTION_CACHE_LOCK = threading.Lock()
+_RESOLUTION_CACHE_STATS = {"hits": 0, "misses": 0}
+
+# Symbol cache generation the strike and resolution caches were built from
+_symbol_cache_generation: int | None = None
+
 
 def get_strikes_cache_stats() -> dict:
     """Get cache statistics for monitoring"""
@@ -75,6 +101,49 @@ def clear_strikes_cache():
     logger.info("Strikes cache cleared")
 
 
+def get_option_symbol_cache_stats() -> dict:
+    """Get resolution cache statistics for monitoring"""
+    with _RESOLUTION_CACHE_LOCK:
+        return {**_RESOLUTION_CACHE_STATS, "cached_entries": len(_RESOLUTION_CACHE)}
+
+
+def clear_option_symbol_cache():
+    """Clear the resolved option contracts (call when master contracts are updated)"""
+    with _RESOLUTION_CACHE_LOCK:
+        _RESOLUTION_CACHE.clear()
+        _RESOLUTION_CACHE_STATS.update({"hits": 0, "misses": 0})
+
+
+def _sync_with_symbol_cache():
+    """Drop strikes and resolved contracts once the master contract is reloaded or cleared"""
+    global _symbol_cache_generation
+    generation = get_cache().generation
+    if generation != _symbol_cache_generation:
+        if _symbol_cache_generation is not None:
+            clear_strikes_cache()
+            clear_option_symbol_cache()
+        _symbol_cache_generation = generation
+
+
+def _resolution_cache_get(key: tuple) -> dict[str, Any] | None:
+    with _RESOLUTION_CACHE_LOCK:
+        details = _RESOLUTION_CACHE.get(key)
+        if details is None:
+            _RESOLUTION_CACHE_STATS["misses"] += 1
+            return None
+        _RESOLUTION_CACHE.move_to_end(key)
+        _RESOLUTION_CACHE_STATS["hits"] += 1
+        return details
+
+
+def _resolution_cache_put(key: tuple, details: dict[str, Any]):
+    with _RESOLUTION_CACHE_LOCK:
+        _RESOLUTION_CACHE[key] = details
+        _RESOLUTION_CACHE.move_to_end(key)
+        while len(_RESOLUTION_CACHE) > OPTION_SYMBOL_CACHE_SIZE:
+            _RESOLUTION_CACHE.popitem(last=False)
+
+
 def parse_underlying_symbol(underlying: str) -> tuple[str, str | None]:
     """
     Parse underlying symbol to extract base symbol and expiry date if present.
@@ -245,12 +314,8 @@ def find_option_in_database(option_symbol: str, exchange: str) -> dict[str, Any]
         Dictionary with symbol details or None if not found
     """
     try:
-        # Query the database
-        result = (
-            db_session.query(SymToken)
-            .filter(SymToken.symbol == option_symbol, SymToken.exchange == exchange)
-            .first()
-        )
+        # Symbol cache first (O(1)), database fallback inside get_symbol_info
+        result = get_symbol_info(option_symbol, exchange)
 
         if result:
             logger.info(f"Found option in database: {option_symbol} on {exchange}")
@@ -298,6 +363,8 @@ def get_available_strikes(
     """
     global _STRIKES_CACHE, _CACHE_STATS
 
+    _sync_with_symbol_cache()
+
     try:
         # Normalize inputs for cache key
         cache_key = (
@@ -345,6 +412,14 @@ def get_available_strikes(
             )
             strikes = [r.strike for r in results if r.strike is not None and r.strike > 0]
         else:
+            # Sorted strike index built with the symbol cache, database when unavailable
+            strikes = get_option_strikes_cached(
+                exchange, base_symbol, expiry_formatted, option_type
+            )
+            if strikes:
+                _STRIKES_CACHE[cache_key] = strikes
+                return strikes
+
             # Construct symbol pattern: BASE + EXPIRY (without hyphens) + % wildcard
             # e.g., "NIFTY" + "18NOV25" + "%" = "NIFTY18NOV25%"
             expiry_no_hyphen = expiry_date.upper()  # Already in DDMMMYY format
@@ -403,13 +478,50 @@ def find_atm_strike_from_actual(ltp: float, available_strikes: list) -> float |
         logger.warning("No available strikes to find ATM")
         return None
 
-    # Find the strike closest to LTP
-    atm_strike = min(available_strikes, key=lambda x: abs(x - ltp))
+    # Find the strike closest to LTP (lower one on a tie) by binary search
+    index = bisect.bisect_left(available_strikes, ltp)
+    if index == 0:
+        atm_strike = available_strikes[0]
+    elif index == len(available_strikes):
+        atm_strike = available_strikes[-1]
+    else:
+        lower, upper = available_strikes[index - 1], available_strikes[index]
+        atm_strike = lower if ltp - lower <= upper - ltp else upper
 
     logger.info(f"Found ATM strike: {atm_strike} (LTP: {ltp})")
     return atm_strike
 
 
+def find_atm_strikes(ltps, available_strikes: list) -> list[float | None]:
+    """
+    Find the ATM strike for each of many prices (e.g. every candle close).
+
+    Same rule as find_atm_strike_from_actual() - closest strike, the lower one
+    on a tie - resolved with one binary search over the sorted strikes.
+
+    Args:
+        ltps: Sequence of underlying prices
+        available_strikes: List of available strike prices
+
+    Returns:
+        List of ATM strikes, one per price (None for every price if no strikes)
+    """
+    import numpy as np
+
+    prices = np.asarray(ltps, dtype=float)
+    if not available_strikes:
+        logger.warning("No available strikes to find ATM")
+        return [None] * len(prices)
+
+    strikes = np.sort(np.asarray(available_strikes, dtype=float))
+    upper = np.clip(np.searchsorted(strikes, prices), 1, len(strikes) - 1) if len(strikes) > 1 else 0
+    lower = np.maximum(upper - 1, 0)
+    nearest = np.where(
+        np.abs(prices - strikes[lower]) <= np.abs(strikes[upper] - prices), lower, upper
+    )
+    return strikes[nearest].tolist()
+
+
 def calculate_offset_strike_from_actual(
     atm_strike: float, offset: str, option_type: str, available_strikes: list
 ) -> float | None:
@@ -442,16 +554,15 @@ def calculate_offset_strike_from_actual(
         For CE ITM2: Move 2 positions DOWN from ATM
         Result: 23400 (actual strike from database)
     """
-    if not available_strikes or atm_strike not in available_strikes:
+    # Find the index of ATM in the sorted strikes list (binary search)
+    atm_index = bisect.bisect_left(available_strikes, atm_strike) if available_strikes else 0
+    if atm_index >= len(available_strikes) or available_strikes[atm_index] != atm_strike:
         logger.error(f"ATM strike {atm_strike} not found in available strikes")
         return None
 
     offset = offset.upper()
     option_type = option_type.upper()
 
-    # Find the index of ATM in the sorted strikes list
-    atm_index = available_strikes.index(atm_strike)
-
     if offset == "ATM":
         target_strike = atm_strike
         logger.info(f"Target strike (ATM): {target_strike}")
@@ -635,6 +746,7 @@ def get_option_symbol(
 
         # Step 4: Map to options exchange
         options_exchange = get_option_exchange(quote_exchange)
+        _sync_with_symbol_cache()
 
         # Step 5: Determine calculation method based on strike_int parameter
         if strike_int is None:
@@ -671,24 +783,6 @@ def get_option_symbol(
                     },
                     500,
                 )
-
-            # Calculate target strike using actual strikes
-            target_strike = calculate_offset_strike_from_actual(
-                atm_strike, offset, option_type, available_strikes
-            )
-            if target_strike is None:
-                logger.error(
-                    f"Failed to calculate offset strike. Offset {offset} may be out of range."
-                )
-                return (
-                    False,
-                    {
-                        "status": "error",
-                        "message": f"Offset {offset} is out of range for available strikes. Please use a smaller offset.",
-                    },
-                    400,
-                )
-
         else:
             # OLD METHOD: Use strike_int for backward compatibility
             logger.info(f"Using strike_int method (strike_int={strike_int})")
@@ -696,30 +790,62 @@ def get_option_symbol(
             # Calculate ATM strike using interval
             atm_strike = get_atm_strike(ltp, strike_int)
 
-            # Calculate target strike based on offset
-            target_strike = calculate_offset_strike(atm_strike, offset, strike_int, option_type)
-
-        # Step 6: Construct option symbol
-        option_symbol = construct_option_symbol(
-            base_symbol, final_expiry, target_strike, option_type
+        # Same underlying, expiry, offset and type within one ATM bucket resolve to the same contract
+        resolution_key = (
+            base_symbol,
+            final_expiry.upper(),
+            options_exchange,
+            strike_int,
+            offset.upper(),
+            option_type.upper(),
+            atm_strike,
         )
+        option_details = _resolution_cache_get(resolution_key)
 
-        # Step 7: Find option in database
-        option_details = find_option_in_database(option_symbol, options_exchange)
+        if option_details is None:
+            if strike_int is None:
+                # Calculate target strike using actual strikes
+                target_strike = calculate_offset_strike_from_actual(
+                    atm_strike, offset, option_type, available_strikes
+                )
+                if target_strike is None:
+                    logger.error(
+                        f"Failed to calculate offset strike. Offset {offset} may be out of range."
+                    )
+                    return (
+                        False,
+                        {
+                            "status": "error",
+                            "message": f"Offset {offset} is out of range for available strikes. Please use a smaller offset.",
+                        },
+                        400,
+                    )
+            else:
+                # Calculate target strike based on offset
+                target_strike = calculate_offset_strike(atm_strike, offset, strike_int, option_type)
 
-        if not option_details:
-            logger.warning(
-                f"Option symbol {option_symbol} not found in database for {options_exchange}"
-            )
-            return (
-                False,
-                {
-                    "status": "error",
-                    "message": f"Option symbol {option_symbol} not found in {options_exchange}. Symbol may not exist or master contract needs update.",
-                },
-                404,
+            # Step 6: Construct option symbol
+            option_symbol = construct_option_symbol(
+                base_symbol, final_expiry, target_strike, option_type
             )
 
+            # Step 7: Find option in database
+            option_details = find_option_in_database(option_symbol, options_exchange)
+
+            if not option_details:
+                logger.warning(
+                    f"Option symbol {option_symbol} not found in database for {options_exchange}"
+                )
+                return (
+                    False,
+                    {
+                        "status": "error",
+                        "message": f"Option symbol {option_symbol} not found in {options_exchange}. Symbol may not exist or master contract needs update.",
+                    },
+                    404,
+                )
+            _resolution_cache_put(resolution_key, option_details)
+
         # Step 8: Get freeze quantity
         from database.qty_freeze_db import get_freeze_qty_for_option
 
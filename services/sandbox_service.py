@@ -701,6 +701,136 @@ def sandbox_get_squareoff_status() -> tuple[bool, dict[str, Any], int]:
         )
 
 
+def sandbox_start_replay(user_id: str, data: dict[str, Any]) -> tuple[bool, dict[str, Any], int]:
+    """
+    Start a historical replay that drives the user's sandbox from Historify bars
+
+    Args:
+        user_id: Sandbox user whose orders and positions are replayed
+        data: {"symbols": [{"symbol", "exchange"}], "start_date", "end_date",
+               "interval" (default 1m), "speed" (0 = as fast as possible)}
+
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict)
+        - HTTP status code (int)
+    """
+    try:
+        from sandbox.replay_engine import get_replay_status, start_replay
+
+        symbols = data.get("symbols") or []
+        start_date = data.get("start_date")
+        end_date = data.get("end_date")
+
+        if not symbols or not start_date or not end_date:
+            return (
+                False,
+                {
+                    "status": "error",
+                    "message": "symbols, start_date and end_date are required",
+                    "mode": "analyze",
+                },
+                400,
+            )
+
+        speed = data.get("speed")
+        success, message = start_replay(
+            user_id=user_id,
+            symbols=symbols,
+            start_date=start_date,
+            end_date=end_date,
+            interval=data.get("interval", "1m"),
+            speed=float(speed) if speed is not None else None,
+        )
+
+        if success:
+            return (
+                True,
+                {
+                    "status": "success",
+                    "message": message,
+                    "data": get_replay_status(user_id),
+                    "mode": "analyze",
+                },
+                200,
+            )
+        else:
+            return False, {"status": "error", "message": message, "mode": "analyze"}, 400
+
+    except Exception as e:
+        logger.exception(f"Error starting replay: {e}")
+        return (
+            False,
+            {"status": "error", "message": f"Error starting replay: {str(e)}", "mode": "analyze"},
+            500,
+        )
+
+
+def sandbox_stop_replay(user_id: str) -> tuple[bool, dict[str, Any], int]:
+    """
+    Stop the user's running historical replay
+
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict)
+        - HTTP status code (int)
+    """
+    try:
+        from sandbox.replay_engine import get_replay_status, stop_replay
+
+        success, message = stop_replay(user_id)
+        status_code = 200 if success else 400
+
+        return (
+            success,
+            {
+                "status": "success" if success else "error",
+                "message": message,
+                "data": get_replay_status(user_id),
+                "mode": "analyze",
+            },
+            status_code,
+        )
+
+    except Exception as e:
+        logger.exception(f"Error stopping replay: {e}")
+        return (
+            False,
+            {"status": "error", "message": f"Error stopping replay: {str(e)}", "mode": "analyze"},
+            500,
+        )
+
+
+def sandbox_get_replay_status(user_id: str) -> tuple[bool, dict[str, Any], int]:
+    """
+    Get progress of the user's current or last historical replay
+
+    Returns:
+        Tuple containing:
+        - Success status (bool)
+        - Response data (dict)
+        - HTTP status code (int)
+    """
+    try:
+        from sandbox.replay_engine import get_replay_status
+
+        return (
+            True,
+            {"status": "success", "data": get_replay_status(user_id), "mode": "analyze"},
+            200,
+        )
+
+    except Exception as e:
+        logger.exception(f"Error getting replay status: {e}")
+        return (
+            False,
+            {"status": "error", "message": f"Error getting status: {str(e)}", "mode": "analyze"},
+            500,
+        )
+
+
 def sandbox_get_pnl_symbols(
     api_key: str, original_data: dict[str, Any]
 ) -> tuple[bool, dict[str, Any], int]:
@@ -13,12 +13,12 @@ from datetime import datetime, timedelta
 import pandas as pd
 import pytz
 
-from services.history_service import get_history
+from services.leg_history_service import fetch_leg_histories
 from services.option_greeks_service import parse_option_symbol
 from services.option_symbol_service import (
     construct_crypto_option_symbol,
     construct_option_symbol,
-    find_atm_strike_from_actual,
+    find_atm_strikes,
     get_available_strikes,
     get_option_exchange,
 )
@@ -167,14 +167,10 @@ def get_straddle_chart_data(
             )
 
         # Step 3: Fetch underlying history
-        success_u, resp_u, _ = get_history(
-            symbol=underlying_quote_symbol,
-            exchange=quote_exchange,
-            interval=interval,
-            start_date=start_date_str,
-            end_date=end_date_str,
-            api_key=api_key,
-        )
+        underlying_leg = (underlying_quote_symbol, quote_exchange)
+        success_u, resp_u, _ = fetch_leg_histories(
+            [underlying_leg], interval, start_date_str, end_date_str, api_key
+        )[underlying_leg]
         if not success_u:
             return (
                 False,
@@ -194,12 +190,7 @@ def get_straddle_chart_data(
             return False, {"status": "error", "message": "Failed to parse underlying timestamps"}, 500
 
         # Step 4: For each candle, compute ATM strike
-        atm_per_row = []
-        for ts, row in df_underlying.iterrows():
-            close_price = float(row["close"])
-            atm = find_atm_strike_from_actual(close_price, available_strikes)
-            atm_per_row.append(atm)
-
+        atm_per_row = find_atm_strikes(df_underlying["close"].astype(float), available_strikes)
         df_underlying["atm_strike"] = atm_per_row
 
         # Step 5: Collect unique ATM strikes
@@ -209,34 +200,29 @@ def get_straddle_chart_data(
 
         logger.debug(f"Straddle chart: {len(unique_strikes)} unique ATM strikes for {base_symbol}: {sorted(unique_strikes)}")
 
-        # Step 6: For each unique strike, fetch CE and PE history
+        # Step 6: Fetch CE and PE history of every unique strike concurrently
         # Build lookup: {strike: {timestamp: {ce_close, pe_close}}}
         strike_data = {}
 
         _build_sym = construct_crypto_option_symbol if exchange.upper() in CRYPTO_EXCHANGES else construct_option_symbol
-        for strike in sorted(unique_strikes):
-            ce_symbol = _build_sym(base_symbol, expiry_date.upper(), strike, "CE")
-            pe_symbol = _build_sym(base_symbol, expiry_date.upper(), strike, "PE")
-
-            # Fetch CE history
-            success_ce, resp_ce, _ = get_history(
-                symbol=ce_symbol,
-                exchange=options_exchange,
-                interval=interval,
-                start_date=start_date_str,
-                end_date=end_date_str,
-                api_key=api_key,
+        strike_symbols = {
+            strike: (
+                _build_sym(base_symbol, expiry_date.upper(), strike, "CE"),
+                _build_sym(base_symbol, expiry_date.upper(), strike, "PE"),
             )
+            for strike in sorted(unique_strikes)
+        }
+        leg_histories = fetch_leg_histories(
+            [(symbol, options_exchange) for pair in strike_symbols.values() for symbol in pair],
+            interval,
+            start_date_str,
+            end_date_str,
+            api_key,
+        )
 
-            # Fetch PE history
-            success_pe, resp_pe, _ = get_history(
-                symbol=pe_symbol,
-                exchange=options_exchange,
-                interval=interval,
-                start_date=start_date_str,
-                end_date=end_date_str,
-                api_key=api_key,
-            )
+        for strike, (ce_symbol, pe_symbol) in strike_symbols.items():
+            success_ce, resp_ce, _ = leg_histories[(ce_symbol, options_exchange)]
+            success_pe, resp_pe, _ = leg_histories[(pe_symbol, options_exchange)]
 
             ce_lookup = {}
             pe_lookup = {}
@@ -246,16 +232,14 @@ def get_straddle_chart_data(
                 if not df_ce.empty:
                     df_ce = _convert_timestamp_to_ist(df_ce)
                     if df_ce is not None:
-                        for ts, row in df_ce.iterrows():
-                            ce_lookup[ts] = float(row["close"])
+                        ce_lookup = dict(zip(df_ce.index, df_ce["close"].astype(float)))
 
             if success_pe:
                 df_pe = pd.DataFrame(resp_pe.get("data", []))
                 if not df_pe.empty:
                     df_pe = _convert_timestamp_to_ist(df_pe)
                     if df_pe is not None:
-                        for ts, row in df_pe.iterrows():
-                            pe_lookup[ts] = float(row["close"])
+                        pe_lookup = dict(zip(df_pe.index, df_pe["close"].astype(float)))
 
             strike_data[strike] = {"ce": ce_lookup, "pe": pe_lookup}
 
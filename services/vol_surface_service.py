@@ -1,14 +1,37 @@
 """
 Volatility Surface Service
 Computes a 3D implied volatility surface across strikes and expiries
-at the current instant using live option chain quotes + Black-76 IV calculation.
+at the current instant using live option chain quotes + vectorized Black-76 IV calculation.
 
 Uses OTM convention: CE IV for strikes >= ATM, PE IV for strikes < ATM.
+
+The surface is built from one underlying quote and one multiquotes call per
+expiry, fetched concurrently, with the IVs of every expiry solved in a single
+batch. Each expiry's smile is smoothed with a quadratic fit in log-moneyness
+(fitted_surface), which also fills strikes without a usable quote. Results are
+cached per underlying/expiries/strike count:
+- Within VOL_SURFACE_CACHE_TTL seconds the cached surface is returned as-is
+- After that only quotes are refetched; the strike layout is reused while the
+  ATM strike is unchanged, and expiries whose quotes did not change keep their
+  IVs and fit
+
+Configuration (.env):
+- VOL_SURFACE_CACHE_TTL: Seconds a computed surface is served from cache (default: 10)
+- VOL_SURFACE_QUOTE_WORKERS: Concurrent broker quote calls per surface (default: 4)
 """
 
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from typing import Any
 
-from services.option_greeks_service import calculate_greeks, parse_option_symbol
+import numpy as np
+
+from database.auth_db import get_auth_token_broker
+from services.option_greeks_service import calculate_greeks_batch, parse_option_symbol
 from services.option_symbol_service import (
     construct_crypto_option_symbol,
     construct_option_symbol,
@@ -23,6 +46,15 @@ from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+VOL_SURFACE_CACHE_TTL = float(os.getenv("VOL_SURFACE_CACHE_TTL", "10"))
+VOL_SURFACE_QUOTE_WORKERS = int(os.getenv("VOL_SURFACE_QUOTE_WORKERS", "4"))
+_MAX_CACHED_SURFACES = 32
+
+# (underlying, options exchange, expiries, strike count) -> cached surface state
+_SURFACE_CACHE: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+_SURFACE_CACHE_LOCK = threading.Lock()
+_SURFACE_CACHE_STATS = {"hits": 0, "refreshes": 0, "layout_builds": 0, "expiries_solved": 0}
+
 # Index symbols that need NSE_INDEX/BSE_INDEX for quotes
 NSE_INDEX_SYMBOLS = {
     "NIFTY",
@@ -52,6 +84,140 @@ def _get_quote_exchange(base_symbol: str, exchange: str) -> str:
     return exchange.upper()
 
 
+def _build_layout(
+    base_symbol: str,
+    options_exchange: str,
+    expiry_dates: list[str],
+    strike_count: int,
+    underlying_ltp: float,
+    build_symbol,
+) -> dict[str, Any] | None:
+    """
+    Strike grid and option symbols of the surface around the current ATM.
+
+    Uses the intersection of the expiries' strike windows for a rectangular
+    grid, with the OTM leg per strike (CE at/above ATM, PE below).
+
+    Returns:
+        Dict with atm_strike, strikes and per-expiry symbols, or None if no
+        expiry has strikes
+    """
+    expiry_strike_data = []
+    for expiry in expiry_dates:
+        strikes = get_available_strikes(base_symbol, expiry, "CE", options_exchange)
+        if not strikes:
+            logger.warning(f"No strikes found for {base_symbol} expiry {expiry}, skipping")
+            continue
+
+        atm = find_atm_strike_from_actual(underlying_ltp, strikes)
+        if atm is None:
+            continue
+
+        atm_idx = strikes.index(atm)
+        start = max(0, atm_idx - strike_count)
+        end = min(len(strikes), atm_idx + strike_count + 1)
+        expiry_strike_data.append(
+            {"expiry": expiry, "all_strikes": strikes, "strikes": strikes[start:end], "atm": atm}
+        )
+
+    if not expiry_strike_data:
+        return None
+
+    strike_sets = [set(e["strikes"]) for e in expiry_strike_data]
+    common_strikes = sorted(strike_sets[0].intersection(*strike_sets[1:]))
+    if len(common_strikes) < 3:
+        # Fallback: use first expiry's strikes (surface may have gaps)
+        common_strikes = sorted(expiry_strike_data[0]["strikes"])
+
+    atm_strike = expiry_strike_data[0]["atm"]
+
+    for ed in expiry_strike_data:
+        ed["symbols"] = [
+            build_symbol(base_symbol, ed["expiry"], strike, "CE" if strike >= atm_strike else "PE")
+            for strike in common_strikes
+        ]
+        try:
+            _, expiry_dt, _, _ = parse_option_symbol(
+                build_symbol(base_symbol, ed["expiry"], common_strikes[0], "CE"), options_exchange
+            )
+        except Exception:
+            expiry_dt = None
+        ed["expiry_dt"] = expiry_dt
+
+    return {"atm_strike": atm_strike, "strikes": common_strikes, "expiries": expiry_strike_data}
+
+
+def _layout_is_current(layout: dict[str, Any], underlying_ltp: float) -> bool:
+    """True while the underlying is still nearest to every expiry's layout ATM"""
+    return all(
+        find_atm_strike_from_actual(underlying_ltp, ed["all_strikes"]) == ed["atm"]
+        for ed in layout["expiries"]
+    )
+
+
+def _fetch_expiry_quotes(
+    layout: dict[str, Any], options_exchange: str, executor: ThreadPoolExecutor, auth: dict[str, Any]
+) -> list:
+    """Submit one multiquotes call per expiry; returns the futures in layout order"""
+
+    def fetch(symbols: list[str]) -> dict[str, float]:
+        success, response, _ = get_multiquotes(
+            symbols=[{"symbol": sym, "exchange": options_exchange} for sym in symbols], **auth
+        )
+        quotes = {}
+        if success and "results" in response:
+            for result in response["results"]:
+                sym = result.get("symbol")
+                if sym:
+                    data = result.get("data", result)
+                    quotes[sym] = data.get("ltp", 0)
+        return quotes
+
+    return [executor.submit(fetch, ed["symbols"]) for ed in layout["expiries"]]
+
+
+def _fit_smile(strikes: list[float], ivs: list[float | None], forward: float) -> list[float | None]:
+    """
+    Smooth one expiry's smile with a quadratic in log-moneyness.
+
+    Strikes without an IV are filled from the fit; beyond the outermost quoted
+    strikes the fit is held flat instead of extrapolated.
+
+    Args:
+        strikes: Grid strikes
+        ivs: IV per strike in percent, None where no IV could be solved
+        forward: Underlying price used for moneyness
+
+    Returns:
+        Fitted IV per strike (percent), or the input IVs with fewer than 3 points
+    """
+    iv = np.array([np.nan if value is None else value for value in ivs], dtype=float)
+    valid = np.isfinite(iv)
+    if valid.sum() < 3 or not forward or forward <= 0:
+        return list(ivs)
+
+    moneyness = np.log(np.asarray(strikes, dtype=float) / forward)
+    coefficients = np.polyfit(moneyness[valid], iv[valid], 2)
+    clipped = np.clip(moneyness, moneyness[valid].min(), moneyness[valid].max())
+    fitted = np.maximum(np.polyval(coefficients, clipped), 0.01)
+    return [round(float(value), 2) for value in fitted]
+
+
+def get_vol_surface_cache_stats() -> dict[str, Any]:
+    """Get vol surface cache statistics for monitoring"""
+    with _SURFACE_CACHE_LOCK:
+        return {**_SURFACE_CACHE_STATS, "cached_surfaces": len(_SURFACE_CACHE)}
+
+
+def clear_vol_surface_cache():
+    """Clear cached surfaces"""
+    with _SURFACE_CACHE_LOCK:
+        _SURFACE_CACHE.clear()
+        for key in _SURFACE_CACHE_STATS:
+            _SURFACE_CACHE_STATS[key] = 0
+    logger.info("Vol surface cache cleared")
+
+
 def get_vol_surface_data(
     underlying: str,
     exchange: str,
@@ -62,6 +228,10 @@ def get_vol_surface_data(
     """
     Compute a volatility surface across multiple expiries at the current instant.
 
+    Served from the surface cache within VOL_SURFACE_CACHE_TTL; otherwise the
+    underlying and every expiry's option quotes are fetched concurrently and
+    only expiries whose quotes changed are re-solved.
+
     Args:
         underlying: Base symbol (e.g., "NIFTY")
         exchange: Exchange for quotes (e.g., "NSE_INDEX")
@@ -79,6 +249,16 @@ def get_vol_surface_data(
         base_symbol = underlying.upper()
         quote_exchange = _get_quote_exchange(base_symbol, exchange)
         options_exchange = get_option_exchange(quote_exchange)
+
+        cache_key = (base_symbol, options_exchange, tuple(expiry_dates), strike_count)
+        now = time.time()
+        with _SURFACE_CACHE_LOCK:
+            entry = _SURFACE_CACHE.get(cache_key)
+            if entry and entry.get("response") and now - entry["built_at"] < VOL_SURFACE_CACHE_TTL:
+                _SURFACE_CACHE.move_to_end(cache_key)
+                _SURFACE_CACHE_STATS["hits"] += 1
+                return True, entry["response"], 200
+
         # CRYPTO: look up the canonical perpetual symbol from DB (e.g. BTC → BTCUSD.P)
         if exchange.upper() in CRYPTO_EXCHANGES:
             _perp = fno_search_symbols(
@@ -96,145 +276,132 @@ def get_vol_surface_data(
         # Symbol builder: CRYPTO canonical format vs Indian FNO suffix format
         _build_sym = construct_crypto_option_symbol if exchange.upper() in CRYPTO_EXCHANGES else construct_option_symbol
 
-        # Step 1: Fetch underlying LTP once
-        success, quote_response, status_code = get_quotes(
-            symbol=underlying_quote_symbol, exchange=quote_exchange, api_key=api_key
-        )
-        if not success:
-            return False, {
-                "status": "error",
-                "message": f"Failed to fetch LTP for {base_symbol}: {quote_response.get('message', '')}",
-            }, status_code
-
-        underlying_ltp = quote_response.get("data", {}).get("ltp")
-        if not underlying_ltp:
-            return False, {"status": "error", "message": f"No LTP for {base_symbol}"}, 500
-
-        # Step 2: For each expiry, get strikes and find ATM
-        expiry_strike_data = []
-        for expiry in expiry_dates:
-            strikes = get_available_strikes(base_symbol, expiry, "CE", options_exchange)
-            if not strikes:
-                logger.warning(f"No strikes found for {base_symbol} expiry {expiry}, skipping")
-                continue
-
-            atm = find_atm_strike_from_actual(underlying_ltp, strikes)
-            if atm is None:
-                continue
-
-            atm_idx = strikes.index(atm)
-            start = max(0, atm_idx - strike_count)
-            end = min(len(strikes), atm_idx + strike_count + 1)
-            selected = strikes[start:end]
-
-            expiry_strike_data.append({
-                "expiry": expiry,
-                "strikes": selected,
-                "atm": atm,
-            })
-
-        if not expiry_strike_data:
-            return False, {"status": "error", "message": "No valid expiry data found"}, 404
-
-        # Step 3: Use intersection of strikes for a rectangular grid
-        strike_sets = [set(e["strikes"]) for e in expiry_strike_data]
-        common_strikes = sorted(strike_sets[0].intersection(*strike_sets[1:]))
-
-        if len(common_strikes) < 3:
-            # Fallback: use first expiry's strikes (surface may have gaps)
-            common_strikes = sorted(expiry_strike_data[0]["strikes"])
-
-        atm_strike = expiry_strike_data[0]["atm"]
-
-        # Step 4: For each expiry, fetch option LTPs and compute IV
-        surface = []  # surface[expiry_idx][strike_idx] = IV
-        expiry_info = []
-
-        for ed in expiry_strike_data:
-            expiry = ed["expiry"]
-
-            # Build symbol list for multiquotes - OTM convention
-            symbols_to_fetch = []
-            symbol_map = {}  # symbol -> (strike, option_type)
-
-            for strike in common_strikes:
-                if strike >= atm_strike:
-                    # Use CE for ATM and above
-                    sym = _build_sym(base_symbol, expiry, strike, "CE")
-                    opt_type = "CE"
-                else:
-                    # Use PE below ATM
-                    sym = _build_sym(base_symbol, expiry, strike, "PE")
-                    opt_type = "PE"
-
-                symbols_to_fetch.append({"symbol": sym, "exchange": options_exchange})
-                symbol_map[sym] = (strike, opt_type)
-
-            # Batch fetch all LTPs
-            success_q, quotes_resp, _ = get_multiquotes(
-                symbols=symbols_to_fetch, api_key=api_key
-            )
-
-            quotes_map = {}
-            if success_q and "results" in quotes_resp:
-                for result in quotes_resp["results"]:
-                    sym = result.get("symbol")
-                    if sym:
-                        data = result.get("data", result)
-                        quotes_map[sym] = data.get("ltp", 0)
-
-            # Compute IV for each strike
-            iv_row = []
-            for strike in common_strikes:
-                if strike >= atm_strike:
-                    sym = _build_sym(base_symbol, expiry, strike, "CE")
-                else:
-                    sym = _build_sym(base_symbol, expiry, strike, "PE")
+        # Resolve broker auth once for all concurrent quote calls
+        auth_token, feed_token, broker = get_auth_token_broker(api_key, include_feed_token=True)
+        if auth_token is None:
+            return False, {"status": "error", "message": "Invalid openalgo apikey"}, 403
+        auth = {"auth_token": auth_token, "feed_token": feed_token, "broker": broker}
 
-                option_ltp = quotes_map.get(sym, 0)
+        entry = entry or {"layout": None, "expiries": {}}
+        layout = entry["layout"]
 
-                if not option_ltp or option_ltp <= 0:
-                    iv_row.append(None)
-                    continue
+        with ThreadPoolExecutor(max_workers=max(1, VOL_SURFACE_QUOTE_WORKERS)) as executor:
+            # Step 1: Underlying LTP, together with the option quotes of a known layout
+            underlying_future = executor.submit(
+                get_quotes, symbol=underlying_quote_symbol, exchange=quote_exchange, **auth
+            )
+            quote_futures = (
+                _fetch_expiry_quotes(layout, options_exchange, executor, auth) if layout else None
+            )
 
+            success, quote_response, status_code = underlying_future.result()
+            if not success:
+                return False, {
+                    "status": "error",
+                    "message": f"Failed to fetch LTP for {base_symbol}: {quote_response.get('message', '')}",
+                }, status_code
+
+            underlying_ltp = quote_response.get("data", {}).get("ltp")
+            if not underlying_ltp:
+                return False, {"status": "error", "message": f"No LTP for {base_symbol}"}, 500
+
+            # Step 2: Strike grid around ATM, rebuilt only when the ATM moved
+            if layout is None or not _layout_is_current(layout, underlying_ltp):
+                layout = _build_layout(
+                    base_symbol, options_exchange, expiry_dates, strike_count, underlying_ltp, _build_sym
+                )
+                if layout is None:
+                    return False, {"status": "error", "message": "No valid expiry data found"}, 404
+                entry = {"layout": layout, "expiries": {}}
+                with _SURFACE_CACHE_LOCK:
+                    _SURFACE_CACHE_STATS["layout_builds"] += 1
+                quote_futures = _fetch_expiry_quotes(layout, options_exchange, executor, auth)
+
+            # Step 3: Option quotes of every expiry (fetched concurrently)
+            quote_maps = []
+            for ed, future in zip(layout["expiries"], quote_futures):
                 try:
-                    ok, greeks_resp, _ = calculate_greeks(
-                        option_symbol=sym,
-                        exchange=options_exchange,
-                        spot_price=underlying_ltp,
-                        option_price=option_ltp,
-                    )
-                    if ok and greeks_resp.get("status") == "success":
-                        iv_val = greeks_resp.get("implied_volatility")
-                        iv_row.append(round(iv_val, 2) if iv_val and iv_val > 0 else None)
+                    quote_maps.append(future.result())
+                except Exception as e:
+                    logger.warning(f"Quote fetch failed for {base_symbol} {ed['expiry']}: {e}")
+                    quote_maps.append({})
+
+        # Step 4: Solve IVs of every expiry whose quotes changed in one batch
+        common_strikes = layout["strikes"]
+        rows: dict[str, dict[str, Any]] = {}
+        pending = []
+        for ed, quotes_map in zip(layout["expiries"], quote_maps):
+            ltps = tuple(quotes_map.get(sym, 0) or 0 for sym in ed["symbols"])
+            cached = entry["expiries"].get(ed["expiry"])
+            if cached and cached["ltps"] == ltps and cached["spot"] == underlying_ltp:
+                rows[ed["expiry"]] = cached
+            else:
+                pending.append((ed, ltps))
+
+        if pending:
+            greeks_requests = [
+                {
+                    "symbol": sym,
+                    "exchange": options_exchange,
+                    "spot_price": underlying_ltp,
+                    "option_price": ltp,
+                }
+                for ed, ltps in pending
+                for sym, ltp in zip(ed["symbols"], ltps)
+            ]
+            results = iter(calculate_greeks_batch(greeks_requests))
+            for ed, ltps in pending:
+                iv_row = []
+                for _ in ed["symbols"]:
+                    ok, greeks_resp, _ = next(results)
+                    iv_val = greeks_resp.get("implied_volatility") if ok else None
+                    if ok and greeks_resp.get("status") == "success" and iv_val and iv_val > 0:
+                        iv_row.append(round(iv_val, 2))
                     else:
                         iv_row.append(None)
-                except Exception:
-                    iv_row.append(None)
-
-            surface.append(iv_row)
-
-            # Compute DTE from parsed symbol
-            try:
-                test_sym = _build_sym(base_symbol, expiry, common_strikes[0], "CE")
-                _, expiry_dt, _, _ = parse_option_symbol(test_sym, options_exchange)
-                from datetime import datetime
-                dte = max(0, (expiry_dt - datetime.now()).total_seconds() / 86400)
-                expiry_info.append({"date": expiry, "dte": round(dte, 1)})
-            except Exception:
-                expiry_info.append({"date": expiry, "dte": 0})
-
-        return True, {
+                rows[ed["expiry"]] = {
+                    "ltps": ltps,
+                    "spot": underlying_ltp,
+                    "iv_row": iv_row,
+                    "fitted_row": _fit_smile(common_strikes, iv_row, underlying_ltp),
+                }
+
+        surface = []  # surface[expiry_idx][strike_idx] = IV
+        fitted_surface = []
+        expiry_info = []
+        for ed in layout["expiries"]:
+            row = rows[ed["expiry"]]
+            surface.append(row["iv_row"])
+            fitted_surface.append(row["fitted_row"])
+            if ed["expiry_dt"] is not None:
+                dte = max(0, (ed["expiry_dt"] - datetime.now()).total_seconds() / 86400)
+                expiry_info.append({"date": ed["expiry"], "dte": round(dte, 1)})
+            else:
+                expiry_info.append({"date": ed["expiry"], "dte": 0})
+
+        response = {
             "status": "success",
             "data": {
                 "underlying": base_symbol,
                 "underlying_ltp": underlying_ltp,
-                "atm_strike": atm_strike,
+                "atm_strike": layout["atm_strike"],
                 "strikes": common_strikes,
                 "expiries": expiry_info,
                 "surface": surface,
+                "fitted_surface": fitted_surface,
             },
-        }, 200
+        }
+
+        entry = {"layout": layout, "expiries": rows, "response": response, "built_at": time.time()}
+        with _SURFACE_CACHE_LOCK:
+            _SURFACE_CACHE[cache_key] = entry
+            _SURFACE_CACHE.move_to_end(cache_key)
+            while len(_SURFACE_CACHE) > _MAX_CACHED_SURFACES:
+                _SURFACE_CACHE.popitem(last=False)
+            _SURFACE_CACHE_STATS["refreshes"] += 1
+            _SURFACE_CACHE_STATS["expiries_solved"] += len(pending)
+
+        return True, response, 200
 
     except Exception as e:
         logger.exception(f"Error computing vol surface: {e}")
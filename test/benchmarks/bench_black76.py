@@ -0,0 +1,109 @@
+"""
+Benchmark: per-option py_vollib calls vs the vectorized Black-76 engine
+
+Times IV plus all Greeks for a 91-strike chain (182 options) and for 10,000
+options, then a full chain through calculate_greeks() per option vs one
+calculate_greeks_batch() call.
+
+Usage:
+    python test/benchmarks/bench_black76.py
+"""
+
+from datetime import datetime, timedelta
+
+from common import best_of, configure
+
+FORWARD = 24000.0
+YEARS = 9 / 365
+
+
+def _chain_requests(np, black76, strikes, sigma=0.14):
+    """CE and PE requests for every strike, priced with a smile"""
+    expiry = (datetime.now() + timedelta(days=9)).strftime("%d%b%y").upper()
+    requests = []
+    for flag, suffix in (("c", "CE"), ("p", "PE")):
+        vols = sigma + 0.4 * np.log(strikes / FORWARD) ** 2
+        prices = black76.black_price(flag, FORWARD, strikes, YEARS, 0.0, vols)
+        for strike, price in zip(strikes, prices):
+            requests.append(
+                {
+                    "symbol": f"NIFTY{expiry}{strike}{suffix}",
+                    "exchange": "NFO",
+                    "spot_price": FORWARD,
+                    "option_price": max(round(float(price) / 0.05) * 0.05, 0.05),
+                }
+            )
+    return requests
+
+
+def main():
+    configure()
+
+    import warnings
+
+    import numpy as np
+
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    from py_vollib.black.greeks import analytical
+    from py_vollib.black.implied_volatility import implied_volatility as vollib_iv
+
+    from services.option_greeks_service import calculate_greeks, calculate_greeks_batch
+    from utils import black76
+
+    strikes = np.arange(21750, 26250 + 1, 50)  # 91 strikes
+    rng = np.random.default_rng(3)
+
+    print("IV + delta/gamma/theta/vega/rho")
+    for n in (2 * len(strikes), 10_000):
+        flag = rng.choice(["c", "p"], n)
+        rate = rng.choice([0.0, 0.065], n)
+        strike = np.resize(strikes.astype(float), n)
+        sigma = 0.12 + 0.5 * np.log(strike / FORWARD) ** 2
+        prices = black76.black_price(flag, FORWARD, strike, YEARS, rate, sigma)
+
+        # py_vollib is timed on at most 2,000 options and scaled up
+        sample = min(n, 2000)
+
+        def scalar():
+            for i in range(sample):
+                args = (flag[i], FORWARD, strike[i], YEARS, rate[i])
+                iv = vollib_iv(prices[i], FORWARD, strike[i], rate[i], YEARS, flag[i])
+                for greek in (
+                    analytical.delta,
+                    analytical.gamma,
+                    analytical.theta,
+                    analytical.vega,
+                    analytical.rho,
+                ):
+                    greek(*args, iv)
+
+        def vectorized():
+            iv = black76.implied_volatility(prices, FORWARD, strike, rate, YEARS, flag)
+            black76.greeks(flag, FORWARD, strike, YEARS, rate, iv)
+
+        scalar_seconds = best_of(scalar, repeat=1)[0] * n / sample
+        vector_seconds = best_of(vectorized)[0]
+        print(
+            f"  {n:>6,} options: py_vollib {scalar_seconds * 1000:8.1f} ms, "
+            f"utils/black76 {vector_seconds * 1000:6.2f} ms "
+            f"({scalar_seconds / vector_seconds:.0f}x)"
+        )
+
+    requests = _chain_requests(np, black76, strikes)
+    per_option = best_of(
+        lambda: [
+            calculate_greeks(r["symbol"], r["exchange"], r["spot_price"], r["option_price"])
+            for r in requests
+        ],
+        repeat=1,
+    )[0]
+    batched = best_of(lambda: calculate_greeks_batch(requests))[0]
+    print(
+        f"{len(requests)}-option chain through option_greeks_service: "
+        f"calculate_greeks {per_option * 1000:.0f} ms, "
+        f"calculate_greeks_batch {batched * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: N simultaneous sandbox fills, synchronous vs write-behind
+
+Creates N open orders spread over a few users and symbols, as when many resting
+orders cross on an opening gap (each user adds to one long or short position
+per symbol), and times filling all of them:
+- synchronously: ExecutionEngine._execute_order, one set of commits per fill
+- write-behind: FillJournal.record_fill per fill (acknowledged), then one flush
+
+Usage:
+    python test/benchmarks/bench_fill_journal.py [n_fills]
+"""
+
+import os
+import sys
+import time
+from decimal import Decimal
+
+from common import configure
+
+USERS = 10
+SYMBOLS = ("SBIN", "INFY", "TCS", "HDFCBANK", "RELIANCE")
+
+
+def _create_orders(n_fills, prefix):
+    """Open orders with margin blocked, as order placement would"""
+    from database.sandbox_db import SandboxOrders, db_session
+    from sandbox.fund_manager import FundManager
+
+    orders = []
+    for i in range(n_fills):
+        user, symbol = i % USERS, (i // USERS) % len(SYMBOLS)
+        user_id = f"{prefix}_{user}"
+        fm = FundManager(user_id)
+        if i < USERS:
+            fm.initialize_funds()
+        price = Decimal(500 + (i % 7) * 5)
+        quantity = 10 + i % 5
+        margin = price * quantity / 5
+        fm.block_margin(margin, f"bench order {i}")
+        order = SandboxOrders(
+            orderid=f"{prefix}-{i}",
+            user_id=user_id,
+            symbol=SYMBOLS[symbol],
+            exchange="NSE",
+            action="BUY" if (user + symbol) % 2 else "SELL",
+            quantity=quantity,
+            price=price,
+            price_type="LIMIT",
+            product="MIS",
+            order_status="open",
+            pending_quantity=quantity,
+            margin_blocked=margin,
+        )
+        db_session.add(order)
+        orders.append(order)
+    db_session.commit()
+    return orders
+
+
+def main(n_fills=500):
+    work_dir = configure()
+
+    from database import symbol as symbol_db
+    from database.sandbox_db import init_db
+    from sandbox.execution_engine import ExecutionEngine
+    from sandbox.fill_journal import FillJournal
+
+    init_db()
+    symbol_db.Base.metadata.create_all(symbol_db.engine)  # empty master contract
+
+    orders = _create_orders(n_fills, "BENCH_SYNC")
+    engine = ExecutionEngine()
+    start = time.perf_counter()
+    for order in orders:
+        engine._execute_order(order, order.price)
+    synchronous = time.perf_counter() - start
+
+    orders = _create_orders(n_fills, "BENCH_WB")
+    journal = FillJournal(path=os.path.join(work_dir, "bench_journal.jsonl"), flush_size=n_fills + 1)
+    start = time.perf_counter()
+    for order in orders:
+        journal.record_fill(order, order.price)
+    acknowledged = time.perf_counter() - start
+    assert journal.flush() == n_fills
+    write_behind = time.perf_counter() - start
+
+    print(f"{n_fills} simultaneous fills across {USERS} users, {len(SYMBOLS)} symbols")
+    print(f"  synchronous  {synchronous * 1000:8.0f} ms  {n_fills / synchronous:7.0f} fills/s")
+    print(
+        f"  write-behind {write_behind * 1000:8.0f} ms  {n_fills / write_behind:7.0f} fills/s "
+        f"(all acknowledged after {acknowledged * 1000:.0f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
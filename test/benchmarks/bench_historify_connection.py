@@ -0,0 +1,91 @@
+"""
+Benchmark: Historify chart-data requests per second, before and after pooling
+
+Times 5m chart requests over a week of 1m bars with the previous
+connect-per-call get_connection() (open and close the DuckDB file for every
+read) and with the pooled read cursors of database/historify_connection.py.
+The query cache is off so every request reads DuckDB.
+
+Usage:
+    python test/benchmarks/bench_historify_connection.py [n_requests]
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from common import configure
+
+START_TS = 1735875900  # 2025-01-03 09:15 IST
+BARS = 375 * 5
+
+
+def main(n_requests=200):
+    os.environ.setdefault("HISTORIFY_QUERY_CACHE_MB", "0")
+    configure()
+
+    import duckdb
+    import numpy as np
+    import pandas as pd
+
+    from database import historify_db, market_calendar_db
+    from database.historify_connection import close_historify_connections
+
+    historify_db.init_database()
+    market_calendar_db.init_db()
+    close = 100.0 + np.cumsum(np.random.default_rng(7).normal(0, 0.5, BARS))
+    historify_db.upsert_market_data(
+        pd.DataFrame(
+            {
+                "timestamp": START_TS + 60 * np.arange(BARS, dtype=np.int64),
+                "open": close,
+                "high": close + 0.5,
+                "low": close - 0.5,
+                "close": close,
+                "volume": np.full(BARS, 1000),
+            }
+        ),
+        "CONN0",
+        "NSE",
+        "1m",
+    )
+
+    def chart_request():
+        df = historify_db.get_ohlcv("CONN0", "NSE", "5m", START_TS, START_TS + 60 * BARS)
+        assert not df.empty
+
+    def requests_per_second():
+        chart_request()  # warm up
+        start = time.perf_counter()
+        for _ in range(n_requests):
+            chart_request()
+        return n_requests / (time.perf_counter() - start)
+
+    @contextmanager
+    def connect_per_call(max_retries=3, retry_delay=0.5):
+        """Previous get_connection(): open and close the database file for every call"""
+        conn = duckdb.connect(historify_db.get_db_path())
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    results = {}
+    close_historify_connections()
+    pooled = historify_db.get_connection
+    historify_db.get_connection = connect_per_call
+    try:
+        results["connect per call"] = requests_per_second()
+    finally:
+        historify_db.get_connection = pooled
+    results["pooled cursors"] = requests_per_second()
+    close_historify_connections()
+
+    print(f"{n_requests} 5m chart requests over {BARS:,} 1m bars")
+    for label, rps in results.items():
+        print(f"  {label:<18} {rps:7.0f} req/s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
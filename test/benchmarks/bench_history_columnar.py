@@ -0,0 +1,85 @@
+"""
+Benchmark: records vs columnar history responses for a large range
+
+Loads two years of 1m candles into a throwaway Historify database and times
+get_history(source="db") end to end, query plus encoding, for the 'records'
+format (row dicts through jsonify) and for 'columns', 'arrow' and 'parquet'.
+The query cache is off so every run reads DuckDB.
+
+Usage:
+    python test/benchmarks/bench_history_columnar.py
+"""
+
+import os
+
+from common import best_of, configure
+
+START_TS = 1704167100  # 2024-01-02 09:15 IST
+BARS_PER_DAY = 375
+YEARS = 2
+TRADING_DAYS = 250 * YEARS
+START_DATE, END_DATE = "2024-01-01", "2026-01-31"
+
+
+def main():
+    os.environ.setdefault("HISTORIFY_QUERY_CACHE_MB", "0")
+    configure()
+
+    import numpy as np
+    import pandas as pd
+    from flask import Flask, jsonify
+
+    from database import historify_db, market_calendar_db
+    from services.history_service import encode_history_table, get_history
+
+    historify_db.init_database()
+    market_calendar_db.init_db()
+
+    days = START_TS + 86400 * (np.arange(TRADING_DAYS) * 7 // 5)  # skip weekends
+    ts = (days[:, None] + 60 * np.arange(BARS_PER_DAY)).ravel()
+    close = 100.0 + np.cumsum(np.random.default_rng(11).normal(0, 0.1, len(ts)))
+    historify_db.upsert_market_data(
+        pd.DataFrame(
+            {
+                "timestamp": ts,
+                "open": close,
+                "high": close + 0.5,
+                "low": close - 0.5,
+                "close": close,
+                "volume": np.full(len(ts), 1000),
+                "oi": np.zeros(len(ts), dtype=np.int64),
+            }
+        ),
+        "COLSYM",
+        "NSE",
+        "1m",
+    )
+
+    app = Flask(__name__)
+
+    def history(output_format):
+        ok, response, _ = get_history(
+            "COLSYM", "NSE", "1m", START_DATE, END_DATE, source="db", output_format=output_format
+        )
+        assert ok, response
+        return response
+
+    def records():
+        response = history("records")
+        with app.app_context():
+            return jsonify(response).get_data()
+
+    def columnar(output_format):
+        return lambda: encode_history_table(history(output_format)["data"], output_format)[0]
+
+    results = {"records (row dicts + jsonify)": best_of(records)}
+    for output_format in ("columns", "arrow", "parquet"):
+        results[output_format] = best_of(columnar(output_format))
+
+    print(f"{len(ts):,} 1m candles ({YEARS} years), query + encoding")
+    for label, (seconds, body) in results.items():
+        print(f"  {label:<30} {seconds * 1000:7.0f} ms  {len(body) / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Shared setup for the standalone benchmarks in this directory
+
+The benchmarks are not part of the pytest suite (only test_*.py files are
+collected). Run one from the repository root:
+
+    python test/benchmarks/bench_black76.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure() -> str:
+    """
+    Point every database at a throwaway directory and put the repository on sys.path.
+
+    Database modules create their engines from the environment when first
+    imported, so call this before importing them. Explicitly exported settings
+    still win.
+
+    Returns:
+        The throwaway directory
+    """
+    work_dir = tempfile.mkdtemp(prefix="openalgo_bench_")
+    for name, filename in (
+        ("DATABASE_URL", "openalgo.db"),
+        ("LOGS_DATABASE_URL", "logs.db"),
+        ("LATENCY_DATABASE_URL", "latency.db"),
+        ("HEALTH_DATABASE_URL", "health.db"),
+        ("SANDBOX_DATABASE_URL", "sandbox.db"),
+    ):
+        os.environ.setdefault(name, f"sqlite:///{os.path.join(work_dir, filename)}")
+    os.environ.setdefault("HISTORIFY_DATABASE_PATH", os.path.join(work_dir, "historify.duckdb"))
+    os.environ.setdefault("SANDBOX_JOURNAL_PATH", os.path.join(work_dir, "sandbox_fill_journal.jsonl"))
+    os.environ.setdefault("API_KEY_PEPPER", "0" * 64)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return work_dir
+
+
+def best_of(fn, repeat=3):
+    """Best wall-clock seconds of repeated calls, and the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
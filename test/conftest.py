@@ -0,0 +1,74 @@
+"""
+Shared pytest setup
+
+Database modules create their engines from the environment when they are first
+imported, which happens while test modules are collected, so throwaway databases
+are configured in pytest_configure. Explicitly exported settings still win.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config):
+    test_dir = tempfile.mkdtemp(prefix="openalgo_test_")
+    for name, filename in (
+        ("DATABASE_URL", "openalgo.db"),
+        ("LOGS_DATABASE_URL", "logs.db"),
+        ("LATENCY_DATABASE_URL", "latency.db"),
+        ("HEALTH_DATABASE_URL", "health.db"),
+        ("SANDBOX_DATABASE_URL", "sandbox.db"),
+    ):
+        os.environ.setdefault(name, f"sqlite:///{os.path.join(test_dir, filename)}")
+    os.environ.setdefault("HISTORIFY_DATABASE_PATH", os.path.join(test_dir, "historify.duckdb"))
+    os.environ.setdefault("SANDBOX_JOURNAL_PATH", os.path.join(test_dir, "sandbox_fill_journal.jsonl"))
+    os.environ.setdefault("API_KEY_PEPPER", "0" * 64)
+
+
+@pytest.fixture(scope="module")
+def historify_settings():
+    """
+    Historify settings for the historify_db fixture; a test module overrides this
+    fixture to pick the storage backend ("backend") or materialized rollups
+    ("rollup_intervals")
+    """
+    return {}
+
+
+@pytest.fixture(scope="module")
+def historify_db(tmp_path_factory, historify_settings):
+    """Historify DuckDB database and Parquet root in a fresh directory for each test module"""
+    from database import historify_cache, historify_connection, historify_parquet
+    from database import historify_db as db
+
+    root = tmp_path_factory.mktemp("historify")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(db, "HISTORIFY_DB_PATH", str(root / "historify.duckdb"))
+        mp.setattr(historify_parquet, "HISTORIFY_PARQUET_PATH", str(root / "parquet"))
+        mp.setattr(historify_parquet, "STORAGE_BACKEND", historify_settings.get("backend", "duckdb"))
+        mp.setattr(db, "ROLLUP_INTERVALS", tuple(historify_settings.get("rollup_intervals", ())))
+        # Results cached from another module's database must not be served here
+        mp.setattr(historify_cache, "_cache", None)
+
+        db.init_database()
+        yield db
+
+        historify_connection.close_historify_connections()
+
+
+@pytest.fixture
+def query_cache(historify_db, monkeypatch):
+    """
+    Give one test its own Historify query cache: call with a budget in MB
+    (0 disables caching) to get the fresh cache get_ohlcv() will use
+    """
+    from database import historify_cache
+
+    def configure(size_mb=128):
+        monkeypatch.setattr(historify_cache, "QUERY_CACHE_MB", size_mb)
+        monkeypatch.setattr(historify_cache, "_cache", None)
+        return historify_cache.get_query_cache()
+
+    return configure
@@ -1,2 +0,0 @@
-# test/sandbox/__init__.py
-"""Sandbox test suite"""
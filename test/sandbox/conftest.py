@@ -0,0 +1,20 @@
+"""Fixtures for the sandbox tests"""
+
+import pytest
+
+# Standalone scripts run with python against the real sandbox database (see README.md)
+collect_ignore = [
+    "test_cnc_sell_validation.py",
+    "test_fund_manager.py",
+    "test_margin_scenarios.py",
+]
+
+
+@pytest.fixture(scope="session")
+def sandbox_db():
+    """Sandbox tables in the throwaway sandbox database"""
+    from database.sandbox_db import db_session, init_db
+
+    init_db()
+    yield db_session
+    db_session.remove()
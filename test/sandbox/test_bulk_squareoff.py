@@ -0,0 +1,211 @@
+# test/sandbox/test_bulk_squareoff.py
+"""
+Tests for the sandbox bulk MIS square-off
+
+Tests:
+- Bulk square-off is opt-in
+- Closing fills use ExecutionEngine's MARKET price: bid for sells, ask for buys
+- All due MIS positions are closed in one pass, with trades and fund releases, and
+  open MIS orders are cancelled with their margin released in the same transaction
+- Frozen books reject new MIS orders and skip MIS fills
+- The catch-up processor squares off positions when the scheduled run was missed
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from database.sandbox_db import SandboxFunds, SandboxOrders, SandboxPositions, SandboxTrades
+from sandbox import replay_clock, squareoff_manager
+from sandbox.catch_up_processor import catch_up_missed_squareoff
+from sandbox.execution_engine import ExecutionEngine
+from sandbox.fund_manager import FundManager
+from sandbox.order_manager import OrderManager
+from sandbox.replay_clock import IST
+from sandbox.squareoff_manager import (
+    SquareOffManager,
+    frozen_books,
+    is_book_frozen,
+    is_bulk_squareoff_enabled,
+)
+
+AVG_PRICE = Decimal("100")
+QUOTE = {"ltp": 105.0, "bid": 104.9, "ask": 105.1}
+POSITION_MARGIN = Decimal("200")
+ORDER_MARGIN = Decimal("500")
+
+
+@pytest.fixture
+def db(sandbox_db):
+    yield sandbox_db
+    sandbox_db.rollback()
+
+
+@pytest.fixture
+def market(db, monkeypatch):
+    """Bulk square-off enabled, every symbol quoted at QUOTE; returns a setter for sandbox time"""
+    monkeypatch.setenv("SANDBOX_BULK_SQUAREOFF", "true")
+    monkeypatch.setattr(
+        ExecutionEngine,
+        "_fetch_quotes_batch",
+        lambda self, symbols_list: {key: dict(QUOTE) for key in symbols_list},
+    )
+
+    def at(hhmm):
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+        now = IST.localize(datetime.strptime(f"{today} {hhmm}", "%Y-%m-%d %H:%M"))
+        for module in (replay_clock, squareoff_manager):
+            monkeypatch.setattr(module, "sandbox_now", lambda user_id=None: now)
+
+    return at
+
+
+def _create_book(db, user_id, symbols, with_order=True):
+    """MIS positions (alternating long/short) and one resting MIS order, margin blocked as placement would"""
+    fm = FundManager(user_id)
+    fm.initialize_funds()
+    for i, symbol in enumerate(symbols):
+        fm.block_margin(POSITION_MARGIN, f"test position {symbol}")
+        db.add(
+            SandboxPositions(
+                user_id=user_id,
+                symbol=symbol,
+                exchange="NSE",
+                product="MIS",
+                quantity=10 if i % 2 == 0 else -10,
+                average_price=AVG_PRICE,
+                ltp=AVG_PRICE,
+                pnl=Decimal("0.00"),
+                pnl_percent=Decimal("0.00"),
+                accumulated_realized_pnl=Decimal("0.00"),
+                today_realized_pnl=Decimal("0.00"),
+                margin_blocked=POSITION_MARGIN,
+            )
+        )
+    if with_order:
+        fm.block_margin(ORDER_MARGIN, "test resting order")
+        db.add(
+            SandboxOrders(
+                orderid=f"RESTING-{user_id}",
+                user_id=user_id,
+                symbol=symbols[0],
+                exchange="NSE",
+                action="BUY",
+                quantity=10,
+                price=Decimal("90"),
+                price_type="LIMIT",
+                product="MIS",
+                order_status="open",
+                pending_quantity=10,
+                margin_blocked=ORDER_MARGIN,
+            )
+        )
+    db.commit()
+    return fm.starting_capital
+
+
+def _assert_squared_off(db, user_id, symbols, capital, with_order=True):
+    db.expire_all()
+    positions = SandboxPositions.query.filter_by(user_id=user_id, product="MIS").all()
+    assert positions and all(p.quantity == 0 and p.margin_blocked == 0 for p in positions)
+
+    trades = SandboxTrades.query.filter_by(user_id=user_id, strategy="AUTO_SQUARE_OFF").all()
+    assert len(trades) == len(symbols)
+    # Longs are sold at the bid, shorts bought back at the ask
+    assert all(
+        t.price == Decimal(str(QUOTE["bid"] if t.action == "SELL" else QUOTE["ask"])) for t in trades
+    )
+
+    if with_order:
+        order = SandboxOrders.query.filter_by(orderid=f"RESTING-{user_id}").first()
+        assert order.order_status == "cancelled"
+
+    # Longs make +49 and shorts -51 at the quoted bid/ask
+    longs = (len(symbols) + 1) // 2
+    expected_pnl = Decimal("49") * longs - Decimal("51") * (len(symbols) - longs)
+    funds = SandboxFunds.query.filter_by(user_id=user_id).first()
+    assert funds.used_margin == 0
+    assert funds.available_balance == capital + expected_pnl
+    assert funds.today_realized_pnl == expected_pnl
+    assert sum(p.today_realized_pnl for p in positions) == expected_pnl
+
+
+def test_bulk_square_off_is_opt_in(monkeypatch):
+    """Square-off closes positions order by order unless SANDBOX_BULK_SQUAREOFF is set"""
+    monkeypatch.delenv("SANDBOX_BULK_SQUAREOFF", raising=False)
+    assert not is_bulk_squareoff_enabled()
+    monkeypatch.setenv("SANDBOX_BULK_SQUAREOFF", "true")
+    assert is_bulk_squareoff_enabled()
+
+
+def test_market_fill_price():
+    """BUY fills at the ask and SELL at the bid, LTP when that side is missing"""
+    assert ExecutionEngine.market_fill_price("BUY", QUOTE) == Decimal("105.1")
+    assert ExecutionEngine.market_fill_price("SELL", QUOTE) == Decimal("104.9")
+    assert ExecutionEngine.market_fill_price("SELL", {"ltp": 105.0, "bid": 0}) == Decimal("105.0")
+    assert ExecutionEngine.market_fill_price("BUY", {"ltp": 0, "ask": 105.1}) is None
+
+
+def test_bulk_square_off(db, market):
+    """Every due MIS position and order is closed in one bulk pass"""
+    symbols = [f"BULK{i}" for i in range(4)]
+    capital = {f"BULK_USER_{u}": _create_book(db, f"BULK_USER_{u}", symbols) for u in range(5)}
+
+    market("15:16")
+    som = SquareOffManager()
+    positions, orders = som.get_due_for_square_off(datetime.strptime("15:16", "%H:%M").time())
+    summary = som.bulk_square_off(positions, orders)
+
+    assert summary["closed"] >= len(capital) * len(symbols)
+    assert summary["cancelled"] >= len(capital)
+    for user_id, cap in capital.items():
+        _assert_squared_off(db, user_id, symbols, cap)
+
+
+def test_not_due_before_square_off_time(db):
+    """Nothing is squared off before the exchange's square-off time"""
+    _create_book(db, "BULK_EARLY", ["EARLY0"])
+    positions, orders = SquareOffManager().get_due_for_square_off(
+        datetime.strptime("15:10", "%H:%M").time()
+    )
+    assert not any(p.user_id == "BULK_EARLY" for p in positions)
+    assert not any(o.user_id == "BULK_EARLY" for o in orders)
+
+
+def test_frozen_book_blocks_mis_orders(db):
+    """While frozen, new MIS orders are rejected and resting MIS orders do not fill"""
+    _create_book(db, "BULK_FROZEN", ["FROZEN0"])
+    order = SandboxOrders.query.filter_by(orderid="RESTING-BULK_FROZEN").first()
+
+    with frozen_books({"BULK_FROZEN"}):
+        assert is_book_frozen("BULK_FROZEN")
+        ExecutionEngine()._process_order(order, {"ltp": 80, "bid": 80, "ask": 80})
+        db.refresh(order)
+        assert order.order_status == "open"
+
+        success, response, status_code = OrderManager("BULK_FROZEN").place_order(
+            {
+                "symbol": "FROZEN0",
+                "exchange": "NSE",
+                "action": "BUY",
+                "quantity": 1,
+                "price_type": "MARKET",
+                "product": "MIS",
+            }
+        )
+        assert not success and status_code == 400
+        assert "square-off in progress" in response["message"]
+
+    assert not is_book_frozen("BULK_FROZEN")
+
+
+def test_catch_up_missed_square_off(db, market):
+    """Catch-up squares off today's MIS book when the scheduled run was missed"""
+    symbols = ["MISSED0", "MISSED1", "MISSED2"]
+    capital = _create_book(db, "BULK_MISSED", symbols)
+
+    market("15:40")
+    catch_up_missed_squareoff()
+
+    _assert_squared_off(db, "BULK_MISSED", symbols, capital)
@@ -0,0 +1,117 @@
+# test/sandbox/test_margin_ledger.py
+"""
+Tests for the sandbox in-memory margin ledger
+
+Tests:
+- FundManager movements through the ledger persist the same fund rows as direct commits
+- Concurrent block/release from many threads keeps every account balanced
+- Direct writes wrapped in external_fund_write() are picked up by cached accounts
+"""
+
+import threading
+from decimal import Decimal
+
+import pytest
+
+from database.sandbox_db import SandboxFunds
+from sandbox.fund_manager import FundManager
+from sandbox.margin_ledger import external_fund_write, get_margin_ledger
+
+FUND_FIELDS = ("available_balance", "used_margin", "realized_pnl", "unrealized_pnl", "total_pnl")
+
+
+@pytest.fixture
+def db(sandbox_db):
+    yield sandbox_db
+    sandbox_db.rollback()
+
+
+@pytest.fixture
+def fund_manager(db, monkeypatch):
+    """Factory for initialized FundManagers with the ledger switched on or off"""
+
+    def make(user_id, ledger):
+        monkeypatch.setenv("SANDBOX_MARGIN_LEDGER", "true" if ledger else "false")
+        fm = FundManager(user_id)
+        fm.initialize_funds()
+        return fm
+
+    return make
+
+
+def _run_movements(fm):
+    assert fm.block_margin(Decimal("25000"), "order 1")[0]
+    assert fm.block_margin(Decimal("12000.50"), "order 2")[0]
+    assert fm.check_margin_available(Decimal("1000"))[0]
+    assert not fm.block_margin(Decimal("999999999"), "too large")[0]
+    fm.release_margin(Decimal("25000"), Decimal("1520.75"), "close 1")
+    fm.release_margin(Decimal("6000"), Decimal("-310.25"), "partial close 2")
+    fm.transfer_margin_to_holdings(Decimal("6000.50"), "T+1")
+    fm.credit_sale_proceeds(Decimal("7000"), "holding sold")
+    fm.update_unrealized_pnl(Decimal("432.10"))
+
+
+def _row(db, user_id):
+    db.expire_all()
+    funds = SandboxFunds.query.filter_by(user_id=user_id).first()
+    return tuple(getattr(funds, f) for f in FUND_FIELDS)
+
+
+def test_ledger_matches_direct_path(db, fund_manager):
+    """Ledger movements persist exactly what direct commits write"""
+    _run_movements(fund_manager("LEDGER_DIRECT", ledger=False))
+    ledger_fm = fund_manager("LEDGER_MEM", ledger=True)
+    _run_movements(ledger_fm)
+
+    ledger = get_margin_ledger()
+    ledger.flush()
+
+    assert _row(db, "LEDGER_MEM") == _row(db, "LEDGER_DIRECT")
+    assert ledger_fm.get_funds()["availablecash"] == float(_row(db, "LEDGER_DIRECT")[0])
+
+    kinds = [entry.kind for entry in ledger.get_movements("LEDGER_MEM")]
+    assert kinds == ["block", "block", "release", "release", "holdings_transfer", "credit"]
+    assert ledger.stats["invariant_violations"] == 0
+
+
+def test_concurrent_orders_stay_balanced(db, fund_manager):
+    """Basket-style concurrent block/release keeps available + used constant"""
+    users = [f"LEDGER_CONC_{i}" for i in range(8)]
+    for user in users:
+        fund_manager(user, ledger=True)
+    before = {user: _row(db, user) for user in users}
+
+    def worker(user):
+        for i in range(50):
+            fm = FundManager(user)
+            fm.block_margin(Decimal("1000"), f"basket leg {i}")
+            fm.release_margin(Decimal("1000"), Decimal("0"), f"basket leg {i} cancelled")
+
+    pool = [threading.Thread(target=worker, args=(u,)) for u in users for _ in range(2)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    ledger = get_margin_ledger()
+    ledger.flush()
+    for user in users:
+        assert _row(db, user) == before[user]
+    assert ledger.stats["invariant_violations"] == 0
+
+
+def test_external_write_reloads_account(db, fund_manager):
+    """Direct fund writes inside external_fund_write() reach the cached account"""
+    fm = fund_manager("LEDGER_EXTERNAL", ledger=True)
+    fm.block_margin(Decimal("5000"), "open order")
+
+    with external_fund_write("LEDGER_EXTERNAL"):
+        funds = SandboxFunds.query.filter_by(user_id="LEDGER_EXTERNAL").first()
+        # Pending movement was persisted before the external write
+        assert funds.used_margin == Decimal("5000")
+        funds.today_realized_pnl = Decimal("0.00")
+        funds.available_balance += Decimal("100")
+        db.commit()
+
+    account = get_margin_ledger().get_account("LEDGER_EXTERNAL")
+    assert account.available_balance == fm.starting_capital - Decimal("5000") + Decimal("100")
@@ -0,0 +1,201 @@
+# test/sandbox/test_mtm_engine.py
+"""
+Tests for the sandbox batch MTM engine
+
+Tests:
+- Vectorized P&L matches PositionManager's per-position Decimal formulas
+- update_all() writes positions and fund unrealized P&L for every user in one pass
+- Users whose last position closed get their fund unrealized P&L reset to 0
+- The background MTM job settles expired NRML contracts before pricing
+- Per-user results stay cached until the LTP of a symbol in that user's book changes
+- Contract values are looked up again after a master contract reload
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from database.sandbox_db import SandboxFunds, SandboxPositions
+from database.token_db_enhanced import get_cache
+from sandbox import mtm_engine
+from sandbox.fund_manager import FundManager
+from sandbox.mtm_engine import MTMEngine, compute_mtm
+from sandbox.position_manager import PositionManager, update_all_positions_mtm
+from services.market_data_service import get_market_data_service
+
+# (symbol, quantity, average_price, ltp, contract_value)
+CASES = [
+    ("SBIN", 100, "500.25", "512.40", "1"),
+    ("INFY", -40, "1480.10", "1462.55", "1"),
+    ("ETHUSD.P", 3, "3120.50", "3098.75", "0.01"),
+    ("NIFTY", -75, "24010.00", "24110.35", "1"),
+]
+CONTRACT_VALUES = {c[0]: c[4] for c in CASES}
+
+
+@pytest.fixture
+def db(sandbox_db, monkeypatch):
+    monkeypatch.setattr(
+        mtm_engine,
+        "get_symbol_info",
+        lambda symbol, exchange: SimpleNamespace(contract_value=CONTRACT_VALUES.get(symbol, "1")),
+    )
+    yield sandbox_db
+    sandbox_db.rollback()
+
+
+def _push_ticks(prices):
+    mds = get_market_data_service()
+    for symbol, ltp in prices.items():
+        mds.process_market_data(
+            {"symbol": symbol, "exchange": "NSE", "mode": 1, "data": {"ltp": float(ltp)}}
+        )
+
+
+def _create_positions(db, user_id, cases=CASES):
+    FundManager(user_id).initialize_funds()
+    for symbol, quantity, avg, _, _ in cases:
+        db.add(
+            SandboxPositions(
+                user_id=user_id,
+                symbol=symbol,
+                exchange="NSE",
+                product="MIS",
+                quantity=quantity,
+                average_price=Decimal(avg),
+            )
+        )
+    db.commit()
+
+
+def test_vectorized_pnl_matches_decimal_formulas():
+    """compute_mtm agrees with PositionManager's Decimal math to the column precision"""
+    pm = PositionManager("MTM_FORMULA")
+    pnl, pnl_percent = compute_mtm(
+        [c[1] for c in CASES],
+        [float(c[2]) for c in CASES],
+        [float(c[3]) for c in CASES],
+        [float(c[4]) for c in CASES],
+    )
+
+    for i, (_, quantity, avg, ltp, cv) in enumerate(CASES):
+        expected_pnl = pm._calculate_position_pnl(quantity, Decimal(avg), Decimal(ltp), Decimal(cv))
+        expected_pct = pm._calculate_pnl_percent(Decimal(avg), Decimal(ltp), quantity)
+        assert Decimal(str(pnl[i])) == expected_pnl.quantize(Decimal("0.01"))
+        assert abs(pnl_percent[i] - float(expected_pct)) < 1e-4
+
+
+def test_update_all_and_user_cache(db):
+    """Batch run updates every user's positions and funds, then serves each user's cache"""
+    users = ["MTM_A", "MTM_B"]
+    for user in users:
+        _create_positions(db, user)
+    _push_ticks({c[0]: c[3] for c in CASES})
+
+    engine = MTMEngine()
+    summary = engine.update_all()
+    assert summary["positions"] >= len(CASES) * len(users)
+    assert summary["users"] >= len(users)
+
+    db.expire_all()
+    for user in users:
+        positions = SandboxPositions.query.filter_by(user_id=user).all()
+        total = sum(p.pnl for p in positions)
+        funds = SandboxFunds.query.filter_by(user_id=user).first()
+        assert funds.unrealized_pnl == total
+        assert funds.total_pnl == funds.realized_pnl + total
+
+        # No new ticks and no position changes - served from cache
+        assert engine.update_user_positions(user, positions) is False
+
+    # A tick on the user's own symbol invalidates the cache
+    _push_ticks({"SBIN": "515.00"})
+    positions = SandboxPositions.query.filter_by(user_id="MTM_A").all()
+    assert engine.update_user_positions("MTM_A", positions) is True
+    sbin = next(p for p in positions if p.symbol == "SBIN")
+    assert sbin.ltp == Decimal("515.00")
+
+
+def test_flat_user_unrealized_reset(db):
+    """Once a user's last position closes, the batch run zeroes their fund unrealized P&L"""
+    _create_positions(db, "MTM_FLAT", CASES[:1])
+    _push_ticks({"SBIN": "512.40"})
+    engine = MTMEngine()
+    engine.update_all(user_ids=["MTM_FLAT"])
+
+    funds = SandboxFunds.query.filter_by(user_id="MTM_FLAT").first()
+    assert funds.unrealized_pnl == Decimal("1215.00")
+
+    SandboxPositions.query.filter_by(user_id="MTM_FLAT").update({"quantity": 0})
+    db.commit()
+    summary = engine.update_all(user_ids=["MTM_FLAT"])
+    assert summary["positions"] == 0 and summary["reset"] == 1
+
+    db.expire_all()
+    funds = SandboxFunds.query.filter_by(user_id="MTM_FLAT").first()
+    assert funds.unrealized_pnl == 0 and funds.total_pnl == funds.realized_pnl
+    assert engine.update_all(user_ids=["MTM_FLAT"])["reset"] == 0
+
+
+def test_mtm_job_settles_expired_contracts(db, monkeypatch):
+    """An NRML option past its expiry is closed by the job instead of being repriced"""
+    monkeypatch.setattr("database.market_calendar_db.is_market_open", lambda exchange=None: True)
+    FundManager("MTM_EXPIRY").initialize_funds()
+    db.add(
+        SandboxPositions(
+            user_id="MTM_EXPIRY",
+            symbol="NIFTY09DEC2526000CE",
+            exchange="NFO",
+            product="NRML",
+            quantity=75,
+            average_price=Decimal("120.00"),
+            margin_blocked=Decimal("9000.00"),
+        )
+    )
+    db.commit()
+
+    update_all_positions_mtm()
+
+    db.expire_all()
+    position = SandboxPositions.query.filter_by(user_id="MTM_EXPIRY").first()
+    assert position.quantity == 0 and position.margin_blocked == 0
+    assert position.pnl == Decimal("-9000.00")
+
+
+def test_unrelated_ticks_keep_cache(db):
+    """Ticks on symbols outside a book, or repeating the same LTP, keep its cached MTM"""
+    _create_positions(db, "MTM_QUIET", CASES[:1])
+    _push_ticks({"SBIN": "512.40"})
+    engine = MTMEngine()
+    positions = SandboxPositions.query.filter_by(user_id="MTM_QUIET").all()
+    assert engine.update_user_positions("MTM_QUIET", positions) is True
+
+    _push_ticks({"TCS": "4100.00", "HDFCBANK": "1650.00", "SBIN": "512.40"})
+    assert engine.update_user_positions("MTM_QUIET", positions) is False
+
+    _push_ticks({"SBIN": "512.45"})
+    assert engine.update_user_positions("MTM_QUIET", positions) is True
+
+
+def test_contract_values_cleared_on_master_contract_reload(db):
+    """A reloaded master contract changes the multiplier used for the next MTM"""
+    _create_positions(db, "MTM_RELOAD", [("ETHUSD.P", 3, "3120.50", "3098.75", "0.01")])
+    _push_ticks({"ETHUSD.P": "3130.50"})
+    engine = MTMEngine()
+    positions = SandboxPositions.query.filter_by(user_id="MTM_RELOAD").all()
+    engine.update_user_positions("MTM_RELOAD", positions)
+    assert positions[0].pnl == Decimal("0.30")
+
+    CONTRACT_VALUES["ETHUSD.P"] = "0.1"
+    try:
+        _push_ticks({"ETHUSD.P": "3130.51"})
+        engine.update_user_positions("MTM_RELOAD", positions)
+        assert positions[0].pnl == Decimal("0.30")  # still the cached multiplier
+
+        get_cache().clear_cache()  # what a master contract download does before loading
+        _push_ticks({"ETHUSD.P": "3130.50"})
+        engine.update_user_positions("MTM_RELOAD", positions)
+        assert positions[0].pnl == Decimal("3.00")
+    finally:
+        CONTRACT_VALUES["ETHUSD.P"] = "0.01"
@@ -0,0 +1,199 @@
+# test/sandbox/test_replay.py
+"""
+Tests for the sandbox historical replay
+
+Tests:
+- Bars are walked open -> first extreme -> second extreme -> close
+- Replayed bars fill the user's resting orders through the paper trading execution path,
+  stamped with simulated bar time; open MIS orders are cancelled after simulated square-off
+- Other users' orders, positions and the live LTP cache are untouched by a replay
+- The replay clock is bound per user: other users keep wall-clock time, and live
+  MTM and square-off skip the replaying user
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from database.sandbox_db import SandboxOrders, SandboxPositions, SandboxTrades
+from sandbox.fund_manager import FundManager
+from sandbox.mtm_engine import MTMEngine
+from sandbox.replay_clock import (
+    IST,
+    get_replaying_users,
+    is_replay_active,
+    sandbox_now,
+    start_replay_clock,
+    stop_replay_clock,
+    user_replay_scope,
+)
+from sandbox.replay_engine import ReplayEngine, bar_tick_path
+from sandbox.squareoff_manager import SquareOffManager
+from services.market_data_service import get_market_data_service
+
+REPLAY_DATE = "2025-01-06"
+
+
+def _bar_ts(hhmm):
+    return int(IST.localize(datetime.strptime(f"{REPLAY_DATE} {hhmm}", "%Y-%m-%d %H:%M")).timestamp())
+
+
+@pytest.fixture(scope="module")
+def bars(historify_db):
+    """A few SBIN 1m bars: a dip to 495 at 09:16, then a rally, then bars after square-off"""
+    rows = [
+        ("09:15", 500, 501, 499, 500),
+        ("09:16", 500, 500, 495, 497),
+        ("09:17", 497, 506, 497, 505),
+        ("15:15", 505, 506, 504, 505),
+        ("15:16", 505, 505, 503, 504),
+    ]
+    df = pd.DataFrame(
+        [
+            {"timestamp": _bar_ts(t), "open": o, "high": h, "low": low, "close": c, "volume": 1000}
+            for t, o, h, low, c in rows
+        ]
+    )
+    historify_db.upsert_market_data(df, "SBIN", "NSE", "1m")
+    return len(rows)
+
+
+@pytest.fixture
+def db(sandbox_db):
+    yield sandbox_db
+    sandbox_db.rollback()
+
+
+def _create_order(db, user_id, orderid, action, price_type, price=None, trigger=None, product="CNC"):
+    fm = FundManager(user_id)
+    fm.initialize_funds()
+    margin = Decimal("10000")
+    fm.block_margin(margin, f"test order {orderid}")
+    order = SandboxOrders(
+        orderid=orderid,
+        user_id=user_id,
+        symbol="SBIN",
+        exchange="NSE",
+        action=action,
+        quantity=10,
+        price=Decimal(str(price)) if price is not None else None,
+        trigger_price=Decimal(str(trigger)) if trigger is not None else None,
+        price_type=price_type,
+        product=product,
+        order_status="open",
+        pending_quantity=10,
+        margin_blocked=margin,
+    )
+    db.add(order)
+    db.commit()
+    return order
+
+
+def _create_position(db, user_id, product="MIS"):
+    db.add(
+        SandboxPositions(
+            user_id=user_id,
+            symbol="SBIN",
+            exchange="NSE",
+            product=product,
+            quantity=10,
+            average_price=Decimal("500.00"),
+        )
+    )
+    db.commit()
+
+
+def test_bar_tick_path_order():
+    """Up bars visit the low first, down bars the high first"""
+    assert bar_tick_path(100, 105, 98, 104) == (100, 98, 105, 104)
+    assert bar_tick_path(100, 105, 98, 99) == (100, 105, 98, 99)
+
+
+def test_replay_fills_orders_at_simulated_time(db, bars):
+    """Resting orders fill on replayed bars and square-off follows simulated time"""
+    _create_order(db, "REPLAY_USER", "REPLAY-LIMIT", "BUY", "LIMIT", price=496)
+    _create_order(db, "REPLAY_USER", "REPLAY-SLM", "BUY", "SL-M", trigger=504)
+    _create_order(db, "REPLAY_USER", "REPLAY-MIS", "BUY", "LIMIT", price=450, product="MIS")
+
+    replay = ReplayEngine("REPLAY_USER", [{"symbol": "SBIN", "exchange": "NSE"}], REPLAY_DATE, REPLAY_DATE)
+    assert replay.load() == bars
+    replay.run()
+
+    assert replay.status["state"] == "completed"
+    assert replay.status["orders_filled"] == 2
+
+    db.expire_all()
+    limit_trade = SandboxTrades.query.filter_by(orderid="REPLAY-LIMIT").first()
+    assert limit_trade.price == Decimal("496")
+    # Filled on the 09:16 bar's dip
+    assert limit_trade.trade_timestamp.strftime("%Y-%m-%d %H:%M") == f"{REPLAY_DATE} 09:16"
+
+    slm_trade = SandboxTrades.query.filter_by(orderid="REPLAY-SLM").first()
+    assert slm_trade.trade_timestamp.strftime("%H:%M") == "09:17"
+
+    # Resting MIS order is cancelled once simulated time passes 15:15
+    assert SandboxOrders.query.filter_by(orderid="REPLAY-MIS").first().order_status == "cancelled"
+
+    # Back on wall-clock time
+    assert not get_replaying_users()
+    assert abs((datetime.now(IST) - sandbox_now("REPLAY_USER")).total_seconds()) < 5
+
+
+def test_replay_leaves_other_users_and_live_prices_alone(db, bars):
+    """Only the replaying user's book is driven; the live LTP cache never sees replayed bars"""
+    _create_order(db, "REPLAY_OWNER", "OWNER-LIMIT", "BUY", "LIMIT", price=496)
+    _create_order(db, "REPLAY_BYSTANDER", "BYSTANDER-LIMIT", "BUY", "LIMIT", price=496)
+    _create_order(db, "REPLAY_BYSTANDER", "BYSTANDER-MIS", "BUY", "LIMIT", price=450, product="MIS")
+    _create_position(db, "REPLAY_BYSTANDER")
+    versions = get_market_data_service().get_ltp_versions([("SBIN", "NSE")])
+
+    ReplayEngine("REPLAY_OWNER", [{"symbol": "SBIN", "exchange": "NSE"}], REPLAY_DATE, REPLAY_DATE).run()
+
+    db.expire_all()
+    assert SandboxOrders.query.filter_by(orderid="OWNER-LIMIT").first().order_status == "complete"
+    assert SandboxOrders.query.filter_by(orderid="BYSTANDER-LIMIT").first().order_status == "open"
+    assert SandboxOrders.query.filter_by(orderid="BYSTANDER-MIS").first().order_status == "open"
+    position = SandboxPositions.query.filter_by(user_id="REPLAY_BYSTANDER").first()
+    assert position.quantity == 10 and position.ltp is None
+    assert get_market_data_service().get_ltp_versions([("SBIN", "NSE")]) == versions
+
+
+def test_replay_clock_is_scoped_to_its_user(db):
+    """Simulated time applies to the replaying user only; live MTM and square-off skip that user"""
+    _create_position(db, "CLOCK_REPLAYING")
+    _create_position(db, "CLOCK_LIVE")
+    simulated = IST.localize(datetime(2025, 1, 6, 15, 20))
+
+    clock = start_replay_clock("CLOCK_REPLAYING")
+    try:
+        assert start_replay_clock("CLOCK_REPLAYING") is None
+        clock.set(simulated)
+        clock.set_quote("SBIN", "NSE", {"ltp": 510.0, "bid": 510.0, "ask": 510.0})
+
+        assert not is_replay_active() and is_replay_active("CLOCK_REPLAYING")
+        assert sandbox_now() != simulated and sandbox_now("CLOCK_LIVE") != simulated
+        assert sandbox_now("CLOCK_REPLAYING") == simulated
+        with user_replay_scope("CLOCK_REPLAYING"):
+            assert sandbox_now() == simulated
+        assert sandbox_now() != simulated
+
+        positions, _ = SquareOffManager().get_due_for_square_off(simulated.time())
+        assert "CLOCK_REPLAYING" not in {p.user_id for p in positions}
+        assert "CLOCK_LIVE" in {p.user_id for p in positions}
+
+        # Live MTM leaves the replaying user, who is priced from the replay clock instead
+        engine = MTMEngine()
+        engine.update_all(user_ids=["CLOCK_LIVE"])
+        engine.update_all()
+        db.expire_all()
+        assert SandboxPositions.query.filter_by(user_id="CLOCK_REPLAYING").first().ltp is None
+
+        replaying = SandboxPositions.query.filter_by(user_id="CLOCK_REPLAYING").all()
+        engine.update_user_positions("CLOCK_REPLAYING", replaying)
+        assert replaying[0].ltp == Decimal("510.00") and replaying[0].pnl == Decimal("100.00")
+    finally:
+        stop_replay_clock(clock)
+
+    assert not is_replay_active("CLOCK_REPLAYING")
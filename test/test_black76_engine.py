@@ -0,0 +1,165 @@
+"""
+Tests for the vectorized Black-76 engine
+
+Covers utils/black76.py and services/option_greeks_service.calculate_greeks_batch():
+- Implied volatility matches py_vollib across moneyness, expiry and volatility
+- Closed-form Greeks match py_vollib.black.greeks.analytical
+- calculate_greeks_batch() returns the same responses as calculate_greeks() per option,
+  including deep ITM, invalid and expired options
+- GEX built from the batch matches GEX built from per-option calls
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from py_vollib.black.greeks import analytical
+from py_vollib.black.implied_volatility import implied_volatility as vollib_iv
+
+from services import gex_service
+from services.option_greeks_service import calculate_greeks, calculate_greeks_batch
+from utils import black76
+
+FORWARD = 24000.0
+EXPIRY = (datetime.now() + timedelta(days=9)).strftime("%d%b%y").upper()
+STRIKES = np.arange(21750, 26250 + 1, 50)  # 91 strikes
+
+
+def _random_options(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return {
+        "F": FORWARD,
+        "K": rng.uniform(18000, 30000, n),
+        "t": rng.uniform(0.5 / 365, 1.0, n),
+        "r": rng.choice([0.0, 0.065], n),
+        "sigma": rng.uniform(0.05, 1.5, n),
+        "flag": rng.choice(["c", "p"], n),
+    }
+
+
+def _chain_requests(spot=FORWARD, sigma=0.14):
+    """CE and PE requests for every strike, priced with a smile"""
+    years = 9 / 365
+    requests = []
+    for flag, suffix in (("c", "CE"), ("p", "PE")):
+        vols = sigma + 0.4 * (np.log(STRIKES / spot)) ** 2
+        prices = black76.black_price(flag, spot, STRIKES, years, 0.0, vols)
+        for strike, price in zip(STRIKES, prices):
+            requests.append(
+                {
+                    "symbol": f"NIFTY{EXPIRY}{strike}{suffix}",
+                    "exchange": "NFO",
+                    "spot_price": spot,
+                    "option_price": max(round(float(price) / 0.05) * 0.05, 0.05),
+                }
+            )
+    return requests
+
+
+def test_iv_matches_pyvollib():
+    """Vectorized IV equals py_vollib wherever the option has time value"""
+    o = _random_options(3000)
+    prices = black76.black_price(o["flag"], o["F"], o["K"], o["t"], o["r"], o["sigma"])
+    intrinsic = np.where(o["flag"] == "c", np.maximum(o["F"] - o["K"], 0), np.maximum(o["K"] - o["F"], 0))
+    priced = prices - intrinsic * np.exp(-o["r"] * o["t"]) > 0.05  # at least one tick of time value
+
+    iv = black76.implied_volatility(prices, o["F"], o["K"], o["r"], o["t"], o["flag"])
+    np.testing.assert_allclose(iv[priced], o["sigma"][priced], rtol=1e-8)
+
+    reference = np.array(
+        [
+            vollib_iv(prices[i], o["F"], o["K"][i], o["r"][i], o["t"][i], o["flag"][i])
+            for i in np.flatnonzero(priced)[:500]
+        ]
+    )
+    np.testing.assert_allclose(iv[np.flatnonzero(priced)[:500]], reference, rtol=1e-8)
+
+
+def test_iv_unsolvable_prices():
+    """Below intrinsic, above the maximum and non-positive inputs return NaN"""
+    iv = black76.implied_volatility(
+        [100.0, 24001.0, 0.0, 50.0, 50.0],
+        [24000.0, 24000.0, 24000.0, 24000.0, -1.0],
+        [23800.0, 24000.0, 24000.0, 24000.0, 24000.0],
+        0.0,
+        [0.05, 0.05, 0.05, 0.0, 0.05],
+        ["c", "c", "c", "c", "c"],
+    )
+    assert np.isnan(iv).all()
+
+
+def test_greeks_match_pyvollib():
+    """Delta, gamma, theta, vega and rho match the py_vollib analytical Greeks"""
+    o = _random_options(400)
+    greeks = black76.greeks(o["flag"], o["F"], o["K"], o["t"], o["r"], o["sigma"])
+    for name in ("delta", "gamma", "theta", "vega", "rho"):
+        fn = getattr(analytical, name)
+        reference = np.array(
+            [fn(o["flag"][i], o["F"], o["K"][i], o["t"][i], o["r"][i], o["sigma"][i]) for i in range(400)]
+        )
+        np.testing.assert_allclose(greeks[name], reference, rtol=1e-9, atol=1e-14, err_msg=name)
+
+
+def test_batch_matches_calculate_greeks():
+    """Batch responses equal calculate_greeks() per option, edge cases included"""
+    requests = _chain_requests()
+    requests += [
+        # Deep ITM call priced at intrinsic, ITM put below intrinsic
+        {"symbol": f"NIFTY{EXPIRY}22000CE", "exchange": "NFO", "spot_price": FORWARD, "option_price": 2000.0},
+        {"symbol": f"NIFTY{EXPIRY}26000PE", "exchange": "NFO", "spot_price": FORWARD, "option_price": 1990.0},
+        # Invalid symbol, zero price, expired option
+        {"symbol": "NIFTYXYZ", "exchange": "NFO", "spot_price": FORWARD, "option_price": 10.0},
+        {"symbol": f"NIFTY{EXPIRY}24000CE", "exchange": "NFO", "spot_price": FORWARD, "option_price": 0},
+        {"symbol": "NIFTY02JAN2524000CE", "exchange": "NFO", "spot_price": FORWARD, "option_price": 10.0},
+    ]
+    batch = calculate_greeks_batch(requests, interest_rate=6.5)
+    assert len(batch) == len(requests)
+
+    for request, (ok, response, status) in zip(requests, batch):
+        expected = calculate_greeks(
+            option_symbol=request["symbol"],
+            exchange=request["exchange"],
+            spot_price=request["spot_price"],
+            option_price=request["option_price"],
+            interest_rate=6.5,
+        )
+        assert (ok, status) == expected[:1] + expected[2:], request
+        if not ok:
+            continue
+        # days_to_expiry is taken at slightly different instants
+        response = {k: v for k, v in response.items() if k != "days_to_expiry"}
+        reference = {k: v for k, v in expected[1].items() if k != "days_to_expiry"}
+        assert set(response) == set(reference), request
+        assert abs(response["implied_volatility"] - reference["implied_volatility"]) <= 0.01, request
+        for name, value in reference["greeks"].items():
+            assert abs(response["greeks"][name] - value) <= max(2e-4, abs(value) * 1e-4), (request, name)
+
+
+def test_gex_uses_one_batch(monkeypatch):
+    """GEX from the batched gammas equals GEX from per-option calculate_greeks()"""
+    requests = _chain_requests()
+    chain = []
+    for strike in STRIKES:
+        legs = {}
+        for suffix in ("CE", "PE"):
+            symbol = f"NIFTY{EXPIRY}{strike}{suffix}"
+            price = next(r["option_price"] for r in requests if r["symbol"] == symbol)
+            legs[suffix.lower()] = {"symbol": symbol, "ltp": price, "oi": 100000, "lotsize": 75}
+        chain.append({"strike": float(strike), **legs})
+
+    monkeypatch.setattr(
+        gex_service,
+        "get_option_chain",
+        lambda **kwargs: (
+            True,
+            {"chain": chain, "atm_strike": 24000.0, "underlying_ltp": FORWARD, "underlying": "NIFTY"},
+            200,
+        ),
+    )
+    monkeypatch.setattr(gex_service, "_get_nearest_futures_price", lambda **kwargs: None)
+    ok, response, _ = gex_service.get_gex_data("NIFTY", "NSE_INDEX", EXPIRY, "key")
+
+    assert ok and len(response["chain"]) == len(STRIKES)
+    for row, item in list(zip(response["chain"], chain))[::10]:
+        for side in ("ce", "pe"):
+            _, expected, _ = calculate_greeks(item[side]["symbol"], "NFO", FORWARD, item[side]["ltp"])
+            assert abs(row[f"{side}_gamma"] - expected["greeks"]["gamma"]) <= 1e-6, item[side]["symbol"]
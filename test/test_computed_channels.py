@@ -0,0 +1,315 @@
+"""
+Tests for services/computed_channel_service
+
+Covers computed channels over a stubbed live option chain:
+- CHAIN_GREEKS, NET_GEX, STRADDLE and PCR payloads match the batch Greeks
+  engine and compute_oi_analytics()
+- A user's subscribers share one chain read and one computation per interval;
+  each user's chain is read with that user's own API key
+- Streamed chains are recomputed after their session ticks (and once a minute),
+  chains that are not streamed only every poll interval
+- Due chains are recomputed concurrently
+- Only legs whose price or the underlying moved are re-solved; unchanged
+  payloads are not pushed again
+- Channel validation, unsubscribe and client cleanup
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import computed_channel_service as computed
+from services import option_chain_service
+from services.oi_tracker_service import compute_oi_analytics
+from services.option_chain_session_service import OptionChainSessionManager
+from services.option_greeks_service import calculate_greeks_batch
+from utils import black76
+
+EXPIRY = (datetime.now() + timedelta(days=12)).strftime("%d%b%y").upper()
+STRIKES = [float(s) for s in range(23500, 24501, 50)]
+
+
+class _Clock:
+    """Stand-in for the time module so tests control intervals and the minute bucket"""
+
+    def __init__(self):
+        self.now = 1_800_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def _price(strike, flag, spot):
+    years = 12 / 365
+    return round(float(black76.black_price(flag, spot, strike, years, 0.0, 0.14)), 2)
+
+
+def _chain(market, underlying, expiry_date):
+    spot = market["spot"]
+    atm = min(STRIKES, key=lambda s: (abs(s - spot), s))
+    chain = []
+    for strike in STRIKES:
+        row = {"strike": strike}
+        for key, flag in (("ce", "c"), ("pe", "p")):
+            symbol = f"{underlying}{expiry_date}{int(strike)}{key.upper()}"
+            row[key] = {
+                "symbol": symbol,
+                "ltp": market["bump"].get(symbol, _price(strike, flag, spot)),
+                "oi": int(100000 + abs(strike - atm) * (40 if key == "pe" else 30)),
+                "volume": int(20000 + strike % 700),
+                "lotsize": 75,
+            }
+        chain.append(row)
+    return {
+        "status": "success",
+        "underlying": underlying,
+        "underlying_ltp": spot,
+        "expiry_date": expiry_date,
+        "atm_strike": atm,
+        "chain": chain,
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(computed, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def market():
+    return {"spot": 24010.0, "bump": {}}
+
+
+@pytest.fixture
+def chain_reads(monkeypatch, market):
+    """Stubbed get_option_chain; records the API key of every read"""
+    reads = []
+
+    def get_chain(underlying, exchange, expiry_date, strike_count, api_key, side=None):
+        reads.append(api_key)
+        return True, _chain(market, underlying, expiry_date), 200
+
+    monkeypatch.setattr(computed, "get_option_chain", get_chain)
+    return reads
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    sessions = OptionChainSessionManager()
+    monkeypatch.setattr(computed, "get_option_chain_sessions", lambda: sessions)
+    return sessions
+
+
+@pytest.fixture
+def manager(chain_reads, clock, sessions):
+    manager = computed.ComputedChannelManager()
+    yield manager
+    for client_id in list(manager._client_channels):
+        manager.remove_client(client_id)
+
+
+def _channel(kind):
+    return f"{kind}:NIFTY:{EXPIRY}"
+
+
+def _by_channel(messages):
+    grouped = {}
+    for client_id, message in messages:
+        grouped.setdefault(message["channel"], {})[client_id] = message["data"]
+    return grouped
+
+
+def test_payloads_match_services(manager, market):
+    """Each channel equals what the REST services compute from the same chain"""
+    manager.subscribe("c1", [_channel(kind) for kind in computed.CHANNEL_KINDS], "alice", "key", "NFO", 10)
+    pushed = _by_channel(manager.compute_due())
+    assert set(pushed) == {_channel(kind) for kind in computed.CHANNEL_KINDS}
+
+    chain_response = _chain(market, "NIFTY", EXPIRY)
+    requests = [
+        {"symbol": row[key]["symbol"], "exchange": "NFO", "spot_price": 24010.0, "option_price": row[key]["ltp"]}
+        for row in chain_response["chain"]
+        for key in ("ce", "pe")
+    ]
+    expected = {
+        request["symbol"]: response
+        for request, (ok, response, _) in zip(requests, calculate_greeks_batch(requests))
+        if ok and response["status"] == "success"
+    }
+
+    greeks = pushed[_channel("CHAIN_GREEKS")]["c1"]
+    gex = pushed[_channel("NET_GEX")]["c1"]
+    for greeks_row, gex_row, chain_row in zip(greeks["chain"], gex["chain"], chain_response["chain"]):
+        for key in ("ce", "pe"):
+            leg = greeks_row[key]
+            reference = expected[leg["symbol"]]
+            assert leg["iv"] == reference["implied_volatility"]
+            assert leg["delta"] == reference["greeks"]["delta"] and leg["vega"] == reference["greeks"]["vega"]
+            assert gex_row[f"{key}_gex"] == round(
+                reference["greeks"]["gamma"] * chain_row[key]["oi"] * chain_row[key]["lotsize"], 2
+            )
+    assert gex["total_net_gex"] == round(gex["total_ce_gex"] - gex["total_pe_gex"], 2)
+
+    straddle = pushed[_channel("STRADDLE")]["c1"]
+    atm_row = next(row for row in chain_response["chain"] if row["strike"] == 24000.0)
+    assert straddle["atm_strike"] == 24000.0
+    assert straddle["straddle_premium"] == round(atm_row["ce"]["ltp"] + atm_row["pe"]["ltp"], 2)
+    assert straddle["synthetic_future"] == round(24000.0 + atm_row["ce"]["ltp"] - atm_row["pe"]["ltp"], 2)
+
+    analytics = compute_oi_analytics(
+        STRIKES,
+        [row["ce"]["oi"] for row in chain_response["chain"]],
+        [row["pe"]["oi"] for row in chain_response["chain"]],
+        [row["ce"]["volume"] for row in chain_response["chain"]],
+        [row["pe"]["volume"] for row in chain_response["chain"]],
+    )
+    pcr = pushed[_channel("PCR")]["c1"]
+    assert pcr["pcr_oi"] == analytics["pcr_oi"] and pcr["pcr_volume"] == analytics["pcr_volume"]
+    assert pcr["max_pain_strike"] == analytics["max_pain_strike"]
+
+
+def test_shared_computation_per_user(manager, chain_reads, clock):
+    """A user's clients share one read per interval with that user's key; each gets only its channels"""
+    manager.subscribe("c1", [_channel("CHAIN_GREEKS"), _channel("PCR")], "alice", "key-alice", "NFO", 10)
+    manager.subscribe("c2", [_channel("PCR")], "alice", "key-alice", "NFO", 10)
+    manager.subscribe("c3", [_channel("STRADDLE")], "alice", "key-alice", "NFO", 10)
+    assert manager.stats()["active_chains"] == 1
+
+    pushed = _by_channel(manager.compute_due())
+    assert chain_reads == ["key-alice"]
+    assert set(pushed[_channel("PCR")]) == {"c1", "c2"}
+    assert set(pushed[_channel("CHAIN_GREEKS")]) == {"c1"}
+    assert set(pushed[_channel("STRADDLE")]) == {"c3"}
+    assert _channel("NET_GEX") not in pushed
+
+    # Inside the poll interval nothing is re-read
+    clock.now += computed.POLL_INTERVAL / 2
+    assert manager.compute_due() == [] and len(chain_reads) == 1
+
+    # A late subscriber of the same user gets the current payload immediately
+    late = manager.subscribe("c4", [_channel("STRADDLE")], "alice", "key-alice", "NFO", 10)
+    assert late[0]["data"] == pushed[_channel("STRADDLE")]["c3"]
+
+    # Another user, or a different window, is a separate computation
+    manager.subscribe("c5", [_channel("STRADDLE")], "bob", "key-bob", "NFO", 10)
+    manager.subscribe("c6", [_channel("PCR")], "alice", "key-alice", "NFO", 5)
+    assert manager.stats()["active_chains"] == 3
+    clock.now += computed.POLL_INTERVAL
+    pushed = _by_channel(manager.compute_due())
+    assert sorted(chain_reads[1:]) == ["key-alice", "key-alice", "key-bob"]
+    assert set(pushed[_channel("STRADDLE")]) == {"c5"}
+
+
+def test_streamed_chains_recompute_on_ticks(manager, chain_reads, clock, sessions, monkeypatch):
+    """With streaming, a chain is recomputed only after its session ticked, or on a new minute"""
+    monkeypatch.setattr(option_chain_service, "OPTION_CHAIN_STREAMING", True)
+    wakeups = []
+    manager.set_wakeup(lambda: wakeups.append(1))
+    manager.subscribe("c1", [_channel("PCR")], "alice", "key-alice", "NFO", 10)
+    manager.compute_due()
+    computation = next(iter(manager._chains.values()))
+
+    clock.now += computed.COMPUTE_INTERVAL
+    assert manager.compute_due() == [] and len(chain_reads) == 1
+
+    # Ticks of other sessions are ignored; the chain's own session wakes the proxy
+    sessions._notify_listeners(("bob", *computation.key[1:]))
+    assert wakeups == [] and manager.compute_due() == []
+    sessions._notify_listeners(computation.key)
+    assert wakeups == [1]
+    manager.compute_due()
+    assert len(chain_reads) == 2
+
+    # Time decay: every chain is refreshed once a minute
+    clock.now += 60
+    manager.compute_due()
+    assert len(chain_reads) == 3
+
+    # Without streaming the chain is re-read every poll interval, not every interval
+    monkeypatch.setattr(option_chain_service, "OPTION_CHAIN_STREAMING", False)
+    clock.now += computed.COMPUTE_INTERVAL
+    manager.compute_due()
+    assert len(chain_reads) == 3
+    clock.now += computed.POLL_INTERVAL
+    manager.compute_due()
+    assert len(chain_reads) == 4
+
+
+def test_due_chains_computed_concurrently(manager, monkeypatch, market):
+    """Chains due in the same pass are read in parallel"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def get_chain(underlying, exchange, expiry_date, strike_count, api_key, side=None):
+        barrier.wait()  # breaks unless both reads are in flight together
+        return True, _chain(market, underlying, expiry_date), 200
+
+    monkeypatch.setattr(computed, "get_option_chain", get_chain)
+    manager.subscribe("c1", [_channel("PCR")], "alice", "key-alice", "NFO", 10)
+    manager.subscribe("c2", [_channel("PCR")], "bob", "key-bob", "NFO", 10)
+
+    pushed = _by_channel(manager.compute_due())
+    assert manager.metrics["errors"] == 0
+    assert set(pushed[_channel("PCR")]) == {"c1", "c2"}
+
+
+def test_incremental_greeks_and_change_only_pushes(manager, market, clock):
+    """Only moved legs are re-solved; unchanged payloads are not pushed"""
+    manager.subscribe("c1", [_channel("CHAIN_GREEKS"), _channel("STRADDLE")], "alice", "key", "NFO", 10)
+    manager.compute_due()
+    computation = next(iter(manager._chains.values()))
+    assert computation.legs_computed == 2 * len(STRIKES)
+
+    # Nothing moved: no Greeks solved, nothing pushed
+    clock.now += computed.POLL_INTERVAL
+    assert manager.compute_due() == []
+    assert computation.legs_computed == 2 * len(STRIKES)
+
+    # One far OTM leg ticks: one leg solved, Greeks pushed, straddle unchanged
+    symbol = f"NIFTY{EXPIRY}24500CE"
+    market["bump"][symbol] = 3.15
+    clock.now += computed.POLL_INTERVAL
+    pushed = _by_channel(manager.compute_due())
+    assert computation.legs_computed == 2 * len(STRIKES) + 1
+    assert set(pushed) == {_channel("CHAIN_GREEKS")}
+    assert pushed[_channel("CHAIN_GREEKS")]["c1"]["chain"][-1]["ce"]["ltp"] == 3.15
+
+    # The underlying moves: every leg is re-solved
+    market["spot"] = 24060.0
+    clock.now += computed.POLL_INTERVAL
+    pushed = _by_channel(manager.compute_due())
+    assert computation.legs_computed == 4 * len(STRIKES) + 1
+    assert pushed[_channel("STRADDLE")]["c1"]["atm_strike"] == 24050.0
+
+
+def test_validation_and_cleanup(manager, clock, sessions, monkeypatch):
+    """Bad channels are rejected; unsubscribe and disconnect drop computations"""
+    results = manager.subscribe(
+        "c1", [_channel("PCR"), "VOLUME:NIFTY:X", "PCR:NIFTY", _channel("NET_GEX")], "alice", "key", "NFO", 10
+    )
+    assert [result["status"] for result in results] == ["success", "error", "error", "success"]
+    manager.subscribe("c2", [_channel("PCR")], "alice", "key", "NFO", 10)
+    assert sessions._listeners == [manager._on_session_tick]
+
+    assert manager.unsubscribe("c1", [_channel("PCR")], "NFO", 10) == [_channel("PCR")]
+    assert manager.unsubscribe("c1", [_channel("STRADDLE")], "NFO", 10) == []
+    assert manager.has_subscriptions()
+
+    manager.remove_client("c1")
+    computation = next(iter(manager._chains.values()))
+    assert computation.subscribers["PCR"] == {"c2"}
+    manager.remove_client("c2")
+    assert not manager.has_subscriptions() and manager._client_channels == {}
+    assert sessions._listeners == []
+
+    # A failing chain read is counted and pushes nothing
+    manager.subscribe("c3", ["PCR:UNKNOWN:" + EXPIRY], "alice", "key", "NFO", 10)
+    monkeypatch.setattr(
+        computed,
+        "get_option_chain",
+        lambda *args: (False, {"status": "error", "message": "No strikes"}, 404),
+    )
+    clock.now += computed.POLL_INTERVAL
+    assert manager.compute_due() == [] and manager.metrics["errors"] == 1
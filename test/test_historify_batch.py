@@ -0,0 +1,146 @@
+"""
+Tests for multi-symbol Historify batch queries
+
+Tests:
+- get_ohlcv_batch() returns, per symbol, exactly the candles of get_ohlcv()
+- Intraday aggregation stays aligned per exchange when NSE and MCX symbols are mixed
+- Rollup intervals fall back to on-the-fly aggregation for symbols without rollups
+- The batch history service reports missing symbols and returns Arrow for columnar formats
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from database import auth_db, market_calendar_db
+from services.history_service import get_history_batch
+
+START_TS = 1735789500  # 2025-01-02 09:15 IST
+DAYS = 20
+BARS_PER_DAY = 375
+N_SYMBOLS = 10
+
+
+def _bars(seed, open_offset=0):
+    days = START_TS - open_offset + 86400 * (np.arange(DAYS) * 7 // 5)  # skip weekends
+    ts = (days[:, None] + 60 * np.arange(BARS_PER_DAY)).ravel()
+    close = 100.0 + np.cumsum(np.random.default_rng(seed).normal(0, 0.1, len(ts)))
+    return pd.DataFrame(
+        {
+            "timestamp": ts,
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.random.default_rng(seed).integers(100, 1000, len(ts)),
+            "oi": np.zeros(len(ts), dtype=np.int64),
+        }
+    )
+
+
+def _daily(seed):
+    return pd.DataFrame(
+        {
+            "timestamp": START_TS - 33300 + 86400 * np.arange(120),
+            "open": 100.0 + seed,
+            "high": 101.0 + seed,
+            "low": 99.0,
+            "close": 100.5,
+            "volume": 10**6,
+        }
+    )
+
+
+SYMBOLS = [{"symbol": f"SYM{i}", "exchange": "NSE"} for i in range(N_SYMBOLS)]
+
+
+@pytest.fixture(scope="module")
+def historify_settings():
+    return {"rollup_intervals": ("15m",)}
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    market_calendar_db.init_db()
+    auth_db.init_db()
+    for i, item in enumerate(SYMBOLS):
+        historify_db.upsert_market_data(_bars(i), item["symbol"], "NSE", "1m")
+    # MCX opens at 09:00, so its 15m candles start 15 minutes before NSE's
+    historify_db.upsert_market_data(_bars(999, open_offset=900), "CRUDEOIL", "MCX", "1m")
+    historify_db.upsert_market_data(_daily(1), "SYM0", "NSE", "D")
+    historify_db.upsert_market_data(_daily(2), "SYM1", "NSE", "D")
+    return historify_db
+
+
+@pytest.fixture(autouse=True)
+def uncached(query_cache):
+    """Compare batch results with per-symbol queries that really hit DuckDB"""
+    query_cache(0)
+
+
+MIXED = SYMBOLS[:5] + [{"symbol": "CRUDEOIL", "exchange": "MCX"}, {"symbol": "NOSYM", "exchange": "NSE"}]
+RANGE = (START_TS + 86400, START_TS + 86400 * 10)
+
+
+def _assert_matches_single(db, symbols, interval, start=None, end=None):
+    batch = db.get_ohlcv_batch(symbols, interval, start, end)
+    for item in symbols:
+        single = db.get_ohlcv(item["symbol"], item["exchange"], interval, start, end)
+        part = batch[(batch.symbol == item["symbol"]) & (batch.exchange == item["exchange"])]
+        assert len(part) == len(single), (interval, item, len(part), len(single))
+        if len(single):
+            np.testing.assert_allclose(
+                part[list(single.columns)].to_numpy(dtype=float), single.to_numpy(dtype=float)
+            )
+    return batch
+
+
+def test_batch_matches_single_queries(db):
+    """Stored, computed and daily-aggregated intervals match per-symbol get_ohlcv()"""
+    for interval in ("1m", "5m", "25m", "1h", "D", "W", "M"):
+        batch = _assert_matches_single(db, MIXED, interval, *RANGE)
+        assert list(batch.columns) == ["symbol", "exchange"] + list(
+            db.OHLCV_ARROW_SCHEMA.names
+        )
+        keys = list(zip(batch.symbol, batch.exchange, batch.timestamp))
+        assert keys == sorted(keys)
+
+
+def test_exchange_alignment(db):
+    """NSE candles start at 09:15 and MCX candles at 09:00 in the same query"""
+    batch = db.get_ohlcv_batch(MIXED, "1h", *RANGE)
+    seconds_of_day = (batch.timestamp + 19800) % 86400
+    assert set(seconds_of_day[batch.exchange == "NSE"]) >= {33300}
+    assert 32400 in set(seconds_of_day[batch.exchange == "MCX"])
+    assert 33300 not in set(seconds_of_day[batch.exchange == "MCX"])
+
+
+def test_rollup_fallback(db):
+    """Symbols whose rollup is missing are aggregated on-the-fly in the same call"""
+    with db.get_write_connection() as conn:
+        conn.execute("DELETE FROM market_data_rollup WHERE symbol IN ('SYM2', 'CRUDEOIL')")
+    _assert_matches_single(db, MIXED, "15m", *RANGE)
+    table = db.get_ohlcv_batch(MIXED, "15m", *RANGE, as_arrow=True)
+    assert table.schema == db.OHLCV_BATCH_ARROW_SCHEMA
+    assert set(table.column("symbol").to_pylist()) == {s["symbol"] for s in MIXED[:-1]}
+
+
+def test_batch_service(db):
+    """Records list missing symbols; columnar formats return the Arrow table"""
+    ok, response, status = get_history_batch(MIXED, "5m", "2025-01-02", "2025-01-10")
+    assert ok and status == 200
+    assert response["missing"] == [{"symbol": "NOSYM", "exchange": "NSE"}]
+    assert {row["symbol"] for row in response["data"]} == {s["symbol"] for s in MIXED[:-1]}
+
+    ok, response, status = get_history_batch(MIXED, "5m", "2025-01-02", "2025-01-10", output_format="arrow")
+    assert ok and isinstance(response["data"], pa.Table)
+    assert response["missing"] == [{"symbol": "NOSYM", "exchange": "NSE"}]
+
+    ok, response, status = get_history_batch(
+        [{"symbol": "NOSYM", "exchange": "NSE"}], "5m", "2025-01-02", "2025-01-10"
+    )
+    assert not ok and status == 404
+
+    ok, response, status = get_history_batch(MIXED, "5m", "2025-01-02", "2025-01-10", api_key="bad-key")
+    assert not ok and status == 403
@@ -0,0 +1,125 @@
+"""
+Tests for the incrementally maintained Historify data catalog
+
+Tests:
+- Overlapping download chunks update record_count without double-counting conflicts
+- Backfilled chunks widen first_timestamp/last_timestamp
+- Catalog ids come from the sequence and are never reused
+- rebuild_data_catalog() repairs drifted counts and drops entries without data
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+START_TS = 1735875900  # 2025-01-03 09:15 IST
+DAY = 86400
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    return historify_db
+
+
+def _bars(n, start=START_TS):
+    close = 100.0 + np.arange(n) * 0.05
+    return pd.DataFrame(
+        {
+            "timestamp": start + 60 * np.arange(n, dtype=np.int64),
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(n, 1000),
+        }
+    )
+
+
+def _catalog(db, symbol, interval="1m"):
+    for entry in db.get_data_catalog():
+        if entry["symbol"] == symbol and entry["interval"] == interval:
+            return entry
+    return None
+
+
+def _catalog_ids(db):
+    with db.get_connection() as conn:
+        return dict(conn.execute("SELECT symbol, id FROM data_catalog").fetchall())
+
+
+def _actual(db, symbol, interval="1m"):
+    with db.get_connection() as conn:
+        return conn.execute(
+            """
+            SELECT MIN(timestamp), MAX(timestamp), COUNT(*) FROM market_data
+            WHERE symbol = ? AND exchange = 'NSE' AND interval = ?
+        """,
+            [symbol, interval],
+        ).fetchone()
+
+
+def _assert_catalog_matches(db, symbol, interval="1m"):
+    entry = _catalog(db, symbol, interval)
+    first, last, count = _actual(db, symbol, interval)
+    assert entry["record_count"] == count, (entry["record_count"], count)
+    assert entry["first_timestamp"] == first
+    assert entry["last_timestamp"] == last
+
+
+def test_overlapping_chunks_counted_once(db):
+    """Re-downloaded and overlapping chunks only add their new rows"""
+    db.upsert_market_data(_bars(375), "CATOVER", "NSE", "1m")
+    db.upsert_market_data(_bars(375), "CATOVER", "NSE", "1m")  # full re-download
+    db.upsert_market_data(_bars(375, START_TS + 200 * 60), "CATOVER", "NSE", "1m")
+
+    # Duplicate timestamps inside one chunk count once
+    chunk = _bars(100, START_TS + DAY)
+    db.upsert_market_data(pd.concat([chunk, chunk]), "catover", "nse", "1m")
+
+    assert _catalog(db, "CATOVER")["record_count"] == 375 + 200 + 100
+    _assert_catalog_matches(db, "CATOVER")
+
+
+def test_backfill_widens_range(db):
+    """A chunk older than the stored data moves first_timestamp back"""
+    db.upsert_market_data(_bars(375, START_TS + 5 * DAY), "CATBACK", "NSE", "1m")
+    db.upsert_market_data(_bars(375, START_TS), "CATBACK", "NSE", "1m")
+
+    entry = _catalog(db, "CATBACK")
+    assert entry["first_timestamp"] == START_TS
+    assert entry["last_timestamp"] == START_TS + 5 * DAY + 374 * 60
+    _assert_catalog_matches(db, "CATBACK")
+
+
+def test_catalog_ids_from_sequence(db):
+    """New entries get fresh ids, also after earlier entries were deleted"""
+    db.upsert_market_data(_bars(10), "CATID0", "NSE", "1m")
+    db.upsert_market_data(_bars(10), "CATID1", "NSE", "1m")
+    first_id = _catalog_ids(db)["CATID1"]
+
+    assert db.delete_market_data("CATID1", "NSE")[0]
+    db.upsert_market_data(_bars(10), "CATID2", "NSE", "1m")
+
+    ids = _catalog_ids(db)
+    assert len(ids) == len(set(ids.values()))
+    assert ids["CATID2"] > first_id
+
+
+def test_rebuild_repairs_catalog(db):
+    """The explicit rebuild fixes drifted counts and removes entries without data"""
+    db.upsert_market_data(_bars(375), "CATFIX", "NSE", "1m")
+    db.upsert_market_data(_bars(50), "CATORPHAN", "NSE", "1m")
+
+    with db.get_write_connection() as conn:
+        conn.execute(
+            "UPDATE data_catalog SET record_count = 1, first_timestamp = 0 WHERE symbol = 'CATFIX'"
+        )
+        conn.execute("DELETE FROM market_data WHERE symbol = 'CATORPHAN'")
+
+    assert db.rebuild_data_catalog(symbol="CATFIX") == 1
+    _assert_catalog_matches(db, "CATFIX")
+    assert _catalog(db, "CATORPHAN") is not None  # outside the filter
+
+    db.rebuild_data_catalog()
+    assert _catalog(db, "CATORPHAN") is None
+    _assert_catalog_matches(db, "CATFIX")
@@ -0,0 +1,118 @@
+"""
+Tests for the Historify DuckDB connection manager
+
+Tests:
+- Reads and writes go through one open database (pooled read cursors, single writer thread)
+- Multi-statement write blocks stay atomic and a failed block leaves the writer usable
+- Concurrent chart reads and download writes run without lock errors
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database.historify_connection import get_connection_manager
+
+START_TS = 1735875900  # 2025-01-03 09:15 IST
+BARS = 375 * 5
+
+
+def _bars(n=BARS, start=START_TS, base=100.0):
+    close = base + np.cumsum(np.random.default_rng(7).normal(0, 0.5, n))
+    return pd.DataFrame(
+        {
+            "timestamp": start + 60 * np.arange(n, dtype=np.int64),
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(n, 1000),
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    """Three symbols of 1m bars and one download job"""
+    for symbol in ("CONN0", "CONN1", "CONN2"):
+        historify_db.upsert_market_data(_bars(), symbol, "NSE", "1m")
+    ok, _ = historify_db.create_download_job(
+        "conn-job", "custom", [{"symbol": "CONN0", "exchange": "NSE"}], "1m", "2025-01-03", "2025-01-09"
+    )
+    assert ok
+    return historify_db
+
+
+def _chart_request(db, symbol="CONN0", interval="5m"):
+    df = db.get_ohlcv(symbol, "NSE", interval, START_TS, START_TS + 60 * BARS)
+    assert not df.empty
+    return df
+
+
+def test_reads_and_writes_share_one_database(db):
+    """Catalog, watchlist and job tables round-trip through the manager"""
+    assert db.add_to_watchlist("CONN0", "NSE")[0]
+    assert any(w["symbol"] == "CONN0" for w in db.get_watchlist())
+    assert db.remove_from_watchlist("CONN0", "NSE")[0]
+    assert len(db.get_job_items("conn-job")) == 1
+
+    catalog = {(c["symbol"], c["interval"]): c for c in db.get_data_catalog()}
+    assert catalog[("CONN0", "1m")]["record_count"] == BARS
+
+    for _ in range(20):
+        _chart_request(db)
+    manager = get_connection_manager(db.get_db_path())
+    assert manager.stats["cursors_opened"] <= manager.pool_size
+
+
+def test_failed_write_block_rolls_back(db):
+    """An exception inside a write transaction rolls it back and the writer keeps working"""
+    with pytest.raises(RuntimeError):
+        with db.get_write_connection() as conn:
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute("DELETE FROM market_data WHERE symbol = 'CONN1'")
+            # Nested block in the same thread shares the session
+            with db.get_write_connection() as inner:
+                assert inner is conn
+            raise RuntimeError("abort")
+
+    with db.get_connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM market_data WHERE symbol = 'CONN1'").fetchone()[0]
+    assert count == BARS
+    assert db.add_to_watchlist("CONN1", "NSE")[0]
+
+
+def test_concurrent_reads_and_writes(db):
+    """Chart reads keep working while download workers upsert other symbols"""
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(25):
+                _chart_request(db, "CONN1")
+        except Exception as e:
+            errors.append(e)
+
+    item_id = db.get_job_items("conn-job")[0]["id"]
+
+    def writer(i):
+        try:
+            for day in range(5):
+                db.upsert_market_data(_bars(375, START_TS + day * 86400), f"WRITER{i}", "NSE", "1m")
+                assert db.update_job_item_status(item_id, "completed", 375)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors, errors
+    catalog = {(c["symbol"], c["interval"]): c for c in db.get_data_catalog()}
+    assert catalog[("WRITER0", "1m")]["record_count"] == 375 * 5
+    assert catalog[("WRITER1", "1m")]["record_count"] == 375 * 5
@@ -0,0 +1,228 @@
+"""
+Tests for streaming Historify exports
+
+Tests:
+- COPY-based CSV/TXT/Parquet exports contain the same rows as a pandas export
+- CSV exports can be gzip/zstd compressed
+- ZIP exports write one CSV per symbol/interval with per-exchange candle alignment
+- Background export jobs report progress and stream the ZIP archive on download
+- Export files are removed after download and on failure
+"""
+
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+import services.historify_export_service as export_service
+from database import market_calendar_db
+
+START_TS = 1704167100  # 2024-01-02 09:15 IST
+DAYS = 20
+BARS_PER_DAY = 375
+N_SYMBOLS = 10
+
+
+def _bars(seed, open_offset=0):
+    days = START_TS - open_offset + 86400 * (np.arange(DAYS) * 7 // 5)  # skip weekends
+    ts = (days[:, None] + 60 * np.arange(BARS_PER_DAY)).ravel()
+    close = 100.0 + np.cumsum(np.random.default_rng(seed).normal(0, 0.1, len(ts)))
+    return pd.DataFrame(
+        {
+            "timestamp": ts,
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(len(ts), 100),
+            "oi": np.zeros(len(ts), dtype=np.int64),
+        }
+    )
+
+
+SYMBOLS = [{"symbol": f"SYM{i}", "exchange": "NSE"} for i in range(N_SYMBOLS)]
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    market_calendar_db.init_db()
+    for i, item in enumerate(SYMBOLS):
+        historify_db.upsert_market_data(_bars(i), item["symbol"], "NSE", "1m")
+    historify_db.upsert_market_data(_bars(99, open_offset=900), "M&M", "MCX", "1m")
+    historify_db.upsert_market_data(
+        pd.DataFrame(
+            {
+                "timestamp": START_TS - 33300 + 86400 * np.arange(90),
+                "open": 100.0,
+                "high": 101.0,
+                "low": 99.0,
+                "close": 100.5,
+                "volume": 1000,
+            }
+        ),
+        "SYM0",
+        "NSE",
+        "D",
+    )
+    return historify_db
+
+
+MIXED = SYMBOLS[:3] + [{"symbol": "M&M", "exchange": "MCX"}]
+
+
+def _pandas_export(db, symbols, interval, delimiter=","):
+    """Reference export through fetchdf() and DataFrame.to_csv()"""
+    source, params = db._export_source(symbols, interval)
+    query = f"""
+        SELECT
+            symbol, exchange, interval,
+            strftime(to_timestamp(timestamp), '%Y-%m-%d') as date,
+            strftime(to_timestamp(timestamp), '%H:%M:%S') as time,
+            open, high, low, close, volume, oi
+        {source}
+        ORDER BY symbol, exchange, interval, timestamp
+    """
+    with db.get_connection() as conn:
+        df = conn.execute(query, params).fetchdf()
+    return df.to_csv(index=False, sep=delimiter)
+
+
+def _wait_for(job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, response, _ = export_service.get_export_job(job_id)
+        if response["data"]["status"] != "running":
+            return response["data"]
+        time.sleep(0.05)
+    raise AssertionError(f"Export job {job_id} did not finish")
+
+
+def test_copy_exports_match_pandas(db, tmp_path):
+    """CSV and TXT files written by COPY equal the pandas output"""
+    path = str(tmp_path / "export.csv")
+    ok, _, count = db.export_bulk_csv(path, MIXED, "1m")
+    assert ok and count == 4 * DAYS * BARS_PER_DAY
+    with open(path) as f:
+        assert f.read() == _pandas_export(db, MIXED, "1m")
+
+    ok, _, _ = db.export_to_txt(path, MIXED[:2], "1m", delimiter="|")
+    with open(path) as f:
+        assert f.read() == _pandas_export(db, MIXED[:2], "1m", "|")
+
+    parquet_path = str(tmp_path / "export.parquet")
+    ok, _, count = db.export_to_parquet(parquet_path, MIXED, "1m")
+    assert ok and len(pd.read_parquet(parquet_path)) == count
+
+
+def test_compressed_csv(db, tmp_path):
+    """gzip and zstd CSV exports decompress to the plain export"""
+    plain_path = str(tmp_path / "plain.csv")
+    db.export_bulk_csv(plain_path, MIXED[:1], "1m")
+
+    def read(path):
+        # DuckDB reads both codecs without extra Python packages
+        return duckdb.sql(f"SELECT * FROM read_csv('{path}', all_varchar = true)").fetchall()
+
+    for compression, suffix in (("gzip", ".gz"), ("zstd", ".zst")):
+        path = str(tmp_path / f"export.csv{suffix}")
+        ok, _, _ = db.export_bulk_csv(path, MIXED[:1], "1m", compression=compression)
+        assert ok
+        assert os.path.getsize(path) < os.path.getsize(plain_path) / 3
+        assert read(path) == read(plain_path)
+
+
+def test_zip_export_files(db, tmp_path):
+    """One CSV per symbol and interval, aligned per exchange, missing sources skipped"""
+    path = str(tmp_path / "export.zip")
+    ok, message, count = db.export_to_zip(path, MIXED, ["1m", "15m", "W"])
+    assert ok
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        assert len(names) == len(set(names))
+        assert names[:3] == ["SYM0_NSE_1m.csv", "SYM0_NSE_15m.csv", "SYM0_NSE_W.csv"]
+        assert "M_M_MCX_15m.csv" in names
+        assert "SYM1_NSE_W.csv" not in names  # no D data
+
+        nse = pd.read_csv(zf.open("SYM0_NSE_15m.csv"))
+        mcx = pd.read_csv(zf.open("M_M_MCX_15m.csv"))
+        assert nse["time"].iloc[0] == "09:15:00" and mcx["time"].iloc[0] == "09:00:00"
+        assert len(nse) == DAYS * BARS_PER_DAY // 15
+        assert nse["volume"].iloc[0] == 1500
+
+        expected = db.get_ohlcv("SYM0", "NSE", "15m")
+        np.testing.assert_allclose(nse["close"].to_numpy(), expected["close"].to_numpy())
+        total_rows = sum(len(pd.read_csv(zf.open(name))) for name in names)
+    assert total_rows == count
+    assert "3 computed interval(s) skipped" in message
+
+    ok, _, _ = db.export_to_zip(path, MIXED, ["5m", "1m"], split_by="none")
+    with zipfile.ZipFile(path) as zf:
+        assert zf.namelist() == ["all_symbols_5m.csv", "all_symbols_1m.csv"]
+        combined = pd.read_csv(zf.open("all_symbols_5m.csv"))
+        assert set(combined["symbol"]) == {"SYM0", "SYM1", "SYM2", "M&M"}
+        assert set(combined["interval"]) == {"5m"}
+
+
+def test_export_job_streams_zip(db, monkeypatch):
+    """Jobs report progress per COPY chunk; the download is a valid streamed ZIP"""
+    progress = []
+    monkeypatch.setattr(
+        export_service, "_emit_export_progress", lambda job_id, current, total: progress.append((current, total))
+    )
+    monkeypatch.setattr(db, "EXPORT_CHUNK_SYMBOLS", 5)
+    ok, response, _ = export_service.start_export_job(
+        {"format": "csv", "symbols": SYMBOLS, "intervals": ["1m", "5m"]}
+    )
+    assert ok
+    job = _wait_for(response["data"]["job_id"])
+
+    assert job["status"] == "completed" and job["format"] == "zip"
+    chunks = N_SYMBOLS * 2 // 5
+    assert progress == [(i, chunks) for i in range(1, chunks + 1)]
+
+    ok, download, _ = export_service.open_export_download(job["job_id"])
+    assert ok and download["mime_type"] == "application/zip"
+    chunks = list(download["stream"])
+    download["cleanup"]()
+    assert len(chunks) > 1
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert len(zf.namelist()) == N_SYMBOLS * 2
+        rows = sum(len(pd.read_csv(zf.open(name))) for name in zf.namelist())
+    assert rows == job["record_count"]
+
+    # Downloaded once, then gone
+    _, response, status = export_service.open_export_download(job["job_id"])
+    assert status == 404
+    assert not [d for d in os.listdir(tempfile.gettempdir()) if d.startswith(f"historify_export_{job['job_id']}_")]
+
+
+def test_export_job_single_file_and_failure(db):
+    """Non-ZIP jobs stream the written file; empty exports fail and leave no files"""
+    ok, response, _ = export_service.start_export_job(
+        {"format": "csv", "symbols": MIXED[:1], "intervals": ["1m"], "compression": "gzip"}
+    )
+    job = _wait_for(response["data"]["job_id"])
+    assert job["status"] == "completed" and job["filename"].endswith(".csv.gz")
+    ok, download, _ = export_service.open_export_download(job["job_id"])
+    body = b"".join(download["stream"])
+    download["cleanup"]()
+    assert len(pd.read_csv(io.BytesIO(body), compression="gzip")) == DAYS * BARS_PER_DAY
+
+    ok, response, _ = export_service.start_export_job(
+        {"format": "parquet", "symbols": [{"symbol": "NOSYM", "exchange": "NSE"}]}
+    )
+    job = _wait_for(response["data"]["job_id"])
+    assert job["status"] == "failed"
+    _, _, status = export_service.open_export_download(job["job_id"])
+    assert status == 409
+
+    ok, response, status = export_service.start_export_job({"format": "xlsx"})
+    assert not ok and status == 400
@@ -0,0 +1,232 @@
+"""
+Tests for the gap-aware Historify download planner
+
+Tests:
+- Trading sessions follow the market calendar (weekends, exchange holidays, MCX evening
+  sessions, 24/7 crypto, index exchanges on their parent calendar)
+- Missing sessions in the middle of stored data and after it become exact download ranges
+- A session downloaded before it closed is planned again
+- Incremental jobs download only the planned ranges and remember sessions without data
+- Verify mode reports gaps without downloading
+- A nightly watchlist refresh plans only the new session and real gaps
+"""
+
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import services.historify_service as historify_service
+from database import market_calendar_db
+from services.historify_planner_service import (
+    _ist_midnight,
+    get_trading_sessions,
+    plan_downloads,
+    verify_gaps,
+)
+
+# Evening of 2025-03-31, after every session of the test period has closed
+NOW = _ist_midnight(date(2025, 3, 31)) + 23 * 3600 + 59 * 60
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    market_calendar_db.init_db()
+    return historify_db
+
+
+def _trading_days(start, end, exchange="NSE"):
+    return [s["date"] for s in get_trading_sessions(exchange, start, end)]
+
+
+def _day_bars(day, n=375):
+    start = _ist_midnight(day) + 33300  # 09:15 IST
+    close = 100.0 + np.arange(n) * 0.01
+    return pd.DataFrame(
+        {
+            "timestamp": start + 60 * np.arange(n, dtype=np.int64),
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(n, 1000),
+        }
+    )
+
+
+def _store_days(db, symbol, days):
+    db.upsert_market_data(
+        pd.concat([_day_bars(d) for d in days], ignore_index=True), symbol, "NSE", "1m"
+    )
+
+
+class FakeBroker:
+    """Stands in for download_data: stores 1m bars for every trading day of the range"""
+
+    def __init__(self, db, listed_from=None):
+        self.db = db
+        self.listed_from = listed_from or {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __call__(self, symbol, exchange, interval, start_date, end_date, api_key):
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        with self.lock:
+            self.requests.append((symbol, start_date, end_date))
+        first = self.listed_from.get(symbol, start)
+        days = [d for d in _trading_days(max(start, first), end) if d <= date(2025, 3, 31)]
+        if days:
+            _store_days(self.db, symbol, days)
+        return True, {"status": "success", "records": 375 * len(days)}, 200
+
+
+@pytest.fixture
+def run_incremental_job(db, monkeypatch):
+    """Create an incremental job and process it synchronously with the given broker"""
+
+    def run(job_id, symbols, broker, start_date, end_date):
+        ok, _ = db.create_download_job(
+            job_id,
+            "custom",
+            [{"symbol": s, "exchange": "NSE"} for s in symbols],
+            "1m",
+            start_date,
+            end_date,
+            config={"incremental": True},
+        )
+        assert ok
+        with historify_service._job_state_lock:
+            historify_service._running_jobs[job_id] = True
+            historify_service._paused_jobs[job_id] = threading.Event()
+            historify_service._paused_jobs[job_id].set()
+
+        monkeypatch.setattr(historify_service, "download_data", broker)
+        historify_service._process_download_job(job_id, "test-key")
+        return db.get_download_job(job_id)
+
+    return run
+
+
+def test_trading_sessions_follow_calendar(db):
+    """Weekends and exchange holidays are excluded; special timings are used where open"""
+    start, end = date(2025, 2, 24), date(2025, 3, 2)
+    nse = _trading_days(start, end)
+    assert date(2025, 2, 26) not in nse  # Maha Shivaratri
+    assert date(2025, 3, 1) not in nse  # Saturday
+    assert nse == [date(2025, 2, 24), date(2025, 2, 25), date(2025, 2, 27), date(2025, 2, 28)]
+
+    assert _trading_days(start, end, "NSE_INDEX") == nse
+    assert date(2025, 2, 26) in _trading_days(start, end, "MCX")  # evening session
+    assert len(_trading_days(start, end, "CRYPTO")) == 7
+
+    session = get_trading_sessions("NSE", date(2025, 2, 24), date(2025, 2, 24))[0]
+    assert session["start_ts"] == _ist_midnight(date(2025, 2, 24)) + 33300
+    assert session["end_ts"] == _ist_midnight(date(2025, 2, 24)) + 55800
+
+
+def test_plan_finds_middle_and_trailing_gaps(db):
+    """Only sessions missing from storage are planned, merged across holidays and weekends"""
+    days = _trading_days(date(2025, 2, 17), date(2025, 3, 7))
+    gap = {date(2025, 2, 25), date(2025, 2, 27)}  # 26th is a holiday between them
+    _store_days(db, "GAPSYM", [d for d in days if d not in gap and d <= date(2025, 3, 5)])
+
+    plan = plan_downloads("GAPSYM", "NSE", "1m", "2025-02-17", "2025-03-07", now=NOW)
+    assert plan["missing_sessions"] == ["2025-02-25", "2025-02-27", "2025-03-06", "2025-03-07"]
+    assert plan["ranges"] == [["2025-02-25", "2025-02-27"], ["2025-03-06", "2025-03-07"]]
+    assert plan["expected_sessions"] == len(days)
+
+    empty = plan_downloads("NODATA", "NSE", "1m", "2025-02-17", "2025-03-07", now=NOW)
+    assert empty["ranges"] == [["2025-02-17", "2025-03-07"]]
+
+    # Sessions that have not started yet are not planned
+    early = plan_downloads(
+        "NODATA", "NSE", "1m", "2025-02-17", "2025-03-07", now=_ist_midnight(date(2025, 3, 6))
+    )
+    assert early["ranges"] == [["2025-02-17", "2025-03-05"]]
+
+
+def test_session_downloaded_before_close_is_replanned(db):
+    """The latest stored session is planned again if it was downloaded mid-session"""
+    day = date(2025, 3, 10)
+    _store_days(db, "LIVESYM", [day])
+    plan = plan_downloads("LIVESYM", "NSE", "1m", "2025-03-10", "2025-03-10", now=NOW)
+    assert plan["ranges"] == []
+
+    mid_session = _ist_midnight(day) + 12 * 3600
+    with db.get_write_connection() as conn:
+        conn.execute(
+            "UPDATE data_catalog SET last_download_at = CAST(to_timestamp(?) AS TIMESTAMP) "
+            "WHERE symbol = 'LIVESYM'",
+            [mid_session],
+        )
+    assert db.get_data_range("LIVESYM", "NSE", "1m")["last_download_ts"] == mid_session
+    plan = plan_downloads("LIVESYM", "NSE", "1m", "2025-03-10", "2025-03-10", now=NOW)
+    assert plan["ranges"] == [["2025-03-10", "2025-03-10"]]
+
+
+def test_incremental_job_downloads_only_missing_sessions(db, run_incremental_job):
+    """Jobs request the planned ranges, remember sessions without data and then skip"""
+    days = _trading_days(date(2025, 3, 3), date(2025, 3, 21))
+    _store_days(db, "JOBSYM", [d for d in days if d != date(2025, 3, 12)])
+
+    broker = FakeBroker(db, listed_from={"NEWSYM": date(2025, 3, 17)})
+    job = run_incremental_job("gap-job", ["JOBSYM", "NEWSYM"], broker, "2025-03-03", "2025-03-21")
+    assert job["status"] == "completed"
+    assert sorted(broker.requests) == [
+        ("JOBSYM", "2025-03-12", "2025-03-12"),
+        ("NEWSYM", "2025-03-03", "2025-03-21"),
+    ]
+
+    # NEWSYM sessions before listing were recorded as empty; nothing left to download
+    plan = plan_downloads("NEWSYM", "NSE", "1m", "2025-03-03", "2025-03-21", now=NOW)
+    assert plan["ranges"] == [] and plan["empty_sessions"] == 9  # 2025-03-14 is Holi
+
+    broker = FakeBroker(db, listed_from={"NEWSYM": date(2025, 3, 17)})
+    run_incremental_job("gap-job-2", ["JOBSYM", "NEWSYM"], broker, "2025-03-03", "2025-03-21")
+    assert broker.requests == []
+    statuses = {item["status"] for item in db.get_job_items("gap-job-2")}
+    assert statuses == {"skipped"}
+
+    # Deleting the symbol forgets its empty sessions
+    db.delete_market_data("NEWSYM", "NSE")
+    assert not db.get_empty_sessions(
+        "NEWSYM", "NSE", "1m", date(2025, 3, 3), date(2025, 3, 21)
+    )
+
+
+def test_verify_mode_reports_without_downloading(db):
+    """verify_gaps() lists missing sessions and the requests a download would make"""
+    ok, response, status = verify_gaps(
+        [{"symbol": "GAPSYM", "exchange": "NSE"}, {"symbol": "JOBSYM", "exchange": "NSE"}],
+        "1m",
+        "2025-03-03",
+        "2025-03-21",
+    )
+    assert ok and status == 200
+    assert response["summary"]["symbols_checked"] == 2
+    assert response["summary"]["symbols_with_gaps"] == 1
+    assert response["data"][0]["symbol"] == "GAPSYM"
+    assert response["summary"]["download_requests"] == len(response["data"][0]["ranges"])
+
+    ok, _, status = verify_gaps(None, "1m", None, None)
+    assert not ok and status == 400
+
+
+def test_nightly_refresh_plans_only_new_sessions(db, n_symbols=20):
+    """A watchlist refresh after one new session requests that session plus the real gaps"""
+    start_date, end_date = "2025-01-01", "2025-03-28"
+    history = _trading_days(date(2025, 1, 1), date(2025, 3, 27))
+    symbols = [f"WL{i}" for i in range(n_symbols)]
+    for i, symbol in enumerate(symbols):
+        # A fifth of the watchlist listed mid-period; one symbol with a missing mid-period session
+        first = history[len(history) // 2] if i % 5 == 0 else history[0]
+        stored = [d for d in history if d >= first and not (i == 1 and d == history[10])]
+        _store_days(db, symbol, stored)
+        db.mark_empty_sessions(symbol, "NSE", "1m", [d for d in history if d < first])
+
+    plans = [plan_downloads(s, "NSE", "1m", start_date, end_date, now=NOW) for s in symbols]
+    assert sum(len(p["missing_sessions"]) for p in plans) == n_symbols + 1
+    assert sum(len(p["ranges"]) for p in plans) == n_symbols + 1
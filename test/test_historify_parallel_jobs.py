@@ -0,0 +1,188 @@
+"""
+Tests for parallel Historify download jobs
+
+Tests:
+- The history rate governor spaces requests per broker and keeps brokers independent
+- Job items are downloaded concurrently while the broker rate limit is respected
+- Job counters, item statuses and progress events stay correct
+- Pausing stops new symbols from starting and resuming finishes the job
+- Cancelling stops the job after in-flight symbols finish
+"""
+
+import threading
+import time
+
+import pytest
+
+import services.historify_service as historify_service
+from utils.history_rate_governor import HistoryRateGovernor, HistoryRateLimit, _parse_overrides
+
+FAKE_RATE = 20  # requests per second allowed for the fake broker
+FAKE_LATENCY = 0.15  # seconds per broker round trip
+
+
+class FakeBroker:
+    """Stands in for download_data: takes a governor slot, then simulates the broker call"""
+
+    def __init__(self, governor, fail_symbols=()):
+        self.governor = governor
+        self.fail_symbols = set(fail_symbols)
+        self.request_times = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, symbol, exchange, interval, start_date, end_date, api_key):
+        self.governor.acquire("fakebroker")
+        with self.lock:
+            self.request_times.append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(FAKE_LATENCY)
+        with self.lock:
+            self.active -= 1
+        if symbol in self.fail_symbols:
+            return False, {"status": "error", "message": "No data"}, 404
+        return True, {"status": "success", "records": 375}, 200
+
+
+def _governor():
+    return HistoryRateGovernor(overrides={"fakebroker": HistoryRateLimit(rate=FAKE_RATE)})
+
+
+@pytest.fixture
+def run_job(historify_db, monkeypatch):
+    """Create a job and process it synchronously with a fake broker; returns the progress events"""
+
+    def run(job_id, n_symbols, broker, concurrency, before_start=None):
+        symbols = [{"symbol": f"SYM{i}", "exchange": "NSE"} for i in range(n_symbols)]
+        ok, _ = historify_db.create_download_job(job_id, "custom", symbols, "1m", "2025-01-01", "2025-01-31")
+        assert ok
+
+        with historify_service._job_state_lock:
+            historify_service._running_jobs[job_id] = True
+            historify_service._paused_jobs[job_id] = threading.Event()
+            historify_service._paused_jobs[job_id].set()
+
+        progress = []
+        monkeypatch.setattr(historify_service, "download_data", broker)
+        monkeypatch.setattr(
+            historify_service, "_emit_progress", lambda job, current, total, symbol: progress.append(current)
+        )
+        monkeypatch.setattr(historify_service, "HISTORIFY_JOB_CONCURRENCY", concurrency)
+        if before_start:
+            before_start()
+        historify_service._process_download_job(job_id, "test-key")
+        return progress
+
+    return run
+
+
+def test_governor_spaces_requests_per_broker():
+    """Requests to one broker are spaced by 1/rate; other brokers are not delayed"""
+    governor = _governor()
+    times = []
+
+    def worker():
+        governor.acquire("fakebroker")
+        times.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    times.sort()
+    span = times[-1] - times[0]
+    assert span >= 9 / FAKE_RATE * 0.9, span
+
+    start = time.monotonic()
+    governor.acquire("otherbroker")
+    assert time.monotonic() - start < 0.05
+    assert governor.stats["acquired"] == 11
+
+
+def test_rate_limit_overrides():
+    """HISTORY_RATE_LIMITS entries parse into limits; bad entries are ignored"""
+    overrides = _parse_overrides("dhan:10, fyers:5:2, broken, angel:-1")
+    assert overrides == {
+        "dhan": HistoryRateLimit(rate=10),
+        "fyers": HistoryRateLimit(rate=5, burst=2),
+    }
+    governor = HistoryRateGovernor(overrides=overrides, default_rate=7)
+    assert governor.get_limit("DHAN").rate == 10
+    assert governor.get_limit("zerodha").rate == 3
+    assert governor.get_limit("unknown").rate == 7
+    assert governor.is_self_governed("zerodha")
+
+
+def test_parallel_job_respects_rate_limit(historify_db, run_job):
+    """Items run concurrently, counters are exact and the broker rate is never exceeded"""
+    broker = FakeBroker(_governor(), fail_symbols={"SYM3", "SYM7"})
+    progress = run_job("par-job", 20, broker, concurrency=4)
+
+    job = historify_db.get_download_job("par-job")
+    assert job["status"] == "completed_with_errors"
+    assert job["completed_symbols"] == 18
+    assert job["failed_symbols"] == 2
+
+    statuses = [item["status"] for item in historify_db.get_job_items("par-job")]
+    assert statuses.count("success") == 18 and statuses.count("error") == 2
+    assert progress == list(range(1, 21))
+
+    assert broker.max_active > 1
+    times = sorted(broker.request_times)
+    for earlier, later in zip(times, times[1:]):
+        assert later - earlier >= (1 / FAKE_RATE) * 0.8, later - earlier
+    assert "par-job" not in historify_service._running_jobs
+
+
+def test_pause_and_resume(historify_db, run_job):
+    """A paused job starts no new symbols until resumed, then completes"""
+    broker = FakeBroker(_governor())
+    pause_state = {}
+
+    def pause_soon():
+        def pause():
+            time.sleep(FAKE_LATENCY)
+            historify_service._paused_jobs["pause-job"].clear()
+            time.sleep(0.5)  # in-flight items drain while paused
+            pause_state["requests"] = len(broker.request_times)
+            time.sleep(1.2)
+            pause_state["after_wait"] = len(broker.request_times)
+            historify_service._paused_jobs["pause-job"].set()
+
+        threading.Thread(target=pause, daemon=True).start()
+
+    run_job("pause-job", 12, broker, concurrency=2, before_start=pause_soon)
+
+    assert pause_state["requests"] < 12
+    assert pause_state["after_wait"] == pause_state["requests"]
+    job = historify_db.get_download_job("pause-job")
+    assert job["status"] == "completed"
+    assert job["completed_symbols"] == 12
+
+
+def test_cancel_waits_for_in_flight_items(historify_db, run_job):
+    """Cancelling stops new symbols; items already downloading finish and are recorded"""
+    broker = FakeBroker(_governor())
+
+    def cancel_soon():
+        def cancel():
+            time.sleep(FAKE_LATENCY * 2)
+            with historify_service._job_state_lock:
+                historify_service._running_jobs["cancel-job"] = False
+
+        threading.Thread(target=cancel, daemon=True).start()
+
+    run_job("cancel-job", 30, broker, concurrency=3, before_start=cancel_soon)
+
+    job = historify_db.get_download_job("cancel-job")
+    assert job["status"] == "cancelled"
+    items = historify_db.get_job_items("cancel-job")
+    statuses = [item["status"] for item in items]
+    assert "downloading" not in statuses
+    assert 0 < statuses.count("success") < 30
+    assert statuses.count("success") == len(broker.request_times)
+    assert job["completed_symbols"] == statuses.count("success")
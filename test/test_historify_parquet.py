@@ -0,0 +1,175 @@
+"""
+Tests for the Historify Parquet storage backend
+
+Tests:
+- Upserts write hive-partitioned files per exchange/symbol/interval/year, read back through market_data
+- Re-downloaded candles replace stored ones and the catalog counts them once
+- A catalog transaction failing after the files were replaced leaves a correct record_count on retry
+- Deleting a symbol removes its partition directories
+- The files are readable directly with read_parquet (external backtesters)
+- Concurrent upserts of different symbols keep every partition intact
+- Switching backends moves stored candles between the table and the Parquet store
+"""
+
+import os
+import threading
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from database import historify_parquet
+
+YEAR_END = 1735611300  # 2024-12-31 07:45 IST
+
+
+@pytest.fixture(scope="module")
+def historify_settings():
+    return {"backend": "parquet"}
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    return historify_db
+
+
+def _bars(n, start=YEAR_END, price=100.0):
+    close = price + np.arange(n) * 0.01
+    return pd.DataFrame(
+        {
+            "timestamp": start + 60 * np.arange(n, dtype=np.int64),
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(n, 1000),
+        }
+    )
+
+
+def _catalog(db, symbol):
+    for entry in db.get_data_catalog():
+        if entry["symbol"] == symbol:
+            return entry
+    return None
+
+
+def _partition(symbol, year, exchange="NSE", interval="1m"):
+    return os.path.join(
+        historify_parquet.get_parquet_root(), f"exchange={exchange}", f"symbol={symbol}", f"interval={interval}", f"year={year}", "data.parquet"
+    )
+
+
+def test_upsert_writes_year_partitions(db):
+    """A batch across the year end lands in two partitions and reads back in order"""
+    # 2024-12-31 07:45 IST + 1000 minutes crosses midnight IST
+    db.upsert_market_data(_bars(1000), "PQSBIN", "NSE", "1m")
+
+    assert os.path.exists(_partition("PQSBIN", 2024))
+    assert os.path.exists(_partition("PQSBIN", 2025))
+
+    df = db.get_ohlcv("PQSBIN", "NSE", "1m")
+    assert len(df) == 1000
+    assert df["timestamp"].is_monotonic_increasing
+    assert _catalog(db, "PQSBIN")["record_count"] == 1000
+
+
+def test_redownload_replaces_candles(db):
+    """Overlapping candles are replaced, not duplicated"""
+    db.upsert_market_data(_bars(500, YEAR_END + 800 * 60, price=200.0), "PQSBIN", "NSE", "1m")
+
+    df = db.get_ohlcv("PQSBIN", "NSE", "1m")
+    assert len(df) == 1300
+    assert df["timestamp"].is_unique
+    assert df.iloc[800]["close"] == 200.0
+    assert _catalog(db, "PQSBIN")["record_count"] == 1300
+
+    # Aggregated intervals and exports go through the market_data view
+    assert not db.get_ohlcv("PQSBIN", "NSE", "5m").empty
+    assert len(db.export_to_dataframe("PQSBIN", "NSE", "1m")) == 1300
+
+
+def test_failed_catalog_update_keeps_count(db, monkeypatch):
+    """Files replaced before a failed transaction are counted once the catalog is repaired"""
+    db.upsert_market_data(_bars(200), "PQRETRY", "NSE", "1m")
+    redownload = _bars(100, YEAR_END + 150 * 60, price=300.0)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("catalog transaction failed")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(db, "_refresh_rollups", fail)
+        with pytest.raises(RuntimeError):
+            db.upsert_market_data(redownload, "PQRETRY", "NSE", "1m")
+
+    # The new files are in place and the catalog already counts them
+    assert len(db.get_ohlcv("PQRETRY", "NSE", "1m")) == 250
+    assert _catalog(db, "PQRETRY")["record_count"] == 250
+
+    db.upsert_market_data(redownload, "PQRETRY", "NSE", "1m")
+    assert _catalog(db, "PQRETRY")["record_count"] == 250
+
+
+def test_external_reader(db):
+    """Backtesters can read the store without OpenAlgo"""
+    external = duckdb.sql(
+        f"""
+        SELECT COUNT(*) FROM read_parquet('{historify_parquet.get_parquet_root()}/**/*.parquet', hive_partitioning = true)
+        WHERE symbol = 'PQSBIN' AND interval = '1m'
+    """
+    ).fetchone()[0]
+    assert external == 1300
+
+
+def test_delete_is_a_file_operation(db):
+    db.upsert_market_data(_bars(100), "PQGONE", "NSE", "1m")
+    db.upsert_market_data(_bars(10, YEAR_END - 7 * 3600 - 2700), "PQGONE", "NSE", "D")
+
+    assert db.delete_market_data("PQGONE", "NSE", "1m")[0]
+    assert not os.path.exists(os.path.dirname(_partition("PQGONE", 2024)))
+    assert db.get_ohlcv("PQGONE", "NSE", "1m").empty
+    assert not db.get_ohlcv("PQGONE", "NSE", "D").empty
+
+    deleted, skipped, failed = db.bulk_delete_market_data([{"symbol": "PQGONE", "exchange": "NSE"}])
+    assert (deleted, failed) == (1, [])
+    assert not os.path.exists(os.path.join(historify_parquet.get_parquet_root(), "exchange=NSE", "symbol=PQGONE"))
+    assert _catalog(db, "PQGONE") is None
+
+
+def test_concurrent_symbol_writes(db, symbols=6, chunks=5):
+    """Download workers write different symbols in parallel"""
+    errors = []
+
+    def worker(i):
+        try:
+            for c in range(chunks):
+                db.upsert_market_data(_bars(375, YEAR_END + c * 86400), f"PQPAR{i}", "NSE", "1m")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(symbols)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors, errors
+    for i in range(symbols):
+        assert len(db.get_ohlcv(f"PQPAR{i}", "NSE", "1m")) == 375 * chunks
+        assert _catalog(db, f"PQPAR{i}")["record_count"] == 375 * chunks
+
+
+def test_switching_backends_moves_data(db, monkeypatch):
+    """Parquet -> table imports the files; table -> Parquet writes partitions and drops the table"""
+    with monkeypatch.context() as mp:
+        mp.setattr(historify_parquet, "STORAGE_BACKEND", "duckdb")
+        db.init_database()
+        assert len(db.get_ohlcv("PQSBIN", "NSE", "1m")) == 1300
+        db.upsert_market_data(_bars(50), "PQTABLE", "NSE", "1m")
+
+    db.init_database()
+    assert os.path.exists(_partition("PQTABLE", 2024))
+    assert len(db.get_ohlcv("PQTABLE", "NSE", "1m")) == 50
+    assert len(db.get_ohlcv("PQSBIN", "NSE", "1m")) == 1300
+    assert db.get_database_stats()["storage_backend"] == "parquet"
@@ -0,0 +1,209 @@
+"""
+Tests for the Historify query result cache
+
+Tests:
+- Repeated get_ohlcv() calls are served from the cache and counted in get_database_stats()
+- Upserts drop only the entries of the written symbol, source interval and time range
+- Rollup entries depend on whole candles at the range edges
+- Deletes and rollup rebuilds drop the affected entries
+- Results of queries that raced a write are not stored
+- Entries are evicted least recently used once the byte budget is exceeded
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database import market_calendar_db
+from database.historify_cache import HistorifyQueryCache
+
+START_TS = 1735789500  # 2025-01-02 09:15 IST
+DAYS = 40
+BARS_PER_DAY = 375
+DAY_START = START_TS - 33300  # 2025-01-02 00:00 IST
+
+
+def _bars(seed, days=DAYS, first_day=0):
+    day_starts = START_TS + 86400 * ((np.arange(days) + first_day) * 7 // 5)  # skip weekends
+    ts = (day_starts[:, None] + 60 * np.arange(BARS_PER_DAY)).ravel()
+    close = 100.0 + np.cumsum(np.random.default_rng(seed).normal(0, 0.1, len(ts)))
+    return pd.DataFrame(
+        {
+            "timestamp": ts,
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(len(ts), 100),
+            "oi": np.zeros(len(ts), dtype=np.int64),
+        }
+    )
+
+
+def _daily(close, days=60):
+    return pd.DataFrame(
+        {
+            "timestamp": DAY_START + 86400 * np.arange(days),
+            "open": 100.0,
+            "high": 101.0,
+            "low": 99.0,
+            "close": close,
+            "volume": 1000,
+        }
+    )
+
+
+RANGE = (START_TS + 86400 * 14, START_TS + 86400 * 21)
+
+
+@pytest.fixture(scope="module")
+def historify_settings():
+    return {"rollup_intervals": ("W",)}
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    market_calendar_db.init_db()
+    for seed, symbol in enumerate(("CACHEA", "CACHEB")):
+        historify_db.upsert_market_data(_bars(seed), symbol, "NSE", "1m")
+        historify_db.upsert_market_data(_daily(100.5), symbol, "NSE", "D")
+    return historify_db
+
+
+@pytest.fixture
+def cache(db, query_cache):
+    return query_cache()
+
+
+def _stats(db):
+    return db.get_database_stats()["query_cache"]
+
+
+def _cached(cache, symbol, interval, start=None, end=None, as_arrow=False):
+    key = (symbol, "NSE", interval, start, end, as_arrow)
+    return key in cache._entries
+
+
+def test_repeated_query_hits_cache(db, cache):
+    """Same request twice: one miss, one hit, identical candles"""
+    before = _stats(db)
+    first = db.get_ohlcv("cachea", "nse", "15m", *RANGE)
+    second = db.get_ohlcv("CACHEA", "NSE", "15m", *RANGE)
+    after = _stats(db)
+
+    uncached = db._query_ohlcv("CACHEA", "NSE", "15m", *RANGE, as_arrow=False)
+    assert len(first) > 0
+    pd.testing.assert_frame_equal(first, uncached)
+    pd.testing.assert_frame_equal(first, second)
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
+    assert after["entries"] == 1 and after["size_mb"] > 0
+
+    # Callers get copies - modifying one does not touch the cached result
+    second["close"] = 0.0
+    assert db.get_ohlcv("CACHEA", "NSE", "15m", *RANGE)["close"].iloc[0] != 0.0
+
+    table = db.get_ohlcv("CACHEA", "NSE", "15m", *RANGE, as_arrow=True)
+    assert table.num_rows == len(first)
+    assert _cached(cache, "CACHEA", "15m", *RANGE, as_arrow=True)
+
+
+def test_upsert_invalidates_precisely(db, cache):
+    """Only entries of the written symbol, source interval and overlapping range are dropped"""
+    for interval in ("1m", "5m", "D", "W"):
+        db.get_ohlcv("CACHEA", "NSE", interval, *RANGE)
+    db.get_ohlcv("CACHEA", "NSE", "5m")
+    db.get_ohlcv("CACHEB", "NSE", "5m", *RANGE)
+
+    # 1m rows well before the range: only the unbounded 5m entry depends on them
+    db.upsert_market_data(_bars(7, days=1, first_day=0), "CACHEA", "NSE", "1m")
+    assert _cached(cache, "CACHEA", "5m", *RANGE) and _cached(cache, "CACHEA", "1m", *RANGE)
+    assert not _cached(cache, "CACHEA", "5m")
+
+    # 1m rows inside the range: 1m and 5m entries go, D/W and the other symbol stay
+    db.upsert_market_data(_bars(8, days=1, first_day=12), "CACHEA", "NSE", "1m")
+    assert not _cached(cache, "CACHEA", "5m", *RANGE) and not _cached(cache, "CACHEA", "1m", *RANGE)
+    assert _cached(cache, "CACHEA", "D", *RANGE) and _cached(cache, "CACHEA", "W", *RANGE)
+    assert _cached(cache, "CACHEB", "5m", *RANGE)
+
+    fresh = db.get_ohlcv("CACHEA", "NSE", "1m", *RANGE)
+    stored = _bars(8, days=1, first_day=12)
+    written = fresh[fresh["timestamp"].isin(stored["timestamp"])]
+    np.testing.assert_allclose(written["close"].to_numpy(), stored["close"].to_numpy())
+
+
+def test_rollup_edge_candles(db, cache):
+    """A daily write just outside the range changes the edge weekly rollup candle"""
+    weekly = db.get_ohlcv("CACHEB", "NSE", "W", *RANGE)
+    db.get_ohlcv("CACHEB", "NSE", "D", *RANGE)
+
+    # The Monday of the week containing RANGE[0] (a Thursday) precedes the range
+    monday = DAY_START + 86400 * 11
+    assert monday < RANGE[0]
+    db.upsert_market_data(
+        pd.DataFrame({"timestamp": [monday], "open": [1.0], "high": [500.0], "low": [1.0], "close": [1.0], "volume": [1]}),
+        "CACHEB",
+        "NSE",
+        "D",
+    )
+    assert not _cached(cache, "CACHEB", "W", *RANGE)
+    assert _cached(cache, "CACHEB", "D", *RANGE)
+    assert db.get_ohlcv("CACHEB", "NSE", "W", *RANGE)["high"].max() == 500.0
+    assert weekly["high"].max() == 101.0
+
+
+def test_delete_and_rebuild_invalidate(db, cache):
+    """Deleting an interval or rebuilding rollups drops the entries that depended on it"""
+    db.get_ohlcv("CACHEB", "NSE", "5m", *RANGE)
+    db.get_ohlcv("CACHEB", "NSE", "D", *RANGE)
+
+    ok, _ = db.delete_market_data("CACHEB", "NSE", "1m")
+    assert ok
+    assert not _cached(cache, "CACHEB", "5m", *RANGE) and _cached(cache, "CACHEB", "D", *RANGE)
+    assert len(db.get_ohlcv("CACHEB", "NSE", "5m", *RANGE)) == 0
+
+    db.get_ohlcv("CACHEA", "NSE", "W", *RANGE)
+    db.rebuild_rollups("CACHEA", "NSE")
+    assert not _cached(cache, "CACHEA", "W", *RANGE) and _cached(cache, "CACHEB", "D", *RANGE)
+    assert _stats(db)["invalidations"] > 0
+
+
+def test_raced_write_not_stored(db):
+    """A result read before a write committed is rejected by the version check"""
+    local = HistorifyQueryCache(10 * 1024 * 1024)
+    df = db.get_ohlcv("CACHEA", "NSE", "D")
+    key = ("CACHEA", "NSE", "D", None, None, False)
+
+    version = local.version("CACHEA", "NSE")
+    local.invalidate("CACHEA", "NSE", "D")
+    assert not local.put(key, df, version, "D")
+
+    version = local.version("CACHEA", "NSE")
+    local.invalidate()
+    assert not local.put(key, df, version, "D")
+
+    assert local.put(key, df, local.version("CACHEA", "NSE"), "D")
+    assert local.get(key) is not None
+
+
+def test_lru_eviction_by_size(db):
+    """Least recently used entries go first once the byte budget is exceeded"""
+    df = db.get_ohlcv("CACHEA", "NSE", "1m", *RANGE)
+    entry_bytes = int(df.memory_usage(index=True, deep=True).sum())
+    local = HistorifyQueryCache(entry_bytes * 4)
+
+    keys = [("CACHEA", "NSE", "1m", RANGE[0], RANGE[1] + i, False) for i in range(4)]
+    for key in keys[:3]:
+        assert local.put(key, df, local.version("CACHEA", "NSE"), "1m", *RANGE)
+    local.get(keys[0])  # keys[1] is now the least recently used
+    assert local.put(keys[3], df, local.version("CACHEA", "NSE"), "1m", *RANGE)
+
+    stats = local.stats()
+    assert stats["entries"] == 4 and stats["evictions"] == 0
+    local.put(("CACHEA", "NSE", "1m", None, None, False), df, local.version("CACHEA", "NSE"), "1m")
+    assert local.stats()["evictions"] == 1
+    assert local.get(keys[1]) is None and local.get(keys[0]) is not None
+
+    # Results larger than a quarter of the budget are never cached
+    assert not HistorifyQueryCache(entry_bytes).put(keys[0], df, (0, 0), "1m")
+    assert not HistorifyQueryCache(0).put(keys[0], df, (0, 0), "1m")
@@ -0,0 +1,145 @@
+"""
+Tests for Historify materialized rollups
+
+Tests:
+- Rollup candles match on-the-fly aggregation after incremental, overlapping and backfilled upserts
+- Range reads return the same candles as on-the-fly aggregation
+- Rollups configured after data was stored are built on the next upsert (on-the-fly until then)
+- Deleting market data removes its rollups
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DAY_OPEN = 1735875900  # 2025-01-03 09:15 IST
+DAY = 86400
+INTRADAY = ("5m", "15m", "1h")
+DAILY = ("W", "M")
+
+
+@pytest.fixture(scope="module")
+def historify_settings():
+    return {"rollup_intervals": INTRADAY + DAILY}
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    return historify_db
+
+
+def _minute_bars(days, first_day=0, seed=1):
+    """375 one-minute bars per day starting at 09:15 IST"""
+    ts = np.concatenate(
+        [DAY_OPEN + (first_day + d) * DAY + 60 * np.arange(375, dtype=np.int64) for d in range(days)]
+    )
+    close = 100 + np.cumsum(np.random.default_rng(seed).normal(0, 0.2, len(ts)))
+    return pd.DataFrame(
+        {
+            "timestamp": ts,
+            "open": close,
+            "high": close + 0.3,
+            "low": close - 0.3,
+            "close": close,
+            "volume": np.random.default_rng(seed).integers(100, 1000, len(ts)),
+        }
+    )
+
+
+def _daily_bars(days, first_day=0, seed=1):
+    ts = DAY_OPEN - 33300 + (first_day + np.arange(days, dtype=np.int64)) * DAY  # IST midnight
+    close = 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, days))
+    return pd.DataFrame(
+        {
+            "timestamp": ts,
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": np.full(days, 100000),
+        }
+    )
+
+
+def _on_the_fly(db, symbol, interval, start=None, end=None):
+    if interval in DAILY:
+        return db._get_daily_aggregated_ohlcv(symbol, "NSE", interval, start, end)
+    return db._get_aggregated_ohlcv(symbol, "NSE", interval, start, end)
+
+
+def _rollup(db, symbol, interval, start=None, end=None):
+    return db._get_rollup_ohlcv(symbol, "NSE", interval, start, end)
+
+
+def _assert_same(left, right):
+    assert len(left) == len(right) and len(left) > 0, (len(left), len(right))
+    np.testing.assert_array_equal(left["timestamp"].astype("int64"), right["timestamp"].astype("int64"))
+    for column in ("open", "high", "low", "close", "volume"):
+        np.testing.assert_allclose(left[column].astype(float), right[column].astype(float))
+
+
+@pytest.fixture(scope="module")
+def roll(db):
+    """Daily chunks, an overlapping re-download with new prices and a backfill"""
+    for day in range(5, 10):
+        db.upsert_market_data(_minute_bars(1, day), "ROLL", "NSE", "1m")
+    db.upsert_market_data(_minute_bars(2, 8, seed=2), "ROLL", "NSE", "1m")  # revised bars
+    db.upsert_market_data(_minute_bars(5, 0), "ROLL", "NSE", "1m")  # backfill
+
+    db.upsert_market_data(_daily_bars(40), "ROLL", "NSE", "D")
+    db.upsert_market_data(_daily_bars(30, 35, seed=3), "ROLL", "NSE", "D")
+    return "ROLL"
+
+
+def test_incremental_rollups_match_on_the_fly(db, roll):
+    """Rollups follow incremental, overlapping and backfilled upserts"""
+    for interval in INTRADAY + DAILY:
+        _assert_same(_rollup(db, "ROLL", interval), _on_the_fly(db, "ROLL", interval))
+        _assert_same(db.get_ohlcv("ROLL", "NSE", interval), _on_the_fly(db, "ROLL", interval))
+
+
+def test_range_reads_match_on_the_fly(db, roll):
+    """Day-aligned range reads return the same candles"""
+    start = DAY_OPEN + 2 * DAY - 33300
+    end = DAY_OPEN + 4 * DAY + 86399 - 33300
+    for interval in INTRADAY:
+        _assert_same(db.get_ohlcv("ROLL", "NSE", interval, start, end), _on_the_fly(db, "ROLL", interval, start, end))
+
+    # Whole candles are returned at the edges; the candle set is the same
+    start = DAY_OPEN + 10 * DAY
+    for interval in DAILY:
+        rollup = db.get_ohlcv("ROLL", "NSE", interval, start)
+        assert list(rollup["timestamp"].astype("int64")) == list(
+            _on_the_fly(db, "ROLL", interval, start)["timestamp"].astype("int64")
+        )
+
+
+def test_rollups_built_on_next_upsert(db):
+    """Data stored before rollups existed is aggregated on-the-fly, then rolled up in full"""
+    db.upsert_market_data(_minute_bars(3), "LATE", "NSE", "1m")
+    with db.get_write_connection() as conn:
+        conn.execute("DELETE FROM market_data_rollup WHERE symbol = 'LATE'")
+
+    assert _rollup(db, "LATE", "5m").empty
+    _assert_same(db.get_ohlcv("LATE", "NSE", "5m"), _on_the_fly(db, "LATE", "5m"))
+
+    db.upsert_market_data(_minute_bars(1, 3), "LATE", "NSE", "1m")
+    assert len(_rollup(db, "LATE", "5m")) == 4 * 75
+    _assert_same(_rollup(db, "LATE", "5m"), _on_the_fly(db, "LATE", "5m"))
+
+    with db.get_write_connection() as conn:
+        conn.execute("UPDATE market_data_rollup SET close = 0 WHERE symbol = 'LATE'")
+    assert db.rebuild_rollups(symbol="LATE") == 4 * (75 + 25 + 7)
+    _assert_same(_rollup(db, "LATE", "1h"), _on_the_fly(db, "LATE", "1h"))
+
+
+def test_delete_removes_rollups(db):
+    db.upsert_market_data(_minute_bars(1), "GONE", "NSE", "1m")
+    db.upsert_market_data(_daily_bars(10), "GONE", "NSE", "D")
+
+    assert db.delete_market_data("GONE", "NSE", "1m")[0]
+    assert _rollup(db, "GONE", "5m").empty
+    assert not _rollup(db, "GONE", "W").empty
+
+    assert db.delete_market_data("GONE", "NSE")[0]
+    assert _rollup(db, "GONE", "W").empty
@@ -0,0 +1,140 @@
+"""
+Tests for columnar history responses
+
+Tests:
+- 'columns', 'arrow' and 'parquet' responses carry the same candles as 'records'
+- DuckDB results are fetched as Arrow with fixed column types (aggregated volume as int64)
+- Empty ranges return the usual 404 error in every format
+- Non-numeric broker columns still encode as JSON column arrays
+"""
+
+import io
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from database import market_calendar_db
+from services.history_service import encode_history_table, get_history
+
+START_TS = 1704167100  # 2024-01-02 09:15 IST
+BARS_PER_DAY = 375
+TRADING_DAYS = 40
+
+
+def _bars():
+    days = START_TS + 86400 * (np.arange(TRADING_DAYS) * 7 // 5)  # skip weekends
+    ts = (days[:, None] + 60 * np.arange(BARS_PER_DAY)).ravel()
+    close = 100.0 + np.cumsum(np.random.default_rng(11).normal(0, 0.1, len(ts)))
+    return pd.DataFrame(
+        {
+            "timestamp": ts,
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": close,
+            "volume": np.full(len(ts), 1000),
+            "oi": np.zeros(len(ts), dtype=np.int64),
+        }
+    )
+
+
+START_DATE, END_DATE = "2024-01-01", "2026-01-31"
+
+
+@pytest.fixture(scope="module")
+def db(historify_db):
+    """1m candles and two years of daily candles for COLSYM"""
+    market_calendar_db.init_db()
+    historify_db.upsert_market_data(_bars(), "COLSYM", "NSE", "1m")
+    historify_db.upsert_market_data(
+        pd.DataFrame(
+            {
+                "timestamp": START_TS - 33300 + 86400 * np.arange(500),
+                "open": 100.0,
+                "high": 101.0,
+                "low": 99.0,
+                "close": 100.5,
+                "volume": 10**9,
+            }
+        ),
+        "COLSYM",
+        "NSE",
+        "D",
+    )
+    return historify_db
+
+
+def _history(interval, output_format):
+    return get_history(
+        "COLSYM", "NSE", interval, START_DATE, END_DATE, source="db", output_format=output_format
+    )
+
+
+def _decode(body, output_format):
+    if output_format == "columns":
+        return pd.DataFrame(orjson.loads(body)["data"])
+    if output_format == "arrow":
+        return pa.ipc.open_stream(io.BytesIO(body)).read_pandas()
+    return pq.read_table(io.BytesIO(body)).to_pandas()
+
+
+def test_columnar_formats_match_records(db):
+    """Every format decodes to the candles of the records response"""
+    for interval in ("1m", "15m", "W"):
+        ok, records, status = _history(interval, "records")
+        assert ok and status == 200
+        expected = pd.DataFrame(records["data"])
+
+        for output_format in ("columns", "arrow", "parquet"):
+            ok, response, status = _history(interval, output_format)
+            assert ok and status == 200
+            assert isinstance(response["data"], pa.Table)
+            body, mimetype = encode_history_table(response["data"], output_format)
+            decoded = _decode(body, output_format)
+            assert list(decoded.columns) == list(expected.columns)
+            assert len(decoded) == len(expected)
+            for column in expected.columns:
+                np.testing.assert_allclose(
+                    decoded[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float)
+                )
+            assert mimetype.startswith("application/")
+
+
+def test_arrow_schema_is_fixed(db):
+    """Aggregated sums and epoch doubles are cast to the OHLCV schema"""
+    for interval in ("1m", "5m", "M"):
+        table = db.get_ohlcv("COLSYM", "NSE", interval, as_arrow=True)
+        assert table.schema == db.OHLCV_ARROW_SCHEMA
+        assert table.num_rows > 0
+    monthly = db.get_ohlcv("COLSYM", "NSE", "M", as_arrow=True)
+    assert monthly.column("volume")[0].as_py() >= 10**9 * 20
+
+
+def test_empty_range_returns_error(db):
+    """No stored candles is the same 404 in every format"""
+    for output_format in ("records", "columns", "arrow"):
+        ok, response, status = get_history(
+            "NOSYM", "NSE", "1m", START_DATE, END_DATE, source="db", output_format=output_format
+        )
+        assert not ok and status == 404
+        assert response["status"] == "error"
+
+
+def test_broker_frame_with_text_columns():
+    """Tables built from broker DataFrames encode non-numeric columns as lists"""
+    df = pd.DataFrame(
+        {
+            "timestamp": ["2024-01-02 09:15:00", "2024-01-02 09:16:00"],
+            "close": [1.5, None],
+            "oi": [0, 1],
+        }
+    )
+    body, _ = encode_history_table(pa.Table.from_pandas(df, preserve_index=False), "columns")
+    data = orjson.loads(body)["data"]
+    assert data["timestamp"] == ["2024-01-02 09:15:00", "2024-01-02 09:16:00"]
+    assert data["close"] == [1.5, None]
+    assert data["oi"] == [0, 1]
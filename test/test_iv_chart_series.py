@@ -0,0 +1,164 @@
+"""
+Tests for the vectorized IV chart series
+
+Covers services/iv_chart_service._calculate_iv_series():
+- The vectorized series matches a per-candle py_vollib computation
+- Only candles present in both the option and underlying history are returned
+- Finished sessions are served from the session cache, today's candles are recomputed
+- find_atm_strikes() matches find_atm_strike_from_actual() for every candle
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+from services import iv_chart_service
+from services.option_symbol_service import find_atm_strike_from_actual, find_atm_strikes
+from utils import black76
+
+IST = pytz.timezone("Asia/Kolkata")
+STRIKE = 24000.0
+RATE = 0.0
+TODAY = datetime.now(IST).date()
+EXPIRY = datetime.combine(TODAY + timedelta(days=10), datetime.min.time()).replace(hour=15, minute=30)
+
+
+def _candles(days=5, bars=375, seed=1):
+    """Underlying and CE closes for `days` sessions ending today, 1m candles from 09:15"""
+    index = pd.DatetimeIndex(
+        [
+            IST.localize(datetime.combine(TODAY - timedelta(days=d), datetime.min.time()).replace(hour=9, minute=15))
+            + timedelta(minutes=m)
+            for d in range(days - 1, -1, -1)
+            for m in range(bars)
+        ]
+    )
+    rng = np.random.default_rng(seed)
+    spot = 24000.0 + np.cumsum(rng.normal(0, 4, len(index)))
+    years = (pd.Timestamp(EXPIRY) - index.tz_localize(None)).total_seconds().to_numpy() / 86400 / 365
+    vol = 0.12 + 0.02 * np.sin(np.arange(len(index)) / 50)
+    premium = np.round(black76.black_price("c", spot, STRIKE, years, RATE, vol) / 0.05) * 0.05
+    premium[::97] = np.maximum(spot[::97] - STRIKE, 0) - 5  # below intrinsic: no IV
+
+    df_underlying = pd.DataFrame({"close": spot}, index=index)
+    df_option = pd.DataFrame({"close": premium}, index=index)
+    return df_option, df_underlying
+
+
+def _reference_series(df_option, df_underlying, flag):
+    """Per-candle py_vollib computation of the same series"""
+    from py_vollib.black.greeks.analytical import delta, gamma, theta, vega
+    from py_vollib.black.implied_volatility import implied_volatility
+
+    rows = []
+    for ts in df_option.index.intersection(df_underlying.index):
+        option_close = float(df_option.loc[ts, "close"])
+        underlying_close = float(df_underlying.loc[ts, "close"])
+        years, _ = iv_chart_service.calculate_time_to_expiry_at(ts.replace(tzinfo=None), EXPIRY)
+        row = {"time": int(ts.timestamp()), "iv": None, "delta": None, "gamma": None, "theta": None, "vega": None}
+        if years > 0 and option_close > 0:
+            try:
+                iv = implied_volatility(option_close, underlying_close, STRIKE, RATE, years, flag)
+                row["iv"] = round(iv * 100.0, 2)
+                args = (flag, underlying_close, STRIKE, years, RATE, iv)
+                row.update(
+                    delta=round(delta(*args), 4),
+                    gamma=round(gamma(*args), 6),
+                    theta=round(theta(*args), 4),
+                    vega=round(vega(*args), 4),
+                )
+            except Exception:
+                pass
+        row["option_price"] = option_close
+        row["underlying_price"] = underlying_close
+        rows.append(row)
+    return rows
+
+
+@pytest.fixture
+def session_cache():
+    """Empty IV series session cache, cleared again after the test"""
+    iv_chart_service.clear_iv_series_cache()
+    yield
+    iv_chart_service.clear_iv_series_cache()
+
+
+def _series(df_option, df_underlying, cache_key=None):
+    return iv_chart_service._calculate_iv_series(
+        df_option=df_option,
+        df_underlying=df_underlying,
+        strike=STRIKE,
+        expiry_dt=EXPIRY,
+        flag="c",
+        interest_rate=RATE,
+        cache_key=cache_key,
+    )
+
+
+def test_matches_per_candle_pyvollib():
+    """Same candles, IV within 0.01 and Greeks within rounding of the scalar computation"""
+    df_option, df_underlying = _candles(days=2)
+    result = _series(df_option, df_underlying)
+    reference = _reference_series(df_option, df_underlying, "c")
+
+    assert len(result) == len(reference)
+    unsolved = 0
+    for got, expected in zip(result, reference):
+        assert got["time"] == expected["time"]
+        assert got["option_price"] == expected["option_price"]
+        for name, tolerance in (("iv", 0.011), ("delta", 2e-4), ("gamma", 2e-6), ("theta", 2e-4), ("vega", 2e-4)):
+            if expected[name] is None:
+                assert got[name] is None, (got, expected)
+            else:
+                assert abs(got[name] - expected[name]) <= tolerance, (name, got, expected)
+        unsolved += got["iv"] is None
+    assert unsolved >= len(result) // 97
+
+
+def test_inner_join_on_timestamps():
+    """Candles missing from either side are skipped, duplicates collapse"""
+    df_option, df_underlying = _candles(days=1)
+    df_option = df_option.drop(df_option.index[10:20])
+    df_underlying = df_underlying.drop(df_underlying.index[-5:])
+    df_underlying = pd.concat([df_underlying, df_underlying.iloc[:3]])
+
+    result = _series(df_option, df_underlying)
+    expected = df_option.index.intersection(df_underlying.index)
+    assert [row["time"] for row in result] == [int(ts.timestamp()) for ts in expected]
+
+
+def test_finished_sessions_cached(session_cache):
+    """Past sessions are computed once; today's candles are recomputed every call"""
+    df_option, df_underlying = _candles(days=3)
+    key = ("NIFTYTESTCE", "NIFTY", "1m")
+
+    first = _series(df_option, df_underlying, cache_key=key)
+    stats = iv_chart_service.get_iv_series_cache_stats()
+    assert stats["cached_sessions"] == 2 and stats["hits"] == 0
+
+    second = _series(df_option, df_underlying, cache_key=key)
+    assert second == first
+    assert iv_chart_service.get_iv_series_cache_stats()["hits"] == 2
+
+    # New candles for today show up, cached sessions are reused as-is
+    today = df_option.index.date == TODAY
+    changed = df_option.copy()
+    changed.loc[today, "close"] = changed.loc[today, "close"] + 1.0
+    third = _series(changed, df_underlying, cache_key=key)
+    assert third[: len(first) - today.sum()] == first[: len(first) - today.sum()]
+    assert third[-1]["option_price"] == first[-1]["option_price"] + 1.0
+
+    # A different interval/symbol is a different entry
+    _series(df_option, df_underlying, cache_key=("NIFTYTESTCE", "NIFTY", "5m"))
+    assert iv_chart_service.get_iv_series_cache_stats()["cached_sessions"] == 4
+
+
+def test_find_atm_strikes_matches_scalar():
+    """Vectorized ATM selection equals the scalar rule, ties included"""
+    strikes = [float(s) for s in range(23000, 25001, 50)] + [25100.0, 25300.0]
+    prices = np.concatenate([np.random.default_rng(2).uniform(22500, 25800, 2000), [23025.0, 25200.0, 25000.0]])
+    assert find_atm_strikes(prices, strikes) == [find_atm_strike_from_actual(p, strikes) for p in prices]
+    assert find_atm_strikes([1.0, 2.0], []) == [None, None]
@@ -0,0 +1,206 @@
+"""
+Tests for services/leg_history_service.fetch_leg_histories()
+
+Tests (stubbed get_history):
+- Legs are fetched concurrently (bounded by LEG_HISTORY_WORKERS) with auth resolved once
+- Identical legs requested by concurrent charts share one broker call
+- Finished sessions are cached per leg; later requests fetch only today's candles
+- Empty days are cached only for market holidays; a trading day without candles is refetched
+- Failed fetches are not cached; an invalid API key fails every leg
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import leg_history_service as legs
+
+TODAY = datetime.now(legs.IST).date()
+START = (TODAY - timedelta(days=3)).isoformat()
+END = TODAY.isoformat()
+
+STRIKE_LEGS = [(f"NIFTY30OCT26{strike}{side}", "NFO") for strike in range(23800, 24300, 100) for side in ("CE", "PE")]
+UNDERLYING = ("NIFTY", "NSE_INDEX")
+
+
+def _candles(symbol, start_date, end_date, skip=()):
+    """Three 5m candles per weekday in the range, close derived from symbol and day"""
+    day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last = datetime.strptime(end_date, "%Y-%m-%d").date()
+    candles = []
+    while day <= last:
+        if day.weekday() < 5 and day not in skip:
+            open_time = legs.IST.localize(datetime.combine(day, datetime.min.time()).replace(hour=9, minute=15))
+            for i in range(3):
+                candles.append(
+                    {
+                        "timestamp": int(open_time.timestamp()) + 300 * i,
+                        "close": float(len(symbol) * 10 + day.day + i),
+                    }
+                )
+        day += timedelta(days=1)
+    return candles
+
+
+class _Broker:
+    """Stubbed history and auth calls recording requests and how many overlap"""
+
+    def __init__(self):
+        self.calls = []
+        self.auth = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail = set()
+        self.no_candles = set()  # days the broker returns nothing for
+        self.holidays = set()
+        self.overlap: threading.Barrier | None = None  # gate history calls when set
+        self.release: threading.Event | None = None
+        self.lock = threading.Lock()
+
+    def get_history(self, symbol, exchange, interval, start_date, end_date, auth_token=None, feed_token=None, broker=None):
+        assert auth_token == "token" and broker == "angel"
+        with self.lock:
+            self.calls.append((symbol, start_date, end_date))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.overlap is not None:
+                self.overlap.wait()
+            if self.release is not None:
+                self.release.wait(timeout=5)
+            if symbol in self.fail:
+                return False, {"status": "error", "message": "Too many requests"}, 500
+            return True, {"status": "success", "data": _candles(symbol, start_date, end_date, self.no_candles)}, 200
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def get_auth_token_broker(self, api_key, include_feed_token=False):
+        self.auth += 1
+        if api_key != "key":
+            return None, None, None
+        return "token", "feed", "angel"
+
+    def is_market_holiday(self, day, exchange=None):
+        return day.weekday() >= 5 or day in self.holidays
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = _Broker()
+    monkeypatch.setattr(legs, "get_history", broker.get_history)
+    monkeypatch.setattr(legs, "get_auth_token_broker", broker.get_auth_token_broker)
+    monkeypatch.setattr(legs, "is_market_holiday", broker.is_market_holiday)
+    legs.clear_leg_history_cache()
+    yield broker
+    legs.clear_leg_history_cache()
+
+
+def _fetch(leg_list, start=START, end=END, api_key="key"):
+    return legs.fetch_leg_histories(leg_list, "5m", start, end, api_key)
+
+
+def test_legs_fetched_concurrently(broker):
+    """One auth lookup, one call per unique leg, overlapping within the worker bound"""
+    # History calls pass only in pairs, so a serial fetch cannot complete
+    broker.overlap = threading.Barrier(2, timeout=5)
+    results = _fetch(STRIKE_LEGS + STRIKE_LEGS[:2])
+    assert broker.auth == 1
+    assert len(broker.calls) == len(STRIKE_LEGS) and set(results) == set(STRIKE_LEGS)
+    assert 2 <= broker.max_in_flight <= legs.LEG_HISTORY_WORKERS
+    for (symbol, _), (ok, response, status) in results.items():
+        assert ok and status == 200
+        assert response["data"] == _candles(symbol, START, END)
+
+
+def test_concurrent_charts_share_requests(broker):
+    """Two charts asking for the same leg at the same time share the broker call"""
+    broker.release = threading.Event()
+    outputs = []
+
+    def chart():
+        outputs.append(_fetch([UNDERLYING]))
+
+    first = threading.Thread(target=chart)
+    first.start()
+    deadline = time.monotonic() + 5
+    while not broker.calls and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    second = threading.Thread(target=chart)
+    second.start()
+    while legs.get_leg_history_cache_stats()["shared_fetches"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    broker.release.set()
+    first.join()
+    second.join()
+
+    assert broker.calls == [("NIFTY", START, END)]
+    stats = legs.get_leg_history_cache_stats()
+    assert stats["shared_fetches"] == 1 and stats["in_flight"] == 0
+    for output in outputs:
+        ok, response, _ = output[UNDERLYING]
+        assert ok and response["data"] == _candles("NIFTY", START, END)
+
+
+def test_finished_sessions_cached(broker):
+    """After the first fetch only today's range goes to the broker; past-only ranges need none"""
+    first = _fetch([UNDERLYING])[UNDERLYING]
+    assert broker.calls == [("NIFTY", START, END)]
+    assert legs.get_leg_history_cache_stats()["cached_sessions"] == 3
+
+    broker.calls = []
+    second = _fetch([UNDERLYING])[UNDERLYING]
+    assert broker.calls == [("NIFTY", END, END)]
+    assert second[1]["data"] == first[1]["data"]
+
+    broker.calls = []
+    yesterday = (TODAY - timedelta(days=1)).isoformat()
+    past = _fetch([UNDERLYING], end=yesterday)[UNDERLYING]
+    assert broker.calls == []
+    assert past[1]["data"] == _candles("NIFTY", START, yesterday)
+    assert legs.get_leg_history_cache_stats()["hits"] == 2
+
+
+def test_empty_trading_day_not_cached(broker):
+    """Holidays are cached empty; a trading day the broker had no candles for is fetched again"""
+    monday = TODAY - timedelta(days=TODAY.weekday() + 14)
+    holiday, missing = monday + timedelta(days=1), monday + timedelta(days=2)
+    broker.holidays = {holiday}
+    broker.no_candles = {holiday, missing}
+    start, end = monday.isoformat(), missing.isoformat()
+
+    _fetch([UNDERLYING], start, end)
+    assert legs.get_leg_history_cache_stats()["cached_sessions"] == 2
+
+    broker.calls = []
+    broker.no_candles = {holiday}
+    refetched = _fetch([UNDERLYING], start, end)[UNDERLYING]
+    assert broker.calls == [("NIFTY", start, end)]
+    assert refetched[1]["data"] == _candles("NIFTY", start, end, {holiday})
+    assert legs.get_leg_history_cache_stats()["cached_sessions"] == 3
+
+    broker.calls = []
+    _fetch([UNDERLYING], start, end)
+    assert broker.calls == []
+
+
+def test_failures_not_cached(broker):
+    """A failed leg reports the broker error and is fetched in full next time"""
+    failing = STRIKE_LEGS[3]
+    broker.fail = {failing[0]}
+    results = _fetch(STRIKE_LEGS[:5])
+    assert results[failing][0] is False and results[failing][2] == 500
+    assert all(results[leg][0] for leg in STRIKE_LEGS[:5] if leg != failing)
+
+    broker.fail = set()
+    broker.calls = []
+    results = _fetch(STRIKE_LEGS[:5])
+    assert (failing[0], START, END) in broker.calls
+    assert all(call[1] == END for call in broker.calls if call[0] != failing[0])
+    assert results[failing][1]["data"] == _candles(failing[0], START, END)
+
+    bad_key = _fetch(STRIKE_LEGS[:2], api_key="wrong")
+    assert all(result == (False, {"status": "error", "message": "Invalid openalgo apikey"}, 403) for result in bad_key.values())
@@ -0,0 +1,200 @@
+"""
+Tests for chunked get_multi_option_greeks() and stream_multi_option_greeks()
+
+Tests (stubbed broker multiquotes):
+- Large requests are split into the broker's multiquote batch size and the chunks
+  are fetched concurrently, paced by the quote rate governor, with auth resolved once
+- Each underlying is quoted once per request; options of different underlyings
+  each use their own spot
+- Results match calculate_greeks_batch() and arrive in request order, chunk by chunk
+- A failed chunk only fails its own symbols; a failed underlying fails the request
+"""
+
+import math
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from database import auth_db
+from services import option_greeks_service as greeks
+from services import quotes_service
+from utils import black76, quote_rate_governor
+from utils.quote_rate_governor import MultiquoteLimit, QuoteRateGovernor
+
+EXPIRY = (datetime.now() + timedelta(days=21)).strftime("%d%b%y").upper()
+SPOTS = {("NSE_INDEX", "NIFTY"): 24020.0, ("NSE_INDEX", "BANKNIFTY"): 51230.0, ("NFO", f"NIFTY{EXPIRY}FUT"): 24110.0}
+BATCH_SIZE = 50
+
+
+def _chain(base, center, step, count):
+    strikes = [center + step * (i - count // 2) for i in range(count)]
+    return [{"symbol": f"{base}{EXPIRY}{strike}{side}", "exchange": "NFO"} for strike in strikes for side in ("CE", "PE")]
+
+
+def _price(symbol, spot):
+    body = symbol[len(symbol.split(EXPIRY)[0]) + len(EXPIRY) : -2]
+    flag = "c" if symbol.endswith("CE") else "p"
+    return round(float(black76.black_price(flag, spot, float(body), 21 / 365, 0.0, 0.14)) / 0.05) * 0.05 or 0.05
+
+
+def _spot_for(symbol):
+    return SPOTS[("NSE_INDEX", "BANKNIFTY")] if symbol.startswith("BANKNIFTY") else SPOTS[("NSE_INDEX", "NIFTY")]
+
+
+class _Broker:
+    """Stubbed multiquotes and auth recording calls and how many overlap"""
+
+    def __init__(self):
+        self.calls = []
+        self.auth = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail = set()
+        self.acquired_at_call = []  # governor slots taken when each call started
+        self.governor: QuoteRateGovernor | None = None
+        self.overlap: threading.Barrier | None = None  # the first calls wait for each other when set
+        self.lock = threading.Lock()
+
+    def get_multiquotes(self, symbols, api_key=None, auth_token=None, feed_token=None, broker=None):
+        assert auth_token == "token" and broker == "testbroker"
+        with self.lock:
+            index = len(self.calls)
+            self.calls.append([(item["exchange"], item["symbol"]) for item in symbols])
+            self.acquired_at_call.append(self.governor.stats["acquired"])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.overlap is not None and index < self.overlap.parties:
+                self.overlap.wait()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        if self.fail & {item["symbol"] for item in symbols}:
+            return False, {"status": "error", "message": "Too many requests"}, 429
+        results = []
+        for item in symbols:
+            key = (item["exchange"], item["symbol"])
+            ltp = SPOTS[key] if key in SPOTS else _price(item["symbol"], _spot_for(item["symbol"]))
+            results.append({"symbol": item["symbol"], "exchange": item["exchange"], "data": {"ltp": ltp}})
+        return True, {"status": "success", "results": results}, 200
+
+    def get_auth_token_broker(self, api_key, include_feed_token=False):
+        self.auth += 1
+        if api_key != "key":
+            return None, None, None
+        return "token", "feed", "testbroker"
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = _Broker()
+    monkeypatch.setattr(quotes_service, "get_multiquotes", broker.get_multiquotes)
+    monkeypatch.setattr(auth_db, "get_auth_token_broker", broker.get_auth_token_broker)
+
+    def use_governor(rate=1000.0, batch_size=BATCH_SIZE):
+        broker.governor = QuoteRateGovernor(
+            overrides={"testbroker": MultiquoteLimit(batch_size=batch_size, rate=rate)}
+        )
+        monkeypatch.setattr(greeks, "get_quote_rate_governor", lambda: broker.governor)
+        return broker.governor
+
+    broker.use_governor = use_governor
+    use_governor()
+    return broker
+
+
+def _expected(symbols):
+    requests = [
+        {
+            "symbol": s["symbol"],
+            "exchange": s["exchange"],
+            "spot_price": SPOTS[(s["underlying_exchange"], s["underlying_symbol"])]
+            if s.get("underlying_symbol")
+            else _spot_for(s["symbol"]),
+            "option_price": _price(s["symbol"], _spot_for(s["symbol"])),
+        }
+        for s in symbols
+    ]
+    return [response for _, response, _ in greeks.calculate_greeks_batch(requests)]
+
+
+def _assert_matches(results, expected):
+    """Same responses as one batch solve; chunks solved a moment later may differ in the last digit"""
+    assert len(results) == len(expected)
+    for result, want in zip(results, expected):
+        assert result["symbol"] == want["symbol"] and result["status"] == want["status"]
+        assert result["spot_price"] == want["spot_price"] and result["option_price"] == want["option_price"]
+        assert abs(result["implied_volatility"] - want["implied_volatility"]) < 0.02
+        assert abs(result["greeks"]["delta"] - want["greeks"]["delta"]) < 1e-3
+
+
+def test_large_request_chunked_concurrently(broker):
+    """300 options: 7 broker-sized chunks in flight together, underlying quoted once"""
+    # The first two chunks wait for each other, so a serial fetch cannot complete
+    broker.overlap = threading.Barrier(2, timeout=5)
+    symbols = _chain("NIFTY", 24000, 50, 150)
+    ok, response, status = greeks.get_multi_option_greeks(symbols, api_key="key")
+    assert ok and status == 200 and response["status"] == "success"
+    assert response["summary"] == {"total": 300, "success": 300, "failed": 0}
+    assert [r["symbol"] for r in response["data"]] == [s["symbol"] for s in symbols]
+    _assert_matches(response["data"], _expected(symbols))
+
+    assert broker.auth == 1
+    assert len(broker.calls) == math.ceil((300 + 1) / BATCH_SIZE)
+    assert all(len(call) <= BATCH_SIZE for call in broker.calls)
+    assert sum(call.count(("NSE_INDEX", "NIFTY")) for call in broker.calls) == 1
+    assert 2 <= broker.max_in_flight <= greeks.MULTI_GREEKS_QUOTE_WORKERS
+
+
+def test_underlyings_grouped(broker):
+    """Each option uses its own underlying; every underlying is quoted once, in the first chunk"""
+    symbols = _chain("NIFTY", 24000, 50, 10) + _chain("BANKNIFTY", 51200, 100, 10)
+    for s in symbols[:6]:
+        s.update(underlying_symbol=f"NIFTY{EXPIRY}FUT", underlying_exchange="NFO")
+    ok, response, _ = greeks.get_multi_option_greeks(symbols, api_key="key")
+    assert ok and response["summary"]["success"] == len(symbols)
+    _assert_matches(response["data"], _expected(symbols))
+
+    assert len(broker.calls) == 1
+    assert all(broker.calls[0].count(source) == 1 for source in SPOTS)
+
+
+def test_stream_order_and_partial_failure(broker):
+    """Chunks stream in request order; a failed chunk marks only its symbols"""
+    symbols = _chain("NIFTY", 24000, 50, 100)
+    broker.fail = {symbols[75]["symbol"]}
+    ok, chunks, status = greeks.stream_multi_option_greeks(symbols, api_key="key")
+    assert ok and status == 200
+    chunks = list(chunks)
+    # The underlying takes one slot of the first chunk
+    assert [len(chunk) for chunk in chunks] == [49, 50, 50, 50, 1]
+    flat = [result for chunk in chunks for result in chunk]
+    assert [r["symbol"] for r in flat] == [s["symbol"] for s in symbols]
+    assert all(r["status"] == "error" and r["message"] == "Failed to fetch quotes: Too many requests" for r in chunks[1])
+    assert all(r["status"] == "success" for chunk in chunks[:1] + chunks[2:] for r in chunk)
+    assert greeks.multi_option_greeks_summary(flat)["status"] == "partial"
+
+    # Underlying quote failing fails the request as before; so does a bad API key
+    broker.fail = {"NIFTY"}
+    ok, response, status = greeks.get_multi_option_greeks(symbols[:4], api_key="key")
+    assert not ok and status == 429 and response["message"] == "Too many requests"
+    ok, response, status = greeks.get_multi_option_greeks(symbols[:4], api_key="wrong")
+    assert not ok and status == 403
+
+
+def test_chunks_paced_by_governor(broker, monkeypatch):
+    """Every chunk takes a governor slot first; slots past the burst are queued 1/rate apart"""
+    rate = 20.0
+    waits = []
+    monkeypatch.setattr(quote_rate_governor, "time", SimpleNamespace(sleep=waits.append))
+    governor = broker.use_governor(rate=rate)
+    greeks.get_multi_option_greeks(_chain("NIFTY", 24000, 50, 150), api_key="key")
+
+    calls = len(broker.calls)
+    assert governor.stats["acquired"] == calls
+    assert all(acquired >= 1 for acquired in broker.acquired_at_call)
+    # One token of burst, then each chunk waits behind the previous ones
+    assert len(waits) == calls - 1
+    assert max(waits) >= (calls - 2) / rate
@@ -0,0 +1,166 @@
+"""
+Tests for OI analytics and max pain
+
+Covers services/oi_tracker_service:
+- compute_oi_analytics() pain per strike and max pain match a quadratic reference loop
+- PCR, per-strike PCR and OI-change totals come out of the same pass
+- calculate_max_pain() keeps its response shape
+- calculate_max_pain_multi() reports each expiry and the aggregate over the union of strikes
+"""
+
+import numpy as np
+
+from services import oi_tracker_service
+from services.oi_tracker_service import compute_oi_analytics
+
+
+def _chain(n, seed=0, step=50.0, first=20000.0):
+    rng = np.random.default_rng(seed)
+    strikes = first + step * np.arange(n)
+    ce_oi = rng.integers(0, 5_000_000, n)
+    pe_oi = rng.integers(0, 5_000_000, n)
+    ce_oi[rng.random(n) < 0.2] = 0
+    return [
+        {"strike": float(s), "ce_oi": int(c), "pe_oi": int(p), "ce_volume": int(c // 3), "pe_volume": int(p // 2)}
+        for s, c, p in zip(strikes, ce_oi, pe_oi)
+    ]
+
+
+def _loop_pain(chain):
+    """Reference pain per candidate strike from a plain O(n^2) loop"""
+    pain = []
+    for candidate in chain:
+        ce_pain = pe_pain = 0
+        for item in chain:
+            if candidate["strike"] > item["strike"] and item["ce_oi"] > 0:
+                ce_pain += (candidate["strike"] - item["strike"]) * item["ce_oi"]
+            if candidate["strike"] < item["strike"] and item["pe_oi"] > 0:
+                pe_pain += (item["strike"] - candidate["strike"]) * item["pe_oi"]
+        pain.append((candidate["strike"], ce_pain, pe_pain, ce_pain + pe_pain))
+    return pain
+
+
+def _analytics(chain, **extra):
+    return compute_oi_analytics(
+        strikes=[item["strike"] for item in chain],
+        ce_oi=[item["ce_oi"] for item in chain],
+        pe_oi=[item["pe_oi"] for item in chain],
+        **extra,
+    )
+
+
+def test_pain_matches_loop():
+    """Per-strike CE/PE/total pain and max pain equal the quadratic loop"""
+    for n, seed, step in ((1, 0, 50.0), (2, 1, 50.0), (91, 2, 50.0), (300, 3, 2.5)):
+        chain = _chain(n, seed, step)
+        analytics = _analytics(chain)
+        expected = _loop_pain(chain)
+
+        np.testing.assert_allclose(analytics["ce_pain"], [row[1] for row in expected], rtol=1e-12, atol=1e-3)
+        np.testing.assert_allclose(analytics["pe_pain"], [row[2] for row in expected], rtol=1e-12, atol=1e-3)
+        assert analytics["max_pain_strike"] == min(expected, key=lambda row: row[3])[0]
+
+
+def test_unsorted_and_duplicate_strikes():
+    """Input order does not matter; repeated strikes add no pain to each other"""
+    chain = _chain(60, seed=4)
+    shuffled = [chain[i] for i in np.random.default_rng(5).permutation(len(chain))]
+    assert _analytics(shuffled)["max_pain_strike"] == _analytics(chain)["max_pain_strike"]
+    np.testing.assert_allclose(_analytics(shuffled)["total_pain"], _analytics(chain)["total_pain"])
+
+    doubled = chain + [dict(item) for item in chain[::7]]
+    expected = sorted(_loop_pain(doubled), key=lambda row: row[0])
+    np.testing.assert_allclose(_analytics(doubled)["total_pain"], [row[3] for row in expected], rtol=1e-12)
+
+
+def test_pcr_and_oi_change():
+    """Totals, PCR, per-strike PCR and OI-change PCR from the same arrays"""
+    chain = _chain(40, seed=6)
+    ce_change = np.arange(40) * 1000 - 5000
+    pe_change = np.arange(40) * 500
+    analytics = _analytics(
+        chain,
+        ce_volume=[item["ce_volume"] for item in chain],
+        pe_volume=[item["pe_volume"] for item in chain],
+        ce_oi_change=ce_change,
+        pe_oi_change=pe_change,
+    )
+
+    total_ce = sum(item["ce_oi"] for item in chain)
+    total_pe = sum(item["pe_oi"] for item in chain)
+    assert analytics["total_ce_oi"] == total_ce and analytics["total_pe_oi"] == total_pe
+    assert analytics["pcr_oi"] == round(total_pe / total_ce, 2)
+    assert analytics["pcr_volume"] == round(
+        sum(item["pe_volume"] for item in chain) / sum(item["ce_volume"] for item in chain), 2
+    )
+    assert analytics["total_ce_oi_change"] == ce_change.sum()
+    assert analytics["pcr_oi_change"] == round(pe_change.sum() / ce_change.sum(), 2)
+    for item, pcr in zip(chain, analytics["strike_pcr"]):
+        assert pcr == (item["pe_oi"] / item["ce_oi"] if item["ce_oi"] else 0)
+
+    empty = compute_oi_analytics([], [], [])
+    assert empty["max_pain_strike"] is None and empty["pcr_oi"] == 0
+
+
+def _stub_oi_data(chains):
+    def get_oi_data(underlying, exchange, expiry_date, api_key):
+        if expiry_date not in chains:
+            return False, {"status": "error", "message": "No strikes found"}, 404
+        chain = chains[expiry_date]
+        analytics = _analytics(chain)
+        return (
+            True,
+            {
+                "status": "success",
+                "underlying": underlying,
+                "spot_price": 21000.0,
+                "futures_price": 21010.0,
+                "lot_size": 75,
+                "pcr_oi": analytics["pcr_oi"],
+                "pcr_volume": 0,
+                "total_ce_oi": int(analytics["total_ce_oi"]),
+                "total_pe_oi": int(analytics["total_pe_oi"]),
+                "atm_strike": 21000.0,
+                "expiry_date": expiry_date,
+                "chain": chain,
+            },
+            200,
+        )
+
+    return get_oi_data
+
+
+def test_single_and_multi_expiry_max_pain(monkeypatch):
+    """Per-expiry results equal calculate_max_pain(); aggregate uses summed OI per strike"""
+    chains = {
+        "30OCT26": _chain(90, seed=7),
+        "27NOV26": _chain(60, seed=8, step=100.0, first=19000.0),
+    }
+    monkeypatch.setattr(oi_tracker_service, "get_oi_data", _stub_oi_data(chains))
+    ok, single, _ = oi_tracker_service.calculate_max_pain("NIFTY", "NFO", "30OCT26", "key")
+    ok_multi, multi, _ = oi_tracker_service.calculate_max_pain_multi(
+        "NIFTY", "NFO", ["30OCT26", "27NOV26", "25DEC26"], "key"
+    )
+
+    assert ok and ok_multi
+    expected = _loop_pain(chains["30OCT26"])
+    assert single["max_pain_strike"] == min(expected, key=lambda row: row[3])[0]
+    assert [row["strike"] for row in single["pain_data"]] == [row[0] for row in expected]
+    assert [row["total_pain"] for row in single["pain_data"]] == [round(row[3], 2) for row in expected]
+    assert set(single["pain_data"][0]) == {"strike", "ce_pain", "pe_pain", "total_pain", "total_pain_cr"}
+
+    assert [item["expiry_date"] for item in multi["expiries"]] == ["30OCT26", "27NOV26"]
+    assert multi["expiries"][0]["max_pain_strike"] == single["max_pain_strike"]
+    assert multi["errors"][0]["expiry_date"] == "25DEC26"
+
+    combined = {}
+    for chain in chains.values():
+        for item in chain:
+            row = combined.setdefault(item["strike"], {"strike": item["strike"], "ce_oi": 0, "pe_oi": 0})
+            row["ce_oi"] += item["ce_oi"]
+            row["pe_oi"] += item["pe_oi"]
+    expected = _loop_pain(sorted(combined.values(), key=lambda row: row["strike"]))
+    aggregate = multi["aggregate"]
+    assert aggregate["max_pain_strike"] == min(expected, key=lambda row: row[3])[0]
+    assert len(aggregate["pain_data"]) == len(combined)
+    assert aggregate["total_ce_oi"] == sum(row["ce_oi"] for row in combined.values())
@@ -0,0 +1,164 @@
+"""
+Tests for the daily OI cache in services/oi_profile_service
+
+Tests:
+- The first load fetches daily history for every option with OI, concurrently and
+  bounded by OI_PROFILE_HISTORY_WORKERS; OI change = current OI - previous session OI
+- Later loads of the day need no option history at all
+- Previous-session OI is the last daily candle before today (IST), with or without today's candle
+- Failed fetches are not cached and are retried; other days' entries are dropped
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from services import oi_profile_service as profile
+
+STRIKES = [float(s) for s in range(23000, 25001, 100)]
+TODAY = datetime.now(profile.IST).date()
+
+
+def _current_oi(symbol):
+    return 100000 + (hash(symbol) % 50) * 1000
+
+
+def _previous_oi(symbol):
+    return 90000 + (hash(symbol) % 40) * 1000
+
+
+def _fake_chain(underlying, exchange, expiry_date, strike_count, api_key, side=None):
+    chain = []
+    for strike in STRIKES:
+        row = {"strike": strike}
+        for key in ("ce", "pe"):
+            symbol = f"NIFTY30OCT26{int(strike)}{key.upper()}"
+            row[key] = {"symbol": symbol, "oi": 0 if strike == STRIKES[0] else _current_oi(symbol), "lotsize": 75}
+        chain.append(row)
+    return True, {"status": "success", "underlying": "NIFTY", "underlying_ltp": 24010.0, "atm_strike": 24000.0, "chain": chain}, 200
+
+
+def _bar(day, oi):
+    """Daily candle stamped at 00:00 IST, as brokers return them"""
+    return {"timestamp": int(profile.IST.localize(datetime.combine(day, datetime.min.time())).timestamp()), "oi": oi}
+
+
+class _Broker:
+    """Stubbed history API recording calls and how many overlap"""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail = set()
+        self.with_today = True
+        self.lock = threading.Lock()
+        self.overlap: threading.Barrier | None = None  # gate option history calls when set
+
+    def get_history(self, symbol, exchange, interval, start_date, end_date, api_key):
+        with self.lock:
+            self.calls.append((symbol, interval))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if interval != "D":
+                return True, {"status": "success", "data": [{"timestamp": 1, "close": 24000.0}]}, 200
+            if self.overlap is not None:
+                self.overlap.wait()
+            if symbol in self.fail:
+                return False, {"status": "error", "message": "Too many requests"}, 500
+            bars = [_bar(TODAY - timedelta(days=3), 1), _bar(TODAY - timedelta(days=1), _previous_oi(symbol))]
+            if self.with_today:
+                bars.append(_bar(TODAY, _current_oi(symbol)))
+            return True, {"status": "success", "data": bars}, 200
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def option_calls(self):
+        return [symbol for symbol, interval in self.calls if interval == "D"]
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = _Broker()
+    monkeypatch.setattr(profile, "get_option_chain", _fake_chain)
+    monkeypatch.setattr(profile, "get_history", broker.get_history)
+    monkeypatch.setattr(
+        profile, "_find_futures_symbol", lambda *args: {"symbol": "NIFTY30OCT26FUT", "exchange": "NFO"}
+    )
+    profile.clear_prev_oi_cache()
+    yield broker
+    profile.clear_prev_oi_cache()
+
+
+def _load():
+    ok, response, status = profile.get_oi_profile_data("NIFTY", "NFO", "30OCT26", "5m", 3, "key")
+    assert ok and status == 200, response
+    return response
+
+
+def test_first_load_fetches_concurrently(broker):
+    """One daily-history call per option with OI, overlapping, within the worker bound"""
+    # Option history calls pass only in pairs, so a serial fetch cannot complete
+    broker.overlap = threading.Barrier(2, timeout=5)
+    response = _load()
+    expected_symbols = 2 * (len(STRIKES) - 1)
+    assert len(broker.option_calls()) == expected_symbols
+    assert 2 <= broker.max_in_flight <= profile.OI_PROFILE_HISTORY_WORKERS + 1
+    assert response["candles"] and response["futures_symbol"] == "NIFTY30OCT26FUT"
+
+    for row in response["oi_chain"][1:]:
+        ce_symbol = f"NIFTY30OCT26{int(row['strike'])}CE"
+        assert row["ce_oi_change"] == _current_oi(ce_symbol) - _previous_oi(ce_symbol)
+    assert response["oi_chain"][0]["ce_oi_change"] == 0
+    assert response["summary"]["total_ce_oi_change"] == sum(row["ce_oi_change"] for row in response["oi_chain"])
+
+
+def test_repeat_load_uses_cache(broker):
+    """After the first view only the futures candles are fetched"""
+    first = _load()
+    broker.calls = []
+    second = _load()
+    assert broker.option_calls() == [] and broker.calls == [("NIFTY30OCT26FUT", "5m")]
+    assert second["oi_chain"] == first["oi_chain"]
+    stats = profile.get_prev_oi_cache_stats()
+    assert stats["cached_symbols"] == 2 * (len(STRIKES) - 1) and stats["hits"] == stats["cached_symbols"]
+
+
+def test_previous_session_before_today(broker):
+    """Pre-open (no candle for today yet) and intraday give the same previous-session OI"""
+    broker.with_today = False
+    pre_open = _load()
+    profile.clear_prev_oi_cache()
+    broker.with_today = True
+    intraday = _load()
+    assert pre_open["oi_chain"] == intraday["oi_chain"]
+
+    bars = [{"oi": 5}, {"oi": 7}, {"oi": 9}]  # no timestamps: second-last candle as before
+    assert profile._previous_session_oi(bars, TODAY) == 7
+    assert profile._previous_session_oi([_bar(TODAY, 3)], TODAY) == 0
+    # Today's 00:00 IST candle falls on the previous UTC day; it is still today
+    assert profile._previous_session_oi([_bar(TODAY - timedelta(days=1), 5), _bar(TODAY, 3)], TODAY) == 5
+
+
+def test_failures_retried_and_day_rollover(broker):
+    """Failed symbols count as zero now and are fetched again next load; old days drop"""
+    failing = f"NIFTY30OCT26{int(STRIKES[5])}PE"
+    broker.fail = {failing}
+    first = _load()
+    row = next(row for row in first["oi_chain"] if row["strike"] == STRIKES[5])
+    assert row["pe_oi_change"] == _current_oi(failing)
+    assert profile.get_prev_oi_cache_stats()["fetch_failures"] == 1
+
+    broker.fail = set()
+    broker.calls = []
+    second = _load()
+    assert broker.option_calls() == [failing]
+    row = next(row for row in second["oi_chain"] if row["strike"] == STRIKES[5])
+    assert row["pe_oi_change"] == _current_oi(failing) - _previous_oi(failing)
+
+    profile._prev_oi_cache_put(TODAY + timedelta(days=1), "NFO", {"NEXTDAYCE": 1.0})
+    assert profile.get_prev_oi_cache_stats()["cached_symbols"] == 1
+    assert profile._prev_oi_cache_get(date(2000, 1, 1), "NFO", ["NEXTDAYCE"]) == {}
@@ -0,0 +1,323 @@
+"""
+Tests for services/option_chain_session_service
+
+Covers chain sessions with a stubbed broker snapshot, a stubbed WebSocket
+connection per user and synthetic ticks pushed through MarketDataService:
+- The first read snapshots once; later reads are served from memory
+- Option and underlying ticks update the live chain and notify tick listeners;
+  responses carry freshness
+- Underlying ticks alone do not keep the stream fresh
+- The side filter matches fetch_option_chain()
+- An ATM move re-centres the window with a new snapshot and moves the tick filter
+- Without option ticks the next read after OPTION_CHAIN_STREAM_MAX_AGE refreshes the snapshot
+- Idle and over-capacity sessions are evicted and stop receiving ticks
+- Sessions belong to the API key's user; legs stream in Depth mode, the underlying in Quote
+- Subscriptions are refcounted per user and symbols other consumers subscribed are kept
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import option_chain_session_service as sessions
+from services.market_data_service import get_market_data_service
+
+STRIKES = [float(s) for s in range(23000, 25001, 100)]
+USERS = {"key-alice": "alice", "key-bob": "bob"}
+
+
+class _SyncThread:
+    """Runs background WebSocket requests inline so tests can assert on them"""
+
+    def __init__(self, target, daemon=None):
+        self._target = target
+
+    def start(self):
+        self._target()
+
+
+@pytest.fixture
+def market():
+    return {"NIFTY": 24020.0}
+
+
+@pytest.fixture
+def snapshots(monkeypatch, market):
+    """Stubbed fetch_option_chain: strike_count strikes around the ATM of the market price"""
+    calls = []
+
+    def fetch(underlying, exchange, expiry_date, strike_count, api_key, side=None):
+        calls.append(api_key)
+        ltp = market[underlying]
+        atm = sessions._nearest_strike(STRIKES, ltp)
+        index = STRIKES.index(atm)
+        chain = []
+        for strike in STRIKES[max(0, index - strike_count) : index + strike_count + 1]:
+            position = int(abs(strike - atm) // 100)
+            ce_label = "ATM" if strike == atm else (f"ITM{position}" if strike < atm else f"OTM{position}")
+            pe_label = "ATM" if strike == atm else (f"OTM{position}" if strike < atm else f"ITM{position}")
+            row = {"strike": strike}
+            for key, label in (("ce", ce_label), ("pe", pe_label)):
+                row[key] = {
+                    "symbol": f"{underlying}30OCT26{int(strike)}{key.upper()}",
+                    "label": label,
+                    "ltp": 100.0,
+                    "bid": 99.5,
+                    "ask": 100.5,
+                    "open": 90.0,
+                    "high": 110.0,
+                    "low": 85.0,
+                    "prev_close": 95.0,
+                    "volume": 1000,
+                    "oi": 50000,
+                    "lotsize": 75,
+                    "tick_size": 0.05,
+                }
+            chain.append(row)
+        return (
+            True,
+            {
+                "status": "success",
+                "underlying": underlying,
+                "underlying_ltp": ltp,
+                "underlying_prev_close": 24000.0,
+                "expiry_date": expiry_date,
+                "atm_strike": atm,
+                "chain": chain,
+            },
+            200,
+        )
+
+    monkeypatch.setattr(sessions, "fetch_option_chain", fetch)
+    monkeypatch.setattr(sessions, "get_available_strikes", lambda *args: STRIKES)
+    monkeypatch.setattr(sessions, "verify_api_key", USERS.get)
+    return calls
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Stubbed WebSocket connections: username -> {("EXCHANGE:SYMBOL", mode)}"""
+    active = {}
+
+    def subscribe(username, broker, symbols, mode):
+        active.setdefault(username, set()).update((f"{s['exchange']}:{s['symbol']}", mode) for s in symbols)
+        return True, {"status": "success"}, 200
+
+    def unsubscribe(username, broker, symbols, mode):
+        active.setdefault(username, set()).difference_update(
+            (f"{s['exchange']}:{s['symbol']}", mode) for s in symbols
+        )
+        return True, {"status": "success"}, 200
+
+    def subscriptions(username):
+        items = [
+            {"exchange": key.split(":", 1)[0], "symbol": key.split(":", 1)[1], "mode": mode}
+            for key, mode in active.get(username, ())
+        ]
+        return True, {"status": "success", "subscriptions": items}, 200
+
+    monkeypatch.setattr(sessions, "ws_subscribe_to_symbols", subscribe)
+    monkeypatch.setattr(sessions, "ws_unsubscribe_from_symbols", unsubscribe)
+    monkeypatch.setattr(sessions, "get_websocket_subscriptions", subscriptions)
+    monkeypatch.setattr(sessions, "get_auth_token_broker", lambda api_key: ("token", "zerodha"))
+    monkeypatch.setattr(
+        sessions,
+        "threading",
+        SimpleNamespace(Lock=threading.Lock, RLock=threading.RLock, Thread=_SyncThread),
+    )
+    return active
+
+
+@pytest.fixture
+def manager(snapshots, connections):
+    manager = sessions.OptionChainSessionManager()
+    yield manager
+    manager.clear()
+
+
+def _tick(symbol, exchange, ltp, **fields):
+    get_market_data_service().process_market_data(
+        {"symbol": symbol, "exchange": exchange, "mode": 2, "data": {"ltp": ltp, **fields}}
+    )
+
+
+def _read(manager, strike_count=3, side=None, api_key="key-alice"):
+    ok, response, status = manager.get_chain("NIFTY", "NFO", "30OCT26", strike_count, api_key, side)
+    assert ok and status == 200
+    return response
+
+
+def _leg(response, strike, key):
+    return next(row[key] for row in response["chain"] if row["strike"] == strike)
+
+
+def test_reads_served_from_ticks(manager, snapshots):
+    """One snapshot, then ticks flow into the chain without further broker calls"""
+    updated = []
+    manager.add_tick_listener(updated.append)
+    first = _read(manager)
+    assert len(snapshots) == 1 and first["atm_strike"] == 24000.0
+    assert first["freshness"]["source"] == "snapshot"
+
+    _tick(
+        "NIFTY30OCT2624000CE",
+        "NFO",
+        123.45,
+        volume=5000,
+        oi=61000,
+        high=130.0,
+        depth={"buy": [{"price": 123.4}], "sell": [{"price": 123.5}]},
+    )
+    _tick("NIFTY30OCT2624100PE", "NFO", 150.0)
+    _tick("NIFTY", "NSE_INDEX", 24030.0)
+    second = _read(manager)
+
+    assert len(snapshots) == 1
+    ce = _leg(second, 24000.0, "ce")
+    assert (ce["ltp"], ce["volume"], ce["oi"], ce["high"]) == (123.45, 5000, 61000, 130.0)
+    assert (ce["bid"], ce["ask"]) == (123.4, 123.5)
+    assert _leg(second, 24100.0, "pe")["ltp"] == 150.0
+    assert second["underlying_ltp"] == 24030.0
+    assert second["freshness"]["source"] == "stream" and second["freshness"]["ticks"] == 2
+    assert manager.metrics["stream_reads"] == 1
+    assert updated == [sessions.session_key("alice", "NIFTY", "NFO", "30OCT26", 3)] * 3
+
+    # Responses are copies - callers cannot corrupt the live table
+    _leg(second, 24000.0, "ce")["ltp"] = -1
+    assert _leg(_read(manager), 24000.0, "ce")["ltp"] == 123.45
+
+    # Ticks of other symbols/exchanges are ignored
+    _tick("NIFTY30OCT2624000CE", "BFO", 1.0)
+    assert _leg(_read(manager), 24000.0, "ce")["ltp"] == 123.45
+
+
+def test_side_filter(manager, snapshots):
+    """ITM/OTM filter keeps ATM and the matching side, like fetch_option_chain()"""
+    response = _read(manager, side="ITM")
+    for row in response["chain"]:
+        for key in ("ce", "pe"):
+            leg = row[key]
+            if leg is not None:
+                assert leg["label"] == "ATM" or leg["label"].startswith("ITM")
+    assert _leg(response, 23900.0, "ce") is not None and _leg(response, 23900.0, "pe") is None
+    assert len(snapshots) == 1
+
+
+def test_recentre_on_atm_move(manager, snapshots, market):
+    """An underlying tick at a new ATM re-snapshots the window and re-filters ticks"""
+    _read(manager, strike_count=2)
+    market["NIFTY"] = 24480.0
+    _tick("NIFTY", "NSE_INDEX", 24480.0)
+    response = _read(manager, strike_count=2)
+
+    assert len(snapshots) == 2 and manager.metrics["recentres"] == 1
+    assert response["atm_strike"] == 24500.0
+    assert [row["strike"] for row in response["chain"]] == [24300.0, 24400.0, 24500.0, 24600.0, 24700.0]
+
+    # New window symbols tick in; the old ones no longer reach the session
+    session = next(iter(manager._sessions.values()))
+    assert "NFO:NIFTY30OCT2624700CE" in session.symbol_keys
+    assert "NFO:NIFTY30OCT2623800CE" not in session.symbol_keys
+    _tick("NIFTY30OCT2624700CE", "NFO", 12.5)
+    assert _leg(_read(manager, strike_count=2), 24700.0, "ce")["ltp"] == 12.5
+
+
+def test_stale_stream_refreshes_snapshot(manager, snapshots, monkeypatch):
+    """No option ticks for longer than the max age: the next read takes a new snapshot"""
+    monkeypatch.setattr(sessions, "STREAM_MAX_AGE", 0.05)
+    _read(manager)
+    _read(manager)
+    assert len(snapshots) == 1
+
+    # Underlying ticks alone do not keep the option legs fresh
+    time.sleep(0.1)
+    _tick("NIFTY", "NSE_INDEX", 24025.0)
+    response = _read(manager)
+    assert len(snapshots) == 2 and response["freshness"]["source"] == "snapshot"
+
+
+def test_eviction(manager, monkeypatch):
+    """Idle sessions are dropped on the next request; capacity evicts least recently read"""
+    _read(manager, strike_count=2)
+    _read(manager, strike_count=3)
+    assert manager.stats()["active_sessions"] == 2
+
+    monkeypatch.setattr(sessions, "MAX_SESSIONS", 2)
+    _read(manager, strike_count=4)
+    assert manager.stats()["active_sessions"] == 2
+    assert [key[4] for key in manager._sessions] == [3, 4]
+
+    evicted = next(iter(manager._sessions.values()))
+    monkeypatch.setattr(sessions, "SESSION_IDLE_SECONDS", 60)
+    evicted.last_access -= 120
+    _read(manager, strike_count=4)
+    assert [key[4] for key in manager._sessions] == [4]
+
+    # An evicted session no longer receives ticks
+    ticks = evicted.tick_count
+    _tick("NIFTY30OCT2624000CE", "NFO", 77.0)
+    assert evicted.tick_count == ticks
+    assert manager.metrics["evictions"] == 2
+    assert all(count == 1 for count in manager._symbol_refs.values())
+
+    manager.clear()
+    assert manager._symbol_refs == {}
+
+
+def test_sessions_belong_to_users(manager, snapshots, connections):
+    """Each user gets a session on their own credentials and WebSocket connection"""
+    _read(manager, api_key="key-alice")
+    _read(manager, api_key="key-bob")
+    _read(manager, api_key="key-alice")
+
+    assert snapshots == ["key-alice", "key-bob"]
+    assert sorted(key[0] for key in manager._sessions) == ["alice", "bob"]
+    for session in manager._sessions.values():
+        assert USERS[session.api_key] == session.username
+
+    for username in ("alice", "bob"):
+        modes = dict(connections[username])
+        assert modes["NSE_INDEX:NIFTY"] == sessions.UNDERLYING_MODE
+        assert modes["NFO:NIFTY30OCT2624000CE"] == sessions.LEG_MODE
+
+    # Unknown keys are not given a session
+    manager.get_chain("NIFTY", "NFO", "30OCT26", 3, "key-unknown")
+    assert len(manager._sessions) == 2 and snapshots[-1] == "key-unknown"
+
+
+def test_subscriptions_refcounted_per_user(manager, connections):
+    """A symbol is unsubscribed only when no session of its user uses it anymore"""
+    _read(manager, strike_count=2)
+    _read(manager, strike_count=3)
+    _read(manager, strike_count=2, api_key="key-bob")
+    assert manager._symbol_refs[("alice", "NFO:NIFTY30OCT2624000CE")] == 2
+    assert manager._symbol_refs[("bob", "NFO:NIFTY30OCT2624000CE")] == 1
+
+    manager._drop(next(key for key in manager._sessions if key[0] == "alice" and key[4] == 3))
+    alice = {key for key, _ in connections["alice"]}
+    assert "NFO:NIFTY30OCT2624000CE" in alice
+    assert "NFO:NIFTY30OCT2624300CE" not in alice
+
+    manager._drop(next(key for key in manager._sessions if key[0] == "bob"))
+    assert connections["bob"] == set()
+    assert ("NFO:NIFTY30OCT2624000CE", sessions.LEG_MODE) in connections["alice"]
+
+
+def test_existing_subscriptions_are_kept(manager, connections):
+    """Symbols another consumer had subscribed are not unsubscribed when sessions go away"""
+    connections["alice"] = {
+        ("NFO:NIFTY30OCT2624000CE", sessions.LEG_MODE),
+        ("NSE_INDEX:NIFTY", sessions.UNDERLYING_MODE),
+        ("NFO:NIFTY30OCT2624100CE", "LTP"),
+    }
+    _read(manager, strike_count=2)
+    manager.clear()
+
+    assert connections["alice"] == {
+        ("NFO:NIFTY30OCT2624000CE", sessions.LEG_MODE),
+        ("NSE_INDEX:NIFTY", sessions.UNDERLYING_MODE),
+        ("NFO:NIFTY30OCT2624100CE", "LTP"),
+    }
+    assert manager._borrowed == set()
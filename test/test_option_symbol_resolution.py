@@ -0,0 +1,160 @@
+"""
+Tests for option symbol resolution in services/option_symbol_service
+
+Tests (master contract in the test database):
+- ATM and ITM/OTM offsets by binary search match the previous linear scans
+- Strikes come from the symbol cache's per-series strike index
+- get_option_symbol() caches resolved contracts per ATM bucket; a new bucket resolves afresh
+- Reloading the master contract drops the strike and resolution caches
+"""
+
+import random
+
+import pytest
+
+from database import qty_freeze_db, token_db_enhanced
+from database.symbol import Base, SymToken, db_session, engine
+from services import option_symbol_service as oss
+
+EXPIRY = "28OCT26"
+STRIKES = [float(s) for s in range(22000, 26001, 50)]
+
+
+def _load_master_contract(lotsize=75, extra_strikes=()):
+    """(Re)write the NIFTY option chain and reload the symbol cache, as after a download"""
+    Base.metadata.create_all(engine)
+    db_session.query(SymToken).delete()
+    rows = []
+    for strike in STRIKES + list(extra_strikes):
+        for option_type in ("CE", "PE"):
+            symbol = f"NIFTY{EXPIRY}{int(strike)}{option_type}"
+            rows.append(
+                SymToken(
+                    symbol=symbol,
+                    brsymbol=symbol,
+                    name="NIFTY",
+                    exchange="NFO",
+                    brexchange="NFO",
+                    token=f"{int(strike)}{option_type}",
+                    expiry="28-OCT-26",
+                    strike=strike,
+                    lotsize=lotsize,
+                    instrumenttype=option_type,
+                    tick_size=0.05,
+                )
+            )
+    db_session.add_all(rows)
+    db_session.commit()
+    assert token_db_enhanced.load_cache_for_broker("zerodha")
+
+
+@pytest.fixture(scope="module")
+def master_contract():
+    _load_master_contract()
+    yield
+    db_session.query(SymToken).delete()
+    db_session.commit()
+    token_db_enhanced.clear_cache()
+
+
+@pytest.fixture
+def quotes(master_contract, monkeypatch):
+    """Stubbed underlying quote and freeze quantity; returns the quote call counter"""
+    calls = {"quotes": 0}
+
+    def get_quotes(symbol, exchange, api_key=None):
+        calls["quotes"] += 1
+        return True, {"status": "success", "data": {"ltp": 24012.0}}, 200
+
+    monkeypatch.setattr(oss, "get_quotes", get_quotes)
+    monkeypatch.setattr(qty_freeze_db, "get_freeze_qty_for_option", lambda symbol, exchange: 1800)
+    oss.clear_strikes_cache()
+    oss.clear_option_symbol_cache()
+    return calls
+
+
+def _resolve(offset="ATM", option_type="CE", ltp=None):
+    ok, response, status = oss.get_option_symbol(
+        "NIFTY", "NSE_INDEX", EXPIRY, None, offset, option_type, "key", underlying_ltp=ltp
+    )
+    assert ok and status == 200, response
+    return response
+
+
+def _linear_atm(ltp, strikes):
+    return min(strikes, key=lambda x: abs(x - ltp))
+
+
+def test_binary_search_matches_linear_scan():
+    """Closest strike with the lower one on ties; offsets walk the sorted list"""
+    rng = random.Random(7)
+    prices = [rng.uniform(21000, 27000) for _ in range(2000)] + [24025.0, 22000.0, 26000.0, 24000.0]
+    for ltp in prices:
+        assert oss.find_atm_strike_from_actual(ltp, STRIKES) == _linear_atm(ltp, STRIKES)
+
+    for offset in ("ATM", "ITM1", "ITM5", "OTM3", "OTM40"):
+        for option_type in ("CE", "PE"):
+            atm = 24000.0
+            index = STRIKES.index(atm)
+            step = int(offset[3:]) if offset != "ATM" else 0
+            towards_higher = (offset.startswith("OTM") and option_type == "CE") or (
+                offset.startswith("ITM") and option_type == "PE"
+            )
+            target = index + step if towards_higher else index - step
+            expected = STRIKES[target] if 0 <= target < len(STRIKES) else None
+            assert oss.calculate_offset_strike_from_actual(atm, offset, option_type, STRIKES) == expected
+
+    assert oss.calculate_offset_strike_from_actual(24010.0, "ATM", "CE", STRIKES) is None
+    assert oss.calculate_offset_strike_from_actual(24000.0, "ITM100", "CE", STRIKES) is None
+
+
+def test_strikes_from_symbol_cache_index(quotes):
+    """Strikes for a series come from the symbol cache, sorted and without a DB query"""
+    assert token_db_enhanced.get_option_strikes_cached("NFO", "NIFTY", "28-OCT-26", "CE") == STRIKES
+    assert oss.get_available_strikes("NIFTY", EXPIRY, "PE", "NFO") == STRIKES
+    assert oss.get_strikes_cache_stats()["cached_entries"] == 1
+
+
+def test_resolution_cached_per_atm_bucket(quotes):
+    """Same bucket: cache hit with the same contract; new bucket: resolved afresh"""
+    first = _resolve("ITM2", "CE", ltp=24012.0)
+    assert first["symbol"] == f"NIFTY{EXPIRY}23900CE" and first["lotsize"] == 75 and first["freeze_qty"] == 1800
+
+    again = _resolve("ITM2", "CE", ltp=24020.0)  # still the 24000 bucket
+    assert again["symbol"] == first["symbol"] and again["underlying_ltp"] == 24020.0
+    assert oss.get_option_symbol_cache_stats() == {"hits": 1, "misses": 1, "cached_entries": 1}
+
+    moved = _resolve("ITM2", "CE", ltp=24030.0)  # 24050 bucket
+    assert moved["symbol"] == f"NIFTY{EXPIRY}23950CE"
+    assert _resolve("OTM3", "PE", ltp=24030.0)["symbol"] == f"NIFTY{EXPIRY}23900PE"
+    assert oss.get_option_symbol_cache_stats()["misses"] == 3
+
+    # Legacy strike_int method shares the cache under its own key
+    ok, legacy, _ = oss.get_option_symbol("NIFTY", "NSE_INDEX", EXPIRY, 50, "ITM2", "CE", "key", underlying_ltp=24012.0)
+    assert ok and legacy["symbol"] == first["symbol"]
+    assert oss.get_option_symbol_cache_stats()["cached_entries"] == 4
+
+    # Quote fetched when no LTP is given, errors are not cached
+    assert _resolve("ATM", "PE")["symbol"] == f"NIFTY{EXPIRY}24000PE" and quotes["quotes"] == 1
+    ok, response, status = oss.get_option_symbol("NIFTY", "NSE_INDEX", EXPIRY, None, "OTM200", "CE", "key", underlying_ltp=24012.0)
+    assert not ok and status == 400
+    assert oss.get_option_symbol_cache_stats()["cached_entries"] == 5
+
+
+def test_master_contract_reload_invalidates(quotes):
+    """A reload with new contracts is picked up by the next resolution"""
+    ok, _, status = oss.get_option_symbol("NIFTY", "NSE_INDEX", EXPIRY, None, "OTM1", "CE", "key", underlying_ltp=26000.0)
+    assert not ok and status == 400  # 26000 is the top strike
+    assert _resolve("ATM", "CE", ltp=26000.0)["lotsize"] == 75
+    assert oss.get_option_symbol_cache_stats()["cached_entries"] > 0
+
+    _load_master_contract(lotsize=65, extra_strikes=[26050.0])
+    try:
+        resolved = _resolve("OTM1", "CE", ltp=26000.0)
+        assert resolved["symbol"] == f"NIFTY{EXPIRY}26050CE" and resolved["lotsize"] == 65
+        assert _resolve("ATM", "CE", ltp=26000.0)["lotsize"] == 65
+        stats = oss.get_option_symbol_cache_stats()
+        assert stats["hits"] == 0 and stats["cached_entries"] == 2
+        assert oss.get_available_strikes("NIFTY", EXPIRY, "CE", "NFO")[-1] == 26050.0
+    finally:
+        _load_master_contract()
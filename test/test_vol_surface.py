@@ -0,0 +1,212 @@
+"""
+Tests for services/vol_surface_service.get_vol_surface_data()
+
+Tests (stubbed broker quotes):
+- IVs match a per-expiry calculate_greeks_batch() solve; fitted_surface follows the smile
+  and fills strikes without a quote
+- The underlying and every expiry's multiquotes call run concurrently, with auth resolved once
+- Within VOL_SURFACE_CACHE_TTL the cached surface is served without broker calls
+- After the TTL only changed expiries are re-solved; an ATM move rebuilds the strike layout
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from services import vol_surface_service as vs
+from services.option_greeks_service import calculate_greeks_batch
+from utils import black76
+
+EXPIRIES = [(datetime.now() + timedelta(days=d)).strftime("%d%b%y").upper() for d in (9, 16, 30, 58)]
+STRIKES = [float(s) for s in range(22000, 26001, 100)]
+
+
+def _years(expiry):
+    return (datetime.strptime(expiry, "%d%b%y").replace(hour=15, minute=30) - datetime.now()).total_seconds() / (
+        365 * 86400
+    )
+
+
+class _Market:
+    """Quadratic smile in log-moneyness, flattening with maturity, priced with Black-76"""
+
+    def __init__(self):
+        self.spot = 24020.0
+        self.bump = {}
+        self.missing = set()
+
+    def smile_vol(self, strike, expiry):
+        k = np.log(strike / self.spot)
+        return 0.13 + 0.02 * EXPIRIES.index(expiry) + (1.5 - 0.3 * EXPIRIES.index(expiry)) * k * k - 0.1 * k
+
+    def option_price(self, symbol):
+        if symbol in self.missing:
+            return 0
+        if symbol in self.bump:
+            return self.bump[symbol]
+        expiry = next(e for e in EXPIRIES if e in symbol)
+        strike = float(symbol[len("NIFTY") + len(expiry) : -2])
+        flag = "c" if symbol.endswith("CE") else "p"
+        price = black76.black_price(flag, self.spot, strike, _years(expiry), 0.0, self.smile_vol(strike, expiry))
+        return round(float(price) / 0.05) * 0.05
+
+
+@pytest.fixture
+def market():
+    return _Market()
+
+
+@pytest.fixture
+def calls(monkeypatch, market):
+    """Stubbed broker quote and auth calls; returns their counters"""
+    calls = {"quotes": 0, "multiquotes": 0, "auth": 0}
+    lock = threading.Lock()
+
+    def get_quotes(symbol, exchange, api_key=None, auth_token=None, feed_token=None, broker=None):
+        assert auth_token == "token" and broker == "zerodha"
+        with lock:
+            calls["quotes"] += 1
+        return True, {"status": "success", "data": {"ltp": market.spot}}, 200
+
+    def get_multiquotes(symbols, api_key=None, auth_token=None, feed_token=None, broker=None):
+        assert auth_token == "token" and broker == "zerodha"
+        with lock:
+            calls["multiquotes"] += 1
+        results = [
+            {"symbol": item["symbol"], "exchange": item["exchange"], "data": {"ltp": market.option_price(item["symbol"])}}
+            for item in symbols
+        ]
+        return True, {"status": "success", "results": results}, 200
+
+    def get_auth_token_broker(api_key, include_feed_token=False):
+        calls["auth"] += 1
+        return "token", "feed", "zerodha"
+
+    monkeypatch.setattr(vs, "get_quotes", get_quotes)
+    monkeypatch.setattr(vs, "get_multiquotes", get_multiquotes)
+    monkeypatch.setattr(vs, "get_auth_token_broker", get_auth_token_broker)
+    monkeypatch.setattr(
+        vs, "get_available_strikes", lambda base_symbol, expiry, option_type, exchange: STRIKES
+    )
+    vs.clear_vol_surface_cache()
+    yield calls
+    vs.clear_vol_surface_cache()
+
+
+def _surface(expiries=EXPIRIES, strike_count=15):
+    ok, response, status = vs.get_vol_surface_data("NIFTY", "NSE_INDEX", list(expiries), strike_count, "key")
+    assert ok and status == 200, response
+    return response["data"]
+
+
+def _expire_cache():
+    with vs._SURFACE_CACHE_LOCK:
+        for entry in vs._SURFACE_CACHE.values():
+            entry["built_at"] -= vs.VOL_SURFACE_CACHE_TTL + 1
+
+
+def test_surface_matches_batch_solve(market, calls):
+    """Same grid and IVs as solving each expiry separately; fit tracks the smile"""
+    data = _surface()
+    assert data["atm_strike"] == 24000.0
+    assert data["strikes"] == [s for s in STRIKES if 22500.0 <= s <= 25500.0]
+    assert [item["date"] for item in data["expiries"]] == EXPIRIES
+
+    for expiry, iv_row, fitted_row in zip(EXPIRIES, data["surface"], data["fitted_surface"]):
+        requests = [
+            {
+                "symbol": f"NIFTY{expiry}{int(strike)}{'CE' if strike >= 24000.0 else 'PE'}",
+                "exchange": "NFO",
+                "spot_price": market.spot,
+            }
+            for strike in data["strikes"]
+        ]
+        for request in requests:
+            request["option_price"] = market.option_price(request["symbol"])
+        expected = [
+            round(response["implied_volatility"], 2)
+            if ok and response["status"] == "success" and response.get("implied_volatility")
+            else None
+            for ok, response, _ in calculate_greeks_batch(requests)
+        ]
+        assert iv_row == expected
+
+        true_smile = [market.smile_vol(strike, expiry) * 100 for strike in data["strikes"]]
+        errors = [abs(f - t) for f, t in zip(fitted_row, true_smile)]
+        assert max(errors) < 0.5, (expiry, max(errors))
+
+
+def test_missing_quotes_filled_by_fit(market, calls):
+    """A strike without a quote has no raw IV but a fitted one between its neighbours"""
+    symbol = f"NIFTY{EXPIRIES[0]}24300CE"
+    market.missing = {symbol}
+    data = _surface()
+    column = data["strikes"].index(24300.0)
+    assert data["surface"][0][column] is None
+    fitted = data["fitted_surface"][0]
+    assert fitted[column] is not None
+    assert min(fitted[column - 1], fitted[column + 1]) - 0.2 <= fitted[column] <= max(
+        fitted[column - 1], fitted[column + 1]
+    ) + 0.2
+
+
+def test_quotes_fetched_concurrently(calls, monkeypatch):
+    """One auth lookup; all expiries' quotes are in flight together"""
+    monkeypatch.setattr(vs, "VOL_SURFACE_QUOTE_WORKERS", len(EXPIRIES))
+    barrier = threading.Barrier(len(EXPIRIES), timeout=5)
+    get_multiquotes = vs.get_multiquotes
+
+    def overlapping_multiquotes(symbols, **kwargs):
+        barrier.wait()  # breaks unless every expiry's call is running at once
+        return get_multiquotes(symbols, **kwargs)
+
+    monkeypatch.setattr(vs, "get_multiquotes", overlapping_multiquotes)
+    _surface()
+
+    assert calls["auth"] == 1
+    assert calls["quotes"] == 1 and calls["multiquotes"] == len(EXPIRIES)
+
+
+def test_cache_ttl_and_incremental_refresh(market, calls):
+    """Cache hits skip the broker; refreshes re-solve only what changed"""
+    first = _surface()
+    stats = vs.get_vol_surface_cache_stats()
+    assert stats["layout_builds"] == 1 and stats["expiries_solved"] == len(EXPIRIES)
+
+    # Within the TTL: same response, no broker calls
+    broker_calls = calls["quotes"] + calls["multiquotes"]
+    assert _surface() is first
+    assert calls["quotes"] + calls["multiquotes"] == broker_calls
+    assert vs.get_vol_surface_cache_stats()["hits"] >= 1
+
+    # After the TTL with unchanged quotes: one round of concurrent quotes, nothing re-solved
+    _expire_cache()
+    second = _surface()
+    assert calls["multiquotes"] == 2 * len(EXPIRIES)
+    stats = vs.get_vol_surface_cache_stats()
+    assert stats["layout_builds"] == 1 and stats["expiries_solved"] == len(EXPIRIES)
+    assert second["surface"] == first["surface"]
+
+    # One expiry's quote moves: only that expiry is re-solved
+    market.bump = {f"NIFTY{EXPIRIES[2]}24500CE": 500.0}
+    _expire_cache()
+    third = _surface()
+    assert vs.get_vol_surface_cache_stats()["expiries_solved"] == len(EXPIRIES) + 1
+    assert third["surface"][0] == first["surface"][0]
+    assert third["surface"][2] != first["surface"][2]
+
+    # The underlying crosses to a new ATM strike: layout rebuilt, grid re-centred
+    market.bump = {}
+    market.spot = 24380.0
+    _expire_cache()
+    fourth = _surface()
+    stats = vs.get_vol_surface_cache_stats()
+    assert stats["layout_builds"] == 2 and stats["expiries_solved"] == 2 * len(EXPIRIES) + 1
+    assert fourth["atm_strike"] == 24400.0 and fourth["strikes"][0] == 22900.0
+
+    # Different expiries or strike count are separate surfaces
+    _surface(EXPIRIES[:2])
+    _surface(strike_count=10)
+    assert vs.get_vol_surface_cache_stats()["cached_surfaces"] == 3
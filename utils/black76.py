@@ -0,0 +1,207 @@
+# utils/black76.py
+"""
+Vectorized Black-76 pricing, implied volatility and Greeks
+
+NumPy implementation of the Black-76 model for options on futures/forwards,
+used for whole option chains instead of one py_vollib call per option.
+Every function takes array-likes (or scalars) that broadcast against each
+other and returns NumPy arrays.
+
+Conventions match py_vollib.black so results are interchangeable:
+- flag: 'c' or 'p' per option
+- t: time to expiry in years, r: annual rate as a decimal, sigma: volatility as a decimal
+- price: discounted option price
+- theta is per calendar day, vega and rho per 1% change
+
+Implied volatility is solved on the out-of-the-money half of each put/call
+pair (undiscounted time value), starting from the Corrado-Miller rational
+approximation and refined with Halley steps inside a bisection bracket, so
+every element converges in a few iterations regardless of moneyness.
+"""
+
+import numpy as np
+from scipy.special import ndtr
+
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+# Upper bound on Halley/bisection iterations (quoted prices converge in 2-3)
+IV_MAX_ITERATIONS = 64
+
+# Relative tolerance on sigma * sqrt(t)
+IV_TOLERANCE = 1e-12
+
+
+def _norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def _is_call(flag) -> np.ndarray:
+    """Boolean call mask from 'c'/'p' flags"""
+    return np.char.lower(np.asarray(flag, dtype=str)) == "c"
+
+
+def _d1_d2(F, K, t, sigma):
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(F / K) + 0.5 * sigma * sigma * t) / (sigma * sqrt_t)
+    return d1, d1 - sigma * sqrt_t
+
+
+def black_price(flag, F, K, t, r, sigma) -> np.ndarray:
+    """
+    Discounted Black-76 option prices.
+
+    Args:
+        flag: 'c' or 'p' per option
+        F: Futures/forward prices
+        K: Strike prices
+        t: Times to expiry in years
+        r: Annual risk-free rates (decimal)
+        sigma: Volatilities (decimal)
+
+    Returns:
+        Array of discounted option prices
+    """
+    is_call = _is_call(flag)
+    F, K, t, r, sigma = (np.asarray(a, dtype=float) for a in (F, K, t, r, sigma))
+    d1, d2 = _d1_d2(F, K, t, sigma)
+    theta = np.where(is_call, 1.0, -1.0)
+    return np.exp(-r * t) * theta * (F * ndtr(theta * d1) - K * ndtr(theta * d2))
+
+
+def _otm_price(x, s, theta, F, K):
+    """Undiscounted price of the OTM option for total volatility s = sigma * sqrt(t)"""
+    d1 = x / s + 0.5 * s
+    d2 = d1 - s
+    return theta * (F * ndtr(theta * d1) - K * ndtr(theta * d2)), d1, d2
+
+
+def implied_volatility(price, F, K, r, t, flag) -> np.ndarray:
+    """
+    Implied volatility of discounted Black-76 option prices.
+
+    Argument order matches py_vollib.black.implied_volatility.implied_volatility.
+
+    Args:
+        price: Discounted option prices
+        F: Futures/forward prices
+        K: Strike prices
+        r: Annual risk-free rates (decimal)
+        t: Times to expiry in years
+        flag: 'c' or 'p' per option
+
+    Returns:
+        Array of volatilities (decimal). NaN where no volatility reproduces the
+        price: at or below intrinsic value, above the no-arbitrage maximum, or
+        non-positive inputs.
+    """
+    is_call = _is_call(flag)
+    price, F, K, r, t = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (price, F, K, r, t)), is_call
+    )[:5]
+    is_call = np.broadcast_to(is_call, price.shape)
+
+    result = np.full(price.shape, np.nan)
+    valid = (price > 0) & (F > 0) & (K > 0) & (t > 0)
+    if not valid.any():
+        return result
+
+    # Work on the valid subset, undiscounted
+    p = price[valid] * np.exp(r[valid] * t[valid])
+    F, K, t, call = F[valid], K[valid], t[valid], is_call[valid]
+
+    # Time value is the price of the out-of-the-money option of the put/call pair
+    intrinsic = np.where(call, np.maximum(F - K, 0.0), np.maximum(K - F, 0.0))
+    q = p - intrinsic
+    theta = np.where(K >= F, 1.0, -1.0)
+    upper = np.minimum(F, K)
+    solvable = (q > 0) & (q < upper)
+
+    x = np.log(F / K)
+
+    # Corrado-Miller rational approximation for the starting point
+    call_price = q + np.maximum(F - K, 0.0)
+    half_moneyness = call_price - 0.5 * (F - K)
+    radicand = np.maximum(half_moneyness**2 - (F - K) ** 2 / np.pi, 0.0)
+    s = SQRT_2PI / (F + K) * (half_moneyness + np.sqrt(radicand))
+    s = np.where(np.isfinite(s) & (s > 1e-8), s, SQRT_2PI * q / F)
+
+    # Bracket [lo, hi] on s; grow hi until it prices above the target
+    lo = np.zeros_like(s)
+    hi = np.maximum(2.0 * s, 1.0)
+    for _ in range(16):
+        below = solvable & (_otm_price(x, hi, theta, F, K)[0] < q)
+        if not below.any():
+            break
+        lo = np.where(below, hi, lo)
+        hi = np.where(below, hi * 4.0, hi)
+    s = np.clip(s, lo, hi)
+    s = np.where((s <= lo) | (s >= hi), 0.5 * (lo + hi), s)
+
+    log_q = np.log(np.where(solvable, q, 1.0))
+    active = solvable.copy()
+    for _ in range(IV_MAX_ITERATIONS):
+        if not active.any():
+            break
+        value, d1, d2 = _otm_price(x, s, theta, F, K)
+        diff = value - q
+        lo = np.where(active & (diff < 0), s, lo)
+        hi = np.where(active & (diff > 0), s, hi)
+
+        # Halley step on ln B(s) - ln q, which stays well-conditioned for deep
+        # OTM prices: dB/ds = F n(d1), d2B/ds2 = dB/ds * d1 d2 / s
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            f = np.log(value) - log_q
+            g = F * _norm_pdf(d1) / value
+            h = g * d1 * d2 / s - g * g
+            newton = f / g
+            step = newton / (1.0 - 0.5 * newton * h / g)
+        converged = (np.abs(step) <= IV_TOLERANCE * s) | (diff == 0) | (hi - lo <= IV_TOLERANCE * s)
+
+        # Fall back to bisection when the step leaves the bracket
+        candidate = s - step
+        outside = ~np.isfinite(candidate) | (candidate < lo) | (candidate > hi)
+        candidate = np.where(outside, 0.5 * (lo + hi), candidate)
+
+        active &= ~converged
+        s = np.where(active, candidate, s)
+
+    solved = np.where(solvable, s / np.sqrt(t), np.nan)
+    result[valid] = solved
+    return result
+
+
+def greeks(flag, F, K, t, r, sigma) -> dict[str, np.ndarray]:
+    """
+    Closed-form Black-76 Greeks, in the units of py_vollib.black.greeks.analytical.
+
+    Args:
+        flag: 'c' or 'p' per option
+        F: Futures/forward prices
+        K: Strike prices
+        t: Times to expiry in years
+        r: Annual risk-free rates (decimal)
+        sigma: Volatilities (decimal)
+
+    Returns:
+        Dict of arrays: delta, gamma, theta (per day), vega (per 1% vol), rho (per 1% rate)
+    """
+    is_call = _is_call(flag)
+    F, K, t, r, sigma = (np.asarray(a, dtype=float) for a in (F, K, t, r, sigma))
+    sqrt_t = np.sqrt(t)
+    discount = np.exp(-r * t)
+    d1, d2 = _d1_d2(F, K, t, sigma)
+    pdf_d1 = _norm_pdf(d1)
+    sign = np.where(is_call, 1.0, -1.0)
+    n_d1 = ndtr(sign * d1)
+    n_d2 = ndtr(sign * d2)
+
+    price = discount * sign * (F * n_d1 - K * n_d2)
+    decay = F * discount * pdf_d1 * sigma / (2.0 * sqrt_t)
+
+    return {
+        "delta": sign * discount * n_d1,
+        "gamma": discount * pdf_d1 / (F * sigma * sqrt_t),
+        "theta": (-decay + sign * r * discount * (F * n_d1 - K * n_d2)) / 365.0,
+        "vega": F * discount * pdf_d1 * sqrt_t * 0.01,
+        "rho": -t * price * 0.01,
+    }
@@ -0,0 +1,142 @@
+# utils/history_rate_governor.py
+"""
+Per-broker rate governor for historical data requests.
+
+Each broker gets a token bucket sized to its documented history API limit, shared
+by every caller in the process (history API, Historify download workers, broker
+adapters that fetch long ranges in chunks). Callers block in acquire() until their
+request slot comes up, so any number of worker threads can issue history requests
+without exceeding the broker's limit.
+
+Brokers listed in SELF_GOVERNED_BROKERS acquire one slot per HTTP request inside
+their adapter (they split long ranges into several requests); history_service skips
+the per-call slot for them.
+
+Configuration (.env):
+- HISTORY_RATE_LIMITS: Per-broker overrides as "broker:rate[:burst],..." (e.g. "dhan:5,fyers:10:2")
+- HISTORY_RATE_LIMIT_DEFAULT: Requests per second for brokers without a known limit (default: 3)
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class HistoryRateLimit:
+    """Steady request rate (per second) and burst size of a broker's history API"""
+
+    rate: float
+    burst: float = 1.0
+
+
+# Documented historical data API limits
+BROKER_HISTORY_LIMITS: dict[str, HistoryRateLimit] = {
+    "zerodha": HistoryRateLimit(rate=3),  # Kite Connect: 3 req/s for historical candles
+    "angel": HistoryRateLimit(rate=3),  # SmartAPI getCandleData: 3 req/s
+    "dhan": HistoryRateLimit(rate=5),  # Data APIs: 5 req/s
+    "fyers": HistoryRateLimit(rate=3),  # API v3: 10 req/s but 200 req/min sustained
+}
+
+# Adapters that acquire a slot per HTTP request themselves
+SELF_GOVERNED_BROKERS = {"zerodha"}
+
+
+def _parse_overrides(value: str) -> dict[str, HistoryRateLimit]:
+    """Parse HISTORY_RATE_LIMITS ("broker:rate[:burst],...")."""
+    overrides = {}
+    for entry in (item.strip() for item in value.split(",")):
+        if not entry:
+            continue
+        try:
+            parts = entry.split(":")
+            rate = float(parts[1])
+            burst = float(parts[2]) if len(parts) > 2 else 1.0
+            if rate <= 0 or burst < 1:
+                raise ValueError("rate must be > 0 and burst >= 1")
+            overrides[parts[0].strip().lower()] = HistoryRateLimit(rate=rate, burst=burst)
+        except (IndexError, ValueError) as e:
+            logger.warning(f"Ignoring HISTORY_RATE_LIMITS entry '{entry}': {e}")
+    return overrides
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations in arrival order"""
+
+    def __init__(self, limit: HistoryRateLimit):
+        self.limit = limit
+        self.tokens = limit.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.limit.burst, self.tokens + (now - self.updated) * self.limit.rate
+            )
+            self.updated = now
+            # A negative balance queues the caller behind earlier reservations
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.limit.rate)
+
+
+class HistoryRateGovernor:
+    """Process-wide token buckets for broker history requests, one per broker"""
+
+    def __init__(self, overrides: dict[str, HistoryRateLimit] | None = None, default_rate: float | None = None):
+        self.limits = {**BROKER_HISTORY_LIMITS, **(overrides or {})}
+        self.default_limit = HistoryRateLimit(
+            rate=default_rate or float(os.getenv("HISTORY_RATE_LIMIT_DEFAULT", "3"))
+        )
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_seconds": 0.0}
+
+    def get_limit(self, broker: str) -> HistoryRateLimit:
+        """Rate limit applied to a broker"""
+        return self.limits.get((broker or "").lower(), self.default_limit)
+
+    def _bucket(self, broker: str) -> TokenBucket:
+        key = (broker or "").lower()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(self.get_limit(key)))
+        return bucket
+
+    def acquire(self, broker: str):
+        """Block until the next history request to this broker may be sent"""
+        wait = self._bucket(broker).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.stats["acquired"] += 1
+            self.stats["waited_seconds"] += wait
+
+    def is_self_governed(self, broker: str) -> bool:
+        """True if the broker adapter acquires a slot per HTTP request itself"""
+        return (broker or "").lower() in SELF_GOVERNED_BROKERS
+
+
+# Global instance for singleton access
+_governor: HistoryRateGovernor | None = None
+_governor_lock = threading.Lock()
+
+
+def get_history_rate_governor() -> HistoryRateGovernor:
+    """Get the global history rate governor instance"""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = HistoryRateGovernor(
+                    overrides=_parse_overrides(os.getenv("HISTORY_RATE_LIMITS", ""))
+                )
+    return _governor
@@ -0,0 +1,144 @@
+# utils/quote_rate_governor.py
+"""
+Per-broker batch size and rate governor for multiquote requests.
+
+Broker adapters split a large get_multiquotes() call into batches of their API's
+symbol limit and sleep between batches, so one call for a few hundred symbols runs
+the batches back to back. Callers that split the symbols into broker-sized chunks
+themselves (multi-option Greeks) take a slot here per chunk, which lets the chunks
+run concurrently while the broker still sees no more than its documented rate.
+
+Maximum multiquote throughput per broker is batch_size x rate symbols per second
+(e.g. zerodha 500/s, angel 50/s, fyers 500/s, dhan 1000/s).
+
+Configuration (.env):
+- MULTIQUOTE_LIMITS: Per-broker overrides as "broker:batch_size:rate,..." (e.g. "angel:50:1,fyers:50:10")
+- MULTIQUOTE_BATCH_SIZE_DEFAULT: Symbols per request for brokers without a known limit (default: 50)
+- MULTIQUOTE_RATE_LIMIT_DEFAULT: Requests per second for brokers without a known limit (default: 1)
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from utils.history_rate_governor import HistoryRateLimit, TokenBucket
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class MultiquoteLimit:
+    """Symbols per request and steady request rate (per second) of a broker's quotes API"""
+
+    batch_size: int
+    rate: float
+
+    @property
+    def max_symbols_per_second(self) -> float:
+        return self.batch_size * self.rate
+
+
+# Batch sizes and inter-batch delays used by the broker adapters' get_multiquotes()
+BROKER_MULTIQUOTE_LIMITS: dict[str, MultiquoteLimit] = {
+    "zerodha": MultiquoteLimit(batch_size=500, rate=1),
+    "upstox": MultiquoteLimit(batch_size=500, rate=1),
+    "dhan": MultiquoteLimit(batch_size=1000, rate=1),
+    "angel": MultiquoteLimit(batch_size=50, rate=1),
+    "fyers": MultiquoteLimit(batch_size=50, rate=10),
+    "kotak": MultiquoteLimit(batch_size=50, rate=5),
+    "groww": MultiquoteLimit(batch_size=50, rate=5),
+    "fivepaisa": MultiquoteLimit(batch_size=50, rate=2),
+    "fivepaisaxts": MultiquoteLimit(batch_size=50, rate=10),
+    "compositedge": MultiquoteLimit(batch_size=50, rate=10),
+    "ibulls": MultiquoteLimit(batch_size=50, rate=10),
+    "iifl": MultiquoteLimit(batch_size=50, rate=10),
+    "jainamxts": MultiquoteLimit(batch_size=50, rate=10),
+    "rmoney": MultiquoteLimit(batch_size=50, rate=10),
+    "wisdom": MultiquoteLimit(batch_size=50, rate=10),
+    "motilal": MultiquoteLimit(batch_size=100, rate=10),
+    "paytm": MultiquoteLimit(batch_size=100, rate=10),
+    "indmoney": MultiquoteLimit(batch_size=500, rate=3),
+    "mstock": MultiquoteLimit(batch_size=500, rate=1),
+    "samco": MultiquoteLimit(batch_size=25, rate=5),
+    "firstock": MultiquoteLimit(batch_size=50, rate=1),
+    "definedge": MultiquoteLimit(batch_size=20, rate=1),
+    "shoonya": MultiquoteLimit(batch_size=20, rate=1),
+    "flattrade": MultiquoteLimit(batch_size=10, rate=0.9),
+    "zebu": MultiquoteLimit(batch_size=10, rate=1),
+}
+
+
+def _parse_overrides(value: str) -> dict[str, MultiquoteLimit]:
+    """Parse MULTIQUOTE_LIMITS ("broker:batch_size:rate,...")."""
+    overrides = {}
+    for entry in (item.strip() for item in value.split(",")):
+        if not entry:
+            continue
+        try:
+            parts = entry.split(":")
+            batch_size = int(parts[1])
+            rate = float(parts[2])
+            if batch_size < 1 or rate <= 0:
+                raise ValueError("batch_size must be >= 1 and rate > 0")
+            overrides[parts[0].strip().lower()] = MultiquoteLimit(batch_size=batch_size, rate=rate)
+        except (IndexError, ValueError) as e:
+            logger.warning(f"Ignoring MULTIQUOTE_LIMITS entry '{entry}': {e}")
+    return overrides
+
+
+class QuoteRateGovernor:
+    """Process-wide token buckets for chunked multiquote requests, one per broker"""
+
+    def __init__(
+        self,
+        overrides: dict[str, MultiquoteLimit] | None = None,
+        default_limit: MultiquoteLimit | None = None,
+    ):
+        self.limits = {**BROKER_MULTIQUOTE_LIMITS, **(overrides or {})}
+        self.default_limit = default_limit or MultiquoteLimit(
+            batch_size=int(os.getenv("MULTIQUOTE_BATCH_SIZE_DEFAULT", "50")),
+            rate=float(os.getenv("MULTIQUOTE_RATE_LIMIT_DEFAULT", "1")),
+        )
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_seconds": 0.0}
+
+    def get_limit(self, broker: str) -> MultiquoteLimit:
+        """Batch size and rate limit applied to a broker"""
+        return self.limits.get((broker or "").lower(), self.default_limit)
+
+    def _bucket(self, broker: str) -> TokenBucket:
+        key = (broker or "").lower()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    key, TokenBucket(HistoryRateLimit(rate=self.get_limit(key).rate))
+                )
+        return bucket
+
+    def acquire(self, broker: str):
+        """Block until the next multiquote request to this broker may be sent"""
+        wait = self._bucket(broker).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.stats["acquired"] += 1
+            self.stats["waited_seconds"] += wait
+
+
+# Global instance for singleton access
+_governor: QuoteRateGovernor | None = None
+_governor_lock = threading.Lock()
+
+
+def get_quote_rate_governor() -> QuoteRateGovernor:
+    """Get the global multiquote rate governor instance"""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = QuoteRateGovernor(overrides=_parse_overrides(os.getenv("MULTIQUOTE_LIMITS", "")))
+    return _governor
@@ -15,6 +15,7 @@ from dotenv import load_dotenv
 from sqlalchemy import text
 
 from database.auth_db import get_broker_name, verify_api_key
+from services.computed_channel_service import COMPUTE_INTERVAL, get_computed_channels
 from services.market_data_service import get_market_data_service
 from utils.logging import get_logger, highlight_url
 
@@ -63,7 +64,12 @@ class WebSocketProxy:
         self.broker_adapters = {}  # Maps user_id to broker adapter
         self.user_mapping = {}  # Maps client_id to user_id
         self.user_broker_mapping = {}  # Maps user_id to broker_name
+        self.client_api_keys = {}  # Maps client_id to API key (computed channel snapshots)
         self.running = False
+        self.computed_task = None  # Computed channel push loop, cancelled in stop()
+
+        # Derived analytics channels (CHAIN_GREEKS, NET_GEX, STRADDLE, PCR) shared by all clients
+        self.computed_channels = get_computed_channels()
 
         # PERFORMANCE OPTIMIZATION: Subscription index for O(1) lookup
         # Maps (symbol, exchange, mode) -> set of client_ids
@@ -111,6 +117,9 @@ class WebSocketProxy:
             # Create the ZMQ listener task
             zmq_task = loop.create_task(self.zmq_listener())
 
+            # Create the computed channel task (analytics pushes on chain session ticks)
+            self.computed_task = loop.create_task(self.computed_channel_loop())
+
             # Start WebSocket server
             stop = aio.Future()  # Used to stop the server
 
@@ -191,6 +200,16 @@ class WebSocketProxy:
         self.running = False
 
         try:
+            # Stop pushing computed channels before clients are closed
+            if self.computed_task is not None and not self.computed_task.done():
+                self.computed_task.cancel()
+                try:
+                    await self.computed_task
+                except aio.CancelledError:
+                    pass
+            self.computed_task = None
+            self.computed_channels.set_wakeup(None)
+
             # Close the WebSocket server first (this releases the port)
             if hasattr(self, "server") and self.server:
                 try:
@@ -346,6 +365,7 @@ class WebSocketProxy:
                 "last_cleanup_time": self._last_cleanup_time,
             },
             "zmq_resources": adapter_stats,
+            "computed_channels": self.computed_channels.stats(),
         }
 
     def _cleanup_stale_throttle_entries(self):
@@ -437,6 +457,10 @@ class WebSocketProxy:
         if client_id in self.clients:
             del self.clients[client_id]
 
+        # Drop computed channel subscriptions
+        self.computed_channels.remove_client(client_id)
+        self.client_api_keys.pop(client_id, None)
+
         # Clean up subscriptions
         if client_id in self.subscriptions:
             subscriptions = self.subscriptions[client_id]
@@ -540,6 +564,10 @@ class WebSocketProxy:
                 await self.subscribe_client(client_id, data)
             elif action in ["unsubscribe", "unsubscribe_all"]:
                 await self.unsubscribe_client(client_id, data)
+            elif action == "subscribe_computed":
+                await self.subscribe_computed(client_id, data)
+            elif action == "unsubscribe_computed":
+                await self.unsubscribe_computed(client_id, data)
             elif action == "get_broker_info":
                 await self.get_broker_info(client_id)
             elif action == "get_supported_brokers":
@@ -653,6 +681,7 @@ class WebSocketProxy:
 
         # Store the user mapping
         self.user_mapping[client_id] = user_id
+        self.client_api_keys[client_id] = api_key
 
         # Get broker name
         broker_name = get_broker_name(api_key)
@@ -1243,6 +1272,119 @@ class WebSocketProxy:
             },
         )
 
+    async def subscribe_computed(self, client_id, data):
+        """
+        Subscribe a client to computed analytics channels
+
+        Args:
+            client_id: ID of the client
+            data: Subscription data with 'channels' (e.g. "CHAIN_GREEKS:NIFTY:28NOV25"),
+                  optional 'exchange' and 'strike_count'
+        """
+        if client_id not in self.user_mapping:
+            await self.send_error(client_id, "NOT_AUTHENTICATED", "You must authenticate first")
+            return
+
+        channels = data.get("channels") or ([data["channel"]] if data.get("channel") else [])
+        if not channels:
+            await self.send_error(
+                client_id, "INVALID_PARAMETERS", "At least one channel must be specified"
+            )
+            return
+
+        try:
+            strike_count = int(data.get("strike_count") or 0) or None
+        except (TypeError, ValueError):
+            await self.send_error(client_id, "INVALID_PARAMETERS", "strike_count must be a number")
+            return
+
+        results = self.computed_channels.subscribe(
+            client_id,
+            channels,
+            self.user_mapping[client_id],
+            self.client_api_keys.get(client_id, ""),
+            exchange=data.get("exchange", "NFO"),
+            strike_count=strike_count,
+        )
+        await self.send_message(
+            client_id,
+            {
+                "type": "subscribe_computed",
+                "status": "success"
+                if all(result["status"] == "success" for result in results)
+                else "partial",
+                "subscriptions": results,
+            },
+        )
+
+    async def unsubscribe_computed(self, client_id, data):
+        """
+        Unsubscribe a client from computed analytics channels
+
+        Args:
+            client_id: ID of the client
+            data: Unsubscription data with 'channels' (all channels when omitted),
+                  'exchange' and 'strike_count' as used when subscribing
+        """
+        if client_id not in self.user_mapping:
+            await self.send_error(client_id, "NOT_AUTHENTICATED", "You must authenticate first")
+            return
+
+        channels = data.get("channels") or ([data["channel"]] if data.get("channel") else None)
+        try:
+            strike_count = int(data.get("strike_count") or 0) or None
+        except (TypeError, ValueError):
+            strike_count = None
+
+        removed = self.computed_channels.unsubscribe(
+            client_id, channels, exchange=data.get("exchange", "NFO"), strike_count=strike_count
+        )
+        await self.send_message(
+            client_id,
+            {"type": "unsubscribe_computed", "status": "success", "channels": removed},
+        )
+
+    async def computed_channel_loop(self):
+        """
+        Recompute subscribed analytics channels when their chain sessions tick and
+        push changed payloads. Wakes on session ticks, at most every
+        COMPUTE_INTERVAL seconds, and at least every interval so chains that are
+        not streamed are re-read once their poll interval is due. Each chain is
+        computed once for all of its user's subscribers; the blocking part
+        (option chain reads, Greeks) runs in the default executor.
+        """
+        loop = aio.get_running_loop()
+        wakeup = aio.Event()
+        self.computed_channels.set_wakeup(lambda: loop.call_soon_threadsafe(wakeup.set))
+        last_pass = 0.0
+
+        while self.running:
+            try:
+                try:
+                    await aio.wait_for(wakeup.wait(), timeout=COMPUTE_INTERVAL)
+                except TimeoutError:
+                    pass
+                # Coalesce tick bursts into one pass per interval
+                delay = last_pass + COMPUTE_INTERVAL - loop.time()
+                if delay > 0:
+                    await aio.sleep(delay)
+                wakeup.clear()
+                if not self.computed_channels.has_subscriptions():
+                    continue
+
+                last_pass = loop.time()
+                messages = await loop.run_in_executor(None, self.computed_channels.compute_due)
+                if messages:
+                    await aio.gather(
+                        *(self.send_message(client_id, message) for client_id, message in messages),
+                        return_exceptions=True,
+                    )
+            except aio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception(f"Error in computed channel loop: {e}")
+                await aio.sleep(1)
+
     async def send_message(self, client_id, message):
         """
         Send a message to a client